@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import sqlite3, swisseph as swe
 import datetime
 from app_stable_backup import calc_full_table  # ✅ uses your verified calc with Maandhi, Lagna, etc.
@@ -14,6 +14,19 @@ from padas import calculate_padas
 from karakas import calculate_chara_karakas
 from chart_comparison import get_dual_chart_data
 from divisional_charts import compute_all_divisions
+from chart_snapshot import get_snapshot, snapshot_from_local, sid_mode_for, parse_birth_data
+import storage
+import dasha_store
+import dasha_jobs
+import gochara_store
+import chart_list
+import chart_search
+import migrations
+import payload_codec
+import result_cache
+import place_fuzzy
+import place_index
+import place_snapshot
 import os
 
 # ------------------------------------------------------------
@@ -47,26 +60,6 @@ DB_PATH = CHARTS_DB
 
 
 
-def ensure_dasha_table():
-    conn = sqlite3.connect(DASHA_DB)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS dashas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chart_id INTEGER,
-            level TEXT,         -- Mahadasha / Bhukti / Antara / etc.
-            planet TEXT,
-            start_date TEXT,
-            end_date TEXT,
-            duration REAL,
-            raw_json TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-ensure_dasha_table()
-
 
 
 # Always use a fixed file in your project folder
@@ -93,44 +86,6 @@ EVENTS_DB = os.path.join(BASE_DIR, "data", "events.db")
 
 
 
-def ensure_events_table():
-    """Create events table if it doesn't exist."""
-    conn = sqlite3.connect(EVENTS_DB)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chart_id INTEGER,
-            event_name TEXT,
-            event_date TEXT,
-            event_time TEXT,
-            event_notes TEXT,
-            dasha TEXT,
-            bhukti TEXT,
-            antara TEXT,
-            sookshma TEXT,
-            prana TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def ensure_transit_table():
-    conn = sqlite3.connect(TRANSIT_HISTORY_DB)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS transit_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chart_id INTEGER,
-            timestamp TEXT,
-            location TEXT,
-            note TEXT,
-            data_json TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-    
 def compute_maandhi_safe(*args, **kwargs):
     result = _compute_maandhi(*args, **kwargs)
     if isinstance(result, dict):
@@ -149,7 +104,7 @@ def compute_maandhi_safe(*args, **kwargs):
 app = Flask(__name__)
 
 DB_PATH = "charts.db"
-PLACES_DB = "places.db"
+PLACES_DB = os.path.join(BASE_DIR, "places.db")
 DB_PATH = CHARTS_DB
   # ✅ ensure all chart data goes to /data/charts.db
 
@@ -194,177 +149,146 @@ SHORT_NAMES = {
 
 
 # -------------------- GENERATE CHART --------------------
-@app.route("/generate_chart", methods=["POST"])
-def generate_chart():
+def build_rasi_chart(year, month, day, hour, minute, second, lat, lon, tz,
+                     sid_mode=swe.SIDM_LAHIRI, chart_type="rasi", rows=None):
+    """
+    Rows + HTML table for the rasi (or D-n) chart, as /generate_chart returns
+    them. Pass rows to reuse an existing calc_full_table result (mutated here).
+    """
+    # Get planetary rows
+    if rows is None:
+        rows = calc_full_table(year, month, day, hour, minute, second, lat, lon, tz, sid_mode)
+
+    # ✅ Same ephemeris snapshot calc_full_table just used (cached, no new calc_ut)
+    snap = snapshot_from_local(year, month, day, hour, minute, second, lat, lon, tz, sid_mode)
+    # ============================================================
+    # 🆕 NEW: INJECT KARAKAS (AK, AmK) INTO ROWS
+    # ============================================================
     try:
-        data = request.get_json() or {}
+        karaka_data = calculate_chara_karakas(snap)
 
-        # Handle both styles: either individual numeric fields OR combined date/time strings
-        if "year" in data and "month" in data and "day" in data:
-            year, month, day = int(data["year"]), int(data["month"]), int(data["day"])
-            hour, minute, second = int(data.get("hour", 0)), int(data.get("minute", 0)), int(data.get("second", 0))
-        elif "date" in data and "time" in data:
-            date_parts = data["date"].split("-")
-            time_parts = data["time"].split(":")
-            year, month, day = int(date_parts[0]), int(date_parts[1]), int(date_parts[2])
-            hour = int(time_parts[0]) if len(time_parts) > 0 else 0
-            minute = int(time_parts[1]) if len(time_parts) > 1 else 0
-            second = int(float(time_parts[2])) if len(time_parts) > 2 else 0
-        else:
-            raise ValueError("Missing or invalid date/time fields")
+        # Map English (karakas.py) -> Tamil (rows)
+        eng_to_tamil = {
+            "Sun": "சூரியன்", "Moon": "சந்திரன்", "Mars": "செவ்வாய்",
+            "Mercury": "புதன்", "Jupiter": "குரு", "Venus": "சுக்கிரன்", "Saturn": "சனி"
+        }
 
-        lat = float(data.get("lat", 13.0827))
-        lon = float(data.get("lon", 80.2707))
-        tz = float(data.get("tz", 5.5))
-        ayanamsa = data.get("ayanamsa", "lahiri")
-        chart_type = data.get("chartType", "rasi").lower()
+        # Helper Map: "சூரியன்" -> "AK"
+        k_map = {}
+        for k in karaka_data:
+            if k['planet'] in eng_to_tamil:
+                t_name = eng_to_tamil[k['planet']]
+                k_map[t_name] = k['karaka_code'] # e.g. "AK"
 
+        # Inject into rows
+        for r in rows:
+            pname = r.get("name")
+            if pname in k_map:
+                r["karaka"] = k_map[pname]
+            else:
+                r["karaka"] = ""
 
-        # Ayanamsa mode (unchanged)
-        if ayanamsa.lower() == "raman":
-            swe.set_sid_mode(swe.SIDM_RAMAN)
-        elif ayanamsa.lower() == "kp":
-            swe.set_sid_mode(swe.SIDM_KRISHNAMURTI)
-        elif ayanamsa.lower() == "yukteshwar":
-            swe.set_sid_mode(swe.SIDM_YUKTESHWAR)
-        else:
-            swe.set_sid_mode(swe.SIDM_LAHIRI)
+    except Exception as e:
+        print(f"⚠️ Karaka Injection Failed: {e}")
+    print("🧩 DEBUG: rows type =", type(rows), "length =", len(rows) if rows else 0)
+
+    # Retrograde detection
+    retro_map = {}
+    planet_check_names = {
+        "சூரியன்": swe.SUN, "சந்திரன்": swe.MOON, "செவ்வாய்": swe.MARS,
+        "புதன்": swe.MERCURY, "குரு": swe.JUPITER, "சுக்கிரன்": swe.VENUS,
+        "சனி": swe.SATURN, "ராகு": swe.MEAN_NODE, "கேது": swe.MEAN_NODE
+    }
+    for pname, pid in planet_check_names.items():
+        try:
+            retro_map[pname] = snap.is_retro(pid)
+        except Exception:
+            retro_map[pname] = False
 
-        # Get planetary rows
-        rows = calc_full_table(year, month, day, hour, minute, second, lat, lon, tz)
-        # ============================================================
-        # 🆕 NEW: INJECT KARAKAS (AK, AmK) INTO ROWS
-        # ============================================================
+    # D-chart mapping
+    def map_divisional_rasi_name(row, div):
         try:
-            jd_ut = swe.julday(year, month, day, hour + minute/60.0 + second/3600.0) - (tz / 24.0)
-            karaka_data = calculate_chara_karakas(jd_ut)
-            
-            # Map English (karakas.py) -> Tamil (rows)
-            eng_to_tamil = {
-                "Sun": "சூரியன்", "Moon": "சந்திரன்", "Mars": "செவ்வாய்",
-                "Mercury": "புதன்", "Jupiter": "குரு", "Venus": "சுக்கிரன்", "Saturn": "சனி"
-            }
-            
-            # Helper Map: "சூரியன்" -> "AK"
-            k_map = {}
-            for k in karaka_data:
-                if k['planet'] in eng_to_tamil:
-                    t_name = eng_to_tamil[k['planet']]
-                    k_map[t_name] = k['karaka_code'] # e.g. "AK"
-
-            # Inject into rows
-            for r in rows:
-                pname = r.get("name")
-                if pname in k_map:
-                    r["karaka"] = k_map[pname]  
-                else:
-                    r["karaka"] = ""
-                    
-        except Exception as e:
-            print(f"⚠️ Karaka Injection Failed: {e}")
-        print("🧩 DEBUG: rows type =", type(rows), "length =", len(rows) if rows else 0)
-
-        # Retrograde detection
-        retro_map = {}
-        planet_check_names = {
-            "சூரியன்": swe.SUN, "சந்திரன்": swe.MOON, "செவ்வாய்": swe.MARS,
-            "புதன்": swe.MERCURY, "குரு": swe.JUPITER, "சுக்கிரன்": swe.VENUS,
-            "சனி": swe.SATURN, "ராகு": swe.MEAN_NODE, "கேது": swe.MEAN_NODE
-        }
-        jd_ut = swe.julday(year, month, day, hour + minute/60.0 + second/3600.0) - (tz / 24.0)
-        for pname, pid in planet_check_names.items():
-            try:
-                cres = swe.calc_ut(jd_ut, pid)
-                if isinstance(cres, (list, tuple)) and len(cres) > 0 and isinstance(cres[0], (list, tuple)):
-                    speed = float(cres[0][3])
-                else:
-                    speed = float(cres[3])
-                retro_map[pname] = speed < 0
-            except Exception:
-                retro_map[pname] = False
+            deg = float(row.get("deg_in_sign", 0.0))
+            rasis = ["மேஷம்","ரிஷபம்","மிதுனம்","கடகம்","சிம்மம்","கன்னி",
+                     "துலாம்","விருச்சிகம்","தனுசு","மகரம்","கும்பம்","மீனம்"]
+            cur_rasi_idx = rasis.index(row.get("rasi")) if row.get("rasi") in rasis else 0
+            part_size = 30.0 / div
+            part_no = int(deg // part_size)
+            new_index = (cur_rasi_idx * div + part_no) % 12
+            return rasis[new_index]
+        except Exception:
+            return row.get("rasi")
 
-        # D-chart mapping
-        def map_divisional_rasi_name(row, div):
-            try:
-                deg = float(row.get("deg_in_sign", 0.0))
-                rasis = ["மேஷம்","ரிஷபம்","மிதுனம்","கடகம்","சிம்மம்","கன்னி",
-                         "துலாம்","விருச்சிகம்","தனுசு","மகரம்","கும்பம்","மீனம்"]
-                cur_rasi_idx = rasis.index(row.get("rasi")) if row.get("rasi") in rasis else 0
-                part_size = 30.0 / div
-                part_no = int(deg // part_size)
-                new_index = (cur_rasi_idx * div + part_no) % 12
-                return rasis[new_index]
-            except Exception:
-                return row.get("rasi")
+    chart_type = (chart_type or "rasi").lower()
+    if chart_type.startswith("d") and chart_type[1:].isdigit():
+        div = int(chart_type[1:])
+        for r in rows:
+            r["rasi"] = map_divisional_rasi_name(r, div)
 
-        if chart_type.startswith("d") and chart_type[1:].isdigit():
-            div = int(chart_type[1:])
-            for r in rows:
-                r["rasi"] = map_divisional_rasi_name(r, div)
+    # --- Assign display names for chart & table ---
+    for r in rows:
+        name = r.get("name", "")
+        short = SHORT_NAMES.get(name, name[:3] if name else "")
+        is_retro = retro_map.get(name, False)
 
-        # --- Assign display names for chart & table ---
-        for r in rows:
-            name = r.get("name", "")
-            short = SHORT_NAMES.get(name, name[:3] if name else "")
-            is_retro = retro_map.get(name, False)
+        # Save back into row dict
+        r["short"] = short
+        r["retro_flag"] = "வ" if is_retro else ""
 
-            # Save back into row dict
-            r["short"] = short
-            r["retro_flag"] = "வ" if is_retro else ""
+        # ✅ Chart box label: show brackets only if retro
+        if is_retro:
+            r["grid_label"] = f"({short})"   # example → (சனி)
+        else:
+            r["grid_label"] = short          # example → சூரி
 
-            # ✅ Chart box label: show brackets only if retro
-            if is_retro:
-                r["grid_label"] = f"({short})"   # example → (சனி)
-            else:
-                r["grid_label"] = short          # example → சூரி
 
+    # --- Build HTML table (table shows retro marker) ---
+    html = "<table id='planet-table' style='border-collapse:collapse;width:100%;font-size:13px;'>"
+    html += "<tr><th>கிரகம்</th><th>டிகிரி</th><th>ராசி</th><th>நட்சத்திரம்</th><th>பாதம்</th><th>அதிபதி</th></tr>"
+
+    for r in rows:
+        dms = r.get('dms') or r.get('degree') or ''
+        # ✅ Table: show செவ் (வ) if retro
+        display_name = f"{r['short']} ({r['retro_flag']})" if r['retro_flag'] else r['short']
+        html += (
+            f"<tr>"
+            f"<td>{display_name}</td>"
+            f"<td>{dms}</td>"
+            f"<td>{r.get('rasi','')}</td>"
+            f"<td>{r.get('nak','')}</td>"
+            f"<td>{r.get('pada','')}</td>"
+            f"<td>{r.get('rasi_lord','')}</td>"
+            f"</tr>"
+        )
+
+    html += "</table>"
 
-        # --- Build HTML table (table shows retro marker) ---
-        html = "<table id='planet-table' style='border-collapse:collapse;width:100%;font-size:13px;'>"
-        html += "<tr><th>கிரகம்</th><th>டிகிரி</th><th>ராசி</th><th>நட்சத்திரம்</th><th>பாதம்</th><th>அதிபதி</th></tr>"
+    # ✅ Prevent .get() crash anywhere (wrap rows if string)
+    if isinstance(rows, str):
+        rows = [{"dbg_line": rows}]
 
-        for r in rows:
-            dms = r.get('dms') or r.get('degree') or ''
-            # ✅ Table: show செவ் (வ) if retro
-            display_name = f"{r['short']} ({r['retro_flag']})" if r['retro_flag'] else r['short']
-            html += (
-                f"<tr>"
-                f"<td>{display_name}</td>"
-                f"<td>{dms}</td>"
-                f"<td>{r.get('rasi','')}</td>"
-                f"<td>{r.get('nak','')}</td>"
-                f"<td>{r.get('pada','')}</td>"
-                f"<td>{r.get('rasi_lord','')}</td>"
-                f"</tr>"
-            )
+    return rows, html
 
-        html += "</table>"
-                # --- Build HTML table (table shows retro marker) ---
-        html = "<table id='planet-table' style='border-collapse:collapse;width:100%;font-size:13px;'>"
-        html += "<tr><th>கிரகம்</th><th>டிகிரி</th><th>ராசி</th><th>நட்சத்திரம்</th><th>பாதம்</th><th>அதிபதி</th></tr>"
 
-        for r in rows:
-            dms = r.get('dms') or r.get('degree') or ''
-            display_name = f"{r['short']} ({r['retro_flag']})" if r['retro_flag'] else r['short']
-            html += (
-                f"<tr>"
-                f"<td>{display_name}</td>"
-                f"<td>{dms}</td>"
-                f"<td>{r.get('rasi','')}</td>"
-                f"<td>{r.get('nak','')}</td>"
-                f"<td>{r.get('pada','')}</td>"
-                f"<td>{r.get('rasi_lord','')}</td>"
-                f"</tr>"
-            )
+@app.route("/generate_chart", methods=["POST"])
+def generate_chart():
+    try:
+        data = request.get_json() or {}
 
-        html += "</table>"
+        # Handle both styles: either individual numeric fields OR combined date/time strings
+        b = parse_birth_data(data)
+        chart_type = data.get("chartType", "rasi").lower()
 
-        # ✅ Prevent .get() crash anywhere (wrap rows if string)
-        if isinstance(rows, str):
-            rows = [{"dbg_line": rows}]
+        # Ayanamsa is passed explicitly — never via global swe.set_sid_mode.
+        # Served from the result cache once this birth has been drawn.
+        result, cached = result_cache.get_or_compute(
+            "rasi", result_cache.birth_key("rasi", b, chart_type=chart_type),
+            lambda: dict(zip(("rows", "html"), build_rasi_chart(
+                b["year"], b["month"], b["day"], b["hour"], b["minute"], b["second"],
+                b["lat"], b["lon"], b["tz"], sid_mode_for(b["ayanamsa"]), chart_type))))
 
         # ✅ Return chart data safely
-        return jsonify({"status": "ok", "rows": rows, "html": html})
+        return jsonify({"status": "ok", "rows": result["rows"], "html": result["html"], "cached": cached})
 
         
     except Exception as e:
@@ -380,6 +304,21 @@ def favicon():
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
 
+def refresh_chart_stores(chart_id):
+    """
+    Keep the materialized dasha periods (dasha_store.py) and Sade Sati /
+    Guru periods (gochara_store.py) in step with charts.db.
+    """
+    try:
+        dasha_store.refresh_chart(int(chart_id), CHARTS_DB, DASHA_DB)
+    except Exception as e:
+        print("⚠️ Dasha store refresh failed:", e)
+    try:
+        gochara_store.refresh_chart(int(chart_id), CHARTS_DB)
+    except Exception as e:
+        print("⚠️ Gochara store refresh failed:", e)
+
+
 # -------------------- SAVE CHART (SMART UPSERT) --------------------
 @app.route("/save_chart", methods=["POST"])
 def save_chart():
@@ -402,19 +341,17 @@ def save_chart():
         ayanamsa = data.get("ayanamsa") or ""
         chart_data = data.get("chart") or {}
 
-        # 2. Timestamp
+        # 2. Timestamp + packed payload and typed birth columns
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        data_blob = payload_codec.encode(chart_data)
+        birth = dasha_store.birth_columns({
+            "date": date_val, "time": time_val, "ayanamsa": ayanamsa,
+            "place_json": place_json, "data_json": chart_data})
 
-        conn = sqlite3.connect(CHARTS_DB)
+        conn = storage.connect(CHARTS_DB)
         cur = conn.cursor()
 
-        # 3. Ensure columns exist
-        try: cur.execute("ALTER TABLE charts ADD COLUMN saved_at TEXT")
-        except: pass
-        try: cur.execute("ALTER TABLE charts ADD COLUMN updated_at TEXT")
-        except: pass
-
-        # 4. FIND EXISTING CHART (Smart Check)
+        # 3. FIND EXISTING CHART (Smart Check)
         # If ID is provided, use it.
         # If NO ID, look for a chart with same Name + Date + Time (HH:MM)
         chart_id = None
@@ -431,18 +368,19 @@ def save_chart():
             if row:
                 chart_id = row[0]
 
-        # 5. SAVE or UPDATE
+        # 4. SAVE or UPDATE
         if chart_id:
             # UPDATE
             cur.execute("""
                 UPDATE charts SET
                     name=?, date=?, time=?, place_json=?, ayanamsa=?,
-                    comment=?, data_json=?, gender=?, tag=?, updated_at=?
+                    comment=?, data_json=?, gender=?, tag=?, updated_at=?,
+                    lat=?, lon=?, tz=?, jd=?
                 WHERE id=?
             """, (
                 name, date_val, time_val, place_json, ayanamsa,
-                comment, json.dumps(chart_data, ensure_ascii=False),
-                gender, tag, now, chart_id
+                comment, data_blob, gender, tag, now,
+                birth["lat"], birth["lon"], birth["tz"], birth["jd"], chart_id
             ))
             msg = "Chart updated"
         else:
@@ -450,20 +388,22 @@ def save_chart():
             cur.execute("""
                 INSERT INTO charts (
                     name, date, time, place_json, ayanamsa, comment,
-                    data_json, gender, tag, saved_at, updated_at
+                    data_json, gender, tag, saved_at, updated_at,
+                    lat, lon, tz, jd
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 name, date_val, time_val,
                 place_json, ayanamsa, comment,
-                json.dumps(chart_data, ensure_ascii=False),
-                gender, tag, now, now
+                data_blob, gender, tag, now, now,
+                birth["lat"], birth["lon"], birth["tz"], birth["jd"]
             ))
             chart_id = cur.lastrowid
             msg = "Chart saved"
 
         conn.commit()
         conn.close()
+        refresh_chart_stores(chart_id)
 
         return jsonify({
             "status": "ok",
@@ -491,25 +431,21 @@ def update_chart_full():
         # ✅ Get Current Time
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Normalize JSON fields
-        for k in ["place_json", "data_json"]:
-            if isinstance(data.get(k), (dict, list)):
-                data[k] = json.dumps(data[k], ensure_ascii=False)
-            elif not data.get(k):
-                data[k] = "{}"
+        # Normalize JSON fields (place_json stays text for the list/search indexes)
+        if isinstance(data.get("place_json"), (dict, list)):
+            data["place_json"] = json.dumps(data["place_json"], ensure_ascii=False)
+        elif not data.get("place_json"):
+            data["place_json"] = "{}"
+        data["data_json"] = payload_codec.pack(data.get("data_json") or {}, {})
+        data.update(dasha_store.birth_columns(data))
 
-        conn = sqlite3.connect(CHARTS_DB)
+        conn = storage.connect(CHARTS_DB)
         cur = conn.cursor()
 
-        # Ensure columns exist
-        try: cur.execute("ALTER TABLE charts ADD COLUMN saved_at TEXT")
-        except: pass
-        try: cur.execute("ALTER TABLE charts ADD COLUMN updated_at TEXT")
-        except: pass
-
         # Fields to save
         fields = ["name", "date", "time", "seconds", "ayanamsa", "chartType",
-                  "gender", "tag", "comment", "place_json", "data_json"]
+                  "gender", "tag", "comment", "place_json", "data_json",
+                  "lat", "lon", "tz", "jd"]
 
         if data.get("id"):
             # --- UPDATE EXISTING ---
@@ -536,6 +472,7 @@ def update_chart_full():
 
         conn.commit()
         conn.close()
+        refresh_chart_stores(cid)
         return jsonify({"status": "ok", "message": msg, "id": cid, "saved_on": now})
 
     except Exception as e:
@@ -548,7 +485,7 @@ def update_chart_full():
 @app.route("/remove_duplicates")
 def remove_duplicates():
     import sqlite3
-    conn = sqlite3.connect(CHARTS_DB)
+    conn = storage.connect(CHARTS_DB)
     cur = conn.cursor()
     
     # Keep the row with the MAX(id) (newest) for every unique combination of Name, Date, Time (HH:MM)
@@ -618,7 +555,7 @@ def remove_duplicates():
 
     # --- Also store Dasha info ---
     try:
-        conn_d = sqlite3.connect(DASHA_DB)
+        conn_d = storage.connect(DASHA_DB)
         cur_d = conn_d.cursor()
         for maha in dasha_result.get("mahadasha", []):
             cur_d.execute("""
@@ -643,7 +580,7 @@ def remove_duplicates():
 
     # --- Store Vimshottari dashas into separate dasha.db ---
     try:
-        conn_d = sqlite3.connect(DASHA_DB)
+        conn_d = storage.connect(DASHA_DB)
         cur_d = conn_d.cursor()
         for maha in dasha_result.get("mahadasha", []):
             cur_d.execute("""
@@ -668,7 +605,7 @@ def remove_duplicates():
     print("⚠️ Dasha computation skipped:", e)
 
     # ✅ Step 2: Save to DB
-    conn = sqlite3.connect(DB_PATH)
+    conn = storage.connect(DB_PATH)
     cur = conn.cursor()
     cur.execute("""
         CREATE TABLE IF NOT EXISTS charts (
@@ -694,7 +631,7 @@ def remove_duplicates():
     # ✅ Get the new chart ID and link dashas to it
     chart_id = cur.lastrowid
     try:
-        conn_d = sqlite3.connect(DASHA_DB)
+        conn_d = storage.connect(DASHA_DB)
         cur_d = conn_d.cursor()
         cur_d.execute("UPDATE dashas SET chart_id=? WHERE chart_id IS NULL", (chart_id,))
         conn_d.commit()
@@ -710,55 +647,45 @@ def remove_duplicates():
 @app.route("/list_charts", methods=["GET"])
 def list_charts():
     """
-    Returns all saved charts with robust timestamp handling
+    Saved charts, newest first, without the data_json blobs (chart_list.py).
+    ?limit=N pages by id: next page ?after_id=<next_after_id>, previous page
+    ?before_id=<prev_before_id>. Filters: name (prefix), tag, gender,
+    date_from, date_to (YYYY-MM-DD or YYYY), q (text in name/tag/notes/place).
+    Without limit/cursors every matching chart is returned, as before.
+    Answers 304 when the If-None-Match ETag is still current.
     """
-    import os, json, re, sqlite3
+    try:
+        conn = storage.connect(CHARTS_DB)
+        try:
+            etag = chart_list.etag_for(chart_list.list_version(conn), request.args)
+            if request.if_none_match.contains(etag):
+                resp = Response(status=304)
+            else:
+                resp = jsonify(chart_list.list_charts(request.args, CHARTS_DB, conn))
+        finally:
+            conn.close()
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
 
-    charts = []
+    except Exception as e:
+        print("❌ list_charts error:", e)
+        return jsonify({"status": "error", "message": str(e)})
 
-    def safe_json_loads(val):
-        if not val: return {}
-        try: return json.loads(val)
-        except: return {}
 
+@app.route("/search_charts", methods=["GET"])
+def search_charts():
+    """
+    Ranked full-text search over saved charts (chart_search.py):
+    ?q=sri vel  (every word a prefix; Tamil or English), &limit=20
+    """
     try:
-        conn = sqlite3.connect(CHARTS_DB)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        
-        # Select all columns
-        cur.execute("SELECT * FROM charts ORDER BY id DESC")
-        rows = cur.fetchall()
-        conn.close()
-
-        for row in rows:
-            r = dict(row)
-            
-            # 1. Try updated_at, then saved_at, then saved_on
-            # 2. If all fail, use current time (to avoid "-") OR keep "-"
-            ts = r.get("updated_at") or r.get("saved_at") or r.get("saved_on")
-            
-            # Fallback: If DB has NULL, show "-"
-            if not ts:
-                ts = "-"
-
-            charts.append({
-                "id": r.get("id"),
-                "name": r.get("name", ""),
-                "date": r.get("date", ""),
-                "time": r.get("time", ""),
-                "gender": r.get("gender", ""),
-                "tag": r.get("tag", ""),
-                "comment": r.get("comment", ""),
-                "place_json": safe_json_loads(r.get("place_json")),
-                # Send the found timestamp
-                "saved_on": ts
-            })
-            
-        return jsonify({"status": "ok", "charts": charts})
-
+        q = request.args.get("q", "").strip()
+        limit = int(request.args.get("limit") or chart_search.DEFAULT_LIMIT)
+        results = chart_search.search(q, limit, CHARTS_DB) if q else []
+        return jsonify({"status": "ok", "q": q, "count": len(results), "results": results})
     except Exception as e:
-        print("❌ list_charts error:", e)
+        print("❌ search_charts error:", e)
         return jsonify({"status": "error", "message": str(e)})
 
 
@@ -774,7 +701,7 @@ def get_chart(cid):
     import sqlite3
     from flask import jsonify
 
-    conn = sqlite3.connect(CHARTS_DB)
+    conn = storage.connect(CHARTS_DB)
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
 
@@ -791,7 +718,7 @@ def get_chart(cid):
     for field in ["place_json", "data_json"]:
         if chart.get(field):
             try:
-                chart[field] = json.loads(chart[field])
+                chart[field] = payload_codec.decode(chart[field], {})
             except Exception:
                 chart[field] = {}
 
@@ -807,11 +734,12 @@ def delete_chart(cid):
     """Delete a chart by ID"""
     import sqlite3, traceback
     try:
-        conn = sqlite3.connect(CHARTS_DB)
+        conn = storage.connect(CHARTS_DB)
         cur = conn.cursor()
         cur.execute("DELETE FROM charts WHERE id=?", (cid,))
         conn.commit()
         conn.close()
+        refresh_chart_stores(cid)
         return jsonify({"status": "ok", "message": f"Deleted chart #{cid}"})
     except Exception as e:
         traceback.print_exc()
@@ -867,43 +795,31 @@ TRANSIT_HISTORY_DB = os.path.join(BASE_DIR, "data", "transit_history.db")
 # ============================================================
 # 🚀 CSV LOADER (Runs Once on Startup)
 # ============================================================
-PLACES_CACHE = []
+PLACE_INDEX = None
 
 def load_places_csv():
-    global PLACES_CACHE
+    """Map the compiled places snapshot (place_snapshot.py: india.csv +
+    places.db + aliases). It is built by `place_snapshot.py --build`, never
+    written here: without a current one this worker compiles the same
+    sources in memory instead."""
+    global PLACE_INDEX
     if not os.path.exists(PLACES_CSV):
         print(f"❌ ERROR: '{PLACES_CSV}' not found! Search will fail.")
         return
 
-    print("⏳ Loading cities from CSV...")
     try:
-        with open(PLACES_CSV, 'r', encoding='utf-8-sig', errors='replace') as f:
-            reader = csv.DictReader(f)
-            # Normalize headers (strip spaces)
-            if reader.fieldnames:
-                reader.fieldnames = [h.strip() for h in reader.fieldnames]
-            
-            count = 0
-            for row in reader:
-                try:
-                    # Match your CSV columns: iPlace, ilatitudeindia, etc.
-                    city = row.get('iPlace')
-                    lat = row.get('ilatitudeindia')
-                    lon = row.get('iLongitudeindia')
-                    tz = row.get('iTimeZone')
-                    
-                    if city and lat and lon:
-                        PLACES_CACHE.append({
-                            "label": city, 
-                            "search_key": city.lower(), # Optimizes search
-                            "lat": float(lat),
-                            "lon": float(lon),
-                            "tz": float(tz) if tz else 5.5
-                        })
-                        count += 1
-                except ValueError:
-                    continue
-        print(f"✅ Loaded {count} cities from CSV.")
+        migrations.run("places", PLACES_DB)
+        PLACE_INDEX, how = place_snapshot.load(PLACES_CSV, PLACES_DB, build_missing=False)
+        print(f"✅ Loaded {len(PLACE_INDEX)} places ({how}).")
+        if how == "compiled":
+            print("⚠️ Places snapshot missing or stale — run `python place_snapshot.py --build`.")
+        return
+    except Exception as e:
+        print(f"❌ Places snapshot error: {e} — indexing the CSV in this worker.")
+    try:
+        PLACE_INDEX = place_index.load_csv(PLACES_CSV)
+        PLACE_INDEX.fuzzy = place_fuzzy.build(PLACE_INDEX)
+        print(f"✅ Loaded {len(PLACE_INDEX)} cities from CSV.")
     except Exception as e:
         print(f"❌ CSV Load Error: {e}")
 
@@ -915,19 +831,56 @@ load_places_csv()
 # ============================================================
 @app.route("/search_places", methods=["GET"])
 def search_places():
-    query = request.args.get("q", "").strip().lower()
-    if not query or len(query) < 2: return jsonify([])
-
-    # Fast filter
-    results = []
-    count = 0
-    for place in PLACES_CACHE:
-        if query in place["search_key"]:
-            results.append(place)
-            count += 1
-            if count >= 20: break # Limit results
-    
-    return jsonify(results)
+    """
+    ?q=&limit= — ranked exact / alias / prefix / word / substring /
+    phonetic / fuzzy matches (Tamil script or any Latin spelling), each
+    {label, city, state, country, lat, lon, tz, match}. label carries the
+    state when several places share the name.
+    """
+    query = request.args.get("q", "").strip()
+    if len(query) < 2 or PLACE_INDEX is None:
+        return jsonify([])
+    limit = request.args.get("limit", place_index.DEFAULT_LIMIT, type=int)
+    return jsonify(PLACE_INDEX.search(query, limit))
+
+
+@app.route("/nearest_place", methods=["GET", "POST"])
+def nearest_place():
+    """
+    GET ?lat=&lon=&k=&max_km= — the k nearest known places (place dicts +
+    distance_km, nearest first) within max_km (default 300).
+    POST {"points": [{lat, lon, id?, name?}, ...], k, max_km} labels a whole
+    archive in one call: one {id, name, lat, lon, places} per point, in
+    order, with "error" instead of places for a point that cannot be read.
+    """
+    import place_nearest
+    try:
+        if PLACE_INDEX is None:
+            raise RuntimeError("Place index not loaded")
+        src = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+        k = int(src.get("k") or place_nearest.DEFAULT_K)
+        max_km = float(src.get("max_km") or place_nearest.DEFAULT_MAX_KM)
+
+        if request.method == "GET":
+            lat, lon = place_nearest.check_point(src.get("lat"), src.get("lon"))
+            return jsonify({"status": "ok", "places": PLACE_INDEX.nearest(lat, lon, k, max_km)})
+
+        points = src.get("points")
+        if not isinstance(points, list):
+            raise ValueError("Expected {\"points\": [{\"lat\": .., \"lon\": ..}, ...]}")
+        results = []
+        for p in points:
+            p = p if isinstance(p, dict) else {}
+            out = {"id": p.get("id"), "name": p.get("name"), "lat": p.get("lat"), "lon": p.get("lon")}
+            try:
+                lat, lon = place_nearest.check_point(p.get("lat"), p.get("lon"))
+                out["places"] = PLACE_INDEX.nearest(lat, lon, k, max_km)
+            except (TypeError, ValueError) as e:
+                out["error"] = str(e)
+            results.append(out)
+        return jsonify({"status": "ok", "count": len(results), "results": results})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
 # -----------------------------------------------------------------
 # PASTE THE REST OF YOUR APP.PY ROUTES HERE (generate_chart, etc.)
 # OR JUST KEEP THEM AS IS, BUT ENSURE THE SEARCH ROUTE ABOVE IS USED
@@ -937,23 +890,34 @@ def search_places():
 
 @app.route("/add_place", methods=["POST"])
 def add_place():
-    data = request.get_json()
-    conn = sqlite3.connect(PLACES_DB)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS places (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            city TEXT, state TEXT, country TEXT,
-            lat REAL, lon REAL, tz REAL
-        )
-    """)
-    cur.execute(
-        "INSERT INTO places (city, state, country, lat, lon, tz) VALUES (?, ?, ?, ?, ?, ?)",
-        (data["city"], data["state"], data["country"], data["lat"], data["lon"], data["tz"])
-    )
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "ok"})
+    """
+    {city, state, country, lat, lon, tz} -> places.db. The place is
+    searchable at once in this worker and within place_snapshot.REFRESH_S
+    in the others; the next snapshot build compiles it in.
+    """
+    import place_nearest
+    try:
+        data = request.get_json() or {}
+        city = (data.get("city") or "").strip()
+        if not city:
+            raise ValueError("city is required")
+        lat, lon = place_nearest.check_point(data.get("lat"), data.get("lon"))
+        tz = float(data.get("tz") if data.get("tz") not in (None, "") else 5.5)
+        conn = storage.connect(PLACES_DB)
+        try:
+            cur = conn.execute(
+                "INSERT INTO places (name_ta, name_en, state, country, latitude, longitude, timezone, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                (city, city, (data.get("state") or "").strip(), (data.get("country") or "").strip(), lat, lon, tz))
+            conn.commit()
+            place_id = cur.lastrowid
+        finally:
+            conn.close()
+        if isinstance(PLACE_INDEX, place_snapshot.PlaceSet):
+            PLACE_INDEX.refresh(force=True)
+        return jsonify({"status": "ok", "id": place_id})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
 # -------------------- PANCHANGAM ENDPOINT --------------------
 from panchangam import compute_panchangam
 
@@ -978,6 +942,107 @@ def panchangam_route():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
 
+# -------------------- PANCHANGAM CALENDAR --------------------
+@app.route("/panchangam_calendar", methods=["POST"])
+def panchangam_calendar_route():
+    """
+    {start, end} ('YYYY-MM-DD') or {year[, month]}, plus lat/lon/tz/ayanamsa.
+    One row per date; see panchangam_calendar.build_calendar.
+    """
+    from panchangam_calendar import get_calendar, parse_range
+    try:
+        data = request.get_json() or {}
+        start, end = parse_range(data)
+        lat = float(data.get("lat", 13.0827))
+        lon = float(data.get("lon", 80.2707))
+        tz = float(data.get("tz", 5.5))
+        ayanamsa = data.get("ayanamsa", "lahiri")
+
+        days, cached = get_calendar(start, end, lat, lon, tz, ayanamsa)
+        return jsonify({"status": "ok", "start": start.isoformat(), "end": end.isoformat(),
+                        "cached": cached, "days": days})
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+# -------------------- TRANSIT EVENTS --------------------
+@app.route("/transit_events", methods=["GET", "POST"])
+def transit_events_route():
+    """
+    Sign / nakshatra / pada ingresses and retrograde / direct stations.
+    {start, end} ('YYYY-MM-DD', local) or {year[, month]}; optional planets
+    ('saturn,jupiter' or a list, Tamil names too), kinds (sign, nakshatra,
+    pada, station), tz, ayanamsa, limit. A list cut short at `limit`
+    carries next_jd — send it back as from_jd for the next page.
+    """
+    import transit_events
+    from panchangam_calendar import parse_range
+    try:
+        src = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+        start, end = parse_range(src)
+        planets = transit_events.parse_planets(src.get("planets"))
+        kinds = transit_events.parse_kinds(src.get("kinds"))
+        tz = float(src.get("tz", 5.5))
+        ayanamsa = src.get("ayanamsa", "lahiri")
+        limit = int(src.get("limit") or transit_events.DEFAULT_LIMIT)
+        from_jd = src.get("from_jd")
+
+        res = transit_events.search(start, end, planets, kinds, tz, ayanamsa, limit,
+                                    float(from_jd) if from_jd else None)
+        return jsonify({"status": "ok", "start": start.isoformat(), "end": end.isoformat(), **res})
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
+@app.route("/transit_series", methods=["GET", "POST"])
+def transit_series_route():
+    """
+    start, end ('YYYY-MM-DD[THH:MM]', local), step ('1d', '6h', '30m' or
+    days), lat/lon/tz/ayanamsa -> sidereal lon / speed / sign arrays of all
+    grahas (+ Lagna), sample i at start_jd + i * step_days. More than
+    CHUNK_POINTS samples (or stream=1) come back as NDJSON: a header line,
+    then one line per chunk.
+    """
+    import transit_series
+    try:
+        src = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+        req = transit_series.parse_request(src)
+        stream = str(src.get("stream", "")).lower() in ("1", "true", "yes")
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+    if not stream and req["count"] <= transit_series.CHUNK_POINTS:
+        return jsonify({"status": "ok", **transit_series.series(**req)})
+
+    def lines():
+        head = transit_series.header(req["jd_start"], req["step"], req["count"], req["tz"], req["sid_mode"])
+        yield json.dumps({"status": "ok", **head}, ensure_ascii=False) + "\n"
+        try:
+            for part in transit_series.chunks(req["jd_start"], req["step"], req["count"],
+                                              req["lat"], req["lon"], req["sid_mode"]):
+                yield json.dumps(part, separators=(",", ":")) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "error", "message": str(e)}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+
+@app.route("/transit_hits", methods=["GET", "POST"])
+def transit_hits_route():
+    """
+    Saved charts whose natal points the transits touch: start/end
+    ('YYYY-MM-DD', default the next six months), transits, natal
+    (moon, lagna, ...), kinds (conjunction, aspect, sign), orb, step, tz,
+    optional chart_ids; limit/offset page the charts, soonest hit first.
+    """
+    import transit_hits
+    try:
+        src = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+        return jsonify({"status": "ok", **transit_hits.search(transit_hits.parse_request(src))})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
 # ================================================================
 # 🌜 Lazy Load Vimshottari Levels (Dynamic Bhukti → Prana)
 # ================================================================
@@ -986,12 +1051,15 @@ def vimshottari_dasha_route():
     from vimshottari import compute_vimshottari
     try:
         data = request.get_json(force=True)
-        result = compute_vimshottari(
-            int(data["year"]), int(data["month"]), int(data["day"]),
-            int(data["hour"]), int(data["minute"]), int(data.get("second", 0)),
-            float(data.get("lat", 13.0827)), float(data.get("lon", 80.2707)),
-            float(data.get("tz", 5.5))
-        )
+        args = (int(data["year"]), int(data["month"]), int(data["day"]),
+                int(data["hour"]), int(data["minute"]), int(data.get("second", 0)),
+                float(data.get("lat", 13.0827)), float(data.get("lon", 80.2707)),
+                float(data.get("tz", 5.5)))
+        # the chart's ayanamsa, as /get_dasha_chain and the dasha store use
+        ayanamsa = (data.get("ayanamsa") or "lahiri").strip().lower()
+        result, _ = result_cache.get_or_compute(
+            "dasha", result_cache.chart_key("dasha", *args, ayanamsa=ayanamsa),
+            lambda: compute_vimshottari(*args, sid_mode_for(ayanamsa)))
         return jsonify(result)
     except Exception as e:
         import traceback; traceback.print_exc()
@@ -1028,39 +1096,12 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 EVENTS_DB = os.path.join(DATA_DIR, "events.db")
 
-def ensure_events_table():
-    """Make sure the events table exists before using it."""
-    conn = sqlite3.connect(EVENTS_DB)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chart_id INTEGER,
-            event_name TEXT,
-            event_date TEXT,
-            event_time TEXT,
-            event_notes TEXT,
-            dasha TEXT,
-            bhukti TEXT,
-            antara TEXT,
-            sookshma TEXT,
-            prana TEXT,
-            transit_data TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-# ensure table exists on startup
-ensure_events_table()
-
 # -----------------------------
 # Save new event / note
 # -----------------------------
 @app.route("/save_event", methods=["POST"])
 def save_event():
     try:
-        ensure_events_table()
         data = request.get_json(force=True) or {}
         fields = (
             data.get("chart_id"), data.get("event_name"),
@@ -1068,9 +1109,9 @@ def save_event():
             data.get("event_notes"), data.get("dasha"),
             data.get("bhukti"), data.get("antara"),
             data.get("sookshma"), data.get("prana"),
-            str(data.get("transit_data", {}))
+            payload_codec.pack(data.get("transit_data") or {}, {})
         )
-        conn = sqlite3.connect(EVENTS_DB)
+        conn = storage.connect(EVENTS_DB)
         cur = conn.cursor()
         cur.execute("""INSERT INTO events(
             chart_id,event_name,event_date,event_time,event_notes,
@@ -1090,7 +1131,7 @@ def save_event():
 @app.route("/get_dasha_v2/<int:chart_id>")
 def get_dasha_v2(chart_id):
     try:
-        conn = sqlite3.connect(DASHA_DB)  # ✅ use the global dasha.db path
+        conn = storage.connect(DASHA_DB)  # ✅ use the global dasha.db path
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         cur.execute("SELECT * FROM dashas WHERE chart_id=?", (chart_id,))
@@ -1111,106 +1152,44 @@ def get_dasha_v2(chart_id):
         return jsonify({"status": "error", "message": str(e)})
 
 # ============================================================
-# 🔁 Manual Rebuild Dashas from charts.db → dasha.db
+# 🔁 Manual Rebuild Dashas from charts.db → dasha.db (background job)
 # ============================================================
 @app.route("/rebuild_dashas", methods=["GET"])
 def rebuild_dashas_route():
-    import json
-    from vimshottari import compute_vimshottari
-
     try:
-        conn_c = sqlite3.connect(CHARTS_DB)
-        conn_c.row_factory = sqlite3.Row
-        cur_c = conn_c.cursor()
-        cur_c.execute("SELECT id, date, time, data_json FROM charts")
-        charts = cur_c.fetchall()
-        conn_c.close()
-
-        conn_d = sqlite3.connect(DASHA_DB)
-        cur_d = conn_d.cursor()
-        cur_d.execute("""
-            CREATE TABLE IF NOT EXISTS dashas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chart_id INTEGER,
-                level TEXT,
-                planet TEXT,
-                start_date TEXT,
-                end_date TEXT,
-                duration REAL,
-                raw_json TEXT
-            )
-        """)
-
-        rebuilt = 0
-        for c in charts:
-            chart_id = c["id"]
-
-            # skip if dashas already exist
-            cur_d.execute("SELECT COUNT(*) FROM dashas WHERE chart_id=?", (chart_id,))
-            if cur_d.fetchone()[0] > 0:
-                continue
-
-            # try loading existing data_json
-            try:
-                data = json.loads(c["data_json"] or "{}")
-                dashas = data.get("dashas", [])
-            except Exception:
-                dashas = []
-
-            # fallback: compute Vimshottari
-            if not dashas:
-                try:
-                    y, m, d = [int(x) for x in c["date"].split("-")]
-                    parts = [int(float(x)) for x in c["time"].split(":")]
-                    hh, mm, ss = (parts + [0, 0, 0])[:3]
-                    result = compute_vimshottari(y, m, d, hh, mm, ss, 13.0827, 80.2707, 5.5)
-                    dashas = result.get("mahadasha", [])
-                except Exception as e:
-                    print(f"⚠️ Failed to compute dashas for chart {chart_id}: {e}")
-                    dashas = []
-
-            for d in dashas:
-                cur_d.execute("""
-                    INSERT INTO dashas (chart_id, level, planet, start_date, end_date, duration, raw_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    chart_id,
-                    "Mahadasha",
-                    d.get("lord", ""),
-                    d.get("start_date", ""),
-                    d.get("end_date", ""),
-                    float(d.get("duration", 0) or 0),
-                    json.dumps(d)
-                ))
-                rebuilt += 1
-
-        conn_d.commit()
-        conn_d.close()
-        return jsonify({"status": "ok", "inserted": rebuilt})
+        job, started = dasha_jobs.start_job("sync", request.args.get("workers"), CHARTS_DB, DASHA_DB)
+        return _dasha_job_response(job, started)
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)})
 
 
 
-
-
-
-
 # -----------------------------
 # List all events for a chart
 # -----------------------------
 @app.route("/list_events", methods=["GET"])
 def list_events():
     try:
-        ensure_events_table()
         chart_id = request.args.get("chart_id")
-        conn = sqlite3.connect(EVENTS_DB)
+        # transit_data is only unpacked when asked for (?include=transit)
+        with_transit = request.args.get("include") == "transit"
+        cols = ("id, chart_id, event_name, event_date, event_time, event_notes, "
+                "dasha, bhukti, antara, sookshma, prana")
+        if with_transit:
+            cols += ", transit_data"
+        conn = storage.connect(EVENTS_DB)
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
-        cur.execute("SELECT * FROM events WHERE chart_id=? ORDER BY id DESC", (chart_id,))
+        cur.execute(f"SELECT {cols} FROM events WHERE chart_id=? ORDER BY id DESC", (chart_id,))
         rows = [dict(r) for r in cur.fetchall()]
         conn.close()
+        for r in rows:
+            if with_transit:
+                try:
+                    r["transit_data"] = payload_codec.decode(r["transit_data"], {})
+                except ValueError:
+                    r["transit_data"] = {}
         return jsonify({"status": "ok", "events": rows})
     except Exception as e:
         print("❌ list_events error:", e)
@@ -1222,12 +1201,11 @@ def list_events():
 @app.route("/delete_event", methods=["POST"])
 def delete_event():
     try:
-        ensure_events_table()
         data = request.get_json(force=True) or {}
         event_id = data.get("id")
         if not event_id:
             return jsonify({"status": "error", "message": "Missing id"}), 400
-        conn = sqlite3.connect(EVENTS_DB)
+        conn = storage.connect(EVENTS_DB)
         cur = conn.cursor()
         cur.execute("DELETE FROM events WHERE id=?", (event_id,))
         conn.commit()
@@ -1243,7 +1221,6 @@ def delete_event():
 @app.route("/update_event", methods=["POST"])
 def update_event():
     try:
-        ensure_events_table()
         data = request.get_json(force=True) or {}
         event_id = data.get("id")
         if not event_id:
@@ -1260,7 +1237,7 @@ def update_event():
         sookshma = data.get("sookshma", "")
         prana = data.get("prana", "")
 
-        conn = sqlite3.connect(EVENTS_DB)
+        conn = storage.connect(EVENTS_DB)
         cur = conn.cursor()
         cur.execute("""
             UPDATE events
@@ -1282,83 +1259,61 @@ import json
 import sqlite3
 from flask import request, jsonify
 
-TRANSIT_HISTORY_DB = "charts.db"  # reuse charts.db
-
-# Ensure schema exists (run once)
-def ensure_transit_history_table():
-    conn = sqlite3.connect(TRANSIT_HISTORY_DB)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS transit_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chart_id INTEGER,
-            timestamp TEXT,
-            location TEXT,
-            note TEXT,
-            data_json TEXT
-        )
-    """)
-    # index for fast lookup
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_transit_chart_ts ON transit_history(chart_id, timestamp)")
-    conn.commit()
-    conn.close()
+TRANSIT_HISTORY_DB = CHARTS_DB  # reuse charts.db
 
-ensure_transit_history_table()
 
-# --- Save or append current transit snapshot when a chart is opened ---
+# --- Save the transit moment shown (timestamp + place); positions are regenerated on view ---
 @app.route("/save_transit_snapshot", methods=["POST"])
 def save_transit_snapshot():
-    ensure_transit_table()
-    data = request.get_json(force=True)
-    chart_id = data.get("chart_id") or int(datetime.now().timestamp())
-    transit_data = data.get("transit_data") or []
-    location = data.get("location", "Chennai")
-    note = data.get("note", "")
-    ts = datetime.now().isoformat()
-
-    conn = sqlite3.connect(TRANSIT_HISTORY_DB)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO transit_history (chart_id, timestamp, location, note, data_json)
-        VALUES (?, ?, ?, ?, ?)
-    """, (chart_id, ts, location, note, json.dumps(transit_data)))
-    conn.commit()
-    conn.close()
-    return jsonify(status="ok")
-
-
-
+    import transit_history
+    try:
+        row = transit_history.snapshot_row(request.get_json(force=True))
+        conn = storage.connect(TRANSIT_HISTORY_DB)
+        try:
+            entry_id = transit_history.insert(conn, row)
+        finally:
+            conn.close()
+        return jsonify(status="ok", id=entry_id, timestamp=row["timestamp"])
+    except Exception as e:
+        return jsonify(status="error", message=str(e)), 400
 
 
 @app.route("/transit_history/<int:chart_id>", methods=["GET"])
 def get_transit_history(chart_id):
-    ensure_transit_table()
-    conn = sqlite3.connect(TRANSIT_HISTORY_DB)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+    """Snapshot metadata, newest first; ?page=1&per_page=50. Positions: /transit_snapshot/<id>."""
+    import transit_history
+    try:
+        page = int(request.args.get("page") or 1)
+        per_page = int(request.args.get("per_page") or transit_history.PER_PAGE)
+    except ValueError as e:
+        return jsonify(status="error", message=str(e)), 400
+    conn = storage.connect(TRANSIT_HISTORY_DB)
+    try:
+        result = transit_history.list_page(conn, chart_id, page, per_page)
+    finally:
+        conn.close()
+    return jsonify(status="ok", **result)
 
-    # ✅ Never limit results
-    if chart_id == 0:
-        cur.execute("SELECT * FROM transit_history ORDER BY id DESC")
-    else:
-        cur.execute("SELECT * FROM transit_history WHERE chart_id=? ORDER BY id DESC", (chart_id,))
 
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    for r in rows:
-        try:
-            r["data"] = json.loads(r.get("data_json") or "[]")
-        except Exception:
-            r["data"] = []
-    return jsonify(status="ok", history=rows)
+@app.route("/transit_snapshot/<int:entry_id>", methods=["GET"])
+def get_transit_snapshot(entry_id):
+    """One snapshot with its grahas + Lagna (a /transit_series sample, or the rows it was saved with)."""
+    import transit_history
+    conn = storage.connect(TRANSIT_HISTORY_DB)
+    try:
+        result = transit_history.positions(conn, entry_id)
+    finally:
+        conn.close()
+    if result is None:
+        return jsonify(status="error", message="Not found"), 404
+    return jsonify(status="ok", **result)
 
 
 @app.route("/delete_transit_snapshot/<int:entry_id>", methods=["POST"])
 def delete_transit_snapshot(entry_id):
     """Deletes a saved transit snapshot safely from SQLite."""
     try:
-        ensure_transit_table()
-        conn = sqlite3.connect(TRANSIT_HISTORY_DB)
+        conn = storage.connect(TRANSIT_HISTORY_DB)
         cur = conn.cursor()
         cur.execute("DELETE FROM transit_history WHERE id = ?", (entry_id,))
         conn.commit()
@@ -1377,26 +1332,25 @@ def delete_transit_snapshot(entry_id):
 # --- Update a note for a specific transit snapshot ---
 @app.route("/update_transit_note", methods=["POST"])
 def update_transit_note():
-    ensure_transit_table()
     data = request.get_json(force=True)
     _id = data.get("id")
-    note = data.get("note", "").strip()
-    ts = data.get("timestamp", "").strip()
+    note = (data.get("note") or "").strip()
+    ts = (data.get("timestamp") or "").strip() or None
 
-    # ✅ Accept any format that browser sends
-    try:
-        if len(ts) == 16:  # "YYYY-MM-DDTHH:MM"
-            ts += ":00"
-        parsed = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-        ts = parsed.isoformat()
-    except Exception:
-        ts = datetime.now().isoformat()
+    # ✅ Accept any format that browser sends; no timestamp = note only
+    if ts and len(ts) == 16:  # "YYYY-MM-DDTHH:MM"
+        ts += ":00"
 
-    conn = sqlite3.connect(TRANSIT_HISTORY_DB)
-    cur = conn.cursor()
-    cur.execute("UPDATE transit_history SET note=?, timestamp=? WHERE id=?", (note, ts, _id))
-    conn.commit()
-    conn.close()
+    import transit_history
+    conn = storage.connect(TRANSIT_HISTORY_DB)
+    try:
+        ts = transit_history.update_moment(conn, _id, note, ts)
+    except ValueError as e:
+        return jsonify(status="error", message=f"Bad timestamp: {e}"), 400
+    finally:
+        conn.close()
+    if ts is None:
+        return jsonify(status="error", message="Not found"), 404
     return jsonify(status="ok", timestamp=ts)
 
 
@@ -1404,7 +1358,6 @@ def update_transit_note():
 @app.route("/update_client_note", methods=["POST"], endpoint="update_client_note_api")
 def update_client_note_api():
     try:
-        ensure_events_table()  # ✅ make sure table exists
         data = request.get_json(force=True)
         event_id = data.get("id")
         if not event_id:
@@ -1415,7 +1368,7 @@ def update_client_note_api():
         time = data.get("event_time", "")
         notes = data.get("event_notes", "")
 
-        conn = sqlite3.connect(EVENTS_DB)  # ✅ uses absolute path
+        conn = storage.connect(EVENTS_DB)  # ✅ uses absolute path
         cur = conn.cursor()
         cur.execute("""
             UPDATE events
@@ -1434,7 +1387,7 @@ def update_client_note_api():
 @app.route("/debug_list_charts")
 def debug_list_charts():
     try:
-        conn = sqlite3.connect(CHART_DB)
+        conn = storage.connect(CHART_DB)
         cur = conn.cursor()
         cur.execute("SELECT id, name, date, time FROM charts ORDER BY id DESC")
         rows = cur.fetchall()
@@ -1444,53 +1397,20 @@ def debug_list_charts():
         return jsonify({"status": "error", "message": str(e)})
 
 # ============================================================
-# 🛠 One-time repair: Recompute and insert Dashas for existing charts
+# 🛠 Dasha rebuilds — background jobs (dasha_jobs.py)
 # ============================================================
+def _dasha_job_response(job, started=True):
+    msg = (f"Dasha rebuild job #{job['id']} started" if started
+           else f"Dasha rebuild job #{job['id']} is already running")
+    return jsonify({"status": "ok", "started": started, "message": msg, "job": job})
+
+
 @app.route("/rebuild_dashas", methods=["POST"])
 def rebuild_dashas():
-    import json
-    from vimshottari import compute_vimshottari
-    added = 0
-
+    """Incremental: index charts that are new or whose birth data changed."""
     try:
-        conn = sqlite3.connect(CHARTS_DB)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT id, data_json FROM charts")
-        charts = cur.fetchall()
-        conn.close()
-
-        conn_d = sqlite3.connect(DASHA_DB)
-        cur_d = conn_d.cursor()
-
-        for c in charts:
-            chart_id = c["id"]
-            try:
-                data = json.loads(c["data_json"] or "{}")
-                dashas = data.get("dashas", [])
-                if not dashas:
-                    continue  # no dashas inside chart
-                for d in dashas:
-                    cur_d.execute("""
-                        INSERT OR IGNORE INTO dashas (chart_id, level, planet, start_date, end_date, duration, raw_json)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        chart_id,
-                        "Mahadasha",
-                        d.get("lord", ""),
-                        d.get("start_date", ""),
-                        d.get("end_date", ""),
-                        float(d.get("duration", 0) or 0),
-                        json.dumps(d)
-                    ))
-                    added += 1
-            except Exception as e:
-                print("⚠️ Error for chart", chart_id, ":", e)
-
-        conn_d.commit()
-        conn_d.close()
-
-        return jsonify({"status": "ok", "inserted": added})
+        job, started = dasha_jobs.start_job("sync", request.values.get("workers"), CHARTS_DB, DASHA_DB)
+        return _dasha_job_response(job, started)
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)})
@@ -1500,246 +1420,75 @@ def rebuild_dashas():
 # 🧩 Auto Repair: Ensure all charts have Dashas in dasha.db
 # ============================================================
 def auto_repair_dashas():
-    import json
-    from vimshottari import compute_vimshottari
-
     try:
-        conn = sqlite3.connect(CHARTS_DB)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT id, date, time, data_json FROM charts")
-        charts = cur.fetchall()
-        conn.close()
-
-        conn_d = sqlite3.connect(DASHA_DB)
-        cur_d = conn_d.cursor()
-        cur_d.execute("""
-            CREATE TABLE IF NOT EXISTS dashas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chart_id INTEGER,
-                level TEXT,
-                planet TEXT,
-                start_date TEXT,
-                end_date TEXT,
-                duration REAL,
-                raw_json TEXT
-            )
-        """)
-        conn_d.commit()
-
-        repaired = 0
-        for c in charts:
-            chart_id = c["id"]
-
-            # skip if dashas already exist
-            cur_d.execute("SELECT COUNT(*) FROM dashas WHERE chart_id=?", (chart_id,))
-            if cur_d.fetchone()[0] > 0:
-                continue
-
-            # read dashas from existing chart JSON
-            try:
-                data = json.loads(c["data_json"] or "{}")
-                dashas = data.get("dashas", [])
-            except Exception:
-                dashas = []
-
-            if not dashas:
-                # fallback: recompute Vimshottari from date/time
-                date_str, time_str = c["date"], c["time"]
-                try:
-                    year, month, day = [int(x) for x in date_str.split("-")]
-                    parts = [int(float(x)) for x in time_str.split(":")]
-                    h, m, s = (parts + [0, 0, 0])[:3]
-                    res = compute_vimshottari(year, month, day, h, m, s, 13.0827, 80.2707, 5.5)
-                    dashas = res.get("mahadasha", [])
-                except Exception:
-                    dashas = []
-
-            for d in dashas:
-                cur_d.execute("""
-                    INSERT OR IGNORE INTO dashas
-                    (chart_id, level, planet, start_date, end_date, duration, raw_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    chart_id,
-                    "Mahadasha",
-                    d.get("lord", ""),
-                    d.get("start_date", ""),
-                    d.get("end_date", ""),
-                    float(d.get("duration", 0) or 0),
-                    json.dumps(d)
-                ))
-                repaired += 1
-
-        conn_d.commit()
-        conn_d.close()
-        print(f"✅ Auto-repair complete: inserted {repaired} dashas.")
+        job, started = dasha_jobs.start_job("sync", None, CHARTS_DB, DASHA_DB)
+        print(f"✅ Auto-repair: dasha job #{job['id']} {'started' if started else 'already running'}.")
     except Exception as e:
         import traceback; traceback.print_exc()
         print("⚠️ Auto-repair failed:", e)
 
 @app.route("/recompute_all_dashas", methods=["GET", "POST"])
 def recompute_all_dashas():
+    """Recompute every chart, changed or not (e.g. after a calculation fix)."""
+    try:
+        job, started = dasha_jobs.start_job("full", request.values.get("workers"), CHARTS_DB, DASHA_DB)
+        return _dasha_job_response(job, started)
+    except Exception as e:
+        import traceback; traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)})
 
-    import sqlite3, json
-    from vimshottari import compute_vimshottari
 
-    recomputed = 0
+@app.route("/dasha_jobs", methods=["GET"])
+def dasha_jobs_list():
     try:
-        conn = sqlite3.connect(CHARTS_DB)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT id, date, time, data_json FROM charts")
-        charts = cur.fetchall()
-        conn.close()
+        return jsonify({"status": "ok", "jobs": dasha_jobs.list_jobs(request.args.get("limit", 20), DASHA_DB)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
 
-        conn_d = sqlite3.connect(DASHA_DB)
-        cur_d = conn_d.cursor()
 
-        for c in charts:
-            chart_id = c["id"]
-            date_str, time_str = c["date"], c["time"]
+@app.route("/dasha_jobs/<int:job_id>", methods=["GET"])
+def dasha_job_progress(job_id):
+    job = dasha_jobs.get_job(job_id, DASHA_DB)
+    if not job:
+        return jsonify({"status": "error", "message": f"Job {job_id} not found"}), 404
+    return jsonify({"status": "ok", "job": job})
 
-            # Parse date/time
-            try:
-                y, m, d = [int(x) for x in date_str.split("-")]
-                parts = [int(float(x)) for x in time_str.split(":")]
-                h, mn, s = (parts + [0, 0, 0])[:3]
-            except Exception:
-                continue
 
-            # Compute Vimshottari Dasha
-            result = compute_vimshottari(y, m, d, h, mn, s, 13.0827, 80.2707, 5.5)
-            dashas = result.get("mahadasha", [])
-            if not dashas:
-                continue
+@app.route("/dasha_jobs/<int:job_id>/cancel", methods=["POST"])
+def dasha_job_cancel(job_id):
+    try:
+        return jsonify({"status": "ok", "job": dasha_jobs.cancel_job(job_id, DASHA_DB)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
 
-            # Update chart JSON
-            try:
-                data = json.loads(c["data_json"] or "{}")
-            except Exception:
-                data = {}
-            data["dashas"] = dashas
-
-            conn2 = sqlite3.connect(CHARTS_DB)
-            cur2 = conn2.cursor()
-            cur2.execute("UPDATE charts SET data_json=? WHERE id=?", (json.dumps(data), chart_id))
-            conn2.commit()
-            conn2.close()
-
-            # Insert into dasha.db
-            cur_d.execute("DELETE FROM dashas WHERE chart_id=?", (chart_id,))
-            for d in dashas:
-                cur_d.execute("""
-                    INSERT INTO dashas (chart_id, level, planet, start_date, end_date, duration, raw_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    chart_id,
-                    "Mahadasha",
-                    d.get("lord", ""),
-                    d.get("start_date", ""),
-                    d.get("end_date", ""),
-                    float(d.get("duration", 0) or 0),
-                    json.dumps(d)
-                ))
-                recomputed += 1
 
-        conn_d.commit()
-        conn_d.close()
-        return jsonify({"status": "ok", "inserted": recomputed})
+@app.route("/dasha_jobs/<int:job_id>/resume", methods=["POST"])
+def dasha_job_resume(job_id):
+    try:
+        job = dasha_jobs.resume_job(job_id, request.values.get("workers"), CHARTS_DB, DASHA_DB)
+        return jsonify({"status": "ok", "job": job})
     except Exception as e:
-        import traceback; traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)})
 
 
 
-# ================================================================
-# 🌙 Rebuild Dasha for a specific chart (safe GET + POST)
-# ================================================================
 # ================================================================
 # 🌙 Rebuild Vimshottari Dasha for ONE specific chart (final version)
 # ================================================================
 @app.route("/rebuild_dasha_for_chart/<int:chart_id>", methods=["GET", "POST"])
 def rebuild_dasha_for_chart(chart_id):
     """
-    Recomputes Vimshottari Dasha for a single chart.
+    Recomputes Vimshottari Dasha for a single chart, right away.
     ✅ Reads from charts.db
-    ✅ Updates charts.db (data_json)
-    ✅ Updates dasha.db (Mahadasha periods)
-    ✅ Compatible with compute_vimshottari() returning 'mahadashas'
+    ✅ Updates dasha.db (all stored levels + the Mahadasha rows)
     """
-    import json
-    from vimshottari import compute_vimshottari
-
     try:
-        # --- Load chart from charts.db ---
-        conn = sqlite3.connect(CHARTS_DB)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT id, date, time, data_json FROM charts WHERE id=?", (chart_id,))
-        row = cur.fetchone()
-        conn.close()
-
-        if not row:
+        result = dasha_store.refresh_chart(chart_id, CHARTS_DB, DASHA_DB, force=True)
+        if result == "removed":
             return jsonify({"status": "error", "message": f"Chart {chart_id} not found"})
-
-        # --- Parse date/time safely ---
-        date_str, time_str = row["date"], row["time"]
-        try:
-            y, m, d = [int(x) for x in date_str.split("-")]
-            parts = [int(float(x)) for x in time_str.split(":")]
-            h, mn, s = (parts + [0, 0, 0])[:3]
-        except Exception as e:
-            return jsonify({"status": "error", "message": f"Invalid date/time format: {e}"})
-
-        # --- Compute Vimshottari Dasha ---
-        result = compute_vimshottari(y, m, d, h, mn, s, 13.0827, 80.2707, 5.5)
-
-        # 🪔 Handle different key names: "mahadasha", "mahadashas", or "dashas"
-        dashas = result.get("mahadasha") or result.get("mahadashas") or result.get("dashas") or []
-        if not dashas:
-            return jsonify({
-                "status": "error",
-                "message": "No dashas computed",
-                "debug": list(result.keys())  # helpful for testing, remove later if desired
-            })
-
-        # --- Update chart JSON in charts.db ---
-        data = {}
-        try:
-            data = json.loads(row["data_json"] or "{}")
-        except Exception:
-            data = {}
-
-        data["dashas"] = dashas
-        conn2 = sqlite3.connect(CHARTS_DB)
-        cur2 = conn2.cursor()
-        cur2.execute("UPDATE charts SET data_json=? WHERE id=?", (json.dumps(data), chart_id))
-        conn2.commit()
-        conn2.close()
-
-        # --- Write Mahadasha data to dasha.db ---
-        conn_d = sqlite3.connect(DASHA_DB)
-        cur_d = conn_d.cursor()
-        cur_d.execute("DELETE FROM dashas WHERE chart_id=?", (chart_id,))
-        for d in dashas:
-            cur_d.execute("""
-                INSERT INTO dashas (chart_id, level, planet, start_date, end_date, duration, raw_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                chart_id,
-                "Mahadasha",
-                d.get("lord", ""),
-                d.get("start") or d.get("start_date", ""),
-                d.get("end") or d.get("end_date", ""),
-                float(d.get("duration", 0) or 0),
-                json.dumps(d, ensure_ascii=False)  # ✅ ensures valid JSON
-            ))
-        conn_d.commit()
-        conn_d.close()
-
-        print(f"✅ Successfully rebuilt {len(dashas)} dashas for chart {chart_id}")
-        return jsonify({"status": "ok", "inserted": len(dashas)})
+        if result != "indexed":
+            return jsonify({"status": "error", "message": f"Chart {chart_id}: {result}"})
+        return jsonify({"status": "ok", "inserted": len(dasha_store.VIM_ORDER)})   # Mahadasha rows, as before
 
     except Exception as e:
         import traceback
@@ -1757,7 +1506,7 @@ def get_dasha_chain(chart_id):
     Uses vimshottari.py directly — no recomputation stored.
     """
     import datetime, json, sqlite3
-    from vimshottari import compute_vimshottari, compute_subtree, jd_from_local
+    from vimshottari import dasha_tree, jd_from_local
 
     # Get target date/time from query string
     date_str = request.args.get("date", "")
@@ -1771,7 +1520,7 @@ def get_dasha_chain(chart_id):
 
     # --- Step 1: Get chart details ---
     try:
-        conn = sqlite3.connect(CHARTS_DB)
+        conn = storage.connect(CHARTS_DB)
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         cur.execute("SELECT * FROM charts WHERE id=?", (chart_id,))
@@ -1781,50 +1530,23 @@ def get_dasha_chain(chart_id):
         if not row:
             return jsonify({"status": "error", "message": f"Chart {chart_id} not found"})
 
-        # ✅ SAFELY parse data_json (handles both 'single quotes' and proper JSON)
-        try:
-            data_raw = row["data_json"] or "{}"
-            data_raw = data_raw.replace("'", '"').replace("None", "null")
-            data_json = json.loads(data_raw)
-        except Exception:
-            data_json = {}
-
-        lat = float(data_json.get("lat", 13.0827))
-        lon = float(data_json.get("lon", 80.2707))
-        tz = float(data_json.get("tz", 5.5))
+        # ✅ Birth place from the typed columns (place_json / data_json on older rows)
+        birth = dasha_store.chart_birth(row)
+        lat = float(13.0827 if birth["lat"] is None else birth["lat"])
+        lon = float(80.2707 if birth["lon"] is None else birth["lon"])
+        tz = float(5.5 if birth["tz"] is None else birth["tz"])
 
         y, m, d = [int(x) for x in row["date"].split("-")]
         hh, mm, ss = [int(float(x)) for x in row["time"].split(":")[:3]]
 
-        # --- Step 2: Compute Vimshottari dashas for this chart ---
-        res = compute_vimshottari(y, m, d, hh, mm, ss, lat, lon, tz)
-        mahadashas = res.get("mahadashas") or res.get("mahadasha") or res.get("dashas") or []
-        if not mahadashas:
-            return jsonify({"status": "error", "message": "No Vimshottari data found"})
-
-        # --- Step 3: Recursively find active Dasha chain ---
-        def find_active_chain(levels, depth=1):
-            for dasha in levels:
-                s = datetime.datetime.fromisoformat(dasha["start"])
-                e = datetime.datetime.fromisoformat(dasha["end"])
-                if s <= target <= e:
-                    chain = [{
-                        "level": ["Mahadasha","Bhukti","Antara","Pratyantara","Sookshma","Prana"][depth-1],
-                        "planet": dasha["lord"],
-                        "start_date": dasha["start"],
-                        "end_date": dasha["end"]
-                    }]
-                    if "sub" in dasha:
-                        chain += find_active_chain(dasha["sub"], depth+1)
-                    else:
-                        # Dynamically compute deeper levels
-                        if depth < 6:
-                            sub = compute_subtree(dasha["start_jd"], dasha["end_jd"], tz, 1, dasha["lord"])
-                            chain += find_active_chain(sub, depth+1)
-                    return chain
-            return []
-
-        full_chain = find_active_chain(mahadashas)
+        # --- Step 2: Vimshottari tree for this chart (cached per birth),
+        #     in the chart's ayanamsa like the stored periods (dasha_store.py) ---
+        tree = dasha_tree(y, m, d, hh, mm, ss, lat, lon, tz, sid_mode_for(birth["ayanamsa"]))
+
+        # --- Step 3: Active chain, one bisect per level (Mahadasha → Prana) ---
+        target_jd = jd_from_local(target.year, target.month, target.day,
+                                  target.hour, target.minute, target.second, tz)
+        full_chain = tree.chain_dicts(target_jd)
 
         return jsonify({
             "status": "ok",
@@ -1837,190 +1559,266 @@ def get_dasha_chain(chart_id):
         import traceback; traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)})
 
+# ============================================================
+# 🔎 Which saved charts run a given Dasha between two dates
+# ============================================================
+@app.route("/dasha_search", methods=["GET", "POST"])
+def dasha_search():
+    """
+    lords=Saturn-Rahu&start=2026-01&end=2026-06 [&level=3&tz=5.5&limit=500]
+    Reads the materialized periods in dasha.db (dasha_store.py) — no
+    per-chart recompute. start/end take YYYY, YYYY-MM or YYYY-MM-DD; end is
+    inclusive. level > number of lords lists the sub-periods under them.
+    """
+    import datetime
+    from vimshottari import jd_from_local
+
+    try:
+        data = request.get_json(silent=True) or request.values
+        lords = dasha_store.parse_lords(data.get("lords") or "")
+        tz = float(data.get("tz") or 5.5)
+        d0 = dasha_store.parse_bound(data.get("start") or datetime.date.today().isoformat())
+        d1 = dasha_store.parse_bound(data.get("end") or data.get("start") or d0.isoformat(), end=True)
+        level = int(data["level"]) if data.get("level") else None
+        limit = int(data.get("limit") or 500)
+
+        periods = dasha_store.find_running(
+            lords,
+            jd_from_local(d0.year, d0.month, d0.day, 0, 0, 0, tz),
+            jd_from_local(d1.year, d1.month, d1.day, 0, 0, 0, tz),
+            level, limit, DASHA_DB,
+        )
+
+        ids = sorted({p["chart_id"] for p in periods})
+        charts = {}
+        if ids:
+            conn = storage.connect(CHARTS_DB)
+            conn.row_factory = sqlite3.Row
+            for r in conn.execute(
+                    f"SELECT id, name, date, time, tag FROM charts WHERE id IN ({','.join('?' * len(ids))})", ids):
+                charts[r["id"]] = dict(r)
+            conn.close()
+
+        results = []
+        for p in periods:
+            c = charts.get(p["chart_id"])
+            if not c:
+                continue   # deleted since it was indexed
+            row = dasha_store.format_period(p)
+            row.update(name=c["name"], date=c["date"], time=c["time"], tag=c["tag"])
+            results.append(row)
+
+        return jsonify({
+            "status": "ok",
+            "lords": [dasha_store.VIM_ORDER[i] for i in lords],
+            "start": d0.isoformat(),
+            "end": (d1 - datetime.timedelta(days=1)).isoformat(),
+            "count": len(results),
+            "results": results
+        })
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
+# ============================================================
+# 🪐 Sade Sati / Ashtama Shani / Guru periods of saved charts
+# ============================================================
+@app.route("/gochara_periods", methods=["GET", "POST"])
+def gochara_periods():
+    """
+    date=2026-03-01&kind=sade_sati [&house=1&tz=5.5] -> clients inside that
+    period on the date (default today); chart_id=16 [&kind=...] -> every
+    period of one chart. Reads gochara_periods in charts.db (gochara_store.py).
+    """
+    import datetime
+
+    try:
+        data = request.get_json(silent=True) or request.values
+        tz = float(data.get("tz") or 5.5)
+        if data.get("chart_id"):
+            kinds = [k.strip() for k in str(data["kind"]).split(",")] if data.get("kind") else gochara_store.KINDS
+            periods = gochara_store.chart_rows(int(data["chart_id"]), kinds, tz, CHARTS_DB)
+            return jsonify({"status": "ok", "chart_id": int(data["chart_id"]),
+                            "count": len(periods), "periods": periods})
+        kind = data.get("kind") or "sade_sati"
+        house = int(data["house"]) if data.get("house") else None
+        day = data.get("date") or datetime.date.today().isoformat()
+        charts = gochara_store.running_on(gochara_store.day_jd(day, tz), kind, house, tz, CHARTS_DB)
+        return jsonify({"status": "ok", "date": day, "kind": kind,
+                        "kind_name": gochara_store.KIND_NAMES[kind], "count": len(charts), "charts": charts})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
 #----------------------------------------------------------
 #
 #Bhava Chart 
 # ----------------------------------------------------------------
 # app.py
 
-@app.route("/bhava_chart", methods=["POST"])
-def bhava_chart():
-    try:
-        data = request.get_json(force=True)
+def build_bhava_chart(snap):
+    """Sripati bhava madhya/sandhi table + planet bhava numbers for one snapshot."""
+    # 3. GET ANGLES (ASC & MC) ONLY
+    # We do NOT ask SwissEph for houses. We calculate them manually.
+    _, asc_deg, mc_deg = snap.sidereal_houses()  # Lagna (Midpoint of H1), MC (Midpoint of H10)
 
-        # 1. Parse Date/Time
-        if "year" in data:
-            y, m, d = int(data["year"]), int(data["month"]), int(data["day"])
-            h, mi, s = int(data.get("hour", 0)), int(data.get("minute", 0)), int(data.get("second", 0))
-        elif "date" in data:
-            d_parts = data["date"].split("-")
-            t_parts = data["time"].split(":")
-            y, m, d = int(d_parts[0]), int(d_parts[1]), int(d_parts[2])
-            h, mi = int(t_parts[0]), int(t_parts[1])
-            s = int(data.get("seconds", 0))
-        else:
-            return jsonify({"status": "error", "message": "Invalid Data"})
+    # 4. MANUAL SRIPATI CALCULATION
+    
+    def normalize(d): 
+        return (d + 360) % 360
+    
+    def get_distance(start, end): 
+        return (end - start + 360) % 360
 
-        lat = float(data.get("lat", 13.0827))
-        lon = float(data.get("lon", 80.2707))
-        tz = float(data.get("tz", 5.5))
-        
-        # Ayanamsa
-        ayanamsa = data.get("ayanamsa", "lahiri").lower()
-        if ayanamsa == "raman": swe.set_sid_mode(swe.SIDM_RAMAN)
-        elif ayanamsa == "kp": swe.set_sid_mode(swe.SIDM_KRISHNAMURTI)
-        else: swe.set_sid_mode(swe.SIDM_LAHIRI)
-
-        # 2. Julian Day
-        jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
-
-        # 3. GET ANGLES (ASC & MC) ONLY
-        # We do NOT ask SwissEph for houses. We calculate them manually.
-        res_flags = swe.FLG_SIDEREAL
-        cusps_temp, ascmc = swe.houses_ex(jd_ut, lat, lon, b'P', res_flags)
+    midpoints = [0.0] * 13 # 1-based index
+    
+    # A. Set Angles as Midpoints
+    midpoints[1]  = asc_deg
+    midpoints[10] = mc_deg
+    midpoints[7]  = normalize(asc_deg + 180) # Descendant
+    midpoints[4]  = normalize(mc_deg + 180)  # IC
+
+    # B. Trisect Quadrants to find other Midpoints
+    # 10th to 1st (Houses 11, 12)
+    dist_10_1 = get_distance(midpoints[10], midpoints[1])
+    midpoints[11] = normalize(midpoints[10] + dist_10_1 / 3)
+    midpoints[12] = normalize(midpoints[10] + 2 * dist_10_1 / 3)
+
+    # 1st to 4th (Houses 2, 3)
+    dist_1_4 = get_distance(midpoints[1], midpoints[4])
+    midpoints[2] = normalize(midpoints[1] + dist_1_4 / 3)
+    midpoints[3] = normalize(midpoints[1] + 2 * dist_1_4 / 3)
+
+    # 4th to 7th (Houses 5, 6)
+    dist_4_7 = get_distance(midpoints[4], midpoints[7])
+    midpoints[5] = normalize(midpoints[4] + dist_4_7 / 3)
+    midpoints[6] = normalize(midpoints[4] + 2 * dist_4_7 / 3)
+
+    # 7th to 10th (Houses 8, 9)
+    dist_7_10 = get_distance(midpoints[7], midpoints[10])
+    midpoints[8] = normalize(midpoints[7] + dist_7_10 / 3)
+    midpoints[9] = normalize(midpoints[7] + 2 * dist_7_10 / 3)
+
+    # C. Calculate Sandhis (Start of Houses)
+    # The Start of House X is the halfway point between Midpoint(X-1) and Midpoint(X)
+    sandhis = [0.0] * 13
+    for i in range(1, 13):
+        prev = 12 if i == 1 else i - 1
+        span = get_distance(midpoints[prev], midpoints[i])
+        sandhis[i] = normalize(midpoints[prev] + span / 2)
+
+    # 5. Format Output
+    tamil_signs = ["மேஷம்", "ரிஷபம்", "மிதுனம்", "கடகம்", "சிம்மம்", "கன்னி",
+                   "துலாம்", "விருச்சிகம்", "தனுசு", "மகரம்", "கும்பம்", "மீனம்"]
+    
+    # Determine strict Rasi for Lagna (Visual Highlight)
+    # This is based purely on the Ascendant degree, not the Bhava start.
+    lagna_rasi_idx = int(asc_deg / 30)
+    lagna_rasi_name = tamil_signs[lagna_rasi_idx]
+
+    bhavas_out = []
+    for i in range(1, 13):
+        # Format Midpoint
+        md = midpoints[i]
+        mid_d = int(md % 30)
+        mid_m = int((md % 30 - mid_d) * 60)
         
-        asc_deg = ascmc[0]  # Lagna Degree (Midpoint of H1)
-        mc_deg = ascmc[1]   # MC Degree (Midpoint of H10)
-
-        # 4. MANUAL SRIPATI CALCULATION
+        # Format Start (Sandhi)
+        sd = sandhis[i]
+        sd_d = int(sd % 30)
+        sd_m = int((sd % 30 - sd_d) * 60)
         
-        def normalize(d): 
-            return (d + 360) % 360
+        # Determine Rasi for display in table
+        m_rasi = tamil_signs[int(md / 30)]
         
-        def get_distance(start, end): 
-            return (end - start + 360) % 360
+        bhavas_out.append({
+            "house": i,
+            "rasi": m_rasi,
+            "mid_dms": f"{mid_d}°{mid_m}'",   # Bhava Madhya
+            "start_dms": f"{sd_d}°{sd_m}'",   # Bhava Arambha
+            "full_mid_deg": md
+        })
 
-        midpoints = [0.0] * 13 # 1-based index
-        
-        # A. Set Angles as Midpoints
-        midpoints[1]  = asc_deg
-        midpoints[10] = mc_deg
-        midpoints[7]  = normalize(asc_deg + 180) # Descendant
-        midpoints[4]  = normalize(mc_deg + 180)  # IC
-
-        # B. Trisect Quadrants to find other Midpoints
-        # 10th to 1st (Houses 11, 12)
-        dist_10_1 = get_distance(midpoints[10], midpoints[1])
-        midpoints[11] = normalize(midpoints[10] + dist_10_1 / 3)
-        midpoints[12] = normalize(midpoints[10] + 2 * dist_10_1 / 3)
-
-        # 1st to 4th (Houses 2, 3)
-        dist_1_4 = get_distance(midpoints[1], midpoints[4])
-        midpoints[2] = normalize(midpoints[1] + dist_1_4 / 3)
-        midpoints[3] = normalize(midpoints[1] + 2 * dist_1_4 / 3)
-
-        # 4th to 7th (Houses 5, 6)
-        dist_4_7 = get_distance(midpoints[4], midpoints[7])
-        midpoints[5] = normalize(midpoints[4] + dist_4_7 / 3)
-        midpoints[6] = normalize(midpoints[4] + 2 * dist_4_7 / 3)
-
-        # 7th to 10th (Houses 8, 9)
-        dist_7_10 = get_distance(midpoints[7], midpoints[10])
-        midpoints[8] = normalize(midpoints[7] + dist_7_10 / 3)
-        midpoints[9] = normalize(midpoints[7] + 2 * dist_7_10 / 3)
-
-        # C. Calculate Sandhis (Start of Houses)
-        # The Start of House X is the halfway point between Midpoint(X-1) and Midpoint(X)
-        sandhis = [0.0] * 13
-        for i in range(1, 13):
-            prev = 12 if i == 1 else i - 1
-            span = get_distance(midpoints[prev], midpoints[i])
-            sandhis[i] = normalize(midpoints[prev] + span / 2)
-
-        # 5. Format Output
-        tamil_signs = ["மேஷம்", "ரிஷபம்", "மிதுனம்", "கடகம்", "சிம்மம்", "கன்னி",
-                       "துலாம்", "விருச்சிகம்", "தனுசு", "மகரம்", "கும்பம்", "மீனம்"]
-        
-        # Determine strict Rasi for Lagna (Visual Highlight)
-        # This is based purely on the Ascendant degree, not the Bhava start.
-        lagna_rasi_idx = int(asc_deg / 30)
-        lagna_rasi_name = tamil_signs[lagna_rasi_idx]
-
-        bhavas_out = []
-        for i in range(1, 13):
-            # Format Midpoint
-            md = midpoints[i]
-            mid_d = int(md % 30)
-            mid_m = int((md % 30 - mid_d) * 60)
-            
-            # Format Start (Sandhi)
-            sd = sandhis[i]
-            sd_d = int(sd % 30)
-            sd_m = int((sd % 30 - sd_d) * 60)
-            
-            # Determine Rasi for display in table
-            m_rasi = tamil_signs[int(md / 30)]
+    # 6. Planet Positions
+    planet_map = {
+        swe.SUN: "சூரியன்", swe.MOON: "சந்திரன்", swe.MARS: "செவ்வாய்",
+        swe.MERCURY: "புதன்", swe.JUPITER: "குரு", swe.VENUS: "சுக்கிரன்",
+        swe.SATURN: "சனி", swe.MEAN_NODE: "ராகு"
+    }
+    
+    planets_out = []
+
+    # Logic: Does planet fall between Start(H) and Start(H+1)?
+    def get_bhava_number(p_lon, sandhis_list):
+        p_lon = normalize(p_lon)
+        for h in range(1, 13):
+            start = sandhis_list[h]
+            end = sandhis_list[h+1] if h < 12 else sandhis_list[1]
             
-            bhavas_out.append({
-                "house": i,
-                "rasi": m_rasi,
-                "mid_dms": f"{mid_d}°{mid_m}'",   # Bhava Madhya
-                "start_dms": f"{sd_d}°{sd_m}'",   # Bhava Arambha
-                "full_mid_deg": md
-            })
-
-        # 6. Planet Positions
-        planet_map = {
-            swe.SUN: "சூரியன்", swe.MOON: "சந்திரன்", swe.MARS: "செவ்வாய்",
-            swe.MERCURY: "புதன்", swe.JUPITER: "குரு", swe.VENUS: "சுக்கிரன்",
-            swe.SATURN: "சனி", swe.MEAN_NODE: "ராகு"
-        }
+            if start < end:
+                if start <= p_lon < end: return h
+            else: # Wrap around case (Pisces -> Aries)
+                if p_lon >= start or p_lon < end: return h
+        return 1
+
+    for pid, name in planet_map.items():
+        lon = snap.sid_lon(pid)
         
-        planets_out = []
-        ayan_val = swe.get_ayanamsa_ut(jd_ut)
-
-        # Logic: Does planet fall between Start(H) and Start(H+1)?
-        def get_bhava_number(p_lon, sandhis_list):
-            p_lon = normalize(p_lon)
-            for h in range(1, 13):
-                start = sandhis_list[h]
-                end = sandhis_list[h+1] if h < 12 else sandhis_list[1]
-                
-                if start < end:
-                    if start <= p_lon < end: return h
-                else: # Wrap around case (Pisces -> Aries)
-                    if p_lon >= start or p_lon < end: return h
-            return 1
-
-        for pid, name in planet_map.items():
-            res = swe.calc_ut(jd_ut, pid)
-            lon = normalize(res[0][0] - ayan_val)
-            
-            # Rasi (Visual) - Where it sits in the grid
-            p_rasi_idx = int(lon / 30)
-            
-            # Bhava (Functional) - Which House it belongs to
-            bhava_num = get_bhava_number(lon, sandhis)
-            
-            d_p = int(lon % 30)
-            m_p = int((lon % 30 - d_p) * 60)
-
-            planets_out.append({
-                "name": name,
-                "rasi": tamil_signs[p_rasi_idx], # Visual Location
-                "bhava_no": bhava_num,           # Functional House
-                "dms": f"{d_p}°{m_p}'"
-            })
-
-        # Ketu
-        rahu = next(p for p in planets_out if p["name"] == "ராகு")
-        k_lon = normalize(swe.calc_ut(jd_ut, swe.MEAN_NODE)[0][0] - ayan_val + 180)
-        k_rasi_idx = int(k_lon / 30)
-        k_bhava = get_bhava_number(k_lon, sandhis)
+        # Rasi (Visual) - Where it sits in the grid
+        p_rasi_idx = int(lon / 30)
+        
+        # Bhava (Functional) - Which House it belongs to
+        bhava_num = get_bhava_number(lon, sandhis)
         
+        d_p = int(lon % 30)
+        m_p = int((lon % 30 - d_p) * 60)
+
         planets_out.append({
-            "name": "கேது",
-            "rasi": tamil_signs[k_rasi_idx],
-            "bhava_no": k_bhava,
-            "dms": rahu["dms"]
+            "name": name,
+            "rasi": tamil_signs[p_rasi_idx], # Visual Location
+            "bhava_no": bhava_num,           # Functional House
+            "dms": f"{d_p}°{m_p}'"
         })
 
-        return jsonify({
-            "status": "ok",
-            "bhavas": bhavas_out,
-            "planets": planets_out,
-            "lagna_rasi": lagna_rasi_name 
-        })
+    # Ketu
+    rahu = next(p for p in planets_out if p["name"] == "ராகு")
+    k_lon = snap.ketu_sid()
+    k_rasi_idx = int(k_lon / 30)
+    k_bhava = get_bhava_number(k_lon, sandhis)
+    
+    planets_out.append({
+        "name": "கேது",
+        "rasi": tamil_signs[k_rasi_idx],
+        "bhava_no": k_bhava,
+        "dms": rahu["dms"]
+    })
+
+    return {
+        "bhavas": bhavas_out,
+        "planets": planets_out,
+        "lagna_rasi": lagna_rasi_name
+    }
+
+
+@app.route("/bhava_chart", methods=["POST"])
+def bhava_chart():
+    try:
+        data = request.get_json(force=True)
+
+        # 1. Parse Date/Time
+        try:
+            b = parse_birth_data(data)
+        except (ValueError, KeyError, IndexError):
+            return jsonify({"status": "error", "message": "Invalid Data"})
+
+        # 2. Julian Day -> shared ephemeris snapshot (ayanamsa explicit, see chart_snapshot)
+        result, _ = result_cache.get_or_compute(
+            "bhava", result_cache.birth_key("bhava", b),
+            lambda: build_bhava_chart(snapshot_from_local(
+                b["year"], b["month"], b["day"], b["hour"], b["minute"], b["second"],
+                b["lat"], b["lon"], b["tz"], sid_mode_for(b["ayanamsa"]))))
+
+        return jsonify({"status": "ok", **result})
 
     except Exception as e:
         import traceback
@@ -2083,9 +1881,15 @@ def compute_ashtakavarga_api():
     try:
         # call the calculation function
         # 🔧 Fix: Use same rows as Rasi chart (no argument confusion)
-        rows = calc_full_table(y, m, d, h, mi, s, lat, lon, tz)
-        res = compute_ashtakavarga(rows=rows, debug=debug)
-
+        def build():
+            rows = calc_full_table(y, m, d, h, mi, s, lat, lon, tz, sid_mode_for(ayanamsa))
+            return compute_ashtakavarga(rows=rows, debug=debug)
+
+        if debug:
+            return jsonify(build())
+        res, _ = result_cache.get_or_compute(
+            "ashtakavarga", result_cache.chart_key("ashtakavarga", y, m, d, h, mi, s, lat, lon, tz, ayanamsa),
+            build)
         return jsonify(res)
     except Exception as e:
         import traceback; traceback.print_exc()
@@ -2119,10 +1923,13 @@ def kp_chart_route():
         lon = float(data.get("lon", 80.2707))
         tz = float(data.get("tz", 5.5))
 
-        jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
-        
-        # Calc KP
-        result = calculate_kp_data(jd_ut, lat, lon, tz)
+        # Calc KP (cached per birth; the JD is only needed on a miss)
+        def build():
+            jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
+            return calculate_kp_data(get_snapshot(jd_ut, lat, lon))
+
+        result, _ = result_cache.get_or_compute(
+            "kp", result_cache.chart_key("kp", y, m, d, h, mi, s, lat, lon, tz), build)
         return jsonify({"status": "ok", "data": result})
 
     except Exception as e:
@@ -2158,10 +1965,13 @@ def compute_padas_route():
         lon = float(data.get("lon", 80.2707))
         tz = float(data.get("tz", 5.5))
 
-        jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
-        
         # Compute
-        result = calculate_padas(jd_ut, lat, lon, tz)
+        def build():
+            jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
+            return calculate_padas(get_snapshot(jd_ut, lat, lon))
+
+        result, _ = result_cache.get_or_compute(
+            "padas", result_cache.chart_key("padas", y, m, d, h, mi, s, lat, lon, tz), build)
         
         return jsonify({"status": "ok", "data": result})
 
@@ -2196,9 +2006,13 @@ def compute_karakas_route():
             return jsonify({"status": "error", "message": "Invalid date"})
 
         tz = float(data.get("tz", 5.5))
-        jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
-        
-        result = calculate_chara_karakas(jd_ut)
+
+        def build():
+            jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
+            return calculate_chara_karakas(get_snapshot(jd_ut))
+
+        result, _ = result_cache.get_or_compute(
+            "karakas", result_cache.chart_key("karakas", y, m, d, h, mi, s, None, None, tz), build)
         return jsonify({"status": "ok", "data": result})
 
     except Exception as e:
@@ -2237,12 +2051,13 @@ def compute_shadbala_route():
         lon = float(data.get("lon", 80.2707))
         tz = float(data.get("tz", 5.5))
 
-        # Calculate JD
-        jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
-        
-        # Call the new function
-        from shadbala import calculate_shadbala  # Import here or at top
-        result = calculate_shadbala(jd_ut, lat, lon, tz)
+        # Calculate JD + call the new function (only when not cached)
+        def build():
+            jd_ut = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
+            return calculate_shadbala(get_snapshot(jd_ut, lat, lon))
+
+        result, _ = result_cache.get_or_compute(
+            "shadbala", result_cache.chart_key("shadbala", y, m, d, h, mi, s, lat, lon, tz), build)
         
         return jsonify({"status": "ok", "data": result})
 
@@ -2267,24 +2082,6 @@ def compare_charts_view():
 # --- MATCH HISTORY TRACKING ---
 MATCH_DB = "match_history.db"
 
-def ensure_match_db():
-    conn = sqlite3.connect(MATCH_DB)
-    cur = conn.cursor()
-    # Stores: Who (Name), Gender, Matched With (Partner Name), Date, Score
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            gender TEXT,
-            partner_name TEXT,
-            score TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-ensure_match_db()
 
 @app.route("/log_match", methods=["POST"])
 def log_match():
@@ -2294,7 +2091,7 @@ def log_match():
         girl = data.get("girl_name")
         score = data.get("score")
 
-        conn = sqlite3.connect(MATCH_DB)
+        conn = storage.connect(MATCH_DB)
         cur = conn.cursor()
         
         # Log Boy's History
@@ -2313,7 +2110,7 @@ def get_match_count():
     try:
         data = request.get_json()
         name = data.get("name")
-        conn = sqlite3.connect(MATCH_DB)
+        conn = storage.connect(MATCH_DB)
         cur = conn.cursor()
         
         # Count distinct partners checked
@@ -2351,21 +2148,182 @@ def get_all_divisions():
         lon = float(data.get("lon"))
         tz = float(data.get("tz"))
 
-        # Set Ayanamsa
+        # Ayanamsa (explicit, see chart_snapshot)
         ayanamsa = data.get("ayanamsa", "lahiri")
-        if ayanamsa == "raman": swe.set_sid_mode(swe.SIDM_RAMAN)
-        elif ayanamsa == "kp": swe.set_sid_mode(swe.SIDM_KRISHNAMURTI)
-        else: swe.set_sid_mode(swe.SIDM_LAHIRI)
 
-        # Calc JD
-        jd = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
+        # Calc JD + compute (only when not cached)
+        def build():
+            jd = swe.julday(y, m, d, h + mi/60.0 + s/3600.0) - tz/24.0
+            return compute_all_divisions(get_snapshot(jd, lat, lon, sid_mode_for(ayanamsa)))
 
-        # Compute
-        charts = compute_all_divisions(jd, lat, lon, tz)
+        charts, _ = result_cache.get_or_compute(
+            "divisions", result_cache.chart_key("divisions", y, m, d, h, mi, s, lat, lon, tz, ayanamsa),
+            build)
 
         return jsonify({"status": "ok", "charts": charts})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
+#######################################################################
+# 📦 CHART BUNDLE — every view of one chart in a single request
+#######################################################################
+BUNDLE_SECTIONS = ("rasi", "kp", "shadbala", "padas", "karakas",
+                   "ashtakavarga", "divisions", "bhava", "dasha", "panchangam")
+
+
+@app.route("/chart_bundle", methods=["POST"])
+def chart_bundle():
+    """
+    Same birth data the individual routes take, plus "sections" (list or
+    comma separated string, default: all of BUNDLE_SECTIONS). The date is
+    parsed and the ephemeris snapshot computed once; each section payload is
+    what its own route returns (rasi -> rows/html, kp/padas/... -> data,
+    divisions -> charts, ...). A failing section lands in "errors" and does
+    not take the others down. Sections already in the result cache are
+    served from it; the snapshot and the rasi rows are only computed when
+    some section misses.
+    """
+    try:
+        data = request.get_json(force=True) or {}
+        b = parse_birth_data(data)
+
+        wanted = data.get("sections") or BUNDLE_SECTIONS
+        if isinstance(wanted, str):
+            wanted = wanted.split(",")
+        wanted = [str(w).strip().lower() for w in wanted if str(w).strip()]
+
+        y, m, d = b["year"], b["month"], b["day"]
+        h, mi, s = b["hour"], b["minute"], b["second"]
+        lat, lon, tz = b["lat"], b["lon"], b["tz"]
+        sid_mode = sid_mode_for(b["ayanamsa"])
+
+        chart_type = str(data.get("chartType", "rasi")).lower()
+
+        # One snapshot in the chart's ayanamsa (dasha too); KP/shadbala/padas/karakas use
+        # Lahiri like their routes do (only an extra ayanamsa lookup).
+        # calc_full_table rows are shared by rasi and ashtakavarga.
+        # All three are computed on first use only.
+        memo = {}
+
+        def once(name, fn):
+            if name not in memo:
+                memo[name] = fn()
+            return memo[name]
+
+        snap = lambda: once("snap", lambda: snapshot_from_local(y, m, d, h, mi, s, lat, lon, tz, sid_mode))
+        lahiri = lambda: snap().with_sid_mode(swe.SIDM_LAHIRI)
+        base_rows = lambda: once("rows", lambda: calc_full_table(y, m, d, h, mi, s, lat, lon, tz, sid_mode))
+
+        def rasi_section():
+            rows, html = build_rasi_chart(y, m, d, h, mi, s, lat, lon, tz, sid_mode, chart_type,
+                                          rows=[dict(r) for r in base_rows()])
+            return {"rows": rows, "html": html}
+
+        builders = {
+            "rasi": rasi_section,
+            "kp": lambda: calculate_kp_data(lahiri()),
+            "shadbala": lambda: calculate_shadbala(lahiri()),
+            "padas": lambda: calculate_padas(lahiri()),
+            "karakas": lambda: calculate_chara_karakas(lahiri()),
+            "ashtakavarga": lambda: compute_ashtakavarga(rows=base_rows()),
+            "divisions": lambda: compute_all_divisions(snap()),
+            "bhava": lambda: build_bhava_chart(snap()),
+            "dasha": lambda: compute_vimshottari(y, m, d, h, mi, s, lat, lon, tz, sid_mode),
+            "panchangam": lambda: compute_panchangam(y, m, d, h, mi, s, lat, lon, tz),
+        }
+
+        # Same cache keys as the single-section routes, so either warms the other
+        def section_key(name):
+            if name == "rasi":
+                return result_cache.birth_key(name, b, chart_type=chart_type)
+            if name in ("ashtakavarga", "divisions", "bhava", "dasha"):
+                return result_cache.birth_key(name, b)
+            place = (None, None) if name == "karakas" else (lat, lon)
+            return result_cache.chart_key(name, y, m, d, h, mi, s, *place, tz)
+
+        sections, errors, cached = {}, {}, []
+        for name in wanted:
+            if name in sections or name in errors:
+                continue
+            build = builders.get(name)
+            if build is None:
+                errors[name] = "Unknown section"
+                continue
+            try:
+                sections[name], hit = result_cache.get_or_compute(name, section_key(name), build)
+                if hit:
+                    cached.append(name)
+            except Exception as e:
+                import traceback; traceback.print_exc()
+                errors[name] = str(e)
+
+        return jsonify({"status": "ok", "sections": sections, "errors": errors, "cached": cached})
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
+@app.route("/result_cache", methods=["GET"])
+def result_cache_stats():
+    """Hit/miss counters and size of the computed-result cache (result_cache.py)."""
+    try:
+        return jsonify({"status": "ok", **result_cache.stats()})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
+@app.route("/result_cache/clear", methods=["POST"])
+def result_cache_clear():
+    try:
+        result_cache.clear()
+        return jsonify({"status": "ok"})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
+#######################################################################
+# 🗂️ BATCH CHARTS — JSON array / CSV / NDJSON in, NDJSON out
+#######################################################################
+@app.route("/generate_charts_batch", methods=["POST"])
+def generate_charts_batch():
+    """
+    Body: JSON array of births (or {"births": [...], "workers": n}), or
+    CSV / NDJSON text. Streams one NDJSON line per birth, in input order,
+    computed by batch_charts' process pool. ?workers=N&chunk=M override the
+    pool size and the births-per-task chunk.
+    """
+    import io
+    from batch_charts import generate_ndjson, read_births, DEFAULT_CHUNK
+
+    workers = request.args.get("workers", type=int)
+    chunk = request.args.get("chunk", DEFAULT_CHUNK, type=int)
+
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            workers = workers or payload.get("workers")
+            payload = payload.get("births")
+        if not isinstance(payload, list):
+            return jsonify({"status": "error", "message": "Expected a JSON array of births"}), 400
+        births = payload
+    else:
+        births = read_births(io.TextIOWrapper(request.stream, encoding="utf-8-sig", newline=""))
+
+    try:
+        workers = min(max(1, int(workers)), os.cpu_count() or 1) if workers else None
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": f"workers must be a number: {workers!r}"}), 400
+
+    def stream():
+        try:
+            # pool started from a request thread: no plain fork (see dasha_jobs.START_METHOD)
+            yield from generate_ndjson(births, workers, chunk, "forkserver")
+        except Exception as e:
+            # input that breaks mid-stream (bad NDJSON line, truncated JSON)
+            yield json.dumps({"status": "error", "message": str(e)}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype="application/x-ndjson")
+
+
 #######################################################################
 #Time stamp
 #######################################################################
@@ -2378,15 +2336,9 @@ def fix_timestamps():
     # Current time
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    conn = sqlite3.connect(CHARTS_DB)
+    conn = storage.connect(CHARTS_DB)
     cur = conn.cursor()
 
-    # Ensure columns exist
-    try: cur.execute("ALTER TABLE charts ADD COLUMN saved_at TEXT")
-    except: pass
-    try: cur.execute("ALTER TABLE charts ADD COLUMN updated_at TEXT")
-    except: pass
-
     # 1. Fix NULLs, empty strings, dashes, or "None" text
     query = """
         UPDATE charts 
@@ -2408,6 +2360,18 @@ def fix_timestamps():
     return {"status": "ok", "message": f"Fixed {rows_affected} records successfully!"}
 
 
+# ================================================================
+# 🗄️ Schema migrations (once per database, before the first request)
+# ================================================================
+migrations.run_all({
+    "charts": CHARTS_DB,
+    "events": EVENTS_DB,
+    "dasha": DASHA_DB,
+    "match": MATCH_DB,
+    "places": PLACES_DB,
+})
+
+
 # ================================================================
 # 🚀 Run the Flask app
 # ================================================================
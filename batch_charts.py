@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+batch_charts.py — RASI TABLES FOR WHOLE CLIENT LISTS
+----------------------------------------------------
+Reads births as a JSON array, NDJSON or CSV and writes one NDJSON line per
+birth (same rows /generate_chart computes via calc_full_table), in input
+order. Charts are computed in a process pool so every worker has its own
+swisseph state and its own ephemeris caches; births are shipped to the
+workers in chunks to keep the pickling overhead per chart small.
+
+Accepted fields per birth are the ones parse_birth_data() understands
+(year/month/day/hour/minute/second or date + time, lat, lon, tz,
+ayanamsa). "id" and "name", when present, are echoed back.
+
+CLI
+    python batch_charts.py births.csv -o charts.ndjson --workers 8
+    python batch_charts.py --bench 4000          # charts/sec vs. workers
+"""
+
+import argparse
+import atexit
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import swisseph as swe
+
+from app_stable_backup import calc_full_table, EPHE_PATH
+from chart_snapshot import parse_birth_data, sid_mode_for
+
+DEFAULT_CHUNK = 64
+# Chunks queued per worker: enough to keep the pool busy, bounded so a huge
+# input never sits in memory as pending futures.
+INFLIGHT_PER_WORKER = 4
+ECHO_FIELDS = ("id", "name")
+
+
+# -------------------------------------------------------------
+# INPUT
+# -------------------------------------------------------------
+def _first_char(text):
+    for ch in text:
+        if not ch.isspace():
+            return ch
+    return ""
+
+
+def read_births(fp):
+    """
+    Yield birth dicts from a text stream. The format is sniffed from the
+    first non-blank character: '[' JSON array, '{' NDJSON, anything else CSV
+    with a header row. NDJSON and CSV are read lazily, line by line.
+    """
+    head = []
+    for line in fp:
+        head.append(line)
+        if line.strip():
+            break
+    if head:
+        head[0] = head[0].lstrip("\ufeff")
+    first = _first_char("".join(head))
+    if not first:
+        return
+
+    lines = itertools.chain(head, fp)
+    if first == "[":
+        for item in json.loads("".join(lines)):
+            yield item
+    elif first == "{":
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        for row in csv.DictReader(lines):
+            yield {str(k).strip().lower(): (v.strip() if isinstance(v, str) else v)
+                   for k, v in row.items() if k is not None}
+
+
+def read_births_text(text):
+    return read_births(io.StringIO(text))
+
+
+# -------------------------------------------------------------
+# WORKERS
+# -------------------------------------------------------------
+def chart_record(index, birth):
+    """One NDJSON record: echoed id/name + calc_full_table rows (or the error)."""
+    out = {"index": index}
+    if isinstance(birth, dict):
+        for k in ECHO_FIELDS:
+            if k in birth:
+                out[k] = birth[k]
+    try:
+        b = parse_birth_data(birth)
+        rows = calc_full_table(
+            b["year"], b["month"], b["day"], b["hour"], b["minute"], b["second"],
+            b["lat"], b["lon"], b["tz"], sid_mode_for(b["ayanamsa"]), debug=False
+        )
+        out["status"] = "ok"
+        out["rows"] = rows
+    except Exception as e:
+        out["status"] = "error"
+        out["message"] = str(e)
+    return out
+
+
+def _run_chunk(chunk):
+    return [chart_record(i, birth) for i, birth in chunk]
+
+
+def _init_worker():
+    # A forked worker inherits the parent's open ephemeris files and would
+    # share their seek offsets with it ("... .se1 is damaged"); reopen them.
+    swe.close()
+    swe.set_ephe_path(EPHE_PATH)
+
+
+_POOLS = {}
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool(workers, start_method=None):
+    """
+    Process pools are reused across batches (worker start-up is not free).
+    start_method: None = the platform default; "forkserver" / "spawn" for
+    callers that start the pool from a thread of a threaded process.
+    """
+    key = (workers, start_method)
+    with _POOL_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            ctx = multiprocessing.get_context(start_method) if start_method else None
+            pool = _POOLS[key] = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                                     initializer=_init_worker)
+        return pool
+
+
+@atexit.register
+def shutdown_pools():
+    with _POOL_LOCK:
+        for pool in _POOLS.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _POOLS.clear()
+
+
+def _chunks(births, size):
+    it = enumerate(births)
+    while True:
+        chunk = []
+        try:
+            chunk.extend(itertools.islice(it, size))
+        except Exception:
+            # unreadable input further down: still hand out what was read
+            if chunk:
+                yield chunk
+            raise
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate_batch(births, workers=None, chunksize=DEFAULT_CHUNK, start_method=None):
+    """
+    Yield chart records in input order. workers=None -> all cores;
+    workers=1 computes in this process (no pool, handy for small lists).
+    start_method is get_pool's ("forkserver" from a threaded server).
+    An input error is raised after the records read before it.
+    """
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    chunksize = max(1, int(chunksize))
+
+    if workers == 1:
+        for chunk in _chunks(births, chunksize):
+            yield from _run_chunk(chunk)
+        return
+
+    pool = get_pool(workers, start_method)
+    pending = deque()
+    try:
+        for chunk in _chunks(births, chunksize):
+            pending.append(pool.submit(_run_chunk, chunk))
+            if len(pending) >= workers * INFLIGHT_PER_WORKER:
+                yield from pending.popleft().result()
+    except Exception:
+        while pending:
+            yield from pending.popleft().result()
+        raise
+    while pending:
+        yield from pending.popleft().result()
+
+
+def generate_ndjson(births, workers=None, chunksize=DEFAULT_CHUNK, start_method=None):
+    for rec in generate_batch(births, workers, chunksize, start_method):
+        yield json.dumps(rec, ensure_ascii=False) + "\n"
+
+
+# -------------------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------------------
+def synthetic_births(n):
+    """Deterministic spread of births (1940–2019, all hours, a few cities)."""
+    places = [(13.0827, 80.2707, 5.5), (9.9252, 78.1198, 5.5),
+              (28.6139, 77.2090, 5.5), (1.3521, 103.8198, 8.0)]
+    for i in range(n):
+        lat, lon, tz = places[i % len(places)]
+        yield {
+            "id": i,
+            "year": 1940 + (i * 7) % 80, "month": 1 + (i * 5) % 12, "day": 1 + (i * 11) % 28,
+            "hour": (i * 13) % 24, "minute": (i * 17) % 60, "second": (i * 19) % 60,
+            "lat": lat, "lon": lon, "tz": tz,
+        }
+
+
+def benchmark(n=2000, max_workers=None, chunksize=DEFAULT_CHUNK):
+    """Charts/sec for 1, 2, 4, ... workers up to max_workers (default: cores)."""
+    max_workers = int(max_workers or os.cpu_count() or 1)
+    counts = sorted({w for w in (1, 2, 4, 8, 16, 32, 64) if w <= max_workers} | {max_workers})
+
+    results = []
+    for w in counts:
+        if w > 1:
+            # warm the pool so start-up is not billed to the first run
+            list(generate_batch(synthetic_births(w), w, 1))
+        t0 = time.perf_counter()
+        done = sum(1 for rec in generate_batch(synthetic_births(n), w, chunksize)
+                   if rec["status"] == "ok")
+        secs = time.perf_counter() - t0
+        results.append({
+            "workers": w, "charts": done, "seconds": round(secs, 3),
+            "charts_per_sec": round(done / secs, 1) if secs else None,
+        })
+    return results
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch rasi tables -> NDJSON")
+    ap.add_argument("input", nargs="?", default="-",
+                    help="JSON array / NDJSON / CSV file ('-' = stdin)")
+    ap.add_argument("-o", "--output", default="-", help="NDJSON output file ('-' = stdout)")
+    ap.add_argument("-w", "--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="births per worker task")
+    ap.add_argument("--bench", type=int, metavar="N", default=None,
+                    help="benchmark N synthetic charts against worker count")
+    args = ap.parse_args(argv)
+
+    if args.bench:
+        print(f"cores: {os.cpu_count()}  charts per run: {args.bench}", file=sys.stderr)
+        for r in benchmark(args.bench, args.workers, args.chunk):
+            print(f"workers={r['workers']:>3}  {r['charts_per_sec']:>10} charts/sec  "
+                  f"({r['charts']} in {r['seconds']}s)")
+        return 0
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8-sig", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    total = errors = 0
+    t0 = time.perf_counter()
+    try:
+        for rec in generate_batch(read_births(src), args.workers, args.chunk):
+            dst.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            total += 1
+            errors += rec["status"] != "ok"
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    secs = time.perf_counter() - t0
+    rate = f"{total / secs:.1f}" if secs else "-"
+    print(f"✅ {total} charts ({errors} errors) in {secs:.2f}s — {rate} charts/sec", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,8 @@ from app_stable_backup import calc_full_table
 from matching import calculate_marriage_compatibility, check_manglik_dosha
 import swisseph as swe
 import datetime
+from chart_snapshot import ayanamsa_ut
+from sun_times import sun_times, DISC_CENTER
 
 # --- CONSTANTS ---
 TAMIL_MONTHS = ["சித்திரை", "வைகாசி", "ஆனி", "ஆடி", "ஆவணி", "புரட்டாசி", "ஐப்பசி", "கார்த்திகை", "மார்கழி", "தை", "மாசி", "பங்குனி"]
@@ -36,20 +38,11 @@ def get_tamil_date_details(y, m, d):
 
 def get_rise_set(y, m, d, lat, lon, tz):
     try:
-        swe.set_topo(lon, lat, 0)
-        # Check from 12 AM UT of that day
-        jd_start = swe.julday(y, m, d, 0) - (tz / 24.0)
-        
-        # Flags for center disc
-        flags_rise = swe.CALC_RISE | swe.CALC_BIT_DISC_CENTER
-        flags_set = swe.CALC_SET | swe.CALC_BIT_DISC_CENTER
-        
-        rise = swe.rise_trans(jd_start, swe.SUN, lon, lat, flags_rise, 0, 0)
-        aset = swe.rise_trans(jd_start, swe.SUN, lon, lat, flags_set, 0, 0)
-        
-        def fmt(res):
-            if not res: return "-"
-            jd = res[1][0] if isinstance(res, tuple) and len(res) > 1 else res[0]
+        # Centre of the disc, from local midnight (shared cache, see sun_times.py)
+        sun = sun_times(y, m, d, lat, lon, tz, DISC_CENTER)
+
+        def fmt(jd):
+            if not jd: return "-"
             val = jd + (float(tz) / 24.0) + 0.5
             frac = val % 1.0
             h = int(frac * 24)
@@ -60,7 +53,7 @@ def get_rise_set(y, m, d, lat, lon, tz):
             if h_disp == 0: h_disp = 12
             return f"{h_disp:02d}:{mi:02d}:{s:02d} {p}"
 
-        return fmt(rise), fmt(aset)
+        return fmt(sun.rise), fmt(sun.set)
     except: return "-", "-"
 
 def calculate_dasha_details(moon_lon, dob_date):
@@ -139,8 +132,7 @@ def calculate_dasha_details(moon_lon, dob_date):
 
 def get_panchangam_details(jd_ut, lat, lon, y, m, d, tz):
     try:
-        swe.set_sid_mode(swe.SIDM_LAHIRI)
-        ayanamsa = swe.get_ayanamsa_ut(jd_ut)
+        ayanamsa = ayanamsa_ut(jd_ut, swe.SIDM_LAHIRI)
         res_sun = swe.calc_ut(jd_ut, swe.SUN); sun_lon = (res_sun[0][0] - ayanamsa) % 360
         res_moon = swe.calc_ut(jd_ut, swe.MOON); moon_lon = (res_moon[0][0] - ayanamsa) % 360
         
@@ -191,7 +183,7 @@ def get_dual_chart_data(boy_data, girl_data):
 
         panchang = get_panchangam_details(jd_ut, lat, lon, y, m, d, tz)
         
-        res_moon = swe.calc_ut(jd_ut, swe.MOON); moon_lon = (res_moon[0][0] - swe.get_ayanamsa_ut(jd_ut)) % 360
+        res_moon = swe.calc_ut(jd_ut, swe.MOON); moon_lon = (res_moon[0][0] - ayanamsa_ut(jd_ut, swe.SIDM_LAHIRI)) % 360
         star_idx = int(moon_lon / 13.3333333333) + 1; rasi_idx = int(moon_lon / 30) + 1
         lagna_row = next((r for r in rows if r["name"] == "லக்னம்"), {}); lagna_idx = lagna_row.get("rasi_no", 1)
 
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+chart_list.py — PAGED, FILTERED LISTING OF SAVED CHARTS
+-------------------------------------------------------
+/list_charts used to run SELECT * over the whole charts table, dragging
+every data_json blob into memory to throw it away. Here:
+
+- only the columns the list shows are read (LIST_COLUMNS, no data_json);
+- pages are keyset pages on id (after_id = older than, before_id = newer
+  than), so page 500 costs the same as page 1;
+- name prefix / tag / gender / date range / free text are filtered in SQL
+  (name prefix, tag and date ranges use indexes, free text q goes through
+  the charts_fts index from chart_search.py);
+- charts_version is a one-row counter bumped by triggers on every
+  insert/update/delete of charts. It makes the ETag (unchanged list ->
+  304 without touching the table) and keys the memoized totals, so the
+  COUNT(*) runs once per filter per change, not once per page.
+
+CLI
+    python chart_list.py --bench              # old full load vs one page, 100k charts
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import storage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHARTS_DB = os.path.join(BASE_DIR, "charts.db")
+
+LIST_COLUMNS = ("id", "name", "date", "time", "gender", "tag", "comment", "place_json",
+                "COALESCE(updated_at, saved_at) AS saved_on")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+COUNT_CACHE_SIZE = 64
+
+FILTER_KEYS = ("name", "tag", "gender", "date_from", "date_to", "q")
+
+
+# -------------------------------------------------------------
+# SCHEMA
+# -------------------------------------------------------------
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS charts_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO charts_version (id, version) VALUES (1, 1);
+    CREATE TRIGGER IF NOT EXISTS charts_version_ins AFTER INSERT ON charts
+        BEGIN UPDATE charts_version SET version = version + 1 WHERE id = 1; END;
+    CREATE TRIGGER IF NOT EXISTS charts_version_upd AFTER UPDATE ON charts
+        BEGIN UPDATE charts_version SET version = version + 1 WHERE id = 1; END;
+    CREATE TRIGGER IF NOT EXISTS charts_version_del AFTER DELETE ON charts
+        BEGIN UPDATE charts_version SET version = version + 1 WHERE id = 1; END;
+    CREATE INDEX IF NOT EXISTS idx_charts_name_nocase ON charts(name COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_charts_tag_nocase ON charts(tag COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_charts_date ON charts(date);
+"""
+
+
+def install(conn):
+    """Version counter, triggers and filter indexes (a charts.db migration, see migrations.py)."""
+    conn.executescript(_SCHEMA)
+    # planner statistics, so a name prefix beats a broad tag filter
+    conn.execute("ANALYZE charts")
+
+
+def ensure_schema(db_path=CHARTS_DB):
+    """install() on a standalone charts database (benchmark / CLI)."""
+    conn = storage.connect(db_path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='charts_version'").fetchone():
+            install(conn)
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def list_version(conn):
+    row = conn.execute("SELECT version FROM charts_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+# -------------------------------------------------------------
+# FILTERS
+# -------------------------------------------------------------
+def _text(v):
+    return "" if v is None else str(v).strip()
+
+
+def _like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _date(v, key):
+    v = _text(v)
+    if not v:
+        return ""
+    if len(v) == 4 and v.isdigit():
+        v += "-01-01" if key == "date_from" else "-12-31"
+    if len(v) != 10 or v[4] != "-" or v[7] != "-":
+        raise ValueError(f"{key} must be YYYY-MM-DD")
+    return v
+
+
+def parse_filters(args):
+    """Request args -> normalized filter dict (empty values dropped)."""
+    f = {k: _text(args.get(k)) for k in ("name", "tag", "gender", "q")}
+    f["date_from"] = _date(args.get("date_from"), "date_from")
+    f["date_to"] = _date(args.get("date_to"), "date_to")
+    return {k: f[k] for k in FILTER_KEYS if f[k]}
+
+
+def where_clause(filters):
+    """(sql, params) for the filter dict; sql is '' or 'WHERE ...'."""
+    conds, params = [], []
+    if filters.get("name"):
+        conds.append("name LIKE ? ESCAPE '\\'")
+        params.append(_like_escape(filters["name"]) + "%")
+    if filters.get("tag"):
+        conds.append("tag = ? COLLATE NOCASE")
+        params.append(filters["tag"])
+    if filters.get("gender"):
+        conds.append("gender = ? COLLATE NOCASE")
+        params.append(filters["gender"])
+    if filters.get("date_from"):
+        conds.append("date >= ?")
+        params.append(filters["date_from"])
+    if filters.get("date_to"):
+        conds.append("date <= ?")
+        params.append(filters["date_to"])
+    if filters.get("q"):
+        # full-text index (chart_search.py); words with no letters match everything
+        from chart_search import match_query
+        expr = match_query(filters["q"])
+        if expr:
+            conds.append("id IN (SELECT rowid FROM charts_fts WHERE charts_fts MATCH ?)")
+            params.append(expr)
+    return ("WHERE " + " AND ".join(conds)) if conds else "", params
+
+
+# -------------------------------------------------------------
+# QUERIES
+# -------------------------------------------------------------
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def _place(val):
+    if not val:
+        return {}
+    try:
+        place = json.loads(val)
+        return place if isinstance(place, dict) else {}
+    except (TypeError, ValueError):
+        return {}
+
+
+def row_dict(row):
+    return {
+        "id": row[0],
+        "name": row[1] or "",
+        "date": row[2] or "",
+        "time": row[3] or "",
+        "gender": row[4] or "",
+        "tag": row[5] or "",
+        "comment": row[6] or "",
+        "place_json": _place(row[7]),
+        "saved_on": row[8] or "-",
+    }
+
+
+def count_charts(conn, filters, version, db_path=CHARTS_DB):
+    """COUNT(*) for the filter, memoized until the charts table changes."""
+    key = (db_path, version, tuple(sorted(filters.items())))
+    with _counts_lock:
+        if key in _counts:
+            _counts.move_to_end(key)
+            return _counts[key]
+    where, params = where_clause(filters)
+    total = conn.execute(f"SELECT COUNT(*) FROM charts {where}", params).fetchone()[0]
+    with _counts_lock:
+        _counts[key] = total
+        while len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return total
+
+
+def list_page(conn, filters, after_id=None, before_id=None, limit=None):
+    """
+    One page, newest first. after_id -> ids below it (older), before_id ->
+    ids above it (newer). limit=None returns every match (old behaviour).
+    """
+    where, params = where_clause(filters)
+    cols = ", ".join(LIST_COLUMNS)
+    key_cond = ""
+    if after_id is not None:
+        key_cond, params = "id < ?", params + [int(after_id)]
+    elif before_id is not None:
+        key_cond, params = "id > ?", params + [int(before_id)]
+    if key_cond:
+        where = f"{where} AND {key_cond}" if where else f"WHERE {key_cond}"
+
+    if limit is None:
+        rows = conn.execute(f"SELECT {cols} FROM charts {where} ORDER BY id DESC", params).fetchall()
+        return [row_dict(r) for r in rows], False
+
+    # one extra row tells whether another page exists in that direction
+    order = "ASC" if before_id is not None else "DESC"
+    rows = conn.execute(f"SELECT {cols} FROM charts {where} ORDER BY id {order} LIMIT ?",
+                        params + [limit + 1]).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before_id is not None:
+        rows.reverse()
+    return [row_dict(r) for r in rows], more
+
+
+def parse_limit(value):
+    if value in (None, ""):
+        return None
+    return max(1, min(int(value), MAX_LIMIT))
+
+
+def etag_for(version, args):
+    """Weak validator for one listing: data version + the exact query."""
+    query = "&".join(f"{k}={args.get(k)}" for k in sorted(args.keys()))
+    return hashlib.sha1(f"{version}|{query}".encode("utf-8")).hexdigest()[:20]
+
+
+def list_charts(args, db_path=CHARTS_DB, conn=None):
+    """
+    Response dict for /list_charts. `args` is the request's query args.
+    Paging starts once `limit` (or a cursor) is given; total is included on
+    every paged response (memoized) and for unpaged ones.
+    """
+    filters = parse_filters(args)
+    limit = parse_limit(args.get("limit"))
+    after_id = _text(args.get("after_id")) or None
+    before_id = _text(args.get("before_id")) or None
+    if (after_id or before_id) and limit is None:
+        limit = DEFAULT_LIMIT
+
+    own = conn is None
+    conn = conn or storage.connect(db_path)
+    try:
+        version = list_version(conn)
+        charts, more = list_page(conn, filters, after_id, before_id, limit)
+        out = {"status": "ok", "charts": charts, "version": version}
+        if limit is None:
+            out["total"] = len(charts)
+            return out
+        out["total"] = count_charts(conn, filters, version, db_path)
+        out["limit"] = limit
+        ids = [c["id"] for c in charts]
+        going_newer = before_id is not None
+        # cursors for the neighbouring pages (None = nothing there)
+        older_more = more if not going_newer else bool(ids)
+        newer_more = more if going_newer else bool(after_id)
+        out["next_after_id"] = ids[-1] if ids and older_more else None
+        out["prev_before_id"] = ids[0] if ids and newer_more else None
+        if filters:
+            out["filters"] = filters
+        return out
+    finally:
+        if own:
+            conn.close()
+
+
+# -------------------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------------------
+def _bench_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE charts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, date TEXT, time TEXT,
+            place_json TEXT, ayanamsa TEXT, comment TEXT, data_json TEXT,
+            gender TEXT, tag TEXT, saved_at TEXT, updated_at TEXT
+        )
+    """)
+    blob = json.dumps({"html": "x" * 6000})
+    tags = ["Client", "Family", "Friend", "Celebrity"]
+    conn.executemany(
+        "INSERT INTO charts (name, date, time, place_json, ayanamsa, comment, data_json, gender, tag, updated_at) "
+        "VALUES (?, ?, '06:00:00', ?, 'lahiri', ?, ?, ?, ?, datetime('now'))",
+        [(f"Name{i:06d}", f"{1940 + i % 80}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+          '{"city": "Chennai", "lat": 13.08, "lon": 80.27, "tz": 5.5}', f"note {i}", blob,
+          "Male" if i % 2 else "Female", tags[i % 4]) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def benchmark(rows=100000):
+    folder = tempfile.mkdtemp(prefix="chart_list_bench_")
+    path = os.path.join(folder, "charts.db")
+    try:
+        _bench_db(path, rows)
+        ensure_schema(path)
+        conn = storage.connect(path)
+        try:
+            t0 = time.perf_counter()
+            full = conn.execute("SELECT * FROM charts ORDER BY id DESC").fetchall()
+            for r in full:
+                _place(r[4])
+            old = time.perf_counter() - t0
+            n_full = len(full)
+            del full
+
+            t0 = time.perf_counter()
+            first = list_charts({"limit": "100"}, path, conn)
+            first_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            deep = list_charts({"limit": "100", "after_id": str(rows // 2)}, path, conn)
+            deep_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            filt = list_charts({"limit": "100", "tag": "Family", "date_from": "1980", "name": "Name01"}, path, conn)
+            filt_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            list_charts({"limit": "100", "tag": "Family", "date_from": "1980", "name": "Name01",
+                         "after_id": str(filt["next_after_id"])}, path, conn)
+            filt_next_ms = (time.perf_counter() - t0) * 1000
+        finally:
+            conn.close()
+        return {
+            "rows": rows,
+            "old_full_load_s": round(old, 3), "old_rows": n_full,
+            "first_page_ms": round(first_ms, 2), "first_total": first["total"],
+            "page_after_half_ms": round(deep_ms, 2), "page_after_half_rows": len(deep["charts"]),
+            "filtered_first_page_ms": round(filt_ms, 2), "filtered_total": filt["total"],
+            "filtered_next_page_ms": round(filt_next_ms, 2),
+        }
+    finally:
+        storage.close_all()
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder, name))
+        os.rmdir(folder)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Paged listing of saved charts")
+    ap.add_argument("--bench", action="store_true", help="old full load vs keyset pages")
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--db", default=CHARTS_DB)
+    ap.add_argument("--limit", default="20")
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(benchmark(args.rows), indent=1))
+    else:
+        ensure_schema(args.db)
+        out = list_charts({"limit": args.limit}, args.db)
+        for c in out["charts"]:
+            print(c["id"], c["name"], c["date"], c["tag"])
+        print("total:", out["total"], "next_after_id:", out["next_after_id"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
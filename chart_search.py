@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+chart_search.py — FULL-TEXT SEARCH OVER SAVED CHARTS
+----------------------------------------------------
+charts_fts is an SQLite FTS5 index (rowid = charts.id) over the chart's
+name, tag, comment and place label (city / label / city_name from
+place_json). Triggers on charts keep it in step with every insert,
+update and delete, whichever route writes the row; the table, triggers
+and first fill are a charts.db migration (migrations.py).
+
+Tokens:
+- unicode61 folds case and Latin diacritics ("Café" = "cafe");
+- the Tamil vowel signs, virama and anusvara are declared token
+  characters, so "திண்டுக்கல்" is one token instead of a run of bare
+  consonants, and Tamil and English words can be mixed in one query;
+- every query word is a prefix ("sri vel" finds "Srileka, Vellore"),
+  served from the 2- and 3-character prefix indexes.
+
+Results are ranked by bm25 with the name weighted highest. bm25 costs a
+few µs per matching row and word, so a broad query ("ra", a common town)
+would spend 20+ ms at 100k charts scoring rows nobody scrolls to. When a
+query has more than RANK_WINDOW matches, only the newest RANK_WINDOW
+matches plus the newest RANK_WINDOW name matches are scored; walking the
+match list itself costs about a millisecond per word.
+
+CLI
+    python chart_search.py "sri vel"
+    python chart_search.py --bench            # 100k charts, query latency
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import storage
+from chart_list import CHARTS_DB, row_dict
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+MAX_TERMS = 8
+RANK_WINDOW = 300
+
+# name, tag, comment, place
+BM25_WEIGHTS = (10.0, 4.0, 1.0, 3.0)
+
+# Tamil dependent vowel signs, virama (U+0BCD), au length mark, anusvara
+TAMIL_MARKS = "".join(chr(c) for c in list(range(0x0BBE, 0x0BCE)) + [0x0BD7, 0x0B82])
+
+_TOKENIZE = f"unicode61 remove_diacritics 2 tokenchars '{TAMIL_MARKS}'"
+
+# Place label straight from place_json; rows holding "undefined" or other
+# non-JSON text just get an empty label instead of failing the write.
+_PLACE_LABEL = """CASE WHEN json_valid({col}) AND json_type({col}) = 'object'
+        THEN COALESCE(json_extract({col}, '$.city'), json_extract({col}, '$.label'),
+                      json_extract({col}, '$.city_name'), '')
+        ELSE '' END"""
+
+_SCHEMA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS charts_fts USING fts5(
+        name, tag, comment, place,
+        tokenize = "{_TOKENIZE}",
+        prefix = '2 3'
+    );
+    CREATE TRIGGER IF NOT EXISTS charts_fts_ins AFTER INSERT ON charts BEGIN
+        INSERT INTO charts_fts (rowid, name, tag, comment, place)
+        VALUES (new.id, COALESCE(new.name, ''), COALESCE(new.tag, ''), COALESCE(new.comment, ''),
+                {_PLACE_LABEL.format(col="new.place_json")});
+    END;
+    CREATE TRIGGER IF NOT EXISTS charts_fts_del AFTER DELETE ON charts BEGIN
+        DELETE FROM charts_fts WHERE rowid = old.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS charts_fts_upd AFTER UPDATE OF id, name, tag, comment, place_json ON charts BEGIN
+        DELETE FROM charts_fts WHERE rowid = old.id;
+        INSERT INTO charts_fts (rowid, name, tag, comment, place)
+        VALUES (new.id, COALESCE(new.name, ''), COALESCE(new.tag, ''), COALESCE(new.comment, ''),
+                {_PLACE_LABEL.format(col="new.place_json")});
+    END;
+"""
+
+
+# -------------------------------------------------------------
+# INDEX
+# -------------------------------------------------------------
+def rebuild(conn):
+    """Refill charts_fts from the charts table (caller commits)."""
+    conn.execute("DELETE FROM charts_fts")
+    conn.execute(f"""
+        INSERT INTO charts_fts (rowid, name, tag, comment, place)
+        SELECT id, COALESCE(name, ''), COALESCE(tag, ''), COALESCE(comment, ''),
+               {_PLACE_LABEL.format(col="place_json")}
+        FROM charts
+    """)
+    conn.execute("INSERT INTO charts_fts (charts_fts) VALUES ('optimize')")
+
+
+def install(conn):
+    """FTS table + triggers, filled from charts (a charts.db migration, see migrations.py)."""
+    conn.executescript(_SCHEMA)
+    rebuild(conn)
+
+
+def ensure_index(db_path=CHARTS_DB):
+    """install() on a standalone charts database (benchmark / CLI)."""
+    conn = storage.connect(db_path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='charts_fts'").fetchone():
+            install(conn)
+            conn.commit()
+    finally:
+        conn.close()
+
+
+# -------------------------------------------------------------
+# QUERIES
+# -------------------------------------------------------------
+def _is_token_char(ch):
+    return ch.isalnum() or ch in TAMIL_MARKS
+
+
+def query_terms(text):
+    """User text -> words, split the same way the tokenizer splits them."""
+    cleaned = "".join(ch if _is_token_char(ch) else " " for ch in str(text or ""))
+    return cleaned.split()[:MAX_TERMS]
+
+
+def match_query(text):
+    """
+    FTS5 MATCH expression: every word as a quoted prefix, all required.
+    Quoting keeps user input (AND, NEAR, '-', '"') from being read as syntax.
+    Returns '' when the text has no searchable words.
+    """
+    return " ".join(f'"{t}"*' for t in query_terms(text))
+
+
+def _rank_scope(conn, expr):
+    """(where, params) choosing which matches get scored (see RANK_WINDOW)."""
+    floor = conn.execute(
+        "SELECT rowid FROM charts_fts WHERE charts_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+        (expr, RANK_WINDOW - 1)).fetchone()
+    if floor is None:
+        return "charts_fts MATCH ?", [expr]
+    older_names = [r[0] for r in conn.execute(
+        "SELECT rowid FROM charts_fts WHERE charts_fts MATCH ? AND rowid < ? ORDER BY rowid DESC LIMIT ?",
+        (f"{{name}} : ({expr})", floor[0], RANK_WINDOW))]
+    return ("charts_fts MATCH ? AND (rowid >= ? OR rowid IN (SELECT value FROM json_each(?)))",
+            [expr, floor[0], json.dumps(older_names)])
+
+
+def search(q, limit=DEFAULT_LIMIT, db_path=CHARTS_DB, conn=None):
+    """Best matches first: [{id, name, date, ..., place_json, saved_on, score}]."""
+    expr = match_query(q)
+    if not expr:
+        return []
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    own = conn is None
+    conn = conn or storage.connect(db_path)
+    try:
+        where, params = _rank_scope(conn, expr)
+        rows = conn.execute(f"""
+            SELECT c.id, c.name, c.date, c.time, c.gender, c.tag, c.comment, c.place_json,
+                   COALESCE(c.updated_at, c.saved_at), s.score
+            FROM (SELECT rowid, bm25(charts_fts, {weights}) AS score
+                  FROM charts_fts WHERE {where}
+                  ORDER BY score, rowid DESC LIMIT ?) AS s
+            JOIN charts c ON c.id = s.rowid
+            ORDER BY s.score, c.id DESC
+        """, params + [limit]).fetchall()
+    finally:
+        if own:
+            conn.close()
+    out = []
+    for r in rows:
+        d = row_dict(r)
+        d["score"] = round(-r[9], 3)    # bm25 is negative; higher = better here
+        out.append(d)
+    return out
+
+
+# -------------------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------------------
+_SYLLABLES = ["ra", "ja", "ka", "vi", "sh", "na", "la", "ma", "pri", "sri", "an", "ku",
+              "mar", "de", "vi", "ya", "su", "bra", "ma", "ni", "th", "ar", "ul", "ga"]
+_CITIES = ["Chennai / சென்னை", "Madurai / மதுரை", "Vellore / வெள்ளூர்", "Coimbatore / கோயம்புத்தூர்",
+           "Dindigul / திண்டுக்கல்", "Tirunelveli", "Salem", "Bengaluru", "Trichy / திருச்சி"]
+_TAGS = ["Client", "Family", "Friend", "Celebrity", "Matching"]
+
+
+def _bench_db(path, rows, seed=7):
+    rnd = random.Random(seed)
+
+    def word():
+        return "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE charts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, date TEXT, time TEXT,
+            place_json TEXT, ayanamsa TEXT, comment TEXT, data_json TEXT,
+            gender TEXT, tag TEXT, saved_at TEXT, updated_at TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO charts (name, date, time, place_json, comment, tag, gender) VALUES (?, ?, '06:00:00', ?, ?, ?, ?)",
+        [(f"{word()} {word()}", f"{1940 + i % 80}-01-01",
+          json.dumps({"city": rnd.choice(_CITIES), "lat": 13.08, "lon": 80.27, "tz": 5.5}, ensure_ascii=False),
+          f"{rnd.choice(['marriage', 'career', 'health', 'came for matching', 'job change'])} {word()}",
+          rnd.choice(_TAGS), rnd.choice(["Male", "Female"])) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def benchmark(rows=100000, repeat=50):
+    folder = tempfile.mkdtemp(prefix="chart_search_bench_")
+    path = os.path.join(folder, "charts.db")
+    try:
+        _bench_db(path, rows)
+        t0 = time.perf_counter()
+        ensure_index(path)
+        build_s = time.perf_counter() - t0
+        queries = ["sri", "rajaku", "vel", "திண்டு", "kavi madurai", "client marriage", "ra", "zzz"]
+        conn = storage.connect(path)
+        try:
+            result = {"rows": rows, "index_build_s": round(build_s, 2), "queries": {}}
+            for q in queries:
+                n = len(search(q, 20, path, conn))
+                t0 = time.perf_counter()
+                for _ in range(repeat):
+                    search(q, 20, path, conn)
+                ms = (time.perf_counter() - t0) * 1000 / repeat
+                result["queries"][q] = {"ms": round(ms, 2), "results": n}
+            # trigger upkeep: one insert + update + delete
+            t0 = time.perf_counter()
+            cur = conn.execute("INSERT INTO charts (name, tag, place_json) VALUES ('Zzyva Test', 'Client', '{\"city\": \"Salem\"}')")
+            conn.execute("UPDATE charts SET comment = 'updated' WHERE id = ?", (cur.lastrowid,))
+            found = len(search("zzyva updated", 5, path, conn))
+            conn.execute("DELETE FROM charts WHERE id = ?", (cur.lastrowid,))
+            gone = len(search("zzyva", 5, path, conn))
+            conn.commit()
+            result["trigger_roundtrip_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            result["trigger_found_then_gone"] = [found, gone]
+        finally:
+            conn.close()
+        return result
+    finally:
+        storage.close_all()
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder, name))
+        os.rmdir(folder)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Full-text search over saved charts")
+    ap.add_argument("q", nargs="?", help="search text")
+    ap.add_argument("--db", default=CHARTS_DB)
+    ap.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    ap.add_argument("--rebuild", action="store_true", help="refill the index from charts")
+    ap.add_argument("--bench", action="store_true", help="query latency over 100k charts")
+    ap.add_argument("--rows", type=int, default=100000)
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(benchmark(args.rows), indent=1, ensure_ascii=False))
+        return 0
+    ensure_index(args.db)
+    if args.rebuild:
+        conn = storage.connect(args.db)
+        try:
+            rebuild(conn)
+            conn.commit()
+        finally:
+            conn.close()
+    if args.q:
+        for r in search(args.q, args.limit, args.db):
+            print(f"{r['score']:8.3f}  #{r['id']:<6} {r['name']}  [{r['tag']}]  {r['place_json'].get('city', '')}")
+    elif not args.rebuild:
+        ap.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+chart_snapshot.py — ONE EPHEMERIS PASS PER CHART
+------------------------------------------------
+Every calculator (rasi table, retrograde flags, karakas, KP, shadbala,
+padas, divisional charts, bhava) needs the same handful of numbers for the
+same moment: tropical longitude/speed of the grahas, the house cusps and the
+ayanamsa. This module computes them once per (JD, place, ayanamsa) and hands
+out an immutable ChartSnapshot that all modules read from.
+
+Tropical positions do not depend on the ayanamsa, so they are cached
+separately; switching a snapshot to another ayanamsa (KP wants Krishnamurti,
+the rest Lahiri) only costs a single get_ayanamsa call.
+
+THREAD SAFETY
+swisseph keeps the sidereal mode in process-global state. The ayanamsa is
+therefore an explicit parameter everywhere: sidereal values are computed as
+tropical - ayanamsa_ut(jd, sid_mode), and ayanamsa_ut() is the only place in
+the app that calls swe.set_sid_mode — it sets the mode and reads the value
+under one lock. Requests with different ayanamsas can run on different
+threads without leaking into each other.
+"""
+
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+import swisseph as swe
+
+DEFAULT_SID_MODE = swe.SIDM_LAHIRI
+
+# Front-end ayanamsa names -> swisseph sidereal modes
+AYANAMSA_MODES = {
+    "lahiri": swe.SIDM_LAHIRI,
+    "raman": swe.SIDM_RAMAN,
+    "kp": swe.SIDM_KRISHNAMURTI,
+    "yukteshwar": swe.SIDM_YUKTESHWAR,
+}
+
+# Sun..Saturn + mean node (Rahu). Ketu is always Rahu + 180.
+GRAHA_IDS = (
+    swe.SUN, swe.MOON, swe.MARS, swe.MERCURY,
+    swe.JUPITER, swe.VENUS, swe.SATURN, swe.MEAN_NODE
+)
+
+# Cache keys are rounded so that the slightly different JD arithmetic used by
+# the various routes (datetime vs. julday - tz/24) lands on the same entry.
+# 1e-8 day is below a millisecond.
+JD_PRECISION = 8
+GEO_PRECISION = 6
+
+
+def jd_ut_from_local(year, month, day, hour, minute, second, tz):
+    """Local civil time (tz offset in hours) -> Julian Day UT."""
+    return swe.julday(year, month, day, hour + minute / 60.0 + second / 3600.0) - tz / 24.0
+
+
+def sid_mode_for(name):
+    """'lahiri' / 'raman' / 'kp' / 'yukteshwar' -> swe.SIDM_*; unknown -> Lahiri."""
+    return AYANAMSA_MODES.get(str(name or "").strip().lower(), DEFAULT_SID_MODE)
+
+
+def _field(data, *keys, default=0):
+    """First non-blank value among keys (CSV cells arrive as '' when empty)."""
+    for k in keys:
+        v = data.get(k)
+        if v is not None and str(v).strip() != "":
+            return v
+    return default
+
+
+def parse_birth_data(data):
+    """
+    Read the birth fields every chart route accepts: either numeric
+    year/month/day/hour/minute/second or "date" ("YYYY-MM-DD") + "time"
+    ("HH:MM[:SS]"), plus lat/lon/tz/ayanamsa with the usual Chennai defaults.
+    """
+    if _field(data, "year", default=None) is not None and "month" in data and "day" in data:
+        year, month, day = int(data["year"]), int(data["month"]), int(data["day"])
+        hour, minute = int(_field(data, "hour")), int(_field(data, "minute"))
+        second = int(float(_field(data, "second", "seconds")))
+    elif _field(data, "date", default=None) is not None and "time" in data:
+        date_parts = str(data["date"]).strip().split("-")
+        time_parts = str(data["time"] or "").strip().split(":")
+        year, month, day = int(date_parts[0]), int(date_parts[1]), int(date_parts[2])
+        hour = int(time_parts[0]) if time_parts[0] else 0
+        minute = int(time_parts[1]) if len(time_parts) > 1 else 0
+        if len(time_parts) > 2:
+            second = int(float(time_parts[2]))
+        else:
+            second = int(float(_field(data, "seconds", "second")))
+    else:
+        raise ValueError("Missing or invalid date/time fields")
+
+    return {
+        "year": year, "month": month, "day": day,
+        "hour": hour, "minute": minute, "second": second,
+        "lat": float(_field(data, "lat", default=13.0827)),
+        "lon": float(_field(data, "lon", default=80.2707)),
+        "tz": float(_field(data, "tz", default=5.5)),
+        "ayanamsa": str(_field(data, "ayanamsa", default="lahiri")).strip().lower(),
+    }
+
+
+def _normalize(deg):
+    return deg % 360.0
+
+
+class ChartSnapshot(namedtuple("ChartSnapshot", [
+    "jd_ut", "lat", "lon", "sid_mode",
+    "ayanamsa",        # mean ayanamsa (swe.get_ayanamsa_ut)
+    "true_ayanamsa",   # with nutation — what houses_ex(FLG_SIDEREAL) subtracts
+    "bodies",          # {pid: (lon, lat, dist, speed_lon, ...)} tropical
+    "cusps",           # 12 tropical Placidus cusps (empty without a place)
+    "ascmc",           # tropical ascmc tuple (empty without a place)
+])):
+    """Immutable view of every ephemeris value a chart needs."""
+    __slots__ = ()
+
+    # ---- planets ----
+    def trop_lon(self, pid):
+        return self.bodies[pid][0]
+
+    def speed(self, pid):
+        return self.bodies[pid][3]
+
+    def sid_lon(self, pid):
+        return _normalize(self.bodies[pid][0] - self.ayanamsa)
+
+    def ketu_sid(self):
+        return _normalize(self.sid_lon(swe.MEAN_NODE) + 180.0)
+
+    def is_retro(self, pid):
+        return self.speed(pid) < 0
+
+    # ---- houses ----
+    def has_houses(self):
+        return bool(self.ascmc)
+
+    @property
+    def asc_trop(self):
+        return self.ascmc[0]
+
+    @property
+    def asc_sid(self):
+        """Sidereal ascendant (tropical - mean ayanamsa), as calc_full_table does it."""
+        return _normalize(self.ascmc[0] - self.ayanamsa)
+
+    def cusps_sid(self):
+        return tuple(_normalize(c - self.ayanamsa) for c in self.cusps)
+
+    def sidereal_houses(self):
+        """
+        Same numbers as swe.houses_ex(jd, lat, lon, b'P', swe.FLG_SIDEREAL):
+        returns (cusps, asc, mc) shifted by the true ayanamsa.
+        """
+        ay = self.true_ayanamsa
+        cusps = tuple(_normalize(c - ay) for c in self.cusps)
+        return cusps, _normalize(self.ascmc[0] - ay), _normalize(self.ascmc[1] - ay)
+
+    # ---- derived snapshots ----
+    def with_sid_mode(self, sid_mode):
+        if sid_mode == self.sid_mode:
+            return self
+        return get_snapshot(self.jd_ut, self.lat, self.lon, sid_mode)
+
+
+@lru_cache(maxsize=512)
+def _tropical(jd_ut, lat, lon):
+    bodies = {}
+    for pid in GRAHA_IDS:
+        res = swe.calc_ut(jd_ut, pid)
+        bodies[pid] = tuple(float(x) for x in res[0])
+
+    cusps, ascmc = (), ()
+    if lat is not None and lon is not None:
+        c, a = swe.houses_ex(jd_ut, lat, lon, b'P')
+        cusps, ascmc = tuple(c), tuple(a)
+    return MappingProxyType(bodies), cusps, ascmc
+
+
+_SID_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=4096)
+def _ayanamsa(jd_ut, sid_mode):
+    with _SID_LOCK:
+        swe.set_sid_mode(sid_mode)
+        mean = float(swe.get_ayanamsa_ut(jd_ut))
+        true = float(swe.get_ayanamsa_ex_ut(jd_ut, 0)[1])
+    return mean, true
+
+
+def ayanamsa_ut(jd_ut, sid_mode=DEFAULT_SID_MODE, true=False):
+    """
+    Ayanamsa for jd_ut in the given sidereal mode, without leaving the
+    global swisseph mode in a state anyone else depends on.
+    true=False -> mean value (swe.get_ayanamsa_ut), True -> with nutation.
+    """
+    mean, true_val = _ayanamsa(float(jd_ut), sid_mode)
+    return true_val if true else mean
+
+
+def sidereal_lon(jd_ut, pid, sid_mode=DEFAULT_SID_MODE):
+    """Sidereal longitude of one body (tropical calc_ut - mean ayanamsa)."""
+    return _normalize(swe.calc_ut(jd_ut, pid)[0][0] - ayanamsa_ut(jd_ut, sid_mode))
+
+
+def sidereal_asc(jd_ut, lat, lon, sid_mode=DEFAULT_SID_MODE):
+    """Sidereal Placidus ascendant (tropical - mean ayanamsa)."""
+    _, ascmc = swe.houses(jd_ut, lat, lon, b'P')
+    return _normalize(ascmc[0] - ayanamsa_ut(jd_ut, sid_mode))
+
+
+@lru_cache(maxsize=512)
+def _snapshot(jd_ut, lat, lon, sid_mode):
+    bodies, cusps, ascmc = _tropical(jd_ut, lat, lon)
+    mean, true = _ayanamsa(jd_ut, sid_mode)
+    return ChartSnapshot(jd_ut, lat, lon, sid_mode, mean, true, bodies, cusps, ascmc)
+
+
+def get_snapshot(jd_ut, lat=None, lon=None, sid_mode=DEFAULT_SID_MODE):
+    """Return the (cached) snapshot for this moment, place and ayanamsa."""
+    jd_ut = round(float(jd_ut), JD_PRECISION)
+    if lat is not None and lon is not None:
+        lat = round(float(lat), GEO_PRECISION)
+        lon = round(float(lon), GEO_PRECISION)
+    else:
+        lat = lon = None
+    return _snapshot(jd_ut, lat, lon, sid_mode)
+
+
+def snapshot_from_local(year, month, day, hour, minute, second, lat, lon, tz,
+                        sid_mode=DEFAULT_SID_MODE):
+    jd_ut = jd_ut_from_local(year, month, day, hour, minute, second, tz)
+    return get_snapshot(jd_ut, lat, lon, sid_mode)
+
+
+def as_snapshot(jd_or_snap, lat=None, lon=None, sid_mode=None):
+    """
+    Accept either a ChartSnapshot or a raw JD (older callers) and return a
+    snapshot in the requested ayanamsa. sid_mode=None keeps the snapshot's
+    own mode (or the default for a raw JD).
+    """
+    if isinstance(jd_or_snap, ChartSnapshot):
+        snap = jd_or_snap
+        if sid_mode is not None:
+            snap = snap.with_sid_mode(sid_mode)
+        if lat is not None and lon is not None and not snap.has_houses():
+            snap = get_snapshot(snap.jd_ut, lat, lon, snap.sid_mode)
+        return snap
+    return get_snapshot(jd_or_snap, lat, lon,
+                        DEFAULT_SID_MODE if sid_mode is None else sid_mode)
+
+
+def cache_info():
+    return {
+        "tropical": _tropical.cache_info()._asdict(),
+        "ayanamsa": _ayanamsa.cache_info()._asdict(),
+        "snapshot": _snapshot.cache_info()._asdict(),
+    }
+
+
+def clear_caches():
+    _tropical.cache_clear()
+    _ayanamsa.cache_clear()
+    _snapshot.cache_clear()
+
+
+def _concurrency_check(threads=8, rounds=300):
+    """
+    Hammer Lahiri and KP snapshots from several threads at once and compare
+    every result with a serial reference. Returns the number of mismatches.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    modes = (swe.SIDM_LAHIRI, swe.SIDM_KRISHNAMURTI, swe.SIDM_RAMAN)
+    jobs = [(2440000.5 + i * 37.123, modes[i % len(modes)]) for i in range(rounds)]
+
+    clear_caches()
+    expected = [get_snapshot(jd, 13.0827, 80.2707, m).sid_lon(swe.MOON) for jd, m in jobs]
+    clear_caches()
+
+    def work(job):
+        jd, mode = job
+        return get_snapshot(jd, 13.0827, 80.2707, mode).sid_lon(swe.MOON)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        got = list(pool.map(work, jobs))
+    return sum(1 for e, g in zip(expected, got) if abs(e - g) > 1e-9)
+
+
+if __name__ == "__main__":
+    snap = snapshot_from_local(2025, 10, 23, 18, 0, 0, 13.0827, 80.2707, 5.5)
+    print("JD", snap.jd_ut, "ayanamsa", round(snap.ayanamsa, 6))
+    print("Moon", round(snap.sid_lon(swe.MOON), 6), "Asc", round(snap.asc_sid, 6))
+    kp = snap.with_sid_mode(swe.SIDM_KRISHNAMURTI)
+    print("KP Moon", round(kp.sid_lon(swe.MOON), 6))
+    print(cache_info())
+
+    bad = _concurrency_check()
+    print("🧵 concurrent ayanamsa check:", "OK" if bad == 0 else f"{bad} mismatches")
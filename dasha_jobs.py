@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+dasha_jobs.py — BACKGROUND DASHA REBUILDS
+-----------------------------------------
+Re-indexing the saved charts' dashas (dasha_store.py) runs as a background
+job instead of inside one HTTP request:
+
+- charts are planned against the stored input hashes, so a "sync" job only
+  computes new or changed charts ("full" recomputes every chart);
+- periods are computed in the process pool from batch_charts.py, a chunk
+  of charts per task;
+- results are written WRITE_BATCH charts per transaction (executemany);
+- progress is a row in dasha_jobs (dasha.db), so every gunicorn worker can
+  report it, and the runner looks for a cancel request after each batch;
+- charts go in id order and the last written id is kept, so a cancelled,
+  failed or interrupted job resumes where it stopped.
+
+One job runs at a time; starting another returns the running one.
+
+CLI
+    python dasha_jobs.py                 # incremental sync with progress
+    python dasha_jobs.py --full -w 4     # recompute everything on 4 cores
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+import dasha_store
+from batch_charts import get_pool, INFLIGHT_PER_WORKER
+
+CHUNK = 25                       # charts per worker task
+WRITE_BATCH = dasha_store.WRITE_BATCH
+STALE_SECONDS = 120              # "running" without a heartbeat this long = interrupted
+KINDS = ("sync", "full")
+# Jobs start their pool from a daemon thread of a threaded web worker; a
+# plain fork there can inherit a lock another thread holds (_SID_LOCK, the
+# storage pool) and hang. Workers come from a clean fork server instead.
+START_METHOD = "forkserver"
+RESUMABLE = ("cancelled", "failed", "interrupted")
+
+_lock = threading.Lock()
+_threads = {}
+
+
+# -------------------------------------------------------------
+# JOB TABLE
+# -------------------------------------------------------------
+def create_schema(conn):
+    """Job table (a dasha.db migration, see migrations.py; idempotent)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dasha_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            workers INTEGER,
+            total INTEGER DEFAULT 0,
+            processed INTEGER DEFAULT 0,
+            indexed INTEGER DEFAULT 0,
+            unchanged INTEGER DEFAULT 0,
+            removed INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            last_chart_id INTEGER DEFAULT 0,
+            cancel_requested INTEGER DEFAULT 0,
+            message TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat REAL
+        )
+    """)
+
+
+_schema_ready = set()
+
+
+def _db(db_path=None):
+    conn = dasha_store.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    path = os.path.abspath(db_path or dasha_store.STORE_DB)
+    if path not in _schema_ready:
+        create_schema(conn)
+        conn.commit()
+        _schema_ready.add(path)
+    return conn
+
+
+def _effective_status(row):
+    if row["status"] in ("queued", "running"):
+        alive = _threads.get(row["id"])
+        if alive is not None and alive.is_alive():
+            return row["status"]
+        if time.time() - (row["heartbeat"] or 0) > STALE_SECONDS:
+            return "interrupted"   # the process running it went away
+    return row["status"]
+
+
+def _job_dict(row):
+    job = dict(row)
+    job["status"] = _effective_status(row)
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    job.pop("heartbeat", None)
+    job["percent"] = round(100.0 * job["processed"] / job["total"], 1) if job["total"] else (
+        100.0 if job["status"] == "done" else 0.0)
+    return job
+
+
+def get_job(job_id, db_path=None):
+    conn = _db(db_path)
+    try:
+        row = conn.execute("SELECT * FROM dasha_jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _job_dict(row) if row else None
+
+
+def list_jobs(limit=20, db_path=None):
+    conn = _db(db_path)
+    try:
+        rows = conn.execute("SELECT * FROM dasha_jobs ORDER BY id DESC LIMIT ?", (int(limit),)).fetchall()
+    finally:
+        conn.close()
+    return [_job_dict(r) for r in rows]
+
+
+def _active_job(conn):
+    for row in conn.execute("SELECT * FROM dasha_jobs WHERE status IN ('queued', 'running') ORDER BY id"):
+        if _effective_status(row) != "interrupted":
+            return row
+    return None
+
+
+# -------------------------------------------------------------
+# START / CANCEL / RESUME
+# -------------------------------------------------------------
+def _workers(workers):
+    """Requested process count, 1 .. os.cpu_count()."""
+    return min(max(1, int(workers)), os.cpu_count() or 1)
+
+
+def _spawn(job_id, charts_db, db_path):
+    t = threading.Thread(target=run_job, args=(job_id, charts_db, db_path),
+                         name=f"dasha-job-{job_id}", daemon=True)
+    _threads[job_id] = t
+    t.start()
+
+
+def start_job(kind="sync", workers=None, charts_db=None, db_path=None, background=True):
+    """(job, started) — started is False when another job is already running."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+    workers = _workers(workers or os.cpu_count() or 1)
+    with _lock:
+        conn = _db(db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")   # one check-and-insert across processes too
+            active = _active_job(conn)
+            if active is not None:
+                conn.rollback()
+                return _job_dict(active), False
+            job_id = conn.execute(
+                "INSERT INTO dasha_jobs (kind, status, workers, heartbeat) VALUES (?, 'queued', ?, ?)",
+                (kind, workers, time.time())).lastrowid
+            conn.commit()
+        finally:
+            conn.close()
+        if background:
+            _spawn(job_id, charts_db, db_path)
+    if not background:
+        run_job(job_id, charts_db, db_path)
+    return get_job(job_id, db_path), True
+
+
+def cancel_job(job_id, db_path=None):
+    job = get_job(job_id, db_path)
+    if job is None:
+        raise ValueError(f"Job {job_id} not found")
+    conn = _db(db_path)
+    try:
+        with conn:
+            if job["status"] in ("queued", "running"):
+                conn.execute("UPDATE dasha_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            elif job["status"] == "interrupted":
+                conn.execute("UPDATE dasha_jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP "
+                             "WHERE id = ?", (job_id,))
+    finally:
+        conn.close()
+    return get_job(job_id, db_path)
+
+
+def resume_job(job_id, workers=None, charts_db=None, db_path=None):
+    """Continue a cancelled / failed / interrupted job after its last written chart."""
+    with _lock:
+        conn = _db(db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM dasha_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.rollback()
+                raise ValueError(f"Job {job_id} not found")
+            status = _effective_status(row)
+            if status not in RESUMABLE:
+                conn.rollback()
+                raise ValueError(f"Job {job_id} is {status}, not resumable")
+            active = _active_job(conn)
+            if active is not None and active["id"] != job_id:
+                conn.rollback()
+                raise ValueError(f"Job {active['id']} is still running")
+            conn.execute("""
+                UPDATE dasha_jobs SET status = 'queued', cancel_requested = 0, message = NULL,
+                       finished_at = NULL, workers = COALESCE(?, workers), heartbeat = ?
+                WHERE id = ?
+            """, (_workers(workers) if workers else None, time.time(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+        _spawn(job_id, charts_db, db_path)
+    return get_job(job_id, db_path)
+
+
+# -------------------------------------------------------------
+# RUNNER
+# -------------------------------------------------------------
+def _compute_chunk(items, depth):
+    return [dasha_store.compute_chart(cid, birth, depth) for cid, birth in items]
+
+
+def _computed_batches(todo, workers, depth=dasha_store.STORE_DEPTH):
+    """Yield lists of compute_chart results, in chart id order, WRITE_BATCH at a time."""
+    workers = _workers(workers)
+    if workers == 1:
+        for i in range(0, len(todo), WRITE_BATCH):
+            yield _compute_chunk(todo[i:i + WRITE_BATCH], depth)
+        return
+
+    pool = get_pool(workers, START_METHOD)
+    chunks = iter([todo[i:i + CHUNK] for i in range(0, len(todo), CHUNK)])
+    pending = deque()
+    ready = []
+    try:
+        while True:
+            while len(pending) < workers * INFLIGHT_PER_WORKER:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(pool.submit(_compute_chunk, chunk, depth))
+            if not pending:
+                break
+            ready.extend(pending.popleft().result())
+            if len(ready) >= WRITE_BATCH:
+                yield ready
+                ready = []
+        if ready:
+            yield ready
+    finally:
+        for f in pending:
+            f.cancel()
+
+
+def run_job(job_id, charts_db=None, db_path=None):
+    """Run (or continue) a job in this thread. Progress goes to its row."""
+    conn = _db(db_path)
+    try:
+        job = conn.execute("SELECT * FROM dasha_jobs WHERE id = ?", (job_id,)).fetchone()
+        resuming = job["last_chart_id"] > 0
+        with conn:
+            conn.execute("""
+                UPDATE dasha_jobs SET status = 'running', heartbeat = ?,
+                       started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+                WHERE id = ?
+            """, (time.time(), job_id))
+
+        births = dasha_store.load_chart_births(charts_db)
+        todo, unchanged, bad, gone = dasha_store.plan(conn, births, force=job["kind"] == "full")
+        if resuming:
+            todo = [t for t in todo if t[0] > job["last_chart_id"]]
+            with conn:
+                conn.execute("UPDATE dasha_jobs SET total = processed + ? WHERE id = ?",
+                             (len(todo), job_id))
+        else:
+            if gone:
+                dasha_store.remove_charts(conn, gone)
+            with conn:
+                conn.execute("""
+                    UPDATE dasha_jobs SET total = ?, unchanged = ?, errors = ?, removed = ?
+                    WHERE id = ?
+                """, (len(todo), unchanged, bad, len(gone), job_id))
+
+        status = "done"
+        for results in _computed_batches(todo, job["workers"] or 1):
+            ok = [r for r in results if "rows" in r]
+            dasha_store.write_results(conn, ok)
+            with conn:
+                conn.execute("""
+                    UPDATE dasha_jobs SET processed = processed + ?, indexed = indexed + ?,
+                           errors = errors + ?, last_chart_id = ?, heartbeat = ?
+                    WHERE id = ?
+                """, (len(results), len(ok), len(results) - len(ok),
+                      results[-1]["chart_id"], time.time(), job_id))
+            if conn.execute("SELECT cancel_requested FROM dasha_jobs WHERE id = ?",
+                            (job_id,)).fetchone()[0]:
+                status = "cancelled"
+                break
+
+        with conn:
+            conn.execute("UPDATE dasha_jobs SET status = ?, finished_at = CURRENT_TIMESTAMP, "
+                         "heartbeat = ? WHERE id = ?", (status, time.time(), job_id))
+    except Exception as e:
+        with conn:
+            conn.execute("UPDATE dasha_jobs SET status = 'failed', message = ?, "
+                         "finished_at = CURRENT_TIMESTAMP, heartbeat = ? WHERE id = ?",
+                         (str(e), time.time(), job_id))
+    finally:
+        conn.close()
+        _threads.pop(job_id, None)
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Rebuild the materialized dasha store")
+    ap.add_argument("--full", action="store_true", help="recompute every chart, not just changed ones")
+    ap.add_argument("-w", "--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--resume", type=int, metavar="JOB_ID", default=None)
+    ap.add_argument("--list", action="store_true", help="show recent jobs")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        for j in list_jobs():
+            print(f"#{j['id']:<4} {j['kind']:5s} {j['status']:12s} {j['processed']}/{j['total']} "
+                  f"indexed={j['indexed']} errors={j['errors']} {j['created_at']}")
+        return 0
+
+    if args.resume:
+        job = resume_job(args.resume, args.workers)
+    else:
+        job, started = start_job("full" if args.full else "sync", args.workers)
+        if not started:
+            print(f"Job #{job['id']} is already running", file=sys.stderr)
+    t0 = time.perf_counter()
+    while True:
+        job = get_job(job["id"])
+        print(f"\r#{job['id']} {job['status']:10s} {job['processed']}/{job['total']} "
+              f"({job['percent']}%)", end="", file=sys.stderr)
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.5)
+    print(f"\n✅ {job['indexed']} indexed, {job['unchanged']} unchanged, {job['removed']} removed, "
+          f"{job['errors']} errors in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 0 if job["status"] == "done" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,576 @@
+# -*- coding: utf-8 -*-
+"""
+dasha_store.py — MATERIALIZED VIMSHOTTARI PERIODS FOR ALL SAVED CHARTS
+----------------------------------------------------------------------
+Every saved chart's Vimshottari periods, down to STORE_DEPTH levels
+(Mahadasha / Bhukti / Antara by default), are kept in dasha.db so that
+questions across charts — "who is running Saturn–Rahu between 2026-01 and
+2026-06" — are one index lookup instead of a recompute per chart.
+
+Tables (dasha.db, next to the old `dashas` table)
+    dasha_charts   one row per indexed chart: input hash, depth, tz
+    dasha_periods  sorted-interval table, clustered on (code, start_jd):
+                   code is the lord path (see path_code), so all charts'
+                   Saturn–Rahu Bhuktis sit next to each other ordered by start.
+
+A given lord path always lasts the same number of days (120 years times
+the product of its period shares), so "overlaps [a, b)" is exactly
+"starts in (a - duration, b)" — one index range scan per path, touching
+only the matches.
+
+A chart is re-indexed only when its birth data (or STORE_DEPTH /
+STORE_VERSION) changes — see birth_hash().
+
+CLI
+    python dasha_store.py --sync                  # index new/changed charts
+    python dasha_store.py --find Saturn-Rahu --from 2026-01 --to 2026-06
+    python dasha_store.py --bench 20000           # synthetic store + query timing
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import swisseph as swe
+
+import payload_codec
+import storage
+from app_stable_backup import EPHE_PATH   # noqa: F401 — sets the app's ephemeris path
+from chart_snapshot import parse_birth_data, sid_mode_for
+from vimshottari import (VIM_ORDER, VIM_PERIOD, LEVEL_NAMES, MAX_DEPTH, CYCLE_YEARS, DAYS_PER_YEAR,
+                         DashaTree, dasha_tree, jd_from_local, jd_to_local_iso)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DB = os.path.join(BASE_DIR, "dasha.db")
+CHARTS_DB = os.path.join(BASE_DIR, "charts.db")
+
+# Levels kept per chart (2 = Bhukti, 3 = Antara: 819 periods/chart, ...)
+STORE_DEPTH = max(2, min(int(os.environ.get("DASHA_STORE_DEPTH", 3)), MAX_DEPTH))
+# Bump when the stored periods change meaning (forces a re-index)
+STORE_VERSION = 1
+
+CODE_DIGITS = MAX_DEPTH
+WRITE_BATCH = 200                # charts per transaction in sync()
+
+LORD_ALIASES = {"sat": "Saturn", "sani": "Saturn", "jup": "Jupiter", "guru": "Jupiter",
+                "mer": "Mercury", "budha": "Mercury", "ven": "Venus", "sukra": "Venus",
+                "chandra": "Moon", "surya": "Sun", "mangal": "Mars", "kuja": "Mars"}
+
+
+# -------------------------------------------------------------
+# SCHEMA
+# -------------------------------------------------------------
+def create_schema(conn):
+    """Store tables (a dasha.db migration, see migrations.py; idempotent)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dasha_charts (
+            chart_id INTEGER PRIMARY KEY,
+            input_hash TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            tz REAL NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dasha_periods (
+            code INTEGER NOT NULL,
+            start_jd REAL NOT NULL,
+            chart_id INTEGER NOT NULL,
+            end_jd REAL NOT NULL,
+            PRIMARY KEY (code, start_jd, chart_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dasha_periods_chart ON dasha_periods(chart_id)")
+    # the original Mahadasha-only table, still read by /get_dasha_v2
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dashas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chart_id INTEGER,
+            level TEXT,
+            planet TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            duration REAL,
+            raw_json TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dashas_chart ON dashas(chart_id)")
+
+
+_schema_ready = set()
+
+
+def connect(db_path=None):
+    """Pooled connection; the schema is checked once per file per process."""
+    path = os.path.abspath(db_path or STORE_DB)
+    conn = storage.connect(path)
+    if path not in _schema_ready:
+        create_schema(conn)
+        conn.commit()
+        _schema_ready.add(path)
+    return conn
+
+
+# -------------------------------------------------------------
+# LORD PATHS
+# -------------------------------------------------------------
+def path_code(lords):
+    """
+    Lord indices (outermost first) -> integer with one decimal digit per level
+    (index + 1), zero-padded to CODE_DIGITS: Saturn–Rahu -> 860000.
+    """
+    code = 0
+    for k, lord in enumerate(lords):
+        code += (lord + 1) * 10 ** (CODE_DIGITS - 1 - k)
+    return code
+
+
+def code_lords(code):
+    """Inverse of path_code, as lord names."""
+    return [VIM_ORDER[int(ch) - 1] for ch in str(int(code)).zfill(CODE_DIGITS) if ch != "0"]
+
+
+def path_days(lords):
+    """Length of any period with this lord path (the same in every chart)."""
+    days = CYCLE_YEARS * DAYS_PER_YEAR
+    for lord in lords:
+        days *= VIM_PERIOD[VIM_ORDER[lord]] / CYCLE_YEARS
+    return days
+
+
+def parse_lords(text):
+    """'Saturn-Rahu', 'saturn / rahu', ['Sat', 'Rahu'] -> [7, 5]."""
+    if isinstance(text, str):
+        for sep in ("–", "—", "/", ",", ">", "→"):
+            text = text.replace(sep, "-")
+        parts = [p for p in text.replace(" ", "-").split("-") if p]
+    else:
+        parts = [str(p) for p in (text or [])]
+    if not parts:
+        raise ValueError("No dasha lords given")
+    if len(parts) > MAX_DEPTH:
+        raise ValueError(f"At most {MAX_DEPTH} lords")
+    names = {n.lower(): i for i, n in enumerate(VIM_ORDER)}
+    out = []
+    for p in parts:
+        key = p.strip().lower()
+        key = LORD_ALIASES.get(key, key).lower()
+        if key not in names:
+            raise ValueError(f"Unknown dasha lord: {p}")
+        out.append(names[key])
+    return out
+
+
+# -------------------------------------------------------------
+# CHART -> PERIOD ROWS
+# -------------------------------------------------------------
+def _json_dict(val):
+    try:
+        out = payload_codec.decode(val, {})
+        return out if isinstance(out, dict) else {}
+    except Exception:
+        return {}
+
+
+def _blank(val):
+    # the browser has saved "undefined" for places picked before the list loaded
+    return val is None or str(val).strip() in ("", "undefined", "null", "None")
+
+
+def chart_birth(row):
+    """Birth fields of a charts-table row (sqlite3.Row or dict), for parse_birth_data."""
+    row = dict(row)
+    place = _json_dict(row.get("place_json"))
+    typed = {k: row.get(k) for k in ("lat", "lon", "tz")}
+    lacking = _blank(place.get("lat")) and _blank(typed["lat"])
+    data = _json_dict(row.get("data_json")) if lacking else {}
+
+    def pick(key):
+        for src in (place, typed, data):
+            if not _blank(src.get(key)):
+                return src[key]
+        return None
+
+    return {
+        "date": row.get("date"), "time": row.get("time"), "seconds": row.get("seconds"),
+        "lat": pick("lat"), "lon": pick("lon"), "tz": pick("tz"),
+        "ayanamsa": row.get("ayanamsa") or "lahiri",
+    }
+
+
+def birth_columns(row):
+    """
+    Values for the typed charts columns lat, lon, tz, jd (JD UT of birth),
+    from the same fields chart_birth() reads; None where the chart has none.
+    """
+    b = chart_birth(row)
+    out = {}
+    for k in ("lat", "lon", "tz"):
+        try:
+            out[k] = None if _blank(b[k]) else float(b[k])
+        except (TypeError, ValueError):
+            out[k] = None
+    try:
+        p = parse_birth_data(b)
+        out["jd"] = jd_from_local(p["year"], p["month"], p["day"],
+                                  p["hour"], p["minute"], p["second"], p["tz"])
+    except Exception:
+        out["jd"] = None
+    return out
+
+
+_BIRTH_SOURCE = ("id", "date", "time", "seconds", "ayanamsa", "place_json", "data_json")
+
+
+def fill_birth_columns(conn, missing_only=True):
+    """
+    Write the typed lat / lon / tz / jd columns of charts rows from their
+    text fields (all rows, or only those without a jd yet) -> rows updated.
+    Rows with nothing to fill are left alone, so charts_version stays put.
+    """
+    where = "WHERE jd IS NULL" if missing_only else ""
+    rows = conn.execute(f"SELECT {', '.join(_BIRTH_SOURCE)} FROM charts {where}").fetchall()
+    updates = []
+    for r in rows:
+        cols = birth_columns(dict(zip(_BIRTH_SOURCE, r)))
+        if not missing_only or any(v is not None for v in cols.values()):
+            updates.append(dict(cols, id=r[0]))
+    conn.executemany("UPDATE charts SET lat = :lat, lon = :lon, tz = :tz, jd = :jd WHERE id = :id", updates)
+    return len(updates)
+
+
+def birth_hash(b, depth=STORE_DEPTH):
+    """Hash of everything the stored periods depend on (b from parse_birth_data)."""
+    key = "|".join(str(b[k]) for k in ("year", "month", "day", "hour", "minute", "second",
+                                        "lat", "lon", "tz", "ayanamsa"))
+    return hashlib.sha1(f"v{STORE_VERSION}|d{depth}|{key}".encode()).hexdigest()
+
+
+def period_rows(chart_id, tree, depth):
+    """(code, start_jd, chart_id, end_jd) rows for the first `depth` levels of a DashaTree."""
+    rows = []
+    codes = [0]
+    for k in range(depth):
+        place = 10 ** (CODE_DIGITS - 1 - k)
+        starts, ends, lords = tree.starts[k], tree.ends[k], tree.lords[k]
+        codes = [codes[i // 9] + (lords[i] + 1) * place for i in range(len(starts))]
+        rows.extend(zip(codes, starts, [chart_id] * len(codes), ends))
+    return rows
+
+
+def compute_chart(chart_id, birth, depth=STORE_DEPTH):
+    """
+    Everything needed to (re)index one chart, as plain data so it can come
+    back from a worker process: {"chart_id", "input_hash", "tz", "rows"} or
+    {"chart_id", "error"}.
+    """
+    try:
+        b = parse_birth_data(birth)
+        tree = dasha_tree(b["year"], b["month"], b["day"], b["hour"], b["minute"], b["second"],
+                          b["lat"], b["lon"], b["tz"], sid_mode_for(b["ayanamsa"]), depth)
+        return {"chart_id": chart_id, "input_hash": birth_hash(b, depth), "depth": depth,
+                "tz": b["tz"], "rows": period_rows(chart_id, tree, depth)}
+    except Exception as e:
+        return {"chart_id": chart_id, "error": str(e)}
+
+
+def _legacy_rows(r):
+    """Mahadasha rows of one result in the old `dashas` table format."""
+    place = 10 ** (CODE_DIGITS - 1)
+    out = []
+    for code, s, cid, e in r["rows"]:
+        if code % place:
+            continue    # not a Mahadasha
+        lord = VIM_ORDER[code // place - 1]
+        period = {"lord": lord, "lord_ta": lord,
+                  "start": jd_to_local_iso(s, r["tz"]), "end": jd_to_local_iso(e, r["tz"]),
+                  "start_jd": s, "end_jd": e}
+        out.append((cid, "Mahadasha", lord, period["start"], period["end"],
+                    round((e - s) / DAYS_PER_YEAR, 6), json.dumps(period)))
+    return out
+
+
+def write_results(conn, results):
+    """Replace the periods of every chart in `results` — one transaction."""
+    results = [r for r in results if "rows" in r]
+    if not results:
+        return 0
+    ids = [(r["chart_id"],) for r in results]
+    with conn:
+        conn.executemany("DELETE FROM dasha_periods WHERE chart_id = ?", ids)
+        conn.executemany("INSERT INTO dasha_periods (code, start_jd, chart_id, end_jd) VALUES (?, ?, ?, ?)",
+                         [row for r in results for row in r["rows"]])
+        conn.executemany("""
+            INSERT OR REPLACE INTO dasha_charts (chart_id, input_hash, depth, tz, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, [(r["chart_id"], r["input_hash"], r["depth"], r["tz"]) for r in results])
+        conn.executemany("DELETE FROM dashas WHERE chart_id = ?", ids)
+        conn.executemany("""
+            INSERT INTO dashas (chart_id, level, planet, start_date, end_date, duration, raw_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [row for r in results for row in _legacy_rows(r)])
+    return len(results)
+
+
+def remove_charts(conn, chart_ids):
+    with conn:
+        conn.executemany("DELETE FROM dasha_periods WHERE chart_id = ?",
+                         [(cid,) for cid in chart_ids])
+        conn.executemany("DELETE FROM dashas WHERE chart_id = ?",
+                         [(cid,) for cid in chart_ids])
+        conn.executemany("DELETE FROM dasha_charts WHERE chart_id = ?",
+                         [(cid,) for cid in chart_ids])
+
+
+def stored_hashes(conn):
+    return dict(conn.execute("SELECT chart_id, input_hash FROM dasha_charts"))
+
+
+def load_chart_births(charts_db=None, chart_ids=None):
+    """{chart_id: birth dict} for all charts (or the given ids)."""
+    conn = storage.connect(charts_db or CHARTS_DB)
+    conn.row_factory = sqlite3.Row
+    try:
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(charts)")}
+        # the typed lat/lon/tz columns stand in for data_json once they exist
+        extra = ("lat", "lon", "tz") if "lat" in cols else ("data_json",)
+        want = [c for c in ("id", "date", "time", "seconds", "ayanamsa", "place_json") + extra
+                if c in cols]
+        sql = f"SELECT {', '.join(want)} FROM charts"
+        if chart_ids is not None:
+            ids = [int(c) for c in chart_ids]
+            sql += f" WHERE id IN ({', '.join('?' * len(ids))})" if ids else " WHERE 0"
+            rows = conn.execute(sql, ids if ids else ()).fetchall()
+        else:
+            rows = conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+    return {r["id"]: chart_birth(r) for r in rows}
+
+
+def refresh_chart(chart_id, charts_db=None, db_path=None, force=False):
+    """Re-index one chart after a save (no-op if its birth data is unchanged)."""
+    births = load_chart_births(charts_db, [chart_id])
+    conn = connect(db_path)
+    try:
+        if chart_id not in births:
+            remove_charts(conn, [chart_id])
+            return "removed"
+        try:
+            h = birth_hash(parse_birth_data(births[chart_id]))
+        except ValueError as e:
+            return f"skipped: {e}"
+        row = conn.execute("SELECT input_hash FROM dasha_charts WHERE chart_id = ?",
+                           (chart_id,)).fetchone()
+        if row and row[0] == h and not force:
+            return "unchanged"
+        res = compute_chart(chart_id, births[chart_id])
+        if "error" in res:
+            return f"skipped: {res['error']}"
+        write_results(conn, [res])
+        return "indexed"
+    finally:
+        conn.close()
+
+
+def plan(conn, births, force=False):
+    """
+    Split births ({chart_id: birth}) against what is stored:
+    (todo [(chart_id, birth)] in id order, unchanged count, unreadable count,
+    stored chart ids that no longer exist). force=True recomputes everything.
+    """
+    have = stored_hashes(conn)
+    todo, unchanged, bad = [], 0, 0
+    for cid in sorted(births):
+        try:
+            h = birth_hash(parse_birth_data(births[cid]))
+        except ValueError:
+            bad += 1
+            continue
+        if not force and have.get(cid) == h:
+            unchanged += 1
+        else:
+            todo.append((cid, births[cid]))
+    gone = [cid for cid in have if cid not in births]
+    return todo, unchanged, bad, gone
+
+
+def sync(charts_db=None, db_path=None, batch=WRITE_BATCH, force=False):
+    """
+    Index new/changed charts and drop deleted ones, serially in this process.
+    The app runs the same thing as a background job (dasha_jobs.py).
+    """
+    births = load_chart_births(charts_db)
+    conn = connect(db_path)
+    try:
+        todo, unchanged, bad, gone = plan(conn, births, force)
+        stats = {"charts": len(births), "indexed": 0, "unchanged": unchanged,
+                 "removed": len(gone), "errors": bad}
+        if gone:
+            remove_charts(conn, gone)
+        pending = []
+        for cid, birth in todo:
+            res = compute_chart(cid, birth)
+            if "error" in res:
+                stats["errors"] += 1
+                continue
+            pending.append(res)
+            if len(pending) >= batch:
+                stats["indexed"] += write_results(conn, pending)
+                pending = []
+        stats["indexed"] += write_results(conn, pending)
+    finally:
+        conn.close()
+    return stats
+
+
+# -------------------------------------------------------------
+# QUERIES
+# -------------------------------------------------------------
+def parse_bound(text, end=False):
+    """'2026', '2026-06' or '2026-06-15' -> date; with end=True, the day after the span."""
+    text = str(text).strip()
+    parts = [int(p) for p in text.split("-")]
+    if len(parts) == 1:
+        d = date(parts[0], 1, 1)
+        return date(parts[0] + 1, 1, 1) if end else d
+    if len(parts) == 2:
+        d = date(parts[0], parts[1], 1)
+        if end:
+            return date(parts[0] + (parts[1] == 12), parts[1] % 12 + 1, 1)
+        return d
+    d = datetime.strptime(text[:10], "%Y-%m-%d").date()
+    return d + timedelta(days=1) if end else d
+
+
+def find_running(lords, start_jd, end_jd, level=None, limit=None, db_path=None):
+    """
+    Periods whose lord path is `lords` (indices; Saturn–Rahu = Bhukti level)
+    overlapping [start_jd, end_jd). level > len(lords) finds the sub-periods
+    under that path instead. Sorted by start; one entry per stored period:
+    {"chart_id", "level", "lords", "start_jd", "end_jd", "tz"}.
+    """
+    level = int(level or len(lords))
+    if not len(lords) <= level <= STORE_DEPTH:
+        raise ValueError(f"level must be between {len(lords)} and {STORE_DEPTH} (stored depth)")
+    paths = [list(lords) + list(tail)
+             for tail in itertools.product(range(9), repeat=level - len(lords))]
+    sql = """
+        SELECT p.chart_id, p.start_jd, p.end_jd, c.tz
+        FROM dasha_periods p JOIN dasha_charts c ON c.chart_id = p.chart_id
+        WHERE p.code = ? AND p.start_jd > ? AND p.start_jd < ? AND p.end_jd > ?
+    """
+    out = []
+    conn = connect(db_path)
+    try:
+        for path in paths:
+            code = path_code(path)
+            earliest = start_jd - path_days(path) - 1e-6
+            names = code_lords(code)
+            out.extend({"chart_id": cid, "level": level, "lords": names,
+                        "start_jd": s, "end_jd": e, "tz": tz}
+                       for cid, s, e, tz in conn.execute(sql, (code, earliest, end_jd, start_jd)))
+    finally:
+        conn.close()
+    out.sort(key=lambda p: (p["start_jd"], p["chart_id"]))
+    return out[:int(limit)] if limit else out
+
+
+def format_period(p):
+    tz = p["tz"]
+    return {
+        "chart_id": p["chart_id"],
+        "level": LEVEL_NAMES[p["level"] - 1],
+        "lords": p["lords"],
+        "start": jd_to_local_iso(p["start_jd"], tz),
+        "end": jd_to_local_iso(p["end_jd"], tz),
+    }
+
+
+def store_info(db_path=None):
+    conn = connect(db_path)
+    try:
+        charts = conn.execute("SELECT COUNT(*) FROM dasha_charts").fetchone()[0]
+        periods = conn.execute("SELECT COUNT(*) FROM dasha_periods").fetchone()[0]
+    finally:
+        conn.close()
+    return {"charts": charts, "periods": periods, "depth": STORE_DEPTH}
+
+
+# -------------------------------------------------------------
+# BENCHMARK / CLI
+# -------------------------------------------------------------
+def benchmark(n_charts=20000, db_path=None):
+    """Fill a scratch store with synthetic charts and time a Saturn–Rahu query."""
+    db_path = db_path or os.path.join(BASE_DIR, "data", "dasha_bench.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = connect(db_path)
+    t0 = time.perf_counter()
+    jd0 = swe.julday(1940, 1, 1, 0.0)
+    pending = []
+    for cid in range(1, n_charts + 1):
+        # birth anywhere in 1940-2020, any starting lord / elapsed fraction
+        birth_jd = jd0 + (cid * 7919.37) % (80 * 365.25)
+        lord = cid % 9
+        start = birth_jd - ((cid * 0.6180339) % 1.0) * DAYS_PER_YEAR * 20
+        tree = DashaTree(start, CYCLE_YEARS * DAYS_PER_YEAR, lord, 5.5, STORE_DEPTH)
+        pending.append({"chart_id": cid, "input_hash": "bench", "depth": STORE_DEPTH,
+                        "tz": 5.5, "rows": period_rows(cid, tree, STORE_DEPTH)})
+        if len(pending) >= WRITE_BATCH:
+            write_results(conn, pending)
+            pending = []
+    write_results(conn, pending)
+    conn.close()
+    build = time.perf_counter() - t0
+
+    q0 = jd_from_local(2026, 1, 1, 0, 0, 0, 5.5)
+    q1 = jd_from_local(2026, 7, 1, 0, 0, 0, 5.5)
+    t0 = time.perf_counter()
+    hits = find_running([VIM_ORDER.index("Saturn"), VIM_ORDER.index("Rahu")], q0, q1, db_path=db_path)
+    query = time.perf_counter() - t0
+    return {"charts": n_charts, "periods": n_charts * sum(9 ** (k + 1) for k in range(STORE_DEPTH)),
+            "build_seconds": round(build, 2), "matches": len(hits),
+            "query_ms": round(query * 1000, 2), "db": db_path}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Materialized Vimshottari periods for saved charts")
+    ap.add_argument("--sync", action="store_true", help="index new/changed charts")
+    ap.add_argument("--find", metavar="LORDS", help="e.g. Saturn-Rahu")
+    ap.add_argument("--from", dest="start", default=None)
+    ap.add_argument("--to", dest="end", default=None)
+    ap.add_argument("--level", type=int, default=None)
+    ap.add_argument("--tz", type=float, default=5.5)
+    ap.add_argument("--bench", type=int, metavar="N", default=None)
+    args = ap.parse_args(argv)
+
+    if args.bench:
+        print(json.dumps(benchmark(args.bench), indent=1))
+    if args.sync:
+        print(json.dumps(sync(), indent=1))
+    if args.find:
+        d0 = parse_bound(args.start or date.today().isoformat())
+        d1 = parse_bound(args.end or args.start or date.today().isoformat(), end=True)
+        hits = find_running(parse_lords(args.find),
+                            jd_from_local(d0.year, d0.month, d0.day, 0, 0, 0, args.tz),
+                            jd_from_local(d1.year, d1.month, d1.day, 0, 0, 0, args.tz),
+                            args.level)
+        for p in map(format_period, hits):
+            print(f"#{p['chart_id']:<6} {p['level']:10s} {'-'.join(p['lords']):24s} "
+                  f"{p['start']} → {p['end']}")
+    if not (args.bench or args.sync or args.find):
+        print(json.dumps(store_info(), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
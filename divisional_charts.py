@@ -1,4 +1,5 @@
 ﻿import swisseph as swe
+from chart_snapshot import as_snapshot
 
 # Tamil Sign Names (matching your app)
 RASI_NAMES = ["மேஷம்", "ரிஷபம்", "மிதுனம்", "கடகம்", "சிம்மம்", "கன்னி",
@@ -155,9 +156,10 @@ def calculate_division(long, div_no):
     return sign # Default D1
 
 # --- Main Computation Function ---
-def compute_all_divisions(jd, lat, lon, tz):
+def compute_all_divisions(snap, lat=None, lon=None, tz=None):
     """
     Returns a dictionary of 16 charts.
+    snap: ChartSnapshot in the chart's ayanamsa (a raw JD plus lat/lon is still accepted).
     """
     div_map = [1, 2, 3, 4, 7, 9, 10, 12, 16, 20, 24, 27, 30, 40, 45, 60]
     
@@ -168,27 +170,17 @@ def compute_all_divisions(jd, lat, lon, tz):
         "Sat": swe.SATURN, "Rahu": swe.MEAN_NODE, "Ketu": swe.MEAN_NODE # Ketu is opposite
     }
     
-    # Get Ayanamsa (Lahiri/Krishnamurti handled by global set in app.py)
-    ayanamsa = swe.get_ayanamsa_ut(jd)
+    # Ayanamsa comes with the snapshot (Lahiri/Krishnamurti chosen by the route)
+    snap = as_snapshot(snap, lat, lon)
 
-    # Get Ascendant (Lagna)
-    cusps, ascmc = swe.houses_ex(jd, lat, lon, b'P', swe.FLG_SIDEREAL)
-    asc_deg = ascmc[0] # Already sidereal if set globally, but better to ensure
-    # Note: If swe.set_sid_mode was called in app.py, houses_ex respects it.
+    # Get Ascendant (Lagna) — same frame as houses_ex(..., swe.FLG_SIDEREAL)
+    _, asc_deg, _ = snap.sidereal_houses()
     
     raw_planets = {}
     
-    # Calculate Planets
+    # Planets: tropical minus ayanamsa, the same way calc_full_table does it
     for name, pid in planet_ids.items():
-        res = swe.calc_ut(jd, pid)[0]
-        deg = (res[0] - ayanamsa) % 360 # If not using FLG_SIDEREAL in calc_ut
-        # NOTE: app.py uses set_sid_mode. We assume global mode is set.
-        # If we use swe.FLG_SIDEREAL, we don't subtract ayanamsa manually.
-        # Let's rely on how calc_full_table does it: raw calc_ut then subtract?
-        # Safe bet: Calculate Tropical and subtract Ayanamsa manually to be sure.
-        
-        res_trop = swe.calc_ut(jd, pid)[0]
-        deg_sid = (res_trop[0] - ayanamsa) % 360
+        deg_sid = snap.sid_lon(pid)
         
         if name == "Ketu":
             deg_sid = (deg_sid + 180) % 360
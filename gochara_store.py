@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+gochara_store.py — SADE SATI, ASHTAMA SHANI AND GURU PERIODS PER CHART
+----------------------------------------------------------------------
+Saturn and Jupiter counted from each saved chart's natal Moon rasi,
+materialized once instead of worked out by hand for every client:
+
+    sade_sati          Saturn in the 12th, 1st or 2nd (house = phase)
+    ardhashtama_shani  Saturn in the 4th
+    ashtama_shani      Saturn in the 8th
+    guru               Jupiter, every house
+
+The sign ingresses of Saturn and Jupiter (transit_events) are the same
+for every chart, so they are found once per ayanamsa over SPAN and cut
+into stays (start, end, sign). A chart's periods are then only an
+interval join: the stays numbered from its Moon rasi, clipped to
+[birth, birth + LIFESPAN_YEARS]. Each row also carries period_start /
+period_end, the run of touching rows it belongs to — one Sade Sati over
+its three phases; a retrograde step back out of the 12th ends the run.
+
+gochara_periods lives in charts.db next to natal_positions (natal_store),
+and gochara_charts records the natal Moon / birth each chart's rows were
+built from, so sync() rebuilds only new and edited charts. save_chart
+refreshes its chart; queries sync first whenever charts_version moved.
+
+"Who is in Sade Sati on D" is a range on the (kind, start_jd) index: no
+stay lasts longer than STAY_BOUND days, so only rows starting in
+(D - bound, D] are read.
+
+CLI
+    python gochara_store.py --sync
+    python gochara_store.py --on 2025-06-01 --kind sade_sati
+    python gochara_store.py --chart 16
+    python gochara_store.py --bench 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import swisseph as swe
+
+import migrations
+import natal_store
+import storage
+from chart_list import CHARTS_DB, list_version
+from chart_snapshot import sid_mode_for
+from panchangam import jd_to_local_str
+from transit_events import TransitClock
+
+# Bump when the stored periods change meaning (forces a rebuild)
+GOCHARA_VERSION = 1
+
+# graha -> {house from the Moon: kind}
+HOUSE_KINDS = {
+    "saturn": {12: "sade_sati", 1: "sade_sati", 2: "sade_sati",
+               4: "ardhashtama_shani", 8: "ashtama_shani"},
+    "jupiter": {h: "guru" for h in range(1, 13)},
+}
+KINDS = ("sade_sati", "ardhashtama_shani", "ashtama_shani", "guru")
+KIND_GRAHA = {k: g for g, houses in HOUSE_KINDS.items() for k in houses.values()}
+# kinds whose touching rows of different houses are one period
+PHASED = ("sade_sati",)
+
+KIND_NAMES = {"sade_sati": "ஏழரை சனி", "ardhashtama_shani": "அர்த்தாஷ்டம சனி",
+              "ashtama_shani": "அஷ்டம சனி", "guru": "குரு"}
+PHASE_NAMES = {12: "விரய சனி", 1: "ஜென்ம சனி", 2: "பாத சனி"}
+
+SPAN = (swe.julday(1900, 1, 1, 0.0), swe.julday(2150, 1, 1, 0.0))
+LIFESPAN_YEARS = 100
+# longest single stay in one sign, retrograde loops included (days)
+STAY_BOUND = {"saturn": 1300.0, "jupiter": 600.0}
+WRITE_BATCH = 500
+
+_stays = {}                  # (graha, sid_mode) -> (start, end, sign) arrays
+_synced = {}                 # db path -> charts_version of the last full sync
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------------
+# SCHEMA
+# -------------------------------------------------------------
+def install(conn):
+    """gochara_periods + gochara_charts (a charts.db migration, see migrations.py; idempotent)."""
+    conn.executescript("""
+        -- keyed by chart: rows of one chart are written and read together
+        CREATE TABLE IF NOT EXISTS gochara_periods (
+            chart_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            start_jd REAL NOT NULL,
+            end_jd REAL NOT NULL,
+            house INTEGER NOT NULL,
+            period_start REAL NOT NULL,
+            period_end REAL NOT NULL,
+            PRIMARY KEY (chart_id, kind, start_jd)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_gochara_kind_start ON gochara_periods(kind, start_jd);
+        CREATE TABLE IF NOT EXISTS gochara_charts (
+            chart_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL,
+            jd REAL, moon REAL, ayanamsa TEXT
+        );
+    """)
+
+
+# -------------------------------------------------------------
+# STAYS (shared by all charts)
+# -------------------------------------------------------------
+def stays(graha, sid_mode):
+    """(start, end, sign) arrays: every stay of a graha in one sign over SPAN."""
+    key = (graha, sid_mode)
+    with _lock:
+        hit = _stays.get(key)
+    if hit:
+        return hit
+    clock = TransitClock(sid_mode)
+    jd0, jd1 = SPAN
+    starts, signs = [jd0], [int(clock.state(jd0, graha)[0] // 30.0)]
+    for e in clock.events(graha, jd0, jd1, ("sign",)):
+        starts.append(e["jd"])
+        signs.append(e["to"])
+    start = np.array(starts)
+    out = (start, np.append(start[1:], jd1), np.array(signs, dtype=np.int64))
+    with _lock:
+        _stays[key] = out
+    return out
+
+
+def chart_periods(moon, birth_jd, sid_mode):
+    """
+    Rows (kind, start_jd, end_jd, house, period_start, period_end) of one
+    natal Moon longitude over its lifespan, in time order per graha.
+    """
+    rasi = int(moon // 30.0)
+    lo = max(birth_jd, SPAN[0])
+    hi = min(birth_jd + LIFESPAN_YEARS * 365.25, SPAN[1])
+    rows = []
+    for graha, kinds in HOUSE_KINDS.items():
+        start, end, sign = stays(graha, sid_mode)
+        i0, i1 = np.searchsorted(end, lo, "right"), np.searchsorted(start, hi, "left")
+        house = (sign[i0:i1] - rasi) % 12 + 1
+        keep = np.isin(house, list(kinds))
+        part = [[kinds[h], s, e, h] for h, s, e in zip(
+            house[keep].tolist(), np.maximum(start[i0:i1][keep], lo).tolist(),
+            np.minimum(end[i0:i1][keep], hi).tolist())]
+        # runs of touching rows of one kind (and one house unless PHASED)
+        first = 0
+        for i in range(1, len(part) + 1):
+            prev = part[i - 1]
+            if i < len(part) and part[i][1] == prev[2] and part[i][0] == prev[0] \
+                    and (prev[0] in PHASED or part[i][3] == prev[3]):
+                continue
+            for r in part[first:i]:
+                rows.append((*r, part[first][1], prev[2]))
+            first = i
+    return rows
+
+
+# -------------------------------------------------------------
+# SYNC
+# -------------------------------------------------------------
+_STALE = """
+    SELECT n.chart_id, n.jd, n.moon, n.ayanamsa
+    FROM natal_positions n LEFT JOIN gochara_charts g ON g.chart_id = n.chart_id
+    WHERE g.chart_id IS NULL OR g.version != ? OR g.jd IS NOT n.jd
+       OR g.moon IS NOT n.moon OR g.ayanamsa IS NOT n.ayanamsa
+"""
+_GONE = "chart_id NOT IN (SELECT chart_id FROM natal_positions)"
+
+
+def sync(conn, chart_id=None):
+    """Rebuild the periods of new / edited charts, drop deleted ones (or just one chart) -> counts."""
+    natal_store.sync(conn, chart_id)
+    if chart_id is None:
+        stale = conn.execute(_STALE, (GOCHARA_VERSION,)).fetchall()
+    else:
+        stale = conn.execute(f"SELECT * FROM ({_STALE}) WHERE chart_id = ?",
+                             (GOCHARA_VERSION, chart_id)).fetchall()
+    rows = 0
+    for i in range(0, len(stale), WRITE_BATCH):
+        batch = stale[i:i + WRITE_BATCH]
+        periods = [(cid, *p) for cid, jd, moon, ayanamsa in batch
+                   for p in chart_periods(moon, jd, sid_mode_for(ayanamsa or "lahiri"))]
+        with conn:
+            conn.executemany("DELETE FROM gochara_periods WHERE chart_id = ?", [(r[0],) for r in batch])
+            conn.executemany("INSERT INTO gochara_periods VALUES (?, ?, ?, ?, ?, ?, ?)", periods)
+            conn.executemany("INSERT OR REPLACE INTO gochara_charts VALUES (?, ?, ?, ?, ?)",
+                             [(cid, GOCHARA_VERSION, jd, moon, ay) for cid, jd, moon, ay in batch])
+        rows += len(periods)
+    only = "" if chart_id is None else f" AND chart_id = {int(chart_id)}"
+    with conn:
+        conn.execute(f"DELETE FROM gochara_periods WHERE {_GONE}{only}")
+        removed = conn.execute(f"DELETE FROM gochara_charts WHERE {_GONE}{only}").rowcount
+    return {"charts": len(stale), "rows": rows, "removed": removed}
+
+
+def refresh_chart(chart_id, db_path=None):
+    """Bring one chart's periods in step with charts.db after a save / delete."""
+    path = db_path or CHARTS_DB
+    migrations.run("charts", path)
+    conn = storage.connect(path)
+    try:
+        return sync(conn, int(chart_id))
+    finally:
+        conn.close()
+
+
+def _ready(db_path):
+    """Connection to a charts.db whose periods are current (full sync when charts_version moved)."""
+    path = os.path.abspath(db_path or CHARTS_DB)
+    migrations.run("charts", path)
+    conn = storage.connect(path)
+    version = list_version(conn)
+    with _lock:
+        current = _synced.get(path) == version
+    if not current:
+        sync(conn)
+        with _lock:
+            _synced[path] = version
+    return conn
+
+
+# -------------------------------------------------------------
+# QUERIES
+# -------------------------------------------------------------
+_COLS = "g.chart_id, c.name, g.kind, g.house, g.start_jd, g.end_jd, g.period_start, g.period_end"
+
+
+def _rows(rows, tz):
+    # rows of charts with the same Moon rasi share their ingress moments
+    local = {}
+
+    def fmt(jd):
+        if jd not in local:
+            local[jd] = jd_to_local_str(jd, tz)
+        return local[jd]
+
+    out = []
+    for cid, name, kind, house, s, e, ps, pe in rows:
+        r = {"chart_id": cid, "name": name, "kind": kind, "kind_name": KIND_NAMES[kind], "house": house,
+             "start": fmt(s), "end": fmt(e), "period_start": fmt(ps), "period_end": fmt(pe),
+             "start_jd": round(s, 5), "end_jd": round(e, 5)}
+        if kind == "sade_sati":
+            r["phase"] = PHASE_NAMES[house]
+        out.append(r)
+    return out
+
+
+def running_on(jd, kind="sade_sati", house=None, tz=5.5, db_path=None):
+    """Charts inside a period of `kind` (optionally one house) at JD UT `jd`, by name."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown period kind: {kind} (use {', '.join(KINDS)})")
+    sql = (f"SELECT {_COLS} FROM gochara_periods g JOIN charts c ON c.id = g.chart_id "
+           f"WHERE g.kind = ? AND g.start_jd > ? AND g.start_jd <= ? AND g.end_jd > ?")
+    args = [kind, jd - STAY_BOUND[KIND_GRAHA[kind]], jd, jd]
+    if house is not None:
+        sql += " AND g.house = ?"
+        args.append(int(house))
+    conn = _ready(db_path)
+    try:
+        rows = conn.execute(sql + " ORDER BY c.name COLLATE NOCASE, g.chart_id", args).fetchall()
+    finally:
+        conn.close()
+    return _rows(rows, tz)
+
+
+def chart_rows(chart_id, kinds=KINDS, tz=5.5, db_path=None):
+    """Every stored period of one chart, in time order."""
+    for kind in kinds:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown period kind: {kind} (use {', '.join(KINDS)})")
+    conn = _ready(db_path)
+    try:
+        rows = conn.execute(f"SELECT {_COLS} FROM gochara_periods g JOIN charts c ON c.id = g.chart_id "
+                            f"WHERE g.chart_id = ? AND g.kind IN ({', '.join('?' * len(kinds))}) "
+                            f"ORDER BY g.start_jd", (int(chart_id), *kinds)).fetchall()
+    finally:
+        conn.close()
+    return _rows(rows, tz)
+
+
+def day_jd(text, tz=5.5):
+    """'YYYY-MM-DD' (default today) -> JD UT of local noon that day."""
+    d = datetime.strptime(str(text), "%Y-%m-%d").date() if text else date.today()
+    return swe.julday(d.year, d.month, d.day, 12.0) - tz / 24.0
+
+
+def store_info(db_path=None):
+    conn = _ready(db_path)
+    try:
+        charts = conn.execute("SELECT COUNT(*) FROM gochara_charts").fetchone()[0]
+        by_kind = dict(conn.execute("SELECT kind, COUNT(*) FROM gochara_periods GROUP BY kind").fetchall())
+    finally:
+        conn.close()
+    return {"charts": charts, "rows": by_kind, "version": GOCHARA_VERSION}
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _bench(n, db_path):
+    """n synthetic charts in a scratch charts.db: full sync, queries, and a check against the ephemeris."""
+    import random
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    migrations.run("charts", db_path)
+    rnd = random.Random(3)
+    conn = storage.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO charts (name, jd, lat, lon, ayanamsa) VALUES (?, ?, ?, ?, ?)",
+                         [(f"c{i}", rnd.uniform(swe.julday(1940, 1, 1, 0), swe.julday(2020, 1, 1, 0)),
+                           rnd.uniform(8, 30), rnd.uniform(70, 90), "lahiri") for i in range(n)])
+    conn.close()
+
+    t = time.perf_counter()
+    conn = _ready(db_path)
+    conn.close()
+    build = time.perf_counter() - t
+    for g in HOUSE_KINDS:
+        start, end, _ = stays(g, sid_mode_for("lahiri"))
+        assert (end - start).max() < STAY_BOUND[g], g
+
+    days = [day_jd(f"{y}-{m:02d}-15") for y in range(2000, 2030) for m in (1, 7)]
+    t = time.perf_counter()
+    hits = [running_on(jd, "sade_sati", db_path=db_path) for jd in days]
+    per_query = (time.perf_counter() - t) / len(days)
+
+    # the same charts straight from Saturn's longitude and each natal Moon
+    conn = storage.connect(db_path)
+    moons = dict(conn.execute("SELECT chart_id, moon FROM natal_positions").fetchall())
+    births = dict(conn.execute("SELECT id, jd FROM charts").fetchall())
+    conn.close()
+    clock = TransitClock(sid_mode_for("lahiri"))
+    for jd, got in zip(days[::6], hits[::6]):
+        sat = int(clock.state(jd, "saturn")[0] // 30.0)
+        want = {cid for cid, moon in moons.items()
+                if (sat - int(moon // 30.0)) % 12 + 1 in (12, 1, 2)
+                and births[cid] <= jd < births[cid] + LIFESPAN_YEARS * 365.25}
+        assert {r["chart_id"] for r in got} == want
+    return {"charts": n, "sync_s": round(build, 2), **store_info(db_path),
+            "sade_sati_query_ms": round(per_query * 1000, 2),
+            "avg_clients_in_sade_sati": round(sum(map(len, hits)) / len(hits), 1)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sade Sati / Ashtama Shani / Guru periods per chart")
+    ap.add_argument("--db", default=CHARTS_DB)
+    ap.add_argument("--sync", action="store_true")
+    ap.add_argument("--on", metavar="YYYY-MM-DD", help="charts inside a period that day")
+    ap.add_argument("--kind", default="sade_sati", choices=KINDS)
+    ap.add_argument("--chart", type=int, help="every period of one chart")
+    ap.add_argument("--tz", type=float, default=5.5)
+    ap.add_argument("--bench", type=int, metavar="N", help="N synthetic charts in a scratch db")
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(_bench(args.bench, os.path.join(tempfile.gettempdir(), "gochara_bench.db")),
+                         indent=1))
+        return 0
+    if args.sync:
+        migrations.run("charts", args.db)
+        conn = storage.connect(args.db)
+        try:
+            t = time.perf_counter()
+            stats = sync(conn)
+        finally:
+            conn.close()
+        stats["seconds"] = round(time.perf_counter() - t, 2)
+        print(json.dumps(stats, indent=1))
+    if args.chart is not None:
+        for r in chart_rows(args.chart, tz=args.tz, db_path=args.db):
+            print(f"  {r['kind_name']:<16} {r['house']:>2}  {r['start']} — {r['end']}")
+        return 0
+    if args.on:
+        t = time.perf_counter()
+        rows = running_on(day_jd(args.on, args.tz), args.kind, tz=args.tz, db_path=args.db)
+        print(f"{len(rows)} charts in {KIND_NAMES[args.kind]} on {args.on} "
+              f"({(time.perf_counter() - t) * 1000:.1f} ms)")
+        for r in rows:
+            print(f"  #{r['chart_id']} {r['name']}: {r.get('phase', r['house'])} "
+                  f"{r['period_start'][:10]} — {r['period_end'][:10]}")
+        return 0
+    print(json.dumps(store_info(args.db), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 ﻿# -*- coding: utf-8 -*-
 import swisseph as swe
+from chart_snapshot import as_snapshot
 
 # Standard 7 Karakas Scheme (Parasara)
 KARAKA_NAMES = [
@@ -23,9 +24,9 @@ def get_dms(deg):
     s = int(((deg - d) * 60 - m) * 60)
     return f"{d}° {m}' {s}\""
 
-def calculate_chara_karakas(jd):
-    swe.set_sid_mode(swe.SIDM_LAHIRI)
-    ayanamsa = swe.get_ayanamsa_ut(jd)
+def calculate_chara_karakas(snap):
+    """snap: ChartSnapshot (a raw JD is still accepted)."""
+    snap = as_snapshot(snap, sid_mode=swe.SIDM_LAHIRI)
     
     # Only 7 Planets for Standard Chara Karakas (Sun to Saturn)
     # Rahu/Ketu are excluded in the 7-Karaka scheme.
@@ -38,8 +39,7 @@ def calculate_chara_karakas(jd):
     planet_list = []
     
     for pid, name in p_map.items():
-        res = swe.calc_ut(jd, pid)
-        abs_deg = (res[0][0] - ayanamsa) % 360
+        abs_deg = snap.sid_lon(pid)
         
         # Degree within sign (0-30)
         deg_in_sign = abs_deg % 30
@@ -1,6 +1,7 @@
 ﻿# -*- coding: utf-8 -*-
 import swisseph as swe
 from datetime import datetime
+from chart_snapshot import as_snapshot
 
 # --- CONSTANTS ---
 DASHA_YEARS = {
@@ -50,9 +51,10 @@ def get_kp_lords(lon):
         
     return {"star": star_lord, "sub": sub_lord}
 
-def calculate_kp_data(jd, lat, lon, tz):
-    swe.set_sid_mode(swe.SIDM_KRISHNAMURTI)
-    ayanamsa = swe.get_ayanamsa_ut(jd)
+def calculate_kp_data(snap, lat=None, lon=None, tz=None):
+    """snap: ChartSnapshot (a raw JD plus lat/lon is still accepted)."""
+    snap = as_snapshot(snap, lat, lon, swe.SIDM_KRISHNAMURTI)
+    jd = snap.jd_ut
     
     tamil_signs = ["Mesham", "Rishabam", "Mithunam", "Kadagam", "Simmam", "Kanni",
                    "Thulaam", "Vrischikam", "Dhanusu", "Makaram", "Kumbam", "Meenam"]
@@ -66,19 +68,11 @@ def calculate_kp_data(jd, lat, lon, tz):
     }
     
     planets_data = []
-    rahu_res = swe.calc_ut(jd, swe.MEAN_NODE)[0][0]
-    rahu_pos = normalize(rahu_res - ayanamsa)
+    rahu_pos = snap.sid_lon(swe.MEAN_NODE)
     
     for pid, name in p_map.items():
-        if name == "Rahu":
-            raw = swe.calc_ut(jd, swe.MEAN_NODE)[0]
-        else:
-            raw = swe.calc_ut(jd, pid)[0]
-
-        raw_lon = raw[0]
-        speed = raw[3]  # Retro info
-
-        pos = normalize(raw_lon - ayanamsa)
+        speed = snap.speed(pid)  # Retro info
+        pos = snap.sid_lon(pid)
         lords = get_kp_lords(pos)
 
         planets_data.append({
@@ -107,14 +101,12 @@ def calculate_kp_data(jd, lat, lon, tz):
     })
 
     # 2. Cusps
-    cusps_tropical, ascmc = swe.houses(jd, lat, lon, b'P')
-    asc_deg = normalize(ascmc[0] - ayanamsa)
+    asc_deg = snap.asc_sid
     
     cusps_data = []
     cusp_degrees = []
     
-    for i, c_deg in enumerate(cusps_tropical):
-        sid_deg = normalize(c_deg - ayanamsa)
+    for i, sid_deg in enumerate(snap.cusps_sid()):
         cusp_degrees.append(sid_deg)
         lords = get_kp_lords(sid_deg)
         cusps_data.append({
@@ -12,9 +12,8 @@ Logic:
 
 from datetime import datetime, timedelta
 import swisseph as swe
-
-# Set Ayanamsa (Lahiri)
-swe.set_sid_mode(swe.SIDM_LAHIRI)
+from chart_snapshot import sidereal_asc
+from sun_times import sun_times, DISC_CENTER
 
 # --- CONSTANTS ---
 RASI = ["மேஷம்", "ரிஷபம்", "மிதுனம்", "கடகம்", "சிம்மம்", "கன்னி",
@@ -62,45 +61,19 @@ def _to_dms(deg):
     return f"{d:02d}°{m:02d}′{s:02d}″"
 
 def _get_sun_times(y, m, d, lat, lon, tz):
-    """Calculates Sunrise and Sunset JDs."""
-    jd_start = swe.julday(y, m, d, 12 - tz) # Start search at noon UTC
-    
-    # Calculate Sunrise
-    res_rise = swe.rise_trans(
-        jd_start - 1, swe.SUN, swe.CALC_RISE | swe.BIT_DISC_CENTER, [lon, lat, 0]
-    )
-    rise_jd = res_rise[1][0]
-
-    # Calculate Sunset
-    res_set = swe.rise_trans(
-        rise_jd, swe.SUN, swe.CALC_SET | swe.BIT_DISC_CENTER, [lon, lat, 0]
-    )
-    set_jd = res_set[1][0]
-    
-    # Calculate Next Sunrise (for night duration)
-    res_next_rise = swe.rise_trans(
-        set_jd + 0.2, swe.SUN, swe.CALC_RISE | swe.BIT_DISC_CENTER, [lon, lat, 0]
-    )
-    next_rise_jd = res_next_rise[1][0]
-
-    return rise_jd, set_jd, next_rise_jd
-
-def _calculate_lagna(jd, lat, lon):
-    """Calculates Ascendant (Lagna) for a specific JD."""
-    swe.set_sid_mode(swe.SIDM_LAHIRI)
-    cusps, ascmc = swe.houses(jd, lat, lon, b'P')
-    asc_deg = ascmc[0]
-    
-    # Convert Tropical to Sidereal
-    ayanamsa = swe.get_ayanamsa_ut(jd)
-    sidereal_asc = (asc_deg - ayanamsa) % 360
-    return sidereal_asc
+    """Sunrise, Sunset and next Sunrise JDs (disc centre) — cached, see sun_times.py."""
+    return sun_times(y, m, d, lat, lon, tz, DISC_CENTER)
+
+def _calculate_lagna(jd, lat, lon, sid_mode=swe.SIDM_LAHIRI):
+    """Calculates sidereal Ascendant (Lagna) for a specific JD (Lahiri by default)."""
+    return sidereal_asc(jd, lat, lon, sid_mode)
 
 # -------------------------------------------------------------
 # MAIN COMPUTATION
 # -------------------------------------------------------------
 
-def compute_maandhi(year, month, day, hour, minute, second, lat, lon, tz):
+def compute_maandhi(year, month, day, hour, minute, second, lat, lon, tz,
+                    sid_mode=swe.SIDM_LAHIRI):
     try:
         # 1. Input Time as JD
         birth_dt = datetime(year, month, day, hour, minute, second)
@@ -149,7 +122,7 @@ def compute_maandhi(year, month, day, hour, minute, second, lat, lon, tz):
             maandhi_jd = set_jd + (duration * (ghati_val / 30.0))
 
         # 5. Calculate Ascendant at Maandhi Time
-        maandhi_deg = _calculate_lagna(maandhi_jd, lat, lon)
+        maandhi_deg = _calculate_lagna(maandhi_jd, lat, lon, sid_mode)
 
         # 6. Format Output
         rasi_i = int(maandhi_deg // 30)
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+migrations.py — VERSIONED SCHEMA FOR EVERY APP DATABASE
+-------------------------------------------------------
+Tables, columns and indexes used to be created from the request path:
+ALTER TABLE charts ADD COLUMN ... inside try/except on every save,
+ensure_events_table() on every event call, CREATE TABLE IF NOT EXISTS
+in the match / dasha / transit helpers. All of that lives here now.
+
+Each database has an ordered list of steps (STEPS). PRAGMA user_version
+in the file records how many have been applied; run_all() applies the
+missing ones once per database at startup, then never touches the schema
+again for the life of the process. Each step takes the write lock and
+re-reads the version first, then commits with its version, so workers
+booting together never repeat one and an interrupted step leaves nothing
+behind. Steps are idempotent anyway (IF NOT EXISTS, column checks).
+
+Add a change by appending a step to the right list — never edit or
+reorder a step that has shipped. Work that scans, rewrites or locks a
+whole file (packing legacy payloads, dropping the old places copy,
+VACUUM) is not a step: it goes in MAINTENANCE and runs from
+`migrations.py --apply`, never at import. Readers handle the rows such a
+task has not reached yet.
+
+CLI
+    python migrations.py                  # versions of the app databases
+    python migrations.py --apply          # bring them up to date, then the
+                                          # MAINTENANCE tasks (deploy step)
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+import storage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# -------------------------------------------------------------
+# HELPERS
+# -------------------------------------------------------------
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_columns(conn, table, columns):
+    """ALTER TABLE ... ADD COLUMN for each (name, decl) the table lacks."""
+    have = _columns(conn, table)
+    for name, decl in columns:
+        if name not in have:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def _statements(script):
+    """The statements of an SQL script, one at a time (trigger bodies stay whole)."""
+    buf = ""
+    for part in script.split(";"):
+        buf += part + ";"
+        if sqlite3.complete_statement(buf):
+            if buf.strip(" \t\r\n;"):
+                yield buf
+            buf = ""
+
+
+class _Locked:
+    """
+    A step's view of the connection while migrate() holds the write lock:
+    executescript() runs statement by statement (sqlite3's own COMMITs
+    first, which would drop the lock) and commit() is left to migrate().
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def executescript(self, script):
+        for stmt in _statements(script):
+            self._conn.execute(stmt)
+
+    def commit(self):
+        pass
+
+
+def _sql(doc, script):
+    def step(conn):
+        conn.executescript(script)
+    step.__doc__ = doc
+    return step
+
+
+# -------------------------------------------------------------
+# charts.db — charts, transit_history, timeline
+# -------------------------------------------------------------
+def _charts_table(conn):
+    """charts with every column the routes write (older files lack the later ones)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS charts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT, date TEXT, time TEXT,
+            place_json TEXT, ayanamsa TEXT,
+            comment TEXT, data_json TEXT, created_at TEXT
+        )
+    """)
+    _add_columns(conn, "charts", [
+        ("chartType", "TEXT"),
+        ("seconds", "TEXT DEFAULT '0'"),
+        ("gender", "TEXT DEFAULT ''"),
+        ("tag", "TEXT DEFAULT ''"),
+        ("saved_at", "TEXT"),
+        ("updated_at", "TEXT"),
+    ])
+
+
+def _chart_list(conn):
+    """list version counter + filter indexes (chart_list.py)"""
+    import chart_list
+    chart_list.install(conn)
+
+
+def _chart_search(conn):
+    """full-text index + triggers (chart_search.py)"""
+    import chart_search
+    chart_search.install(conn)
+
+
+def _birth_columns(conn):
+    """typed lat/lon/tz/jd columns (filled by save_chart, natal_store and --apply)"""
+    _add_columns(conn, "charts", [("lat", "REAL"), ("lon", "REAL"), ("tz", "REAL"), ("jd", "REAL")])
+
+
+def _compact_payloads(conn):
+    """pack legacy data_json payloads and fill the typed birth columns of every chart (payload_codec.py)"""
+    import dasha_store
+    import payload_codec
+    payload_codec.convert_column(conn, "charts", "data_json", {})
+    payload_codec.convert_column(conn, "transit_history", "data_json", [])
+    dasha_store.fill_birth_columns(conn, missing_only=False)
+
+
+def _drop_stale_places(conn):
+    """drop the old copy of the places table (places.db holds every row of it)"""
+    if "places" not in {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}:
+        return
+    places_db = os.path.join(BASE_DIR, "places.db")
+    if not os.path.exists(places_db) or _columns(conn, "places") != {
+            "id", "name_ta", "name_en", "latitude", "longitude", "timezone"}:
+        return
+    conn.execute("ATTACH DATABASE ? AS placesdb", (places_db,))
+    try:
+        # EXCEPT sorts both sides once (NULLs compare equal, like IS)
+        missing = conn.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT name_en, latitude, longitude FROM main.places
+                EXCEPT SELECT name_en, latitude, longitude FROM placesdb.places)
+        """).fetchone()[0]
+    finally:
+        conn.execute("DETACH DATABASE placesdb")
+    if not missing:
+        conn.execute("DROP TABLE main.places")
+
+
+def _natal_positions(conn):
+    """natal_positions (natal_store.py; filled on first load)"""
+    import natal_store
+    natal_store.install(conn)
+
+
+def _gochara_periods(conn):
+    """gochara_periods + gochara_charts (gochara_store.py; filled on first query)"""
+    import gochara_store
+    gochara_store.install(conn)
+
+
+def _transit_moments(conn):
+    """transit_history moment / place columns (transit_history.py) + (chart_id, id) paging index"""
+    _add_columns(conn, "transit_history", [("jd", "REAL"), ("lat", "REAL"), ("lon", "REAL"),
+                                           ("tz", "REAL"), ("ayanamsa", "TEXT")])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transit_chart_id ON transit_history(chart_id, id)")
+
+
+def _vacuum(conn):
+    """give the space freed by the migrations and the places drop back to the file system"""
+    conn.commit()
+    conn.execute("VACUUM")
+
+
+CHARTS_STEPS = [
+    _charts_table,
+    _sql("transit_history + (chart_id, timestamp) index", """
+        CREATE TABLE IF NOT EXISTS transit_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chart_id INTEGER,
+            timestamp TEXT,
+            location TEXT,
+            note TEXT,
+            data_json TEXT
+        );
+        -- (chart_id, timestamp) also serves lookups by chart_id alone
+        CREATE INDEX IF NOT EXISTS idx_transit_chart_ts ON transit_history(chart_id, timestamp);
+    """),
+    _sql("timeline (was created on the first POST /timeline)", """
+        CREATE TABLE IF NOT EXISTS timeline (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT,
+            timestamp TEXT
+        );
+    """),
+    _sql("charts(name, date, time) index for the save_chart duplicate check", """
+        CREATE INDEX IF NOT EXISTS idx_charts_name_date_time ON charts(name, date, time);
+    """),
+    _chart_list,
+    _chart_search,
+    # v7 also rewrote every payload; that pass is MAINTENANCE now (--apply only)
+    _birth_columns,
+    # v8 / v9 were _drop_stale_places and _vacuum, now MAINTENANCE (--apply only)
+    _sql("(old places copy: dropped by migrations.py --apply)", ""),
+    _sql("(vacuum: run by migrations.py --apply)", ""),
+    _natal_positions,
+    _gochara_periods,
+    _transit_moments,
+]
+
+
+# -------------------------------------------------------------
+# events.db
+# -------------------------------------------------------------
+def _events_table(conn):
+    """events (transit_data came later)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chart_id INTEGER,
+            event_name TEXT,
+            event_date TEXT,
+            event_time TEXT,
+            event_notes TEXT,
+            dasha TEXT,
+            bhukti TEXT,
+            antara TEXT,
+            sookshma TEXT,
+            prana TEXT
+        )
+    """)
+    _add_columns(conn, "events", [("transit_data", "TEXT")])
+
+
+def _compact_transit_data(conn):
+    """pack legacy transit_data payloads (older rows hold str(dict) text)"""
+    import payload_codec
+    payload_codec.convert_column(conn, "events", "transit_data", {})
+
+
+EVENTS_STEPS = [
+    _events_table,
+    _sql("events(chart_id) index", """
+        CREATE INDEX IF NOT EXISTS idx_events_chart ON events(chart_id);
+    """),
+    # v3 was _compact_transit_data, now MAINTENANCE (--apply only)
+    _sql("(packed transit_data: rewritten by migrations.py --apply)", ""),
+]
+
+
+# -------------------------------------------------------------
+# dasha.db — legacy dashas + the interval store and its jobs
+# -------------------------------------------------------------
+def _dasha_store(conn):
+    """dashas, dasha_charts, dasha_periods (+ dashas(chart_id) index)"""
+    import dasha_store
+    dasha_store.create_schema(conn)
+
+
+def _dasha_jobs(conn):
+    """dasha_jobs"""
+    import dasha_jobs
+    dasha_jobs.create_schema(conn)
+
+
+DASHA_STEPS = [
+    _dasha_store,
+    _dasha_jobs,
+]
+
+
+# -------------------------------------------------------------
+# match_history.db
+# -------------------------------------------------------------
+MATCH_STEPS = [
+    _sql("history", """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            gender TEXT,
+            partner_name TEXT,
+            score TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    _sql("history(name) index for /get_match_count", """
+        CREATE INDEX IF NOT EXISTS idx_history_name ON history(name);
+    """),
+]
+
+
+# -------------------------------------------------------------
+# places.db — the places /add_place writes (merged into the places snapshot)
+# -------------------------------------------------------------
+def _places_table(conn):
+    """places (name_ta, name_en, latitude, longitude, timezone) + state, country, added_at"""
+    cols = _columns(conn, "places")
+    if cols and "name_en" not in cols:
+        # a file created by the old /add_place (city, state, country, lat, lon, tz)
+        conn.execute("ALTER TABLE places RENAME TO places_add_place")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS places (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name_ta TEXT,
+            name_en TEXT,
+            latitude REAL,
+            longitude REAL,
+            timezone REAL
+        )
+    """)
+    _add_columns(conn, "places", [
+        ("state", "TEXT DEFAULT ''"),
+        ("country", "TEXT DEFAULT ''"),
+        ("added_at", "TEXT"),
+    ])
+    if cols and "name_en" not in cols:
+        conn.execute("""
+            INSERT INTO places (name_ta, name_en, state, country, latitude, longitude, timezone)
+            SELECT city, city, state, country, lat, lon, tz FROM places_add_place
+        """)
+        conn.execute("DROP TABLE places_add_place")
+
+
+PLACES_STEPS = [
+    _places_table,
+]
+
+
+# Whole-file work that must not run inside `import app` (a scan of every
+# row, an exclusive lock): unversioned, idempotent, run by --apply only.
+MAINTENANCE = {
+    "charts": [_compact_payloads, _drop_stale_places, _vacuum],
+    "events": [_compact_transit_data],
+}
+
+STEPS = {
+    "charts": CHARTS_STEPS,
+    "events": EVENTS_STEPS,
+    "dasha": DASHA_STEPS,
+    "match": MATCH_STEPS,
+    "places": PLACES_STEPS,
+}
+
+DEFAULT_PATHS = {
+    "charts": os.path.join(BASE_DIR, "charts.db"),
+    "events": os.path.join(BASE_DIR, "data", "events.db"),
+    "dasha": os.path.join(BASE_DIR, "dasha.db"),
+    "match": os.path.join(BASE_DIR, "match_history.db"),
+    "places": os.path.join(BASE_DIR, "places.db"),
+}
+
+
+# -------------------------------------------------------------
+# RUNNER
+# -------------------------------------------------------------
+_done = set()
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path, steps):
+    """
+    Apply the steps past the file's user_version; returns (old, new) version.
+    Each step runs under BEGIN IMMEDIATE with the version re-read once the
+    lock is held, and sets the next version in the same transaction, so
+    workers starting together apply every step exactly once between them.
+    """
+    conn = storage.connect(db_path)
+    try:
+        old = version = schema_version(conn)
+        while version < len(steps):
+            conn.execute("BEGIN IMMEDIATE")
+            version = schema_version(conn)
+            if version >= len(steps):       # another process finished meanwhile
+                conn.rollback()
+                break
+            step = steps[version]
+            step(_Locked(conn))
+            version += 1
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+            print(f"🗄️ {os.path.basename(db_path)} v{version}: {(step.__doc__ or step.__name__).strip()}")
+        return old, version
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def run(name, path=None):
+    """Migrate one app database (STEPS[name]) once per process; None if already done."""
+    path = os.path.abspath(path or DEFAULT_PATHS[name])
+    if path in _done:
+        return None
+    result = migrate(path, STEPS[name])
+    _done.add(path)
+    return result
+
+
+def run_all(paths=None):
+    """
+    Migrate every app database once per process. `paths` maps the STEPS
+    names to files (app.py passes its *_DB settings); missing names use
+    DEFAULT_PATHS.
+    """
+    paths = {**DEFAULT_PATHS, **(paths or {})}
+    result = {}
+    for name in STEPS:
+        done = run(name, paths[name])
+        if done is not None:
+            result[name] = done
+    return result
+
+
+def maintain(paths=None):
+    """Run the MAINTENANCE tasks of every app database that exists (after run_all)."""
+    paths = {**DEFAULT_PATHS, **(paths or {})}
+    for name, tasks in MAINTENANCE.items():
+        if not os.path.exists(paths[name]):
+            continue
+        conn = storage.connect(paths[name])
+        try:
+            for task in tasks:
+                task(conn)
+                conn.commit()
+                print(f"🧹 {os.path.basename(paths[name])}: {(task.__doc__ or task.__name__).strip()}")
+        finally:
+            conn.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Schema versions of the app databases")
+    ap.add_argument("--apply", action="store_true", help="apply pending migrations")
+    args = ap.parse_args(argv)
+    if args.apply:
+        for name, (old, new) in run_all().items():
+            print(f"{name:7s} v{old} -> v{new}")
+        maintain()
+        return 0
+    for name, steps in STEPS.items():
+        path = DEFAULT_PATHS[name]
+        if not os.path.exists(path):
+            print(f"{name:7s} {path}: missing (v0 of {len(steps)})")
+            continue
+        conn = storage.connect(path)
+        try:
+            v = schema_version(conn)
+        finally:
+            conn.close()
+        print(f"{name:7s} {path}: v{v} of {len(steps)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+natal_store.py — NATAL LONGITUDES OF EVERY SAVED CHART
+------------------------------------------------------
+Questions across the archive ("whose natal Moon is Saturn crossing?")
+need the sidereal longitude of each graha and the Lagna for every chart,
+and a chart is only ever opened one at a time. natal_positions (charts.db)
+keeps those ten numbers per chart next to the inputs they came from —
+the typed jd / lat / lon columns and the ayanamsa of the charts row.
+
+A row is stale when any of those inputs differs from its chart, so
+sync() is one LEFT JOIN that returns only new and edited charts; rows of
+deleted charts are dropped in the same pass. load() hands the columns out
+as NumPy arrays and keeps them in memory until charts_version
+(chart_list.py) moves, i.e. until some chart is inserted, edited or
+deleted.
+
+CLI
+    python natal_store.py                 # rows / stale count
+    python natal_store.py --sync
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import dasha_store
+import migrations
+import storage
+from chart_list import CHARTS_DB, list_version
+from chart_snapshot import get_snapshot, sid_mode_for
+from transit_events import GRAHAS
+
+# Bump when the stored longitudes change meaning (forces a recompute)
+NATAL_VERSION = 1
+POINTS = tuple(GRAHAS) + ("lagna",)
+WRITE_BATCH = 500
+
+_cache = {}                  # db path -> (charts_version, NatalSet)
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------------
+# SCHEMA
+# -------------------------------------------------------------
+def install(conn):
+    """natal_positions table (a charts.db migration, see migrations.py; idempotent)."""
+    cols = ", ".join(f"{p} REAL" for p in POINTS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS natal_positions (
+            chart_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL,
+            jd REAL, lat REAL, lon REAL, ayanamsa TEXT,
+            {cols}
+        )
+    """)
+
+
+# -------------------------------------------------------------
+# SYNC
+# -------------------------------------------------------------
+_STALE = """
+    SELECT c.id, c.jd, c.lat, c.lon, c.ayanamsa
+    FROM charts c LEFT JOIN natal_positions n ON n.chart_id = c.id
+    WHERE c.jd IS NOT NULL
+      AND (n.chart_id IS NULL OR n.version != ? OR n.jd IS NOT c.jd
+           OR n.lat IS NOT c.lat OR n.lon IS NOT c.lon OR n.ayanamsa IS NOT c.ayanamsa)
+"""
+
+
+def natal_row(chart_id, jd, lat, lon, ayanamsa):
+    """(chart_id, version, inputs..., longitudes...) for one chart; Lagna is None without a place."""
+    has_place = lat is not None and lon is not None
+    snap = get_snapshot(jd, lat if has_place else None, lon if has_place else None,
+                        sid_mode_for(ayanamsa or "lahiri"))
+    lons = []
+    for _, pid, offset in GRAHAS.values():
+        lons.append((snap.sid_lon(pid) + offset) % 360.0)
+    lons.append(snap.asc_sid if has_place else None)
+    return (chart_id, NATAL_VERSION, jd, lat, lon, ayanamsa, *lons)
+
+
+def sync(conn, chart_id=None):
+    """Compute rows for new / edited charts and drop rows of deleted ones (or just one chart) -> counts."""
+    # charts saved before the typed columns, until migrations.py --apply fills them
+    with conn:
+        dasha_store.fill_birth_columns(conn)
+    if chart_id is None:
+        stale = conn.execute(_STALE, (NATAL_VERSION,)).fetchall()
+    else:
+        stale = conn.execute(_STALE + " AND c.id = ?", (NATAL_VERSION, chart_id)).fetchall()
+    marks = ", ".join("?" * (6 + len(POINTS)))
+    written = 0
+    for i in range(0, len(stale), WRITE_BATCH):
+        rows = [natal_row(*r) for r in stale[i:i + WRITE_BATCH]]
+        with conn:
+            conn.executemany(f"INSERT OR REPLACE INTO natal_positions VALUES ({marks})", rows)
+        written += len(rows)
+    gone = "chart_id NOT IN (SELECT id FROM charts WHERE jd IS NOT NULL)"
+    with conn:
+        if chart_id is None:
+            removed = conn.execute(f"DELETE FROM natal_positions WHERE {gone}").rowcount
+        else:
+            removed = conn.execute(f"DELETE FROM natal_positions WHERE chart_id = ? AND {gone}",
+                                   (chart_id,)).rowcount
+    return {"computed": written, "removed": removed}
+
+
+# -------------------------------------------------------------
+# ARRAYS
+# -------------------------------------------------------------
+class NatalSet:
+    """
+    Natal longitudes of all charts as parallel arrays: chart_ids (int64),
+    ayanamsa (object) and one float64 array per POINTS name (NaN = unknown,
+    e.g. the Lagna of a chart without a place).
+    """
+
+    def __init__(self, chart_ids, ayanamsa, points):
+        self.chart_ids = chart_ids
+        self.ayanamsa = ayanamsa
+        self.points = points
+
+    def __len__(self):
+        return len(self.chart_ids)
+
+    def subset(self, mask):
+        return NatalSet(self.chart_ids[mask], self.ayanamsa[mask],
+                        {p: a[mask] for p, a in self.points.items()})
+
+
+def _read(conn):
+    rows = conn.execute(f"SELECT chart_id, ayanamsa, {', '.join(POINTS)} FROM natal_positions "
+                        f"ORDER BY chart_id").fetchall()
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    ayan = np.array([(r[1] or "lahiri").strip().lower() for r in rows], dtype=object)
+    vals = np.array([r[2:] for r in rows], dtype=np.float64).reshape(len(rows), len(POINTS))
+    return NatalSet(ids, ayan, {p: vals[:, k].copy() for k, p in enumerate(POINTS)})
+
+
+def load(db_path=None):
+    """NatalSet of every chart, synced first; cached until charts_version changes."""
+    path = os.path.abspath(db_path or CHARTS_DB)
+    migrations.run("charts", path)
+    conn = storage.connect(path)
+    try:
+        version = list_version(conn)
+        with _lock:
+            hit = _cache.get(path)
+        if hit and hit[0] == version:
+            return hit[1]
+        sync(conn)
+        natal = _read(conn)
+        # sync() may have filled typed birth columns of old charts (a version bump)
+        version = list_version(conn)
+        with _lock:
+            _cache[path] = (version, natal)
+        return natal
+    finally:
+        conn.close()
+
+
+def info(db_path=None):
+    conn = storage.connect(db_path or CHARTS_DB)
+    try:
+        rows = conn.execute("SELECT COUNT(*) FROM natal_positions").fetchone()[0]
+        stale = len(conn.execute(_STALE, (NATAL_VERSION,)).fetchall())
+    finally:
+        conn.close()
+    return {"rows": rows, "stale": stale, "version": NATAL_VERSION}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Natal longitudes of every saved chart")
+    ap.add_argument("--db", default=CHARTS_DB)
+    ap.add_argument("--sync", action="store_true")
+    args = ap.parse_args(argv)
+    migrations.run("charts", args.db)
+    if args.sync:
+        conn = storage.connect(args.db)
+        try:
+            t = time.perf_counter()
+            stats = sync(conn)
+        finally:
+            conn.close()
+        stats["seconds"] = round(time.perf_counter() - t, 2)
+        print(json.dumps(stats, indent=1))
+    print(json.dumps(info(args.db), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 ﻿# -*- coding: utf-8 -*-
 import swisseph as swe
+from chart_snapshot import as_snapshot
 
 # Standard Rulership (Parashara)
 RULERS = {
@@ -24,13 +25,12 @@ def get_dms(deg):
     m = int((deg - d) * 60)
     return f"{d}° {m}'"
 
-def calculate_padas(jd, lat, lon, tz):
-    swe.set_sid_mode(swe.SIDM_LAHIRI)
-    ayanamsa = swe.get_ayanamsa_ut(jd)
+def calculate_padas(snap, lat=None, lon=None, tz=None):
+    """snap: ChartSnapshot (a raw JD plus lat/lon is still accepted)."""
+    snap = as_snapshot(snap, lat, lon, swe.SIDM_LAHIRI)
     
     # 1. Get Ascendant Sign (Lagna)
-    cusps, ascmc = swe.houses(jd, lat, lon, b'P')
-    asc_deg = (ascmc[0] - ayanamsa) % 360
+    asc_deg = snap.asc_sid
     lagna_sign = get_sign(asc_deg)
     
     # 2. Get Planet Positions & Degrees
@@ -42,8 +42,7 @@ def calculate_padas(jd, lat, lon, tz):
     }
     
     for pid in p_map:
-        res = swe.calc_ut(jd, pid)
-        pos = (res[0][0] - ayanamsa) % 360
+        pos = snap.sid_lon(pid)
         planet_data[pid] = {
             "sign": get_sign(pos),
             "deg_in_sign": pos % 30,
@@ -2,18 +2,22 @@
 """
 FINAL panchangam.py — Drop-in production file
 - Swiss Ephemeris for tithi/nakshatra/yoga/karana/planet lon calculations
-- NOAA solar formula for sunrise/sunset (robust)
+- Sunrise/sunset from the shared cached service (sun_times.py, Hindu rising:
+  disc centre, no refraction — matches the verified Chennai reference times)
 - Vedic day logic: day starts at sunrise (weekday shifts if local time < sunrise)
-- Small exact override for Chennai 2025-10-18 to match your verified image times
 - No debug prints, ready to use
 """
 
-import math
+import os
 import swisseph as swe
 from datetime import datetime, timedelta
+from chart_snapshot import ayanamsa_ut
+from panchangam_solver import AngaClock, ANGAS
+from sun_times import sun_times, HINDU_RISING
 
-# Set ephemeris path (update if your path differs)
-swe.set_ephe_path("D:/Jamakkol application/ephemeris")
+# Same ephemeris folder as the rest of the app (a missing path would silently
+# switch every later calculation to the Moshier fallback)
+swe.set_ephe_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ephemeris"))
 
 # Constants
 TITHI_WAX = ["பிரதமை","த்விதியை","த்ருதியை","சதுர்த்தி","பஞ்சமி","ஷஷ்டி",
@@ -36,6 +40,9 @@ KARANA_MOV = ["பவம்","பாலவம்","கௌலவம்","தை
 KARANA_FIX = ["சகுனி","சதுஷ்பாதம்","நாகவம்","கிம்ஸ்துக்னம்"]
 WEEK = ["திங்கள்","செவ்வாய்","புதன்","வியாழன்","வெள்ளி","சனி","ஞாயிறு"]
 
+# How many upcoming tithis/nakshatras/... to list after the running one
+TRANSITION_COUNT = 3
+
 # Helpers
 def normalize_deg(x):
     return float(x) % 360.0
@@ -44,42 +51,47 @@ def _calc_lon(jd, body):
     r = swe.calc_ut(jd, body)[0]
     return float(r[0] if isinstance(r, (list, tuple)) else r)
 
+def tithi_name(t_idx):
+    if t_idx < 15:
+        return f"{TITHI_WAX[t_idx]} (வ.பிறை / சுக்ல)"
+    return f"{TITHI_WANE[t_idx - 15]} (தே.பிறை / கிருஷ்)"
+
+def karana_name(K):
+    if K in (57, 58, 59, 0):
+        return {57: KARANA_FIX[0], 58: KARANA_FIX[1], 59: KARANA_FIX[2], 0: KARANA_FIX[3]}[K]
+    return KARANA_MOV[(K - 1) % 7]
+
+def anga_name(anga, idx):
+    if anga == "tithi":
+        return tithi_name(idx)
+    if anga == "karana":
+        return karana_name(idx)
+    if anga == "nakshatra":
+        return NAK[idx]
+    return YOGAM[idx]
+
+_JD_2000 = 2451544.5  # 2000-01-01 00:00 UT
+
+def jd_to_local_str(jd_ut, tz):
+    """JD UT -> 'YYYY-MM-DD HH:MM:SS' local (rounded to the second)."""
+    local = datetime(2000, 1, 1) + timedelta(days=jd_ut + tz / 24.0 - _JD_2000)
+    local = (local + timedelta(microseconds=500000)).replace(microsecond=0)
+    return local.strftime("%Y-%m-%d %H:%M:%S")
+
 def jd_to_local_hms(jd_ut, tz):
     if not jd_ut:
         return "--:--:--"
     jd_local = jd_ut + tz / 24.0
-    frac = jd_local % 1.0
+    frac = (jd_local + 0.5) % 1.0   # JD days start at noon
     total_seconds = frac * 86400.0
     h = int(total_seconds // 3600)
     m = int((total_seconds % 3600) // 60)
     s = int(total_seconds % 60)
     return f"{h:02d}:{m:02d}:{s:02d}"
 
-# NOAA solar calculation (returns naive local datetimes)
-def solar_noaa_sunrise_sunset(date_obj, latitude, longitude, tz_offset_hours):
-    date = date_obj.date() if isinstance(date_obj, datetime) else date_obj
-    def d2r(d): return d * math.pi / 180.0
-    def r2d(r): return r * 180.0 / math.pi
-
-    N = date.timetuple().tm_yday
-    decl = 23.45 * math.sin(d2r((360.0/365.0) * (N - 81)))
-    B = d2r((360.0/365.0) * (N - 81))
-    eq_time = 9.87 * math.sin(2*B) - 7.53 * math.cos(B) - 1.5 * math.sin(B)
-    lat_rad = d2r(latitude)
-    decl_rad = d2r(decl)
-    cosH = (math.cos(d2r(90.833)) - math.sin(lat_rad) * math.sin(decl_rad)) / (math.cos(lat_rad) * math.cos(decl_rad))
-    cosH = max(-1.0, min(1.0, cosH))
-    H = r2d(math.acos(cosH))
-    solar_noon_min = 720 - 4.0 * longitude - eq_time + tz_offset_hours * 60.0
-    sunrise_min = solar_noon_min - H * 4.0
-    sunset_min  = solar_noon_min + H * 4.0
-    sunrise_dt = datetime(date.year, date.month, date.day) + timedelta(minutes=sunrise_min)
-    sunset_dt  = datetime(date.year, date.month, date.day) + timedelta(minutes=sunset_min)
-    return sunrise_dt, sunset_dt
-
 # Main function
-def compute_panchangam(year, month, day, hour, minute, second, lat, lon, tz):
-    swe.set_sid_mode(swe.SIDM_LAHIRI)
+def compute_panchangam(year, month, day, hour, minute, second, lat, lon, tz,
+                       sid_mode=swe.SIDM_LAHIRI):
 
     local_dt = datetime(year, month, day, hour, minute, second)
     utc_dt = local_dt - timedelta(hours=tz)
@@ -99,20 +111,14 @@ def compute_panchangam(year, month, day, hour, minute, second, lat, lon, tz):
     except Exception:
         pass
 
-    ay = swe.get_ayanamsa_ut(jd_ut)
+    ay = ayanamsa_ut(jd_ut, sid_mode)
     s_long = normalize_deg(_calc_lon(jd_ut, swe.SUN) - ay)
     m_long = normalize_deg(_calc_lon(jd_ut, swe.MOON) - ay)
     D = normalize_deg(m_long - s_long)
 
     # Tithi
     t_idx = int(D // 12) % 30
-    if t_idx < 15:
-        paksha = "வ.பிறை / சுக்ல"
-        tithi_name = TITHI_WAX[t_idx]
-    else:
-        paksha = "தே.பிறை / கிருஷ்"
-        tithi_name = TITHI_WANE[t_idx - 15]
-    tithi = f"{tithi_name} ({paksha})"
+    tithi = tithi_name(t_idx)
 
     # Nakshatra
     n_float = (m_long * 27.0) / 360.0
@@ -126,34 +132,25 @@ def compute_panchangam(year, month, day, hour, minute, second, lat, lon, tz):
 
     # Karana
     K = int(D // 6) % 60
-    if K in (57, 58, 59, 0):
-        karana = {57: KARANA_FIX[0], 58: KARANA_FIX[1], 59: KARANA_FIX[2], 0: KARANA_FIX[3]}[K]
-    else:
-        karana = KARANA_MOV[(K - 1) % 7]
+    karana = karana_name(K)
 
     # Weekday (civil; may be shifted by vedic rule below)
     weekday_index = local_dt.weekday()
     weekday = WEEK[weekday_index]
 
-    # Sunrise / Sunset using NOAA (local datetimes)
+    # Sunrise / Sunset (JD UT, cached — see sun_times.py)
     try:
-        sr_dt, ss_dt = solar_noaa_sunrise_sunset(local_dt, float(lat), float(lon), float(tz))
+        sun = sun_times(year, month, day, float(lat), float(lon), float(tz), HINDU_RISING)
+        sr_jd, ss_jd = sun.rise, sun.set
     except Exception:
-        sr_dt = ss_dt = None
+        sr_jd = ss_jd = None
 
-    # Exact override for Chennai reference image (matches your verified screenshot)
-    if (year == 2025 and month == 10 and day == 18
-        and abs(float(lat) - 13.0827) <= 0.02
-        and abs(float(lon) - 80.2707) <= 0.02):
-        sr_dt = datetime(year, month, day, 6, 3, 12)
-        ss_dt = datetime(year, month, day, 17, 44, 53)
-
-    sunrise = sr_dt.strftime("%H:%M:%S") if sr_dt else "--:--:--"
-    sunset  = ss_dt.strftime("%H:%M:%S") if ss_dt else "--:--:--"
+    sunrise = jd_to_local_hms(sr_jd, tz) if sr_jd else "--:--:--"
+    sunset  = jd_to_local_hms(ss_jd, tz) if ss_jd else "--:--:--"
 
     # Vedic day rule: if local_time < sunrise -> weekday = previous weekday
     try:
-        if sr_dt and local_dt < sr_dt:
+        if sr_jd and jd_ut < sr_jd:
             weekday_index = (weekday_index - 1) % 7
             weekday = WEEK[weekday_index]
     except Exception:
@@ -174,13 +171,7 @@ def compute_panchangam(year, month, day, hour, minute, second, lat, lon, tz):
     # Udaya nakshatra (moon longitude at sunrise if available)
     udaya = "--"
     try:
-        use_jd = None
-        if sr_dt:
-            s_utc = sr_dt - timedelta(hours=tz)
-            use_jd = swe.julday(s_utc.year, s_utc.month, s_utc.day,
-                                s_utc.hour + s_utc.minute/60.0 + s_utc.second/3600.0)
-        if not use_jd:
-            use_jd = jd_ut
+        use_jd = sr_jd or jd_ut
         moon_at_sr = _calc_lon(use_jd, swe.MOON)
         moon_sr_sid = normalize_deg(moon_at_sr - ay)
         nf = (moon_sr_sid * 27.0) / 360.0
@@ -190,19 +181,25 @@ def compute_panchangam(year, month, day, hour, minute, second, lat, lon, tz):
     except Exception:
         udaya = "--"
 
-    # Next tithi end (search forward)
+    # Anga end times + the next few transitions (solved, see panchangam_solver)
     next_tithi_end = "--:--:--"
+    ends = {anga: "--" for anga in ANGAS}
+    transitions = {}
     try:
-        cur_idx = t_idx
-        for i in range(1, 6000):
-            jt = jd_ut + i * 0.0025
-            s2 = normalize_deg(_calc_lon(jt, swe.SUN) - ay)
-            m2 = normalize_deg(_calc_lon(jt, swe.MOON) - ay)
-            if int(normalize_deg(m2 - s2) // 12) != cur_idx:
-                next_tithi_end = jd_to_local_hms(jt, tz)
-                break
+        clock = AngaClock(jd_ut, sid_mode)
+        for anga in ANGAS:
+            periods = clock.transitions(jd_ut, anga, TRANSITION_COUNT)
+            transitions[anga] = [{
+                "name": anga_name(anga, p["index"]),
+                "start": jd_to_local_str(p["start_jd"], tz),
+                "end": jd_to_local_str(p["end_jd"], tz),
+                "start_jd": p["start_jd"],
+                "end_jd": p["end_jd"],
+            } for p in periods]
+            ends[anga] = transitions[anga][0]["end"]
+        next_tithi_end = jd_to_local_hms(transitions["tithi"][0]["end_jd"], tz)
     except Exception:
-        next_tithi_end = "--:--:--"
+        pass
 
     return {
         "tithi": tithi,
@@ -214,13 +211,10 @@ def compute_panchangam(year, month, day, hour, minute, second, lat, lon, tz):
         "sunset": sunset,
         "moonrise": moonrise,
         "udaya_nakshatra": udaya,
-        "next_tithi_end": next_tithi_end
+        "next_tithi_end": next_tithi_end,
+        "tithi_end": ends["tithi"],
+        "nakshatra_end": ends["nakshatra"],
+        "yoga_end": ends["yoga"],
+        "karana_end": ends["karana"],
+        "transitions": transitions
     }
-from maandhi import compute_maandhi
-
-# after computing Sun, Moon, etc.
-try:
-    maandhi_row = compute_maandhi(jd_ut, lat, lon)
-    rows.extend(maandhi_row)
-except Exception as e:
-    print("⚠️ மாந்தி calculation failed:", e)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+panchangam_calendar.py — MONTH / YEAR PANCHANGAM FOR ONE PLACE
+--------------------------------------------------------------
+One row per civil date: sunrise, sunset, moonrise, vedic weekday and the
+tithi / nakshatra / yoga / karana running from that sunrise to the next,
+each with its end time.
+
+Nothing is recomputed per day:
+- every anga boundary in the range is solved once (panchangam_solver) and
+  the days just pick their slice with bisect;
+- tithis are pairs of karanas (both are Moon-Sun in 12° / 6° steps), so only
+  the karana boundaries are solved;
+- sunrise/sunset come from the shared cache (sun_times.py, same Hindu
+  rising as /panchangam) and a day's "next sunrise" is the following
+  day's sunrise.
+
+Finished calendars are stored in data/panchangam_cache.db keyed by
+(place, range, ayanamsa, CALENDAR_VERSION), with a small in-memory LRU in
+front, so printing the same month or year again is a lookup.
+
+CLI
+    python panchangam_calendar.py --year 2026 --lat 13.0827 --lon 80.2707
+    python panchangam_calendar.py --start 2026-01-01 --end 2026-03-31 --csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import swisseph as swe
+
+import storage
+from chart_snapshot import sid_mode_for
+from panchangam import WEEK, anga_name, jd_to_local_hms, jd_to_local_str
+from panchangam_solver import AngaClock
+from sun_times import sun_times, HINDU_RISING
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB = os.path.join(BASE_DIR, "data", "panchangam_cache.db")
+
+# Bump when the row format or the astronomy changes (old cache rows are ignored)
+CALENDAR_VERSION = 2
+MAX_DAYS = 3 * 366
+MEMORY_CACHE_SIZE = 32
+
+MOONRISE_FLAGS = swe.CALC_RISE | HINDU_RISING
+
+
+# -------------------------------------------------------------
+# MOON EVENTS
+# -------------------------------------------------------------
+def _local_midnight_jd(d, tz):
+    return swe.julday(d.year, d.month, d.day, 0.0) - tz / 24.0
+
+
+def _moonrise(jd_from, lat, lon):
+    """JD UT of the next moonrise after jd_from, or None."""
+    try:
+        res, tret = swe.rise_trans(jd_from, swe.MOON, MOONRISE_FLAGS, [lon, lat, 0.0])
+    except Exception:
+        return None
+    return tret[0] if res == 0 and tret[0] > 0 else None
+
+
+# -------------------------------------------------------------
+# CALENDAR
+# -------------------------------------------------------------
+def _periods_in(periods, ends, jd_from, jd_to):
+    """Periods overlapping [jd_from, jd_to), using the sorted end JDs."""
+    i = bisect_right(ends, jd_from)
+    out = []
+    while i < len(periods) and periods[i]["start_jd"] < jd_to:
+        out.append(periods[i])
+        i += 1
+    return out
+
+
+def _tithis_from_karanas(karanas):
+    """Karana 2t and 2t+1 make up tithi t; keep the boundaries already solved."""
+    tithis = []
+    for k in karanas:
+        t_idx = k["index"] // 2
+        if tithis and tithis[-1]["index"] == t_idx:
+            tithis[-1]["end_jd"] = k["end_jd"]
+        else:
+            tithis.append({"index": t_idx, "start_jd": k["start_jd"], "end_jd": k["end_jd"]})
+    return tithis
+
+
+def build_calendar(start, end, lat, lon, tz, sid_mode=swe.SIDM_LAHIRI):
+    """
+    Rows for every civil date start..end (inclusive, datetime.date).
+    Anga lists cover sunrise -> next sunrise; each entry is {"name", "end"}
+    with "end" as local 'YYYY-MM-DD HH:MM:SS'.
+    """
+    n_days = (end - start).days + 1
+    if n_days <= 0:
+        return []
+    if n_days > MAX_DAYS:
+        raise ValueError(f"Range too long ({n_days} days, max {MAX_DAYS})")
+
+    # Day windows: sunrise of each date (midnight if the sun does not rise),
+    # plus one extra date for the last "next sunrise".
+    dates = [start + timedelta(days=i) for i in range(n_days + 1)]
+    midnights = [_local_midnight_jd(d, tz) for d in dates]
+    suns = [sun_times(d.year, d.month, d.day, lat, lon, tz, HINDU_RISING) for d in dates]
+    sunrises = [s.rise for s in suns]
+    windows = [sr if sr and sr < m + 1.0 else m for sr, m in zip(sunrises, midnights)]
+
+    # Every boundary in the range, solved once
+    clock = AngaClock(windows[0], sid_mode)
+    jd_a, jd_b = windows[0], windows[-1]
+    angas = {
+        "karana": clock.between(jd_a, jd_b, "karana"),
+        "nakshatra": clock.between(jd_a, jd_b, "nakshatra"),
+        "yoga": clock.between(jd_a, jd_b, "yoga"),
+    }
+    angas["tithi"] = _tithis_from_karanas(angas["karana"])
+    ends = {k: [p["end_jd"] for p in v] for k, v in angas.items()}
+
+    rows = []
+    for i in range(n_days):
+        d, mid, sr = dates[i], midnights[i], sunrises[i]
+        has_sunrise = bool(sr and sr < mid + 1.0)
+        ss = suns[i].set if has_sunrise else None
+        mr = _moonrise(mid, lat, lon)
+        if mr and mr >= midnights[i + 1]:
+            mr = None   # no moonrise on this date
+
+        row = {
+            "date": d.isoformat(),
+            # vedic weekday = the weekday this sunrise opens
+            "weekday": WEEK[d.weekday()],
+            "sunrise": jd_to_local_hms(sr, tz) if has_sunrise else "--:--:--",
+            "sunset": jd_to_local_hms(ss, tz) if ss else "--:--:--",
+            "moonrise": jd_to_local_hms(mr, tz) if mr else "--:--:--",
+        }
+        for anga in ("tithi", "nakshatra", "yoga", "karana"):
+            row[anga] = [
+                {"name": anga_name(anga, p["index"]), "end": jd_to_local_str(p["end_jd"], tz)}
+                for p in _periods_in(angas[anga], ends[anga], windows[i], windows[i + 1])
+            ]
+        rows.append(row)
+    return rows
+
+
+# -------------------------------------------------------------
+# CACHE
+# -------------------------------------------------------------
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def cache_key(start, end, lat, lon, tz, ayanamsa):
+    return (f"v{CALENDAR_VERSION}|{float(lat):.4f}|{float(lon):.4f}|{float(tz):g}|"
+            f"{start.isoformat()}|{end.isoformat()}|{ayanamsa}")
+
+
+def _db():
+    conn = storage.connect(CACHE_DB)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS calendar_cache (
+            key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return conn
+
+
+def _remember(key, rows):
+    with _memory_lock:
+        _memory[key] = rows
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def get_calendar(start, end, lat, lon, tz, ayanamsa="lahiri", use_cache=True):
+    """(rows, cached) — rows from build_calendar, served from cache when possible."""
+    ayanamsa = str(ayanamsa or "lahiri").lower()
+    key = cache_key(start, end, lat, lon, tz, ayanamsa)
+
+    if use_cache:
+        with _memory_lock:
+            rows = _memory.get(key)
+        if rows is not None:
+            return rows, True
+        conn = _db()
+        try:
+            hit = conn.execute("SELECT payload FROM calendar_cache WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        if hit:
+            rows = json.loads(hit[0])
+            _remember(key, rows)
+            return rows, True
+
+    rows = build_calendar(start, end, float(lat), float(lon), float(tz), sid_mode_for(ayanamsa))
+    if use_cache:
+        conn = _db()
+        try:
+            conn.execute("INSERT OR REPLACE INTO calendar_cache (key, payload) VALUES (?, ?)",
+                         (key, json.dumps(rows, ensure_ascii=False)))
+            conn.commit()
+        finally:
+            conn.close()
+        _remember(key, rows)
+    return rows, False
+
+
+def parse_range(data):
+    """start/end ('YYYY-MM-DD'), or year (+ month) -> (date, date)."""
+    if data.get("start"):
+        start = datetime.strptime(str(data["start"]), "%Y-%m-%d").date()
+        end = datetime.strptime(str(data.get("end") or data["start"]), "%Y-%m-%d").date()
+    elif data.get("year"):
+        year = int(data["year"])
+        if data.get("month"):
+            month = int(data["month"])
+            start = date(year, month, 1)
+            end = (date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1))
+        else:
+            start, end = date(year, 1, 1), date(year, 12, 31)
+    else:
+        raise ValueError("Give start/end dates or a year (and optional month)")
+    if end < start:
+        raise ValueError("end is before start")
+    return start, end
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _csv_rows(rows):
+    for r in rows:
+        out = {k: r[k] for k in ("date", "weekday", "sunrise", "sunset", "moonrise")}
+        for anga in ("tithi", "nakshatra", "yoga", "karana"):
+            out[anga] = " | ".join(f"{p['name']} → {p['end']}" for p in r[anga])
+        yield out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Panchangam calendar for a date range")
+    ap.add_argument("--start"), ap.add_argument("--end")
+    ap.add_argument("--year", type=int), ap.add_argument("--month", type=int)
+    ap.add_argument("--lat", type=float, default=13.0827)
+    ap.add_argument("--lon", type=float, default=80.2707)
+    ap.add_argument("--tz", type=float, default=5.5)
+    ap.add_argument("--ayanamsa", default="lahiri")
+    ap.add_argument("--csv", action="store_true", help="CSV instead of JSON")
+    ap.add_argument("--no-cache", action="store_true")
+    args = ap.parse_args(argv)
+
+    start, end = parse_range(vars(args))
+    rows, _ = get_calendar(start, end, args.lat, args.lon, args.tz, args.ayanamsa,
+                           use_cache=not args.no_cache)
+    if args.csv:
+        fields = ["date", "weekday", "sunrise", "sunset", "moonrise",
+                  "tithi", "nakshatra", "yoga", "karana"]
+        w = csv.DictWriter(sys.stdout, fieldnames=fields)
+        w.writeheader()
+        w.writerows(_csv_rows(rows))
+    else:
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+panchangam_solver.py — EXACT ANGA END TIMES
+-------------------------------------------
+Every anga is a fixed slice of a steadily increasing angle:
+
+    tithi      Moon - Sun          30 x 12°
+    karana     Moon - Sun          60 x 6°
+    nakshatra  Moon (sidereal)     27 x 13°20'
+    yoga       Moon + Sun (sid.)   27 x 13°20'
+
+so "when does the current anga end" is "when does the angle reach the next
+multiple of the span". Instead of stepping through time, each boundary is
+solved directly: the mean rate gives a bracket, then Newton steps (calc_ut
+returns the speeds for free) refine it, falling back to bisection whenever
+a step leaves the bracket. A boundary costs 3-5 evaluations (two calc_ut
+calls each) and is good to ~0.1 s.
+
+Times are Julian Days UT throughout; formatting is left to the caller.
+"""
+
+import swisseph as swe
+
+from chart_snapshot import ayanamsa_ut, DEFAULT_SID_MODE
+
+NAK_SPAN = 360.0 / 27.0
+
+# anga -> (span in degrees, number of parts)
+ANGAS = {
+    "tithi": (12.0, 30),
+    "karana": (6.0, 60),
+    "nakshatra": (NAK_SPAN, 27),
+    "yoga": (NAK_SPAN, 27),
+}
+
+# Slowest the angle ever moves (deg/day). Moon: ~11.8-15.4, Sun: ~0.95-1.02.
+MIN_RATE = {"tithi": 10.0, "karana": 10.0, "nakshatra": 11.0, "yoga": 12.0}
+
+TOLERANCE_DAYS = 1.0 / 86400.0 / 10.0   # 0.1 s
+MAX_ITER = 40
+
+
+class AngaClock:
+    """
+    Evaluates anga angles for one ayanamsa. The (mean) ayanamsa only
+    precesses ~0.014°/year, so it is taken as linear around a reference JD
+    instead of being looked up for every evaluation.
+    `calls` counts swe.calc_ut calls, for benchmarking.
+    """
+
+    def __init__(self, jd_ref, sid_mode=DEFAULT_SID_MODE):
+        self.sid_mode = sid_mode
+        self.jd_ref = float(jd_ref)
+        self.ay_ref = ayanamsa_ut(self.jd_ref, sid_mode)
+        self.ay_rate = (ayanamsa_ut(self.jd_ref + 365.25, sid_mode) - self.ay_ref) / 365.25
+        self.calls = 0
+
+    def ayanamsa(self, jd_ut):
+        return self.ay_ref + self.ay_rate * (jd_ut - self.jd_ref)
+
+    def angle(self, jd_ut, anga):
+        """(angle in [0, 360), rate in deg/day) of the anga's driving angle at jd_ut."""
+        moon = swe.calc_ut(jd_ut, swe.MOON)[0]
+        self.calls += 1
+        if anga == "nakshatra":
+            return (moon[0] - self.ayanamsa(jd_ut)) % 360.0, moon[3] - self.ay_rate
+        sun = swe.calc_ut(jd_ut, swe.SUN)[0]
+        self.calls += 1
+        if anga in ("tithi", "karana"):
+            return (moon[0] - sun[0]) % 360.0, moon[3] - sun[3]
+        if anga == "yoga":
+            return ((moon[0] + sun[0] - 2.0 * self.ayanamsa(jd_ut)) % 360.0,
+                    moon[3] + sun[3] - 2.0 * self.ay_rate)
+        raise ValueError(f"Unknown anga: {anga}")
+
+    def index(self, jd_ut, anga):
+        span, parts = ANGAS[anga]
+        return int(self.angle(jd_ut, anga)[0] // span) % parts
+
+    def crossing(self, jd_from, anga, target):
+        """First JD >= jd_from where the anga angle reaches `target` degrees."""
+        def g(jd):
+            a, rate = self.angle(jd, anga)
+            return (a - target + 180.0) % 360.0 - 180.0, rate
+
+        # Bracket: lo is behind the target, hi (slowest possible motion) past it
+        val, rate = g(jd_from)
+        if val >= 0.0:
+            val -= 360.0            # target is a full turn ahead
+        lo, hi = jd_from, jd_from + (-val) / MIN_RATE[anga] + 1e-3
+        g_hi, _ = g(hi)
+        while g_hi < 0.0:           # not expected, but never return a wrong root
+            lo, hi = hi, hi + 1.0
+            g_hi, _ = g(hi)
+
+        # Start from the linear estimate and polish with guarded Newton steps
+        jd = jd_from + (-val) / rate if rate > 0 else (lo + hi) / 2.0
+        if not lo < jd < hi:
+            jd = (lo + hi) / 2.0
+        for _ in range(MAX_ITER):
+            val, rate = g(jd)
+            if val < 0.0:
+                lo = jd
+            else:
+                hi = jd
+            step = val / rate if rate > 0 else 0.0
+            nxt = jd - step
+            if not lo < nxt < hi:
+                nxt = (lo + hi) / 2.0
+            if abs(nxt - jd) < TOLERANCE_DAYS or hi - lo < TOLERANCE_DAYS:
+                return nxt
+            jd = nxt
+        return (lo + hi) / 2.0
+
+    def current(self, jd_ut, anga):
+        """(index, start_jd, end_jd) of the anga running at jd_ut."""
+        span, parts = ANGAS[anga]
+        a, _ = self.angle(jd_ut, anga)
+        idx = int(a // span) % parts
+        start = self.crossing(jd_ut - span / MIN_RATE[anga], anga, idx * span)
+        end = self.crossing(jd_ut, anga, ((idx + 1) % parts) * span)
+        return idx, start, end
+
+    def transitions(self, jd_ut, anga, count=3):
+        """
+        The running anga followed by the next `count` ones:
+        [{"index", "start_jd", "end_jd"}, ...]. Each end is the next start,
+        so every extra entry costs one boundary solve.
+        """
+        span, parts = ANGAS[anga]
+        idx, start, end = self.current(jd_ut, anga)
+        out = [{"index": idx, "start_jd": start, "end_jd": end}]
+        for _ in range(count):
+            idx = (idx + 1) % parts
+            start = end
+            end = self.crossing(start + 1e-6, anga, ((idx + 1) % parts) * span)
+            out.append({"index": idx, "start_jd": start, "end_jd": end})
+        return out
+
+    def between(self, jd_start, jd_end, anga):
+        """Every anga period overlapping [jd_start, jd_end) — for calendars."""
+        span, parts = ANGAS[anga]
+        idx, start, end = self.current(jd_start, anga)
+        out = [{"index": idx, "start_jd": start, "end_jd": end}]
+        while end < jd_end:
+            idx = (idx + 1) % parts
+            start = end
+            end = self.crossing(start + 1e-6, anga, ((idx + 1) % parts) * span)
+            out.append({"index": idx, "start_jd": start, "end_jd": end})
+        return out
+
+
+def anga_end(jd_ut, anga, sid_mode=DEFAULT_SID_MODE):
+    """JD UT at which the anga running at jd_ut ends."""
+    clock = AngaClock(jd_ut, sid_mode)
+    span, parts = ANGAS[anga]
+    idx = clock.index(jd_ut, anga)
+    return clock.crossing(jd_ut, anga, ((idx + 1) % parts) * span)
+
+
+def _brute_force_end(jd_ut, anga, sid_mode=DEFAULT_SID_MODE):
+    """Reference scan (0.01 d, then 1 s, then 0.05 s steps) for the self-check."""
+    clock = AngaClock(jd_ut, sid_mode)
+    idx = clock.index(jd_ut, anga)
+    jd = jd_ut
+    for step in (0.01, 1.0 / 86400.0, 0.05 / 86400.0):
+        while clock.index(jd + step, anga) == idx:
+            jd += step
+    return jd + 0.05 / 86400.0
+
+
+if __name__ == "__main__":
+    jd0 = swe.julday(2025, 10, 18, 4.0)   # 09:30 IST
+    for anga in ANGAS:
+        clock = AngaClock(jd0)
+        rows = clock.transitions(jd0, anga, 3)
+        exact = _brute_force_end(jd0, anga)
+        err = abs(rows[0]["end_jd"] - exact) * 86400.0
+        print(f"{anga:10s} idx={rows[0]['index']:2d} end={rows[0]['end_jd']:.6f} "
+              f"(scan {exact:.6f}, |Δ|={err:.2f}s) calls={clock.calls}")
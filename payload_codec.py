@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+payload_codec.py — COMPACT STORED PAYLOADS
+------------------------------------------
+charts.data_json, transit_history.data_json and events.transit_data used
+to hold whatever the route had at hand: json.dumps() text, pretty or not,
+and in older event rows str(dict) with single quotes and None — which is
+why readers had to .replace("'", '"') before json.loads.
+
+Every payload is now written as a BLOB with a leading version byte:
+
+    0x01  compact UTF-8 JSON
+    0x02  zlib-compressed compact JSON (used only when it is smaller)
+
+decode() reads those and every legacy form (JSON text, str(dict) text,
+NULL / empty), so rows written before the migration, or by an older copy
+of the app, still load. The columns keep their TEXT declaration; SQLite
+stores a bytes value as a BLOB regardless, so no table is rebuilt.
+
+Nothing is decoded until a route actually needs the value — list routes
+select only the columns they show.
+
+CLI
+    python payload_codec.py --bench       # size / speed on synthetic charts
+    python payload_codec.py --stats charts.db
+"""
+
+import argparse
+import ast
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+RAW = 0x01
+ZLIB = 0x02
+COMPRESS_LEVEL = 6
+# below this the zlib header costs more than it saves
+MIN_COMPRESS = 64
+
+
+def encode(obj):
+    """Versioned bytes for a JSON-able value."""
+    text = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(text) >= MIN_COMPRESS:
+        packed = zlib.compress(text, COMPRESS_LEVEL)
+        if len(packed) < len(text):
+            return bytes((ZLIB,)) + packed
+    return bytes((RAW,)) + text
+
+
+def is_encoded(value):
+    return isinstance(value, (bytes, bytearray, memoryview)) and len(value) > 0 \
+        and value[0] in (RAW, ZLIB)
+
+
+def _legacy_text(text):
+    """JSON text, or the str(dict) repr older routes stored."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError(f"Unreadable payload: {text[:40]!r}")
+
+
+def decode(value, default=None):
+    """
+    The stored value back as Python data. NULL / empty give `default`;
+    anything that cannot be read raises ValueError.
+    """
+    if value is None:
+        return default
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+        if not raw:
+            return default
+        tag, body = raw[0], raw[1:]
+        if tag == ZLIB:
+            return json.loads(zlib.decompress(body).decode("utf-8"))
+        if tag == RAW:
+            return json.loads(body.decode("utf-8"))
+        # a BLOB some other tool wrote as plain UTF-8
+        value = raw.decode("utf-8")
+    if isinstance(value, str):
+        text = value.strip()
+        return _legacy_text(text) if text else default
+    return value
+
+
+def pack(value, default=None):
+    """encode() for a value that may still be text (JSON or legacy) or already packed."""
+    if is_encoded(value):
+        return bytes(value)
+    if value is None or isinstance(value, (str, bytes, bytearray, memoryview)):
+        value = decode(value, default)
+    return encode(value)
+
+
+# -------------------------------------------------------------
+# TABLE CONVERSION (used by migrations.py)
+# -------------------------------------------------------------
+def convert_column(conn, table, column, default=None, batch=500):
+    """
+    Re-encode every legacy value of table.column in place.
+    Returns (converted, unreadable); unreadable rows are left untouched.
+    """
+    converted = unreadable = 0
+    last = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT rowid, {column} FROM {table} WHERE rowid > ? AND {column} IS NOT NULL "
+            f"AND typeof({column}) != 'blob' ORDER BY rowid LIMIT ?", (last, batch)).fetchall()
+        if not rows:
+            return converted, unreadable
+        updates = []
+        for rowid, value in rows:
+            last = rowid
+            try:
+                updates.append((pack(value, default), rowid))
+            except ValueError:
+                unreadable += 1
+        conn.executemany(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", updates)
+        converted += len(updates)
+
+
+def column_bytes(conn, table, column):
+    """Total stored size of a column (length() counts bytes for BLOBs, chars for TEXT)."""
+    row = conn.execute(f"SELECT COALESCE(SUM(length(CAST({column} AS BLOB))), 0), COUNT({column}) "
+                       f"FROM {table}").fetchone()
+    return row[0], row[1]
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+PAYLOAD_COLUMNS = [("charts", "data_json"), ("transit_history", "data_json"), ("events", "transit_data")]
+
+
+def _stats(path):
+    conn = sqlite3.connect(path)
+    try:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB")
+        for table, column in PAYLOAD_COLUMNS:
+            if table not in tables:
+                continue
+            size, n = column_bytes(conn, table, column)
+            packed = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE typeof({column}) = 'blob'").fetchone()[0]
+            print(f"  {table}.{column}: {n} values, {size / 1024:.1f} KB, {packed} packed")
+    finally:
+        conn.close()
+
+
+def _sample_chart(i):
+    rows = "".join(f"<tr><td>Planet{p}</td><td>{(i * 7 + p * 31) % 360}°{p:02d}'</td>"
+                   f"<td>Star{p % 27}</td><td>{p % 4 + 1}</td></tr>" for p in range(12))
+    return {"html": f"<table class='chart'>{rows}</table>", "lat": 13.0827, "lon": 80.2707, "tz": 5.5}
+
+
+def _bench(n=5000):
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "payload_bench.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE charts (id INTEGER PRIMARY KEY, data_json TEXT)")
+    samples = [_sample_chart(i) for i in range(n)]
+    # half JSON text, half the str(dict) form older rows have
+    conn.executemany("INSERT INTO charts (data_json) VALUES (?)",
+                     [(json.dumps(s, indent=1) if i % 2 else str(s),) for i, s in enumerate(samples)])
+    conn.commit()
+    conn.execute("VACUUM")
+    before, _ = column_bytes(conn, "charts", "data_json")
+    size_before = os.path.getsize(path)
+
+    t = time.perf_counter()
+    converted, bad = convert_column(conn, "charts", "data_json", {})
+    conn.commit()
+    conn.execute("VACUUM")
+    t_convert = time.perf_counter() - t
+    after, _ = column_bytes(conn, "charts", "data_json")
+    size_after = os.path.getsize(path)
+
+    t = time.perf_counter()
+    blobs = [r[0] for r in conn.execute("SELECT data_json FROM charts")]
+    decoded = [decode(b) for b in blobs]
+    t_decode = time.perf_counter() - t
+    conn.close()
+    assert decoded == samples and bad == 0
+
+    print(f"{converted} payloads converted in {t_convert * 1000:.0f} ms")
+    print(f"column: {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+    print(f"file:   {size_before / 1024:.0f} KB -> {size_after / 1024:.0f} KB")
+    print(f"decode: {t_decode / n * 1e6:.1f} µs per payload")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stored payload codec")
+    ap.add_argument("--bench", action="store_true", help="convert / decode synthetic charts")
+    ap.add_argument("--stats", metavar="DB", help="payload column sizes of a database")
+    args = ap.parse_args(argv)
+    if args.stats:
+        _stats(args.stats)
+    else:
+        _bench()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
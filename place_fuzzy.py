@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+place_fuzzy.py — SPELLING-TOLERANT, TAMIL <-> ENGLISH PLACE MATCHING
+--------------------------------------------------------------------
+People type "Tiruchi", "Trichy", "திருச்சி" or "Coimbatre" for the same
+few towns; place_index.py only matches the india.csv spelling. This module
+adds three more tiers to PlaceIndex.search:
+
+alias     place_aliases.csv: old / short / Tamil-script names -> the
+          india.csv name (Madras, Trichy, Ooty, கோவை, ...).
+phonetic  one key per spelling family. Tamil script is transliterated
+          (vowel length dropped, ழ/ள -> l, ற -> r, ...) and Latin spellings
+          folded the same way (th -> t, ch/sh/j -> s, voiced -> unvoiced,
+          ee -> i, oo -> u, doubled letters once, h dropped), so
+          "Thoothukudi" and "தூத்துக்குடி" share "tutukuti". A query matches
+          keys it equals or starts.
+fuzzy     SymSpell-style precomputed deletes of the first PREFIX_LEN key
+          characters: a query key's own deletes are looked up and the few
+          candidates checked with a bounded edit distance (1 edit for short
+          keys, 2 from LONG_KEY on).
+
+Building the deletes is the slow part, so the tables are compiled offline
+into the places snapshot (place_snapshot.py) with the rest of the index.
+
+CLI
+    python place_fuzzy.py trichy            # search with the fuzzy tiers
+    python place_fuzzy.py --key திருச்சி       # show the phonetic key
+    python place_fuzzy.py --bench
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+import place_index
+from place_index import normalize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ALIASES_CSV = os.path.join(BASE_DIR, "place_aliases.csv")
+
+# Bump when the key rules or the stored layout change (stale snapshots rebuild)
+FUZZY_VERSION = 1
+PREFIX_LEN = 7          # SymSpell prefix: deletes cover the first 7 key letters
+LONG_KEY = 7            # keys this long may be 2 edits away, shorter ones 1
+MIN_FUZZY_KEY = 4
+MAX_CANDIDATES = 400    # verified per query, nearest deletes first
+
+
+# -------------------------------------------------------------
+# TAMIL -> LATIN
+# -------------------------------------------------------------
+TAMIL_VOWELS = {"அ": "a", "ஆ": "a", "இ": "i", "ஈ": "i", "உ": "u", "ஊ": "u", "எ": "e",
+                "ஏ": "e", "ஐ": "ai", "ஒ": "o", "ஓ": "o", "ஔ": "au", "ஃ": ""}
+TAMIL_CONSONANTS = {"க": "k", "ங": "ng", "ச": "s", "ஞ": "nj", "ட": "t", "ண": "n", "த": "t",
+                    "ந": "n", "ப": "p", "ம": "m", "ய": "y", "ர": "r", "ல": "l", "வ": "v",
+                    "ழ": "l", "ள": "l", "ற": "r", "ன": "n", "ஜ": "j", "ஷ": "s", "ஸ": "s",
+                    "ஹ": "h"}
+TAMIL_SIGNS = {"ா": "a", "ி": "i", "ீ": "i", "ு": "u", "ூ": "u", "ெ": "e", "ே": "e",
+               "ை": "ai", "ொ": "o", "ோ": "o", "ௌ": "au", "ௗ": "au"}
+VIRAMA = "்"
+
+
+def transliterate(text):
+    """Tamil letters -> plain Latin (vowel length dropped); other characters kept."""
+    out = []
+    pending = None          # consonant still waiting for its vowel
+    for ch in text:
+        if ch in TAMIL_CONSONANTS:
+            if pending is not None:
+                out.append(pending + "a")
+            pending = TAMIL_CONSONANTS[ch]
+            continue
+        if ch in TAMIL_SIGNS:
+            out.append((pending or "") + TAMIL_SIGNS[ch])
+        elif ch == VIRAMA:
+            out.append(pending or "")
+        else:
+            if pending is not None:
+                out.append(pending + "a")
+            out.append(TAMIL_VOWELS.get(ch, ch))
+        pending = None
+    if pending is not None:
+        out.append(pending + "a")
+    return "".join(out)
+
+
+# -------------------------------------------------------------
+# PHONETIC KEY
+# -------------------------------------------------------------
+_DIGRAPHS = [("ksh", "ks"), ("zh", "l"), ("sh", "s"), ("ch", "s"), ("th", "t"), ("dh", "d"),
+             ("ph", "p"), ("bh", "b"), ("kh", "k"), ("gh", "g"), ("jh", "j"), ("x", "ks"),
+             ("ee", "i"), ("oo", "u"), ("ou", "u"), ("ay", "ai"), ("ey", "ai")]
+_SOFT_C = re.compile(r"c(?=[eiy])")
+# voiced -> unvoiced (Tamil writes both with one letter), near-equivalents merged
+_FOLD = str.maketrans({"c": "k", "q": "k", "g": "k", "d": "t", "b": "p", "f": "p",
+                       "j": "s", "z": "s", "w": "v", "y": "i", "h": None})
+_NOT_LATIN = re.compile(r"[^a-z]+")
+_DOUBLED = re.compile(r"(.)\1+")
+
+
+def phonetic_key(text):
+    """Spelling-family key of a place name (Tamil or Latin script)."""
+    s = _NOT_LATIN.sub("", transliterate(normalize(text)))
+    for a, b in _DIGRAPHS:
+        s = s.replace(a, b)
+    s = _SOFT_C.sub("s", s).translate(_FOLD)
+    return _DOUBLED.sub(r"\1", s)
+
+
+def _deletes(word, max_d):
+    """word and every string reachable from it by up to max_d deletions."""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_d):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+def pattern(word):
+    """Bit mask of the positions of each character in word."""
+    peq = {}
+    for i, ch in enumerate(word):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    return peq
+
+
+def prefix_distance(peq, m, text, max_d):
+    """
+    Optimal-string-alignment distance between the m-letter word behind
+    `peq` and the closest prefix of text, or max_d + 1 when every prefix is
+    further away. Hyyrö's bit-vector recurrence: one column per text letter.
+    """
+    full, last = (1 << m) - 1, 1 << (m - 1)
+    vp, vn, d0, pm_prev = full, 0, 0, 0
+    dist = best = m
+    for j, ch in enumerate(text, 1):
+        pm = peq.get(ch, 0)
+        tr = (((~d0) & pm) << 1) & pm_prev
+        d0 = (((pm & vp) + vp) ^ vp) | pm | vn | tr
+        hp = vn | ~(d0 | vp)
+        hn = d0 & vp
+        if hp & last:
+            dist += 1
+        elif hn & last:
+            dist -= 1
+        hp = (hp << 1) | 1
+        vp = ((hn << 1) | ~(d0 | hp)) & full
+        vn = hp & d0 & full
+        pm_prev = pm
+        if dist < best:
+            best = dist
+        if j >= m + max_d:
+            break
+    return best if best <= max_d else max_d + 1
+
+
+# -------------------------------------------------------------
+# INDEX
+# -------------------------------------------------------------
+def read_aliases(path=ALIASES_CSV):
+    """[(alias, india.csv name)] from place_aliases.csv ('#' lines are comments)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        rows = csv.reader(line for line in f if line.strip() and not line.startswith("#"))
+        next(rows, None)
+        return [(r[0].strip(), r[1].strip()) for r in rows if len(r) >= 2 and r[0].strip()]
+
+
+class FuzzyIndex:
+    """
+    Alias, phonetic and delete tables over the sorted names of a
+    PlaceIndex. Everything refers to names by their position in that list.
+    """
+
+    # attributes place_snapshot.py stores (lists of str or flat arrays)
+    SECTIONS = ("alias_keys", "alias_names", "alias_start", "keys", "key_names", "key_start",
+                "deletes", "delete_keys", "delete_start")
+
+    def __init__(self, names, aliases=()):
+        name_id = {n: i for i, n in enumerate(names)}
+
+        by_alias = {}
+        by_key = {}
+        for nid, name in enumerate(names):
+            by_key.setdefault(phonetic_key(name), set()).add(nid)
+        for alias, target in aliases:
+            nid = name_id.get(normalize(target))
+            if nid is None:
+                continue
+            by_alias.setdefault(normalize(alias), set()).add(nid)
+            by_key.setdefault(phonetic_key(alias), set()).add(nid)
+        by_key.pop("", None)
+
+        # names of alias i: alias_names[alias_start[i]:alias_start[i + 1]]
+        self.alias_keys = sorted(by_alias)
+        self.alias_names = array("I")
+        self.alias_start = array("I", [0])
+        for a in self.alias_keys:
+            self.alias_names.extend(sorted(by_alias[a]))
+            self.alias_start.append(len(self.alias_names))
+
+        self.keys = sorted(by_key)
+        # names of key i: key_names[key_start[i]:key_start[i + 1]]
+        self.key_names = array("I")
+        self.key_start = array("I", [0])
+        for k in self.keys:
+            self.key_names.extend(sorted(by_key[k]))
+            self.key_start.append(len(self.key_names))
+
+        # sorted delete strings + one flat posting array instead of a dict of
+        # arrays: about a third of the memory, and it maps straight into a file
+        pairs = sorted((d, kid) for kid, k in enumerate(self.keys) if len(k) >= MIN_FUZZY_KEY - 1
+                       for d in _deletes(k[:PREFIX_LEN], 2))
+        self.deletes = []
+        self.delete_keys = array("I")
+        self.delete_start = array("I")
+        for d, kid in pairs:
+            if not self.deletes or self.deletes[-1] != d:
+                self.deletes.append(d)
+                self.delete_start.append(len(self.delete_keys))
+            self.delete_keys.append(kid)
+        self.delete_start.append(len(self.delete_keys))
+
+    @staticmethod
+    def key(text):
+        return phonetic_key(text)
+
+    def _names(self, kid):
+        return self.key_names[self.key_start[kid]:self.key_start[kid + 1]]
+
+    def _delete_ids(self, d):
+        i = bisect_left(self.deletes, d)
+        if i == len(self.deletes) or self.deletes[i] != d:
+            return ()
+        return self.delete_keys[self.delete_start[i]:self.delete_start[i + 1]]
+
+    def alias_ids(self, q):
+        """Names an alias spelled exactly like q points at."""
+        i = bisect_left(self.alias_keys, q)
+        if i == len(self.alias_keys) or self.alias_keys[i] != q:
+            return ()
+        return self.alias_names[self.alias_start[i]:self.alias_start[i + 1]]
+
+    def phonetic_ids(self, qkey):
+        """Names whose key equals qkey, then those whose key starts with it."""
+        if len(qkey) < 3:
+            return
+        i = bisect_left(self.keys, qkey)
+        while i < len(self.keys) and self.keys[i].startswith(qkey):
+            yield from self._names(i)
+            i += 1
+
+    def fuzzy_ids(self, qkey, q=None, names=None):
+        """
+        Names whose key starts within 1-2 edits of qkey, nearest first.
+        Given the normalized query q and the PlaceIndex names, equally near
+        keys are ordered by how close the spelling itself is.
+        Deletes are looked up one depth at a time; once a depth has produced
+        matches the search stops there, so a near miss never pays for the
+        much larger 2-edit neighbourhood (SymSpell's "closest" mode).
+        """
+        if len(qkey) < MIN_FUZZY_KEY:
+            return
+        max_d = 2 if len(qkey) >= LONG_KEY else 1
+        peq, m = pattern(qkey), len(qkey)
+        qp = qkey[:PREFIX_LEN]
+        seen, found = set(), []
+        frontier = {qp}
+        for depth in range(max_d + 1):
+            if depth:
+                frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            for d in frontier:
+                for kid in self._delete_ids(d):
+                    if kid in seen or len(seen) >= MAX_CANDIDATES:
+                        continue
+                    seen.add(kid)
+                    key = self.keys[kid]
+                    dist = prefix_distance(peq, m, key, max_d)
+                    if dist <= max_d:
+                        found.append((dist, abs(len(key) - m), key, kid))
+            # every match this close has been seen once its own depth is searched
+            ready = [(dist, nid, gap) for dist, gap, _, kid in found if dist <= depth
+                     for nid in self._names(kid)]
+            if ready:
+                if q and names is not None:
+                    qpeq = pattern(q)
+                    ready = [(dist, prefix_distance(qpeq, len(q), names[nid], len(q)), gap, nid)
+                             for dist, nid, gap in ready]
+                else:
+                    ready = [(dist, 0, gap, nid) for dist, nid, gap in ready]
+                for *_, nid in sorted(ready):
+                    yield nid
+                return
+
+
+def build(index, aliases_csv=ALIASES_CSV):
+    """FuzzyIndex over a PlaceIndex's names with the aliases of aliases_csv."""
+    return FuzzyIndex(index.names, read_aliases(aliases_csv))
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+BENCH_QUERIES = ["trichy", "tiruchi", "திருச்சி", "coimbatre", "kovai", "chenai", "madras",
+                 "தூத்துக்குடி", "thoothukudi", "tanjore", "ooty", "bengaluru", "maduari",
+                 "tirunelvely", "சேலம்", "pondy", "nagarcoil", "kumbakonum", "xqzv", "ra"]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fuzzy / transliterated place search")
+    ap.add_argument("query", nargs="?")
+    ap.add_argument("--key", metavar="NAME", help="print the phonetic key of NAME")
+    ap.add_argument("--bench", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.key:
+        print(phonetic_key(args.key))
+        return 0
+
+    t = time.perf_counter()
+    index = place_index.load_csv()
+    index.fuzzy = build(index)
+    print(f"{len(index.fuzzy.keys)} keys, {len(index.fuzzy.deletes)} deletes "
+          f"built in {time.perf_counter() - t:.2f} s")
+
+    queries = BENCH_QUERIES if args.bench else [args.query] if args.query else []
+    for q in queries:
+        t = time.perf_counter()
+        rounds = 50 if args.bench else 1
+        for _ in range(rounds):
+            hits = index.search(q, 5)
+        us = (time.perf_counter() - t) / rounds * 1e6
+        print(f"{q:14s} {us:7.0f} µs  " + "; ".join(f"{h['label']} ({h['match']})" for h in hits))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
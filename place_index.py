@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+place_index.py — RANKED PLACE SEARCH WITHOUT SCANNING THE GAZETTEER
+-------------------------------------------------------------------
+/search_places used to walk all ~27,700 PLACES_CACHE dicts with
+`query in search_key` on every keystroke and return the first 20 hits in
+file order. Here the names are indexed once at startup:
+
+- names       every distinct normalized name, sorted — a flattened prefix
+              trie: all names starting with q sit in one bisect range;
+- words       (suffix starting at a later word, name id), sorted, so
+              "delhi" finds "new delhi" the same way;
+- trigrams    sorted trigrams, each with its ascending name ids, for
+              matches inside a word.
+
+Results are ranked exact name, alias, name prefix, word prefix, substring,
+then the phonetic and misspelling tiers of place_fuzzy.py when those tables
+are attached (alphabetical inside the first tiers, nearest first in the
+fuzzy ones). Each tier stops as soon as the limit is
+filled, so a query costs the bisects plus the rows it returns — not the
+size of the gazetteer. The substring tier walks the rarest trigram's
+names, capped at SUBSTRING_SCAN so a query that matches almost nothing in
+a huge gazetteer stays bounded.
+
+Names shared by several places ("Rampur" is in 31 rows) are labelled
+"City, State" so the picker can tell them apart.
+
+CLI
+    python place_index.py chennai               # search india.csv
+    python place_index.py --bench 1000000       # synthetic gazetteer timing
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+import place_nearest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PLACES_CSV = os.path.join(BASE_DIR, "india.csv")
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MIN_QUERY = 2
+# substring matches check at most this many names of the rarest trigram
+SUBSTRING_SCAN = 4096
+
+EXACT, ALIAS, PREFIX, WORD_PREFIX, SUBSTRING, PHONETIC, FUZZY = range(7)
+MATCH_NAMES = ("exact", "alias", "prefix", "word", "substring", "phonetic", "fuzzy")
+
+# \w misses Indic vowel signs / virama, so the Indic blocks count as word characters
+_NON_WORD = re.compile(r"(?:[^\w\u0900-\u0dff]|_)+")
+_LATIN_MARKS = re.compile("[\u0300-\u036f]")
+
+
+def normalize(text):
+    """Casefolded, Latin accents dropped, punctuation runs -> one space."""
+    text = unicodedata.normalize("NFKD", str(text or "").casefold())
+    text = _LATIN_MARKS.sub("", text)
+    return _NON_WORD.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _trigrams(name):
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+class PlaceIndex:
+    """
+    Columnar place table (city, state, country, lat, lon, tz lists indexed
+    by row id) plus the name indexes described above. `fuzzy` holds the
+    place_fuzzy.FuzzyIndex once attached; `tree` (place_nearest.KDTree)
+    is built by the first nearest_index() / nearest() call.
+    """
+
+    # attributes place_snapshot.py stores (lists of str or flat arrays)
+    SECTIONS = ("cities", "states", "countries", "lats", "lons", "tzs", "names", "name_rows",
+                "row_start", "word_keys", "word_ids", "grams", "gram_ids", "gram_start")
+
+    def __init__(self, cities, states, countries, lats, lons, tzs):
+        self.cities, self.states, self.countries = cities, states, countries
+        self.lats, self.lons, self.tzs = lats, lons, tzs
+
+        by_name = {}
+        for row, city in enumerate(cities):
+            by_name.setdefault(normalize(city), []).append(row)
+        by_name.pop("", None)
+
+        self.names = sorted(by_name)
+        # rows of name i: name_rows[row_start[i]:row_start[i + 1]]
+        self.name_rows = array("I")
+        self.row_start = array("I", [0])
+        for name in self.names:
+            self.name_rows.extend(by_name[name])
+            self.row_start.append(len(self.name_rows))
+
+        words = []
+        trigrams = {}
+        for nid, name in enumerate(self.names):
+            for m in re.finditer(r" (?=\S)", name):
+                words.append((name[m.end():], nid))
+            for g in _trigrams(name):
+                trigrams.setdefault(g, array("I")).append(nid)
+        words.sort()
+        self.word_keys = [w for w, _ in words]
+        self.word_ids = array("I", [nid for _, nid in words])
+        # names of gram i: gram_ids[gram_start[i]:gram_start[i + 1]]
+        self.grams = sorted(trigrams)
+        self.gram_ids = array("I")
+        self.gram_start = array("I", [0])
+        for g in self.grams:
+            self.gram_ids.extend(trigrams[g])
+            self.gram_start.append(len(self.gram_ids))
+        self.fuzzy = None
+        self.tree = None
+
+    def __len__(self):
+        return len(self.cities)
+
+    # ---- lookups ----
+    def _rows(self, nid):
+        return self.name_rows[self.row_start[nid]:self.row_start[nid + 1]]
+
+    def _prefix_ids(self, keys, q):
+        """Indexes into sorted `keys` of the entries starting with q, in order."""
+        i = bisect_left(keys, q)
+        while i < len(keys) and keys[i].startswith(q):
+            yield i
+            i += 1
+
+    def _gram_ids(self, g):
+        i = bisect_left(self.grams, g)
+        if i == len(self.grams) or self.grams[i] != g:
+            return ()
+        return self.gram_ids[self.gram_start[i]:self.gram_start[i + 1]]
+
+    def _substring_ids(self, q):
+        grams = _trigrams(q)
+        if not grams:
+            return
+        postings = [self._gram_ids(g) for g in grams]
+        if not all(postings):
+            return
+        names = self.names
+        for nid in itertools.islice(min(postings, key=len), SUBSTRING_SCAN):
+            if q in names[nid]:
+                yield nid
+
+    def search_ids(self, query, limit=DEFAULT_LIMIT):
+        """[(row id, match tier, shared name)] best first, at most `limit`."""
+        q = normalize(query)
+        if len(q) < MIN_QUERY:
+            return []
+        out, seen = [], set()
+
+        def take(nid, tier):
+            if nid in seen:
+                return False
+            seen.add(nid)
+            rows = self._rows(nid)
+            for row in rows:
+                out.append((row, tier, len(rows) > 1))
+                if len(out) >= limit:
+                    return True
+            return False
+
+        i = bisect_left(self.names, q)
+        tiers = [
+            [(i, EXACT)] if i < len(self.names) and self.names[i] == q else [],
+            ((nid, PREFIX) for nid in self._prefix_ids(self.names, q)),
+            ((self.word_ids[i], WORD_PREFIX) for i in self._prefix_ids(self.word_keys, q)),
+            ((nid, SUBSTRING) for nid in self._substring_ids(q)),
+        ]
+        if self.fuzzy is not None:
+            key = self.fuzzy.key(q)
+            tiers[1:1] = [((nid, ALIAS) for nid in self.fuzzy.alias_ids(q))]
+            tiers += [((nid, PHONETIC) for nid in self.fuzzy.phonetic_ids(key)),
+                      ((nid, FUZZY) for nid in self.fuzzy.fuzzy_ids(key, q, self.names))]
+        for tier in tiers:
+            for nid, rank in tier:
+                if take(nid, rank):
+                    return out
+        return out
+
+    def shared_name(self, row):
+        nid = bisect_left(self.names, normalize(self.cities[row]))
+        return self.row_start[nid + 1] - self.row_start[nid] > 1
+
+    def place(self, row, match=None, shared=None):
+        city, state = self.cities[row], self.states[row]
+        if shared is None:
+            shared = self.shared_name(row)
+        out = {
+            "label": f"{city}, {state}" if state and shared else city,
+            "city": city, "state": state, "country": self.countries[row],
+            "lat": self.lats[row], "lon": self.lons[row], "tz": self.tzs[row],
+        }
+        if match is not None:
+            out["match"] = MATCH_NAMES[match]
+        return out
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Ranked place dicts for /search_places."""
+        limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+        return [self.place(*hit) for hit in self.search_ids(query, limit)]
+
+    def nearest_index(self):
+        if self.tree is None:
+            self.tree = place_nearest.KDTree(self.lats, self.lons)
+        return self.tree
+
+    def nearest(self, lat, lon, k=place_nearest.DEFAULT_K, max_km=place_nearest.DEFAULT_MAX_KM):
+        """Place dicts (+ distance_km) of up to k places within max_km of lat/lon, nearest first."""
+        tree = self.nearest_index()
+        k = max(1, min(int(k or place_nearest.DEFAULT_K), place_nearest.MAX_K))
+        out = []
+        for row, km in tree.nearest(lat, lon, k, max_km):
+            p = self.place(row)
+            p["distance_km"] = round(km, 3)
+            out.append(p)
+        return out
+
+
+# -------------------------------------------------------------
+# SOURCES
+# -------------------------------------------------------------
+def read_csv(path=PLACES_CSV):
+    """Columns of india.csv (iPlace, iState, icountry, ilatitudeindia, iLongitudeindia, iTimeZone)."""
+    cols = ([], [], [], array("d"), array("d"), array("d"))
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.DictReader(f)
+        # Normalize headers (strip spaces)
+        if reader.fieldnames:
+            reader.fieldnames = [h.strip() for h in reader.fieldnames]
+        for row in reader:
+            city = (row.get("iPlace") or "").strip()
+            try:
+                lat = float(row.get("ilatitudeindia"))
+                lon = float(row.get("iLongitudeindia"))
+                tz = float(row.get("iTimeZone") or 5.5)
+            except (TypeError, ValueError):
+                continue
+            if not city:
+                continue
+            for col, val in zip(cols, (city, (row.get("iState") or "").strip(),
+                                       (row.get("icountry") or "").strip(), lat, lon, tz)):
+                col.append(val)
+    return cols
+
+
+def load_csv(path=PLACES_CSV):
+    return PlaceIndex(*read_csv(path))
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _synthetic(n, seed=7):
+    rnd = random.Random(seed)
+    syll = ["ra", "ma", "pur", "nag", "gar", "h", "kot", "ti", "ru", "chi", "van", "pet", "ai",
+            "ko", "lam", "pal", "li", "ya", "dur", "ga", "sa", "lem", "the", "ni", "vel", "lore"]
+    cities = []
+    for _ in range(n):
+        name = "".join(rnd.choice(syll) for _ in range(rnd.randint(2, 5))).title()
+        if rnd.random() < 0.15:
+            name = rnd.choice(["New ", "Old ", "Port ", "North "]) + name
+        cities.append(name)
+    states = [f"State {i % 40}" for i in range(n)]
+    return (cities, states, ["Synthetic"] * n, array("d", [10.0] * n),
+            array("d", [78.0] * n), array("d", [5.5] * n))
+
+
+def _bench(n):
+    cols = _synthetic(n)
+    t = time.perf_counter()
+    index = PlaceIndex(*cols)
+    build = time.perf_counter() - t
+    queries = ["ra", "rama", "ramapur", "pur", "nagar", "kotti", "lemthe", "zz", "port ra", "chiva"]
+    rounds = 200
+    t = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            index.search(q)
+    per_query = (time.perf_counter() - t) / (rounds * len(queries))
+
+    keys = [c.lower() for c in cols[0]]
+    t = time.perf_counter()
+    for q in queries:
+        hits = []
+        for k in keys:
+            if q in k:
+                hits.append(k)
+                if len(hits) >= DEFAULT_LIMIT:
+                    break
+    scan = (time.perf_counter() - t) / len(queries)
+    return {"places": n, "names": len(index.names), "build_s": round(build, 2),
+            "indexed_query_us": round(per_query * 1e6, 1), "linear_scan_us": round(scan * 1e6, 1)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Indexed place search")
+    ap.add_argument("query", nargs="?")
+    ap.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    ap.add_argument("--bench", type=int, metavar="N", help="time a synthetic gazetteer of N places")
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(_bench(args.bench), indent=1))
+        return 0
+    t = time.perf_counter()
+    index = load_csv()
+    print(f"indexed {len(index)} places in {time.perf_counter() - t:.2f} s")
+    if args.query:
+        t = time.perf_counter()
+        hits = index.search(args.query, args.limit)
+        print(f"{len(hits)} hits in {(time.perf_counter() - t) * 1e6:.0f} µs")
+        for h in hits:
+            print(f"  {h['match']:9s} {h['label']} ({h['lat']}, {h['lon']}, tz {h['tz']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
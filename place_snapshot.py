@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+place_snapshot.py — ONE COMPILED, MEMORY-MAPPED PLACES FILE
+-----------------------------------------------------------
+Every worker used to parse india.csv at import time and build the search
+index, the fuzzy tables and the nearest-place tree for itself — seconds of
+startup and tens of MB per process — while /add_place wrote into
+places.db, which search never read.
+
+`python place_snapshot.py --build` compiles every place source into
+data/places.snap:
+
+- india.csv;
+- places.db rows that are not already in india.csv (same name within
+  DUP_KM), including places added through /add_place. Rows without a
+  state or country borrow those of the nearest india.csv place;
+- place_aliases.csv, through the fuzzy tables.
+
+The file holds the attributes each index class lists in its SECTIONS:
+flat numeric arrays (row ids, coordinates, postings, tree layout) and
+string lists (names, keys, deletes). Strings are ids into one shared
+UTF-8 pool. A small JSON table of contents says where each section is.
+
+Opening the snapshot maps the file and wraps each section in a memoryview
+or a Strings view — nothing is parsed or copied. gunicorn workers map the
+same file, so the page cache holds one copy for all of them.
+
+Places added after the build are kept in a small in-memory delta index
+and merged into every search / nearest query. A worker picks up rows
+another worker added within REFRESH_S seconds. The next build folds them
+into the snapshot.
+
+A snapshot is stale when a source file, a FORMAT / FUZZY_VERSION
+constant or the byte order changed, or when places.db was recreated.
+Building is a deploy step (--build), not part of starting a worker: the
+app loads with build_missing=False and, when the snapshot is missing or
+stale, compiles the same sources in the worker's memory instead (slower
+start, same search). The CLI rebuilds as needed.
+
+CLI
+    python place_snapshot.py --build
+    python place_snapshot.py --stats
+    python place_snapshot.py --bench       # startup time + private memory, CSV vs snapshot
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from array import array
+from datetime import datetime
+
+import place_fuzzy
+import place_index
+import place_nearest
+import storage
+from place_index import PlaceIndex, normalize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT = os.path.join(BASE_DIR, "data", "places.snap")
+PLACES_DB = os.path.join(BASE_DIR, "places.db")
+
+MAGIC = b"JKPLACES"
+# Bump when the file layout or any class's SECTIONS change
+FORMAT = 1
+ALIGN = 8
+DUP_KM = 10.0           # a places.db row this close to a same-named india.csv row is that row
+REGION_KM = 50.0        # places.db rows without state / country take the nearest india.csv row's
+REFRESH_S = 2.0         # how often a worker looks for places other workers added
+
+
+# -------------------------------------------------------------
+# FILE FORMAT
+# -------------------------------------------------------------
+# MAGIC | u32 format | u32 toc length | toc JSON | sections (each 8-byte aligned)
+# toc = {"meta": {...}, "sections": {name: [kind, offset, count]}}
+# kind is an array typecode, or "S" for a string list (u32 ids into the pool)
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % ALIGN))
+
+
+def write_sections(path, sections, meta):
+    """Write {name: array | bytearray | list of str} to path (atomically). Returns its size."""
+    pool, pool_ids = [], {}
+
+    def ids(strings):
+        out = array("I")
+        for s in strings:
+            i = pool_ids.get(s)
+            if i is None:
+                i = pool_ids[s] = len(pool)
+                pool.append(s)
+            out.append(i)
+        return out
+
+    blobs = {}
+    for name, value in sections.items():
+        if isinstance(value, bytearray):
+            blobs[name] = ("B", bytes(value), len(value))
+        elif isinstance(value, array):
+            blobs[name] = (value.typecode, value.tobytes(), len(value))
+        else:
+            value = ids(value)
+            blobs[name] = ("S", value.tobytes(), len(value))
+    encoded = [s.encode("utf-8") for s in pool]
+    offsets = array("Q", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    blobs["_pool.offsets"] = ("Q", offsets.tobytes(), len(offsets))
+    blobs["_pool.bytes"] = ("B", b"".join(encoded), offsets[-1])
+
+    # offsets in the toc depend on the toc's own length: lay out after a
+    # generously sized placeholder, then pad the real toc to that size
+    toc_room = 256 + 64 * len(blobs) + len(json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    toc_room += -toc_room % ALIGN
+    pos = len(MAGIC) + 8 + toc_room
+    table = {}
+    for name, (kind, data, count) in blobs.items():
+        table[name] = [kind, pos, count]
+        pos += len(data) + (-len(data) % ALIGN)
+    toc = json.dumps({"meta": meta, "sections": table}, ensure_ascii=False).encode("utf-8")
+    if len(toc) > toc_room:
+        raise ValueError("snapshot table of contents larger than its reserved room")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(array("I", [FORMAT, toc_room]).tobytes())
+        f.write(toc.ljust(toc_room, b" "))
+        for name, (kind, data, count) in blobs.items():
+            assert f.tell() == table[name][1]
+            f.write(data)
+            _pad(f)
+        size = f.tell()
+    os.replace(tmp, path)
+    return size
+
+
+class Strings:
+    """Read-only list of str backed by u32 ids into the snapshot's string pool."""
+
+    __slots__ = ("_ids", "_offsets", "_buf")
+
+    def __init__(self, ids, offsets, buf):
+        self._ids, self._offsets, self._buf = ids, offsets, buf
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        j = self._ids[i]
+        return str(self._buf[self._offsets[j]:self._offsets[j + 1]], "utf-8")
+
+
+class Snapshot:
+    """A mapped snapshot file: .meta and .sections ({name: memoryview | Strings})."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        head = len(MAGIC) + 8
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a places snapshot")
+        words = array("I")
+        words.frombytes(self._map[len(MAGIC):head])
+        fmt, toc_len = words
+        if fmt != FORMAT:
+            raise ValueError(f"{path}: snapshot format {fmt}, expected {FORMAT}")
+        toc = json.loads(self._map[head:head + toc_len].decode("utf-8"))
+        self.meta = toc["meta"]
+
+        view = memoryview(self._map)
+        raw = {}
+        for name, (kind, offset, count) in toc["sections"].items():
+            code = "I" if kind == "S" else kind
+            size = array(code).itemsize * count
+            raw[name] = (kind, view[offset:offset + size].cast(code))
+        offsets = raw.pop("_pool.offsets")[1]
+        pool = raw.pop("_pool.bytes")[1]
+        self.sections = {name: Strings(mv, offsets, pool) if kind == "S" else mv
+                         for name, (kind, mv) in raw.items()}
+
+    @property
+    def size(self):
+        return len(self._map)
+
+
+def _sections_of(obj, prefix):
+    return {f"{prefix}.{a}": getattr(obj, a) for a in type(obj).SECTIONS}
+
+
+def _restore(cls, sections, prefix):
+    obj = cls.__new__(cls)
+    for a in cls.SECTIONS:
+        setattr(obj, a, sections[f"{prefix}.{a}"])
+    return obj
+
+
+# -------------------------------------------------------------
+# SOURCES
+# -------------------------------------------------------------
+def source_stamp(csv_path, aliases_csv=place_fuzzy.ALIASES_CSV):
+    out = {"format": FORMAT, "fuzzy": place_fuzzy.FUZZY_VERSION, "byteorder": sys.byteorder}
+    for key, p in (("csv", csv_path), ("aliases", aliases_csv)):
+        st = os.stat(p) if os.path.exists(p) else None
+        out[key] = [os.path.basename(p), st.st_size, int(st.st_mtime)] if st else None
+    return out
+
+
+def read_places_db(path=PLACES_DB, after_id=0):
+    """([(id, city, state, country, lat, lon, tz)] with id > after_id, MAX(id))."""
+    if not os.path.exists(path):
+        return [], 0
+    conn = storage.connect(path)
+    try:
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(places)")}
+        if "name_en" not in cols:
+            return [], 0
+        state = "COALESCE(state, '')" if "state" in cols else "''"
+        country = "COALESCE(country, '')" if "country" in cols else "''"
+        rows = conn.execute(
+            f"SELECT id, name_en, {state}, {country}, latitude, longitude, COALESCE(timezone, 5.5) "
+            f"FROM places WHERE id > ? AND TRIM(COALESCE(name_en, '')) != '' "
+            f"AND latitude IS NOT NULL AND longitude IS NOT NULL ORDER BY id", (after_id,)).fetchall()
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM places").fetchone()[0]
+    except sqlite3.Error:
+        return [], 0
+    finally:
+        conn.close()
+    return rows, max_id
+
+
+def _columns(rows):
+    cols = ([], [], [], array("d"), array("d"), array("d"))
+    for row in rows:
+        for col, val in zip(cols, row):
+            col.append(val)
+    return cols
+
+
+def compile_sources(csv_path, db_path=PLACES_DB):
+    """(columns of india.csv + the places.db rows it lacks, MAX(id) of places.db)."""
+    cols = place_index.read_csv(csv_path)
+    by_name = {}
+    for row, city in enumerate(cols[0]):
+        by_name.setdefault(normalize(city), []).append(row)
+    db_rows, max_id = read_places_db(db_path)
+    tree = place_nearest.KDTree(cols[3], cols[4]) if db_rows else None
+    for _, city, state, country, lat, lon, tz in db_rows:
+        same = by_name.get(normalize(city), ())
+        if any(place_nearest.haversine_km(lat, lon, cols[3][r], cols[4][r]) <= DUP_KM for r in same):
+            continue
+        if not (state and country):
+            for r, _ in tree.nearest(lat, lon, 1, REGION_KM):
+                state, country = state or cols[1][r], country or cols[2][r]
+        by_name.setdefault(normalize(city), []).append(len(cols[0]))
+        for col, val in zip(cols, (city.strip(), state, country, lat, lon, tz)):
+            col.append(val)
+    return cols, max_id
+
+
+def compile_index(csv_path, db_path=PLACES_DB, aliases_csv=place_fuzzy.ALIASES_CSV):
+    """(PlaceIndex of every source with its fuzzy tables and tree attached, MAX(id) of places.db)."""
+    cols, max_id = compile_sources(csv_path, db_path)
+    index = PlaceIndex(*cols)
+    index.fuzzy = place_fuzzy.build(index, aliases_csv)
+    index.nearest_index()
+    return index, max_id
+
+
+def build(csv_path=place_index.PLACES_CSV, db_path=PLACES_DB, path=SNAPSHOT,
+          aliases_csv=place_fuzzy.ALIASES_CSV):
+    """Compile every source into the snapshot at path; returns its meta."""
+    t = time.perf_counter()
+    index, max_id = compile_index(csv_path, db_path, aliases_csv)
+    fuzzy, tree = index.fuzzy, index.tree
+    meta = {"stamp": source_stamp(csv_path, aliases_csv), "places_db_max_id": max_id,
+            "places": len(index), "built_at": datetime.now().isoformat(timespec="seconds")}
+    sections = {**_sections_of(index, "index"), **_sections_of(fuzzy, "fuzzy"), **_sections_of(tree, "tree")}
+    meta["bytes"] = write_sections(path, sections, meta)
+    meta["build_s"] = round(time.perf_counter() - t, 2)
+    return meta
+
+
+# -------------------------------------------------------------
+# SNAPSHOT + ADDED PLACES
+# -------------------------------------------------------------
+class PlaceSet:
+    """
+    The snapshot's PlaceIndex (row ids 0..n-1) plus an in-memory PlaceIndex
+    of the places.db rows added since the build (row ids n, n+1, ...).
+    Offers the PlaceIndex query methods over both. Without a snapshot
+    (compiled()) the base is the same sources compiled in this process.
+    """
+
+    def __init__(self, snap, db_path=PLACES_DB, aliases_csv=place_fuzzy.ALIASES_CSV, base=None):
+        self.snapshot = snap
+        self.db_path = db_path
+        self.aliases_csv = aliases_csv
+        if base is None:
+            s = snap.sections
+            base = _restore(PlaceIndex, s, "index"), snap.meta["places_db_max_id"]
+            base[0].fuzzy = _restore(place_fuzzy.FuzzyIndex, s, "fuzzy")
+            base[0].tree = _restore(place_nearest.KDTree, s, "tree")
+        self.base, self.built_upto = base
+        self.added = None
+        self.added_upto = self.built_upto
+        self._checked = 0.0
+        self.refresh(force=True)
+
+    def __len__(self):
+        return len(self.base) + (len(self.added) if self.added is not None else 0)
+
+    def refresh(self, force=False):
+        """Index places.db rows added since the build (by any worker)."""
+        now = time.monotonic()
+        if not force and now - self._checked < REFRESH_S:
+            return
+        self._checked = now
+        rows, max_id = read_places_db(self.db_path, self.built_upto)
+        if max_id == self.added_upto:
+            return
+        if rows:
+            added = PlaceIndex(*_columns(r[1:] for r in rows))
+            added.fuzzy = place_fuzzy.build(added, self.aliases_csv)
+            self.added = added
+        else:
+            self.added = None
+        self.added_upto = max_id
+
+    def _owner(self, row):
+        n = len(self.base)
+        return (self.base, row) if row < n else (self.added, row - n)
+
+    def place(self, row, match=None, shared=None):
+        index, row = self._owner(row)
+        return index.place(row, match, shared)
+
+    def search(self, query, limit=place_index.DEFAULT_LIMIT):
+        """PlaceIndex.search over the snapshot and the added places."""
+        self.refresh()
+        limit = max(1, min(int(limit or place_index.DEFAULT_LIMIT), place_index.MAX_LIMIT))
+        hits = self.base.search_ids(query, limit)
+        added = self.added
+        if added is not None:
+            n = len(self.base)
+            extra = [(row + n, tier, shared) for row, tier, shared in added.search_ids(query, limit)]
+            # stable: within a tier the snapshot's (alphabetical) order comes first
+            hits = sorted(hits + extra, key=lambda h: h[1])[:limit]
+        return [self.place(*h) for h in hits]
+
+    def nearest(self, lat, lon, k=place_nearest.DEFAULT_K, max_km=place_nearest.DEFAULT_MAX_KM):
+        """PlaceIndex.nearest over the snapshot and the added places."""
+        self.refresh()
+        out = self.base.nearest(lat, lon, k, max_km)
+        added = self.added
+        if added is not None:
+            out = sorted(out + added.nearest(lat, lon, k, max_km), key=lambda p: p["distance_km"])[:k]
+        return out
+
+    @classmethod
+    def compiled(cls, csv_path=place_index.PLACES_CSV, db_path=PLACES_DB,
+                 aliases_csv=place_fuzzy.ALIASES_CSV):
+        """Every source compiled in memory (no snapshot file): same results, slower start."""
+        return cls(None, db_path, aliases_csv, base=compile_index(csv_path, db_path, aliases_csv))
+
+    def stats(self):
+        snap = {"path": self.snapshot.path, "bytes": self.snapshot.size, **self.snapshot.meta} \
+            if self.snapshot is not None else {"path": None, "places": len(self.base)}
+        return {**snap,
+                "added": len(self.added) if self.added is not None else 0,
+                "added_upto": self.added_upto}
+
+
+def _current(path, csv_path, db_path, aliases_csv):
+    """The snapshot at path if it was built from these sources, else None."""
+    try:
+        snap = Snapshot(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    meta = snap.meta
+    if meta.get("stamp") != source_stamp(csv_path, aliases_csv):
+        return None
+    # places.db recreated (create_places_db.py) since the build
+    if read_places_db(db_path, 1 << 62)[1] < meta.get("places_db_max_id", 0):
+        return None
+    return snap
+
+
+def load(csv_path=place_index.PLACES_CSV, db_path=PLACES_DB, path=SNAPSHOT,
+         aliases_csv=place_fuzzy.ALIASES_CSV, build_missing=True):
+    """
+    (PlaceSet, "snapshot" | "built" | "compiled"): the snapshot, rebuilt first
+    when missing or stale — or, with build_missing=False, the same sources
+    compiled in memory without writing the file.
+    """
+    snap = _current(path, csv_path, db_path, aliases_csv)
+    how = "snapshot"
+    if snap is None:
+        if not build_missing:
+            return PlaceSet.compiled(csv_path, db_path, aliases_csv), "compiled"
+        build(csv_path, db_path, path, aliases_csv)
+        snap = Snapshot(path)
+        how = "built"
+    return PlaceSet(snap, db_path, aliases_csv), how
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+_BENCH_CHILD = """
+import os, sys, time
+t = time.perf_counter()
+mode = sys.argv[1]
+import place_fuzzy, place_index, place_snapshot
+if mode == "csv":
+    index = place_index.load_csv()
+    index.fuzzy = place_fuzzy.build(index)
+    index.nearest_index()
+else:
+    index, _ = place_snapshot.load()
+startup = time.perf_counter() - t
+for q in place_fuzzy.BENCH_QUERIES * 20:
+    index.search(q, 20)
+for i in range(2000):
+    index.nearest(8 + i % 27, 70 + i % 25, 5)
+mem = {}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        k, _, v = line.partition(":")
+        if k in ("Rss", "Private_Clean", "Private_Dirty", "Shared_Clean"):
+            mem[k] = int(v.split()[0])
+print(startup, mem["Rss"], mem["Private_Clean"] + mem["Private_Dirty"], mem["Shared_Clean"])
+"""
+
+
+def _bench():
+    """Startup time and memory of one process: CSV + in-process build vs. the mapped snapshot."""
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("--bench reads /proc/self/smaps_rollup (Linux only)")
+    out = {}
+    for mode in ("csv", "snapshot"):
+        line = subprocess.run([sys.executable, "-c", _BENCH_CHILD, mode], cwd=BASE_DIR, check=True,
+                              capture_output=True, text=True).stdout.split("\n")[-2]
+        startup, rss, private, shared = (float(v) for v in line.split())
+        out[mode] = {"startup_s": round(startup, 3), "rss_mb": round(rss / 1024, 1),
+                     "private_mb": round(private / 1024, 1), "shared_clean_mb": round(shared / 1024, 1)}
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compiled places snapshot")
+    ap.add_argument("--build", action="store_true", help="compile every place source into the snapshot")
+    ap.add_argument("--stats", action="store_true")
+    ap.add_argument("--bench", action="store_true", help="startup time + memory, CSV vs. snapshot")
+    args = ap.parse_args(argv)
+    if args.build:
+        print(json.dumps(build(), indent=1, ensure_ascii=False))
+    elif args.bench:
+        load()   # make sure the snapshot is current before timing it
+        print(json.dumps(_bench(), indent=1))
+    else:
+        places, how = load()
+        print(json.dumps({"how": how, **places.stats()}, indent=1, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+result_cache.py — COMPUTED CHART RESULTS, KEYED BY THE BIRTH THEY CAME FROM
+--------------------------------------------------------------------------
+Opening, comparing, transiting or exporting a chart recomputes the same
+rasi rows, KP table, divisions, shadbala, ashtakavarga and dasha for the
+same birth every time. Those outputs depend only on
+
+    local birth datetime, lat, lon, tz, ayanamsa, node type
+    + ENGINE (ENGINE_VERSION and the swisseph version)
+
+so they are stored under a SHA-1 of exactly those values plus the section
+name (and its own options, e.g. the chart type of the rasi view).
+
+Lookups go through an in-process LRU of packed payloads, then an SQLite
+table (data/result_cache.db, pooled connections from storage.py), and only
+then the calculator. Building the key is plain string work — a chart that
+was viewed before is served without a single swisseph call. Hits return a
+fresh decode of the stored bytes, so a caller that mutates its result never
+changes the cached copy.
+
+Bump ENGINE_VERSION whenever a cached calculator changes its output: keys
+carry the engine, and rows from another engine are deleted the first time
+the table is opened.
+
+CLI
+    python result_cache.py                # counters + table size
+    python result_cache.py --clear
+    python result_cache.py --bench
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import swisseph as swe
+
+import payload_codec
+import storage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB = os.path.join(BASE_DIR, "data", "result_cache.db")
+
+# Bump when any cached calculator changes what it returns
+ENGINE_VERSION = 1
+ENGINE = f"{ENGINE_VERSION}/swe{swe.version}"
+NODE_TYPE = "mean"            # Rahu/Ketu are the mean node everywhere in the app
+
+MEMORY_SIZE = 512             # packed payloads kept in process
+MAX_ROWS = 50000              # table trimmed to this many (newest) rows on open
+GEO_DECIMALS = 6              # same rounding as chart_snapshot's snapshot cache
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+_counters = {}
+_schema_ready = set()
+
+
+# -------------------------------------------------------------
+# KEYS
+# -------------------------------------------------------------
+def _geo(val):
+    return "-" if val is None else f"{round(float(val), GEO_DECIMALS):.{GEO_DECIMALS}f}"
+
+
+def chart_key(section, year, month, day, hour, minute, second, lat, lon, tz,
+              ayanamsa="lahiri", node=NODE_TYPE, **options):
+    """
+    Cache key of one section for one birth. lat/lon may be None for
+    sections that do not use the place (karakas); options are the
+    section's own switches.
+    """
+    moment = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    parts = [ENGINE, section, moment.isoformat(), _geo(lat), _geo(lon), f"{float(tz):g}",
+             str(ayanamsa or "lahiri").strip().lower(), node]
+    parts += [f"{k}={options[k]}" for k in sorted(options)]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def birth_key(section, b, **options):
+    """chart_key() for a parse_birth_data() dict."""
+    return chart_key(section, b["year"], b["month"], b["day"], b["hour"], b["minute"], b["second"],
+                     b["lat"], b["lon"], b["tz"], b["ayanamsa"], **options)
+
+
+# -------------------------------------------------------------
+# STORAGE
+# -------------------------------------------------------------
+def create_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS result_cache (
+            key TEXT PRIMARY KEY,
+            section TEXT NOT NULL,
+            engine TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _db(path=None):
+    path = os.path.abspath(path or CACHE_DB)
+    conn = storage.connect(path)
+    if path not in _schema_ready:
+        create_schema(conn)
+        # results of another engine can never be hit again
+        conn.execute("DELETE FROM result_cache WHERE engine != ?", (ENGINE,))
+        conn.execute("DELETE FROM result_cache WHERE rowid <= "
+                     "(SELECT MAX(rowid) FROM result_cache) - ?", (MAX_ROWS,))
+        conn.commit()
+        _schema_ready.add(path)
+    return conn
+
+
+def _count(section, what):
+    with _lock:
+        c = _counters.setdefault(section, {"memory_hits": 0, "db_hits": 0, "misses": 0})
+        c[what] += 1
+
+
+def _remember(key, blob):
+    with _lock:
+        _memory[key] = blob
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_SIZE:
+            _memory.popitem(last=False)
+
+
+def get_or_compute(section, key, build):
+    """
+    (value, hit) — the stored result for key, or build() stored under it.
+    A result that cannot be stored (not JSON-able, read-only disk) is still
+    returned.
+    """
+    with _lock:
+        blob = _memory.get(key)
+        if blob is not None:
+            _memory.move_to_end(key)
+    if blob is not None:
+        _count(section, "memory_hits")
+        return payload_codec.decode(blob), True
+
+    try:
+        conn = _db()
+        row = conn.execute("SELECT payload FROM result_cache WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        conn, row = None, None
+    if row:
+        conn.close()
+        _remember(key, row[0])
+        _count(section, "db_hits")
+        return payload_codec.decode(row[0]), True
+
+    try:
+        value = build()
+        _count(section, "misses")
+        try:
+            blob = payload_codec.encode(value)
+        except (TypeError, ValueError):
+            return value, False
+        _remember(key, blob)
+        if conn is not None:
+            try:
+                conn.execute("INSERT OR REPLACE INTO result_cache (key, section, engine, payload) "
+                             "VALUES (?, ?, ?, ?)", (key, section, ENGINE, blob))
+                conn.commit()
+            except sqlite3.Error:
+                pass   # the memory tier still works
+        return value, False
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def stats():
+    """Hit/miss counters per section and in total, plus the size of both tiers."""
+    with _lock:
+        sections = {k: dict(v) for k, v in _counters.items()}
+        memory = len(_memory)
+    total = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+    for c in sections.values():
+        for k in total:
+            total[k] += c[k]
+    lookups = sum(total.values())
+    total["hit_rate"] = round((total["memory_hits"] + total["db_hits"]) / lookups, 4) if lookups else None
+    try:
+        conn = _db()
+        try:
+            rows = conn.execute("SELECT COUNT(*), COALESCE(SUM(length(payload)), 0) FROM result_cache").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        rows = (None, None)
+    return {"engine": ENGINE, "total": total, "sections": sections,
+            "memory_entries": memory, "db_rows": rows[0], "db_bytes": rows[1]}
+
+
+def clear(memory_only=False):
+    """Forget every stored result (and reset the counters)."""
+    with _lock:
+        _memory.clear()
+        _counters.clear()
+    if not memory_only:
+        conn = _db()
+        try:
+            conn.execute("DELETE FROM result_cache")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _bench(n=200):
+    """Cold vs. warm timings for the rasi + divisions sections of n births."""
+    from app_stable_backup import calc_full_table
+    from chart_snapshot import clear_caches, snapshot_from_local
+    from divisional_charts import compute_all_divisions
+
+    births = [(1950 + i % 60, 1 + i % 12, 1 + i % 28, i % 24, (i * 7) % 60, 0,
+               8 + (i % 20) * 0.5, 72 + (i % 30) * 0.5, 5.5) for i in range(n)]
+
+    def run():
+        t = time.perf_counter()
+        for y, m, d, h, mi, s, lat, lon, tz in births:
+            get_or_compute("rasi", chart_key("rasi", y, m, d, h, mi, s, lat, lon, tz),
+                           lambda: calc_full_table(y, m, d, h, mi, s, lat, lon, tz))
+            get_or_compute("divisions", chart_key("divisions", y, m, d, h, mi, s, lat, lon, tz),
+                           lambda: compute_all_divisions(
+                               snapshot_from_local(y, m, d, h, mi, s, lat, lon, tz)))
+        return (time.perf_counter() - t) / n * 1000
+
+    cold = run()
+    clear_caches()
+    with _lock:
+        _memory.clear()
+    disk = run()
+    warm = run()
+    return {"births": n, "cold_ms": round(cold, 3), "db_ms": round(disk, 3),
+            "memory_ms": round(warm, 3), "stats": stats()}
+
+
+def main(argv=None):
+    global CACHE_DB
+    ap = argparse.ArgumentParser(description="Computed chart result cache")
+    ap.add_argument("--clear", action="store_true", help="delete every stored result")
+    ap.add_argument("--bench", action="store_true", help="cold / db / memory timings (temporary db)")
+    args = ap.parse_args(argv)
+    if args.bench:
+        import tempfile
+        CACHE_DB = os.path.join(tempfile.mkdtemp(), "result_cache_bench.db")
+        print(json.dumps(_bench(), indent=1))
+    elif args.clear:
+        clear()
+        print("cleared")
+    else:
+        print(json.dumps(stats(), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
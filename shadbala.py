@@ -1,4 +1,5 @@
 ﻿import swisseph as swe
+from chart_snapshot import as_snapshot
 
 # --- CONSTANTS ---
 NAISARGIKA_VALUES = {
@@ -76,15 +77,13 @@ def get_drik_bala(planet, lon, all_planets_pos):
     # Divide by 4 as per Shadbala rules and add baseline to avoid negatives in UI
     return (total_aspect / 4.0) + 20.0
 
-def calculate_shadbala(jd, lat, lon, tz):
-    swe.set_sid_mode(swe.SIDM_LAHIRI)
-    ayanamsa = swe.get_ayanamsa_ut(jd)
-    cusps, ascmc = swe.houses(jd, lat, lon, b'P')
-    asc = ascmc[0]
+def calculate_shadbala(snap, lat=None, lon=None, tz=None):
+    """snap: ChartSnapshot (a raw JD plus lat/lon is still accepted)."""
+    snap = as_snapshot(snap, lat, lon, swe.SIDM_LAHIRI)
+    asc = snap.asc_trop
     
     # Day/Night check
-    sun_res = swe.calc_ut(jd, swe.SUN)[0][0]
-    sun_sid = (sun_res - ayanamsa) % 360
+    sun_sid = snap.sid_lon(swe.SUN)
     dist = (sun_sid - asc + 360) % 360
     is_day = (180 <= dist < 360)
 
@@ -95,9 +94,8 @@ def calculate_shadbala(jd, lat, lon, tz):
     pos_cache = {}
     speed_cache = {}
     for p in planets:
-        res = swe.calc_ut(jd, p)
-        pos_cache[p] = normalize(res[0][0] - ayanamsa)
-        speed_cache[p] = res[0][3]
+        pos_cache[p] = snap.sid_lon(p)
+        speed_cache[p] = snap.speed(p)
 
     results = []
     
@@ -49,6 +49,7 @@ function setupPlaceSearch() {
             cities.forEach(c => {
                 const opt = document.createElement("option");
                 opt.value = c.label; 
+                if (c.state) opt.textContent = c.state; // disambiguates same-named towns
                 opt.setAttribute("data-lat", c.lat);
                 opt.setAttribute("data-lon", c.lon);
                 opt.setAttribute("data-tz", c.tz);
@@ -471,6 +472,7 @@ async function generateChart() {
         
         if (typeof loadAndRenderVimshottariCompact === "function") {
             if(window.currentChartId) meta.chart_id = window.currentChartId;
+            meta.ayanamsa = payload.ayanamsa;
             loadAndRenderVimshottariCompact(meta);
         }
         
@@ -28,6 +28,11 @@ async function loadPanchangam(meta) {
 
         if (data.status === "ok" && data.panchangam) {
             const p = data.panchangam;
+            // "2025-10-18 12:19:41" -> " — 12:19 (18/10)"
+            const upto = (ts) => {
+                if (!ts || ts.length < 16) return "";
+                return ` — ${ts.slice(11, 16)} (${ts.slice(8, 10)}/${ts.slice(5, 7)})`;
+            };
             const wrap = document.getElementById("panchangamWrap");
             if (!wrap) return;
 
@@ -48,10 +53,10 @@ async function loadPanchangam(meta) {
                 <table style="width:100%;border-collapse:collapse;">
                   <tr>
                     <td style="vertical-align:top;width:50%;padding-right:6px;">
-                      திதி: ${p.tithi}<br>
-                      நட்சத்திரம்: ${p.nakshatra}<br>
-                      யோகம்: ${p.yoga}<br>
-                      கரணம்: ${p.karana}<br>
+                      திதி: ${p.tithi}${upto(p.tithi_end)}<br>
+                      நட்சத்திரம்: ${p.nakshatra}${upto(p.nakshatra_end)}<br>
+                      யோகம்: ${p.yoga}${upto(p.yoga_end)}<br>
+                      கரணம்: ${p.karana}${upto(p.karana_end)}<br>
                       வாரம்: ${p.weekday}
                     </td>
                     <td style="vertical-align:top;width:50%;">
@@ -1,5 +1,6 @@
 ﻿/* savedViewer.js — Updated
-   - SEARCH: Global filter.
+   - SEARCH: Server-side filters (text, gender, tag, birth-date range).
+   - PAGING: Keyset pages from /list_charts, one page in memory.
    - WINDOW: Draggable & Resizable.
    - PREVIEW: Compact table with "Star - Pada".
    - MOBILE: Optimized layout.
@@ -155,7 +156,16 @@
     }
 
     // --- 2. MAIN SAVED LIST ---
-    let savedCache = [];
+    // One page at a time from /list_charts (keyset pages, filtered on the
+    // server), so memory stays the same however many charts are saved.
+    const PAGE_SIZE = 100;
+    const EXPORT_PAGE_SIZE = 500;
+    let savedCache = [];                 // current page only
+    let pageInfo = { total: 0, next_after_id: null, prev_before_id: null };
+    let pageCursor = {};                 // {} | {after_id} | {before_id}
+    let pageStart = 0;                   // position of the first row, for "101–200 of N"
+    let filterState = { q: "", gender: "", tag: "", date_from: "", date_to: "" };
+    let searchTimer = null;
     let sortState = { field: 'saved', dir: 'desc' };
 
     async function openSavedModal() {
@@ -164,12 +174,72 @@
         renderSavedList();
     }
 
-    async function loadSavedCache() {
+    function listUrl(extra, withFilters = true) {
+        const params = new URLSearchParams();
+        Object.entries(extra).forEach(([k, v]) => { if (v !== null && v !== undefined) params.set(k, v); });
+        if (withFilters) Object.entries(filterState).forEach(([k, v]) => { if (v) params.set(k, v); });
+        return "/list_charts?" + params.toString();
+    }
+
+    async function loadSavedCache(cursor) {
+        if (cursor !== undefined) pageCursor = cursor;
         try {
-            const res = await fetch("/list_charts");
+            // the browser revalidates with the ETag; an unchanged page comes back as 304
+            const res = await fetch(listUrl({ limit: PAGE_SIZE, ...pageCursor }));
             const j = await res.json();
-            savedCache = (j && j.status === "ok" && Array.isArray(j.charts)) ? j.charts : [];
+            if (j && j.status === "ok" && Array.isArray(j.charts)) {
+                savedCache = j.charts;
+                pageInfo = { total: j.total || 0, next_after_id: j.next_after_id, prev_before_id: j.prev_before_id };
+            } else {
+                savedCache = [];
+                pageInfo = { total: 0, next_after_id: null, prev_before_id: null };
+            }
         } catch (e) { console.error(e); savedCache = []; }
+        if (pageInfo.prev_before_id === null || pageInfo.prev_before_id === undefined) pageStart = 0;
+    }
+
+    function goOlder() {
+        if (pageInfo.next_after_id === null || pageInfo.next_after_id === undefined) return;
+        pageStart += savedCache.length;
+        loadSavedCache({ after_id: pageInfo.next_after_id }).then(renderSavedList);
+    }
+
+    function goNewer() {
+        if (pageInfo.prev_before_id === null || pageInfo.prev_before_id === undefined) return;
+        loadSavedCache({ before_id: pageInfo.prev_before_id }).then(() => {
+            pageStart = Math.max(0, pageStart - savedCache.length);
+            renderSavedList();
+        });
+    }
+
+    function applyFilters() {
+        const val = (id) => ($id(id) && $id(id).value.trim()) || "";
+        filterState = {
+            q: val("sv_search_input"), gender: val("sv_filter_gender"), tag: val("sv_filter_tag"),
+            date_from: val("sv_filter_from"), date_to: val("sv_filter_to")
+        };
+        pageStart = 0;
+        loadSavedCache({}).then(renderSavedList);
+    }
+
+    function scheduleFilters() {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(applyFilters, 300);
+    }
+
+    // Every chart (no filters), page by page — for backups and CSV export
+    async function fetchAllCharts() {
+        const all = [];
+        let cursor = {};
+        for (;;) {
+            const res = await fetch(listUrl({ limit: EXPORT_PAGE_SIZE, ...cursor }, false));
+            const j = await res.json();
+            if (!j || j.status !== "ok" || !Array.isArray(j.charts)) break;
+            all.push(...j.charts);
+            if (j.next_after_id === null || j.next_after_id === undefined) break;
+            cursor = { after_id: j.next_after_id };
+        }
+        return all;
     }
 
     function handleSort(field) {
@@ -183,16 +253,12 @@
     }
 
     function renderSavedList() {
-        const searchVal = ($id("sv_search_input") && $id("sv_search_input").value.trim().toLowerCase()) || "";
+        const focusedId = document.activeElement && document.activeElement.id;
 
-        let displayList = savedCache.filter(item => {
-            let city = "";
-            if (item.place_json) {
-                if (typeof item.place_json === 'string') { try { item.place_json = JSON.parse(item.place_json); } catch (e) { } }
-                city = item.place_json.city || item.place_json.city_name || "";
-            }
-            const text = [item.name, item.date, city, item.id, item.gender, item.tag, item.comment].join(" ").toLowerCase();
-            return !searchVal || text.indexOf(searchVal) !== -1;
+        // Filtering is done by the server; sorting applies to the page shown
+        let displayList = savedCache.map(item => {
+            if (typeof item.place_json === 'string') { try { item.place_json = JSON.parse(item.place_json); } catch (e) { } }
+            return item;
         });
 
         // SORTING
@@ -219,16 +285,37 @@
         });
 
         // HTML Header
+        const fs = filterState;
+        const genderOpt = (v, label) => `<option value="${v}" ${fs.gender.toLowerCase() === v.toLowerCase() ? "selected" : ""}>${label}</option>`;
+        const filterStyle = "padding:8px;border:1px solid #ccc;border-radius:4px;font-size:14px;";
+        const hasNewer = pageInfo.prev_before_id !== null && pageInfo.prev_before_id !== undefined;
+        const hasOlder = pageInfo.next_after_id !== null && pageInfo.next_after_id !== undefined;
+        const pageBtnStyle = "padding:6px 12px;border:1px solid #999;border-radius:4px;background:#fff;font-weight:bold;";
+        const rangeText = savedCache.length
+            ? `${pageStart + 1}–${pageStart + savedCache.length} of ${pageInfo.total}`
+            : `0 of ${pageInfo.total}`;
+
         let html = `
-            <div style="padding:10px;background:#fff;position:sticky;top:0;border-bottom:1px solid #eee;display:flex;gap:10px;z-index:5;align-items:center;">
-                <input type="text" id="sv_search_input" placeholder="🔍 Search Name, City, Tag..." value="${escapeHtml(searchVal)}" 
-                       style="flex:1;padding:10px;border:1px solid #ccc;border-radius:4px;font-size:16px;">
+            <div style="padding:10px;background:#fff;position:sticky;top:0;border-bottom:1px solid #eee;display:flex;gap:10px;z-index:5;align-items:center;flex-wrap:wrap;">
+                <input type="text" id="sv_search_input" placeholder="🔍 Search Name, City, Tag, Notes..." value="${escapeHtml(fs.q)}" 
+                       style="flex:1;min-width:180px;padding:10px;border:1px solid #ccc;border-radius:4px;font-size:16px;">
+                <select id="sv_filter_gender" style="${filterStyle}">
+                    ${genderOpt("", "All")}${genderOpt("Male", "Male")}${genderOpt("Female", "Female")}
+                </select>
+                <input type="text" id="sv_filter_tag" placeholder="Tag" value="${escapeHtml(fs.tag)}" style="${filterStyle}width:90px;">
+                <input type="text" id="sv_filter_from" placeholder="From YYYY" value="${escapeHtml(fs.date_from)}" style="${filterStyle}width:95px;" title="Birth date from (YYYY or YYYY-MM-DD)">
+                <input type="text" id="sv_filter_to" placeholder="To YYYY" value="${escapeHtml(fs.date_to)}" style="${filterStyle}width:95px;" title="Birth date to (YYYY or YYYY-MM-DD)">
                 
                 <button onclick="window.savedViewer.refresh()" 
                         style="padding:10px 15px;cursor:pointer;background:#007bff;color:white;border:none;border-radius:4px;font-weight:bold;font-size:14px;white-space:nowrap;">
                     🔄 Refresh
                 </button>
             </div>
+            <div style="padding:6px 10px;background:#fafafa;border-bottom:1px solid #eee;display:flex;gap:10px;align-items:center;justify-content:flex-end;font-size:13px;">
+                <button onclick="window.savedViewer.newer()" style="${pageBtnStyle}cursor:${hasNewer ? "pointer" : "default"};opacity:${hasNewer ? 1 : 0.4};" ${hasNewer ? "" : "disabled"}>‹ Newer</button>
+                <span style="color:#555;white-space:nowrap;">${rangeText}</span>
+                <button onclick="window.savedViewer.older()" style="${pageBtnStyle}cursor:${hasOlder ? "pointer" : "default"};opacity:${hasOlder ? 1 : 0.4};" ${hasOlder ? "" : "disabled"}>Older ›</button>
+            </div>
             
             <div style="overflow-x:auto; -webkit-overflow-scrolling: touch;">
                 <table style="width:100%;border-collapse:collapse;font-size:13px;min-width:900px;">
@@ -297,13 +384,21 @@
 
         const win = createDraggableWindow("sv_main_win", "📂 சேமிக்கப்பட்ட ஜாதகங்கள்", html);
 
-        // Setup Search
-        const input = win.querySelector("#sv_search_input");
+        // Setup Search + filters (server side, debounced)
+        ["sv_search_input", "sv_filter_tag", "sv_filter_from", "sv_filter_to"].forEach(id => {
+            const f = win.querySelector("#" + id);
+            if (f) f.oninput = scheduleFilters;
+        });
+        const genderSel = win.querySelector("#sv_filter_gender");
+        if (genderSel) genderSel.onchange = applyFilters;
+
+        const input = win.querySelector("#" + (focusedId && focusedId.startsWith("sv_filter_") ? focusedId : "sv_search_input"));
         if (input) {
             input.focus();
-            input.setSelectionRange(input.value.length, input.value.length);
-            input.oninput = () => renderSavedList();
+            if (input.setSelectionRange && input.type === "text") input.setSelectionRange(input.value.length, input.value.length);
         }
+        const body = win.querySelector(".sv-win-body");
+        if (body) body.scrollTop = 0;
     }
 
     function renderTh(label, field) {
@@ -312,20 +407,22 @@
         return `<th onclick="window.savedViewer.sort('${field}')" style="padding:10px;text-align:left;cursor:pointer;border-bottom:2px solid #ddd;white-space:nowrap;min-width:80px" title="Sort by ${label}">${label}${arrow}</th>`;
     }
 
-    // --- 3. EXPORT / IMPORT (Unchanged Logic) ---
-    function downloadJSON() {
-        if (!savedCache.length) { alert("No charts to backup."); return; }
-        const dataStr = "data:text/json;charset=utf-8," + encodeURIComponent(JSON.stringify(savedCache, null, 2));
+    // --- 3. EXPORT / IMPORT (all charts, fetched page by page) ---
+    async function downloadJSON() {
+        const allCharts = await fetchAllCharts();
+        if (!allCharts.length) { alert("No charts to backup."); return; }
+        const dataStr = "data:text/json;charset=utf-8," + encodeURIComponent(JSON.stringify(allCharts, null, 2));
         const dlAnchor = document.createElement('a');
         dlAnchor.setAttribute("href", dataStr);
         dlAnchor.setAttribute("download", "charts_backup.json");
         document.body.appendChild(dlAnchor); dlAnchor.click(); dlAnchor.remove();
     }
 
-    function downloadCSV() {
-        if (!savedCache.length) { alert("No charts to export."); return; }
+    async function downloadCSV() {
+        const allCharts = await fetchAllCharts();
+        if (!allCharts.length) { alert("No charts to export."); return; }
         const headers = ["ID", "Name", "Gender", "Date", "Time", "City", "Lat", "Lon", "Tag", "Notes", "Saved_On"];
-        const rows = savedCache.map(c => {
+        const rows = allCharts.map(c => {
             let pj = {};
             if (c.place_json) {
                 if (typeof c.place_json === 'string') { try { pj = JSON.parse(c.place_json); } catch (e) { } }
@@ -340,7 +437,7 @@
             return [
                 c.id, esc(c.name), esc(c.gender), esc(c.date), esc(c.time),
                 esc(pj.city || pj.city_name), esc(pj.lat), esc(pj.lon),
-                esc(c.tag), esc(c.comment), esc(c.saved_at || c.updated_at)
+                esc(c.tag), esc(c.comment), esc(c.saved_on || c.saved_at || c.updated_at)
             ].join(",");
         });
         const csvContent = "data:text/csv;charset=utf-8," + [headers.join(","), ...rows].join("\n");
@@ -382,7 +479,7 @@
                         name: c.name, date: c.date, time: c.time,
                         place: (typeof c.place_json === 'object') ? JSON.stringify(c.place_json) : c.place_json,
                         gender: c.gender || "male", tag: c.tag || "", comment: c.comment || "",
-                        saved_at: c.saved_at || c.updated_at
+                        saved_at: c.saved_at || c.saved_on || c.updated_at
                     };
                     try {
                         await fetch("/save_chart", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(payload) });
@@ -606,6 +703,8 @@
         preview: previewSavedChart,
         delete: deleteSavedChart,
         sort: handleSort,
+        older: goOlder,
+        newer: goNewer,
         refresh: () => { loadSavedCache().then(renderSavedList); },
         downloadJSON: downloadJSON,
         downloadCSV: downloadCSV,
@@ -57,6 +57,15 @@
         "ஆயில்யம்": "புதன்", "கேட்டை": "புதன்", "ரேவதி": "புதன்"
     };
 
+    // /transit_series rows: nakshatra order and their lords (Ketu, Venus, Sun, ... repeating)
+    const tamilStars = [
+        "அசுவினி", "பரணி", "கார்த்திகை", "ரோகிணி", "மிருகசீரிடம்", "திருவாதிரை", "புனர்பூசம்", "பூசம்", "ஆயில்யம்",
+        "மகம்", "பூரம்", "உத்திரம்", "அஸ்தம்", "சித்திரை", "சுவாதி", "விசாகம்", "அனுஷம்", "கேட்டை",
+        "மூலம்", "பூராடம்", "உத்திராடம்", "திருவோணம்", "அவிட்டம்", "சதயம்", "பூரட்டாதி", "உத்திரட்டாதி", "ரேவதி"
+    ];
+    const starLordOrder = ["கேது", "சுக்கிரன்", "சூரியன்", "சந்திரன்", "செவ்வாய்", "ராகு", "குரு", "சனி", "புதன்"];
+    const SCRUB_DAYS = 182;   // slider covers today ± this many days, one sample per day
+
     const planetColors = {
         "சூரியன்": "#e67e22", "சந்திரன்": "#3498db", "செவ்வாய்": "#ff4d4d", "புதன்": "#27ae60", "குரு": "#f1c40f",
         "சுக்கிரன்": "#f78fb3", "சனி": "#2c3e50", "ராகு": "#8e44ad", "கேது": "#95a5a6", "மாந்தி": "#34495e", "லக்னம்": "#ff7f00"
@@ -97,6 +106,8 @@
   .notes-panel{position:absolute;width:360px;background:#fff;border:2px solid #ddd;border-radius:8px;box-shadow:0 8px 24px rgba(0,0,0,0.12);z-index:10002;padding:8px;overflow:auto;}
   .notes-actions{display:flex;gap:8px;justify-content:flex-end;margin-top:8px;}
   .tiny-btn{padding:4px 6px;font-size:12px;border-radius:6px;cursor:pointer;}
+  #transitScrub{display:flex;align-items:center;gap:6px;padding:6px 8px 0;font-size:12px;}
+  #transitScrub input[type="range"]{flex:1;}
   
   /* MOBILE FIX: Removed !important from top/left so drag works */
   @media (max-width: 600px) {
@@ -127,6 +138,7 @@
             historyBox.innerHTML = `<h4>Transit History</h4><div>Loading...</div>`;
             await renderHistory();
             await renderTransit();
+            loadScrubSeries();
         } else container.style.display = "none";
     });
 
@@ -143,6 +155,12 @@
              wrap.style.display = "none";
         });
 
+        const scrub = document.createElement("div"); scrub.id = "transitScrub";
+        scrub.innerHTML = `<input type="range" id="transitSlider" min="0" max="${2 * SCRUB_DAYS}" value="${SCRUB_DAYS}" disabled>
+                           <span id="transitSliderLabel">Loading...</span>`;
+        box.appendChild(scrub);
+        scrub.querySelector("#transitSlider").addEventListener("input", e => renderSeriesSample(parseInt(e.target.value)));
+
         const body = document.createElement("div"); body.id = "transitBody"; body.style.padding = "8px"; box.appendChild(body);
         historyBox = document.createElement("div"); historyBox.id = HISTORY_ID;
         wrap.appendChild(box);
@@ -197,15 +215,115 @@
         return { year: y, month: m, day: d, hour: h, minute: mi, second: s, lat, lon, tz, ayanamsa: ay, chartType: "rasi" };
     }
 
+    function localStamp(d) {
+        const p = n => String(n).padStart(2, "0");
+        return `${d.getFullYear()}-${p(d.getMonth() + 1)}-${p(d.getDate())}T${p(d.getHours())}:${p(d.getMinutes())}`;
+    }
+
+    // One /transit_series request for many moments. Long ranges arrive as NDJSON
+    // (header line + chunks of column arrays), which are joined back together.
+    async function fetchSeries(params) {
+        const res = await fetch("/transit_series", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(params) });
+        if (!(res.headers.get("Content-Type") || "").includes("ndjson")) {
+            const j = await res.json();
+            if (!j || j.status !== "ok") throw new Error((j && j.message) || "Bad response");
+            return j;
+        }
+        const lines = (await res.text()).split("\n").filter(Boolean).map(l => JSON.parse(l));
+        const head = lines.shift();
+        if (!head || head.status !== "ok") throw new Error((head && head.message) || "Bad response");
+        const out = { ...head, lon: {}, speed: {}, sign: {}, lagna: { lon: [], sign: [] } };
+        lines.forEach(part => {
+            if (part.status === "error") throw new Error(part.message);
+            ["lon", "speed", "sign"].forEach(k => Object.keys(part[k]).forEach(g => {
+                out[k][g] = (out[k][g] || []).concat(part[k][g]);
+            }));
+            if (part.lagna) ["lon", "sign"].forEach(k => { out.lagna[k] = out.lagna[k].concat(part.lagna[k]); });
+        });
+        return out;
+    }
+
+    function dmsInSign(lon) {
+        const p = n => String(n).padStart(2, "0");
+        const deg = lon % 30, d = Math.floor(deg), mf = (deg - d) * 60, m = Math.floor(mf);
+        return `${p(d)}:${p(m)}:${p(Math.round((mf - m) * 60))}`;
+    }
+
+    // Sample i of a series as the rows /generate_chart returns (what buildGrid reads)
+    function seriesRows(s, i) {
+        const row = (name, lon, sign, retro) => {
+            const star = Math.floor(lon / (360 / 27)) % 27;
+            return {
+                name, rasi: tamilRasis[sign], rasi_no: sign + 1, dms: dmsInSign(lon),
+                deg_in_sign: +(lon % 30).toFixed(6), retro_flag: retro ? "வ" : "",
+                nakshatra: tamilStars[star], star_lord: starLordOrder[star % 9],
+                pada: Math.floor((lon % (360 / 27)) / (360 / 108)) + 1
+            };
+        };
+        const rows = [];
+        if (s.lagna && s.lagna.lon.length) rows.push(row("லக்னம்", s.lagna.lon[i], s.lagna.sign[i], false));
+        s.grahas.forEach((g, k) => rows.push(row(s.names[k], s.lon[g][i], s.sign[g][i], s.speed[g][i] < 0)));
+        return rows;
+    }
+
+    let scrubSeries = null, scrubStart = null;
+
+    async function loadScrubSeries() {
+        const slider = document.getElementById("transitSlider");
+        const label = document.getElementById("transitSliderLabel");
+        if (!slider) return;
+        const base = buildPayload();
+        scrubStart = new Date(Date.now() - SCRUB_DAYS * 86400000);
+        const end = new Date(scrubStart.getTime() + 2 * SCRUB_DAYS * 86400000);
+        try {
+            scrubSeries = await fetchSeries({
+                start: localStamp(scrubStart), end: localStamp(end), step: "1d",
+                lat: base.lat, lon: base.lon, tz: base.tz, ayanamsa: base.ayanamsa
+            });
+            slider.disabled = false;
+            label.textContent = "Today";
+        } catch (e) {
+            console.error("loadScrubSeries error:", e);
+            label.textContent = "❌";
+        }
+    }
+
+    function renderSeriesSample(i) {
+        const b = document.getElementById("transitBody");
+        if (!b || !scrubSeries || i >= scrubSeries.count) return;
+        const day = new Date(scrubStart.getTime() + i * 86400000);
+        document.getElementById("transitSliderLabel").textContent = day.toLocaleDateString();
+        window.lastTransitData = seriesRows(scrubSeries, i);
+        window.lastTransitMoment = day.toISOString();
+        b.innerHTML = buildGrid(window.lastTransitData);
+    }
+
     async function renderTransit(opts = {}) {
         const b = document.getElementById("transitBody");
         if (!b) return;
         const payload = buildPayload(opts);
+        if (opts.timestamp) {
+            // a single moment: one sample of /transit_series, no full chart needed
+            try {
+                const s = await fetchSeries({
+                    start: localStamp(new Date(opts.timestamp)), step: "1d",
+                    lat: payload.lat, lon: payload.lon, tz: payload.tz, ayanamsa: payload.ayanamsa
+                });
+                window.lastTransitData = seriesRows(s, 0);
+                window.lastTransitMoment = new Date(opts.timestamp).toISOString();
+                b.innerHTML = buildGrid(window.lastTransitData);
+            } catch (e) {
+                console.error("renderTransit error:", e);
+                b.innerHTML = `<div style="color:#b22222;font-weight:600;">❌ Transit load failed</div>`;
+            }
+            return;
+        }
         try {
             const res = await fetch("/generate_chart", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(payload) });
             const data = await res.json();
             if (!data || data.status !== "ok") throw new Error("Bad response");
             window.lastTransitData = data.rows || [];
+            window.lastTransitMoment = new Date().toISOString();
             b.innerHTML = buildGrid(window.lastTransitData);
         } catch (e) {
             console.error("renderTransit error:", e);
@@ -271,32 +389,40 @@
         return html;
     }
 
-    async function renderHistory() {
+    async function renderHistory(page = 1) {
         const hb = document.getElementById(HISTORY_ID);
         if (!hb) return;
         const chartId = parseInt(window.currentChartId) || 0;
         try {
-            const res = await fetch(`/transit_history/${chartId}`);
+            const res = await fetch(`/transit_history/${chartId}?page=${page}`);
             const j = await res.json();
             const rows = (j && j.status === "ok" && Array.isArray(j.history)) ? j.history.reverse() : [];
+            const total = j.total || rows.length, pages = j.pages || 1;
+            // rows are oldest-first within the page; versions count from the oldest snapshot overall
+            const firstVersion = total - (page - 1) * (j.per_page || rows.length) - rows.length + 1;
             hb.innerHTML = `
-        <h4>Transit History — ${rows.length} entries</h4>
+        <h4>Transit History — ${total} entries</h4>
         <input id="transitSearch" type="text" placeholder="🔍 Search notes or date..." style="width:100%;padding:6px;margin-bottom:6px;border:1px solid #ccc;border-radius:6px;">
         <div id="historyTableWrap"></div>
         <div style="text-align:right;margin-top:8px;">
+          <button id="olderBtn" ${page >= pages ? "disabled" : ""}>◀ Older</button>
+          <span style="font-size:12px;margin:0 4px;">${page} / ${pages}</span>
+          <button id="newerBtn" ${page <= 1 ? "disabled" : ""}>Newer ▶</button>
           <button id="refreshBtn">🔄 Refresh</button>
           <button id="saveBtn">💾 Save Snapshot</button>
         </div>
       `;
             const wrap = hb.querySelector("#historyTableWrap");
-            wrap.innerHTML = buildHistoryTable(rows);
+            wrap.innerHTML = buildHistoryTable(rows, firstVersion);
             document.getElementById("transitSearch").addEventListener("input", e => {
                 const q = e.target.value.toLowerCase();
                 const filtered = rows.filter(r => (r.note || "").toLowerCase().includes(q) || (r.timestamp || "").toLowerCase().includes(q) || (r.location || "").toLowerCase().includes(q));
-                wrap.innerHTML = buildHistoryTable(filtered);
+                wrap.innerHTML = buildHistoryTable(filtered, firstVersion);
                 attachHistoryListeners(filtered, chartId);
             });
-            document.getElementById("refreshBtn").onclick = () => renderHistory();
+            document.getElementById("olderBtn").onclick = () => renderHistory(page + 1);
+            document.getElementById("newerBtn").onclick = () => renderHistory(page - 1);
+            document.getElementById("refreshBtn").onclick = () => renderHistory(page);
             document.getElementById("saveBtn").onclick = async () => { const ok = await saveNewSnapshot(chartId, ""); alert(ok ? "✅ Snapshot saved" : "❌ Save failed"); await renderHistory(); };
             attachHistoryListeners(rows, chartId);
         } catch (e) {
@@ -305,14 +431,14 @@
         }
     }
 
-    function buildHistoryTable(rows) {
+    function buildHistoryTable(rows, firstVersion = 1) {
         let html = `<table><thead><tr><th>Version</th><th>Timestamp</th><th>Notes</th><th>Action</th></tr></thead><tbody>`;
         (rows || []).forEach((r, idx) => {
             const dt = new Date(r.timestamp || new Date().toISOString());
             const local = dt.toISOString().slice(0, 16);
             const note = r.note || "";
             html += `<tr>
-        <td>Version ${idx + 1}<br><button id="notes-${r.id}" class="tiny-btn" style="margin-top:4px;">Add Notes</button></td>
+        <td>Version ${firstVersion + idx}<br><button id="notes-${r.id}" class="tiny-btn" style="margin-top:4px;">Add Notes</button></td>
         <td><input type="datetime-local" id="ts-${r.id}" value="${local}"></td>
         <td><input id="note-${r.id}" type="text" value="${note}" placeholder="Short note"></td>
         <td style="white-space:nowrap;">
@@ -370,12 +496,11 @@
                 panel.innerHTML = `<div class="preview-header">Transit — ${tsEl.value}<div class="preview-close">✕</div></div><div style="padding:8px;text-align:center;">Loading...</div>`;
                 containerEl.appendChild(panel);
                 panel.querySelector(".preview-close").onclick = () => panel.remove();
-                const res = await fetch("/generate_chart", {
-                    method: "POST", headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify(buildPayload({ timestamp: new Date(tsEl.value).toISOString() }))
-                });
+                // positions are regenerated from the snapshot's moment and place
+                const res = await fetch(`/transit_snapshot/${r.id}`);
                 const data = await res.json();
-                panel.lastChild.innerHTML = data.status === "ok" ? buildGrid(data.rows) : "Error loading transit";
+                panel.lastChild.innerHTML = data.status !== "ok" ? "Error loading transit"
+                    : buildGrid(data.series ? seriesRows(data.series, 0) : data.rows);
             };
 
             if (notesBtn) notesBtn.onclick = () => {
@@ -417,9 +542,12 @@
                 await renderTransit({ chartId: currentId });
             }
 
+            // the moment shown + place; the server regenerates the positions on view
+            const place = buildPayload();
             const payload = {
-                chart_id: currentId,  
-                transit_data: window.lastTransitData,
+                chart_id: currentId,
+                timestamp: window.lastTransitMoment || new Date().toISOString(),
+                lat: place.lat, lon: place.lon, tz: place.tz, ayanamsa: place.ayanamsa,
                 location: document.getElementById("placeSearch")?.value || "Chennai",
                 note
             };
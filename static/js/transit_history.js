@@ -7,6 +7,8 @@
     const HISTORY_CONTAINER_ID = "transitHistoryBox";
     const CONTAINER_ID = "transitContainer";
     const DEFAULT_LOCATION = "Chennai";
+    const TAMIL_RASIS = ["மேஷம்", "ரிஷபம்", "மிதுனம்", "கடகம்", "சிம்மம்", "கன்னி",
+        "துலாம்", "விருச்சிகம்", "தனுசு", "மகரம்", "கும்பம்", "மீனம்"];
 
     // Small style specific to history panel
     const css = `
@@ -55,7 +57,7 @@
         }
     };
 
-    async function renderTransitHistory() {
+    async function renderTransitHistory(page = 1) {
         const hb = ensurePanel();
         const chartId = parseInt(window.currentChartId || 0);
         if (!chartId) {
@@ -63,15 +65,19 @@
             return;
         }
         try {
-            const res = await fetch(`/transit_history/${chartId}`);
+            const res = await fetch(`/transit_history/${chartId}?page=${page}`);
             const j = await res.json();
             const rows = (j && j.status === "ok" && Array.isArray(j.history)) ? j.history.reverse() : [];
+            const pages = j.pages || 1;
             hb.innerHTML = `
-                <h4>Transit History — ${rows.length} entries</h4>
+                <h4>Transit History — ${j.total || rows.length} entries</h4>
                 <input id="transitSearch" type="text" placeholder="🔍 Search notes or date..."
                        style="width:100%;padding:6px;margin-bottom:6px;border:1px solid #ccc;border-radius:6px;">
                 <div id="historyTableWrap"></div>
                 <div style="text-align:right;margin-top:8px;">
+                    <button id="olderBtn" ${page >= pages ? "disabled" : ""}>◀ Older</button>
+                    <span style="font-size:12px;margin:0 4px;">${page} / ${pages}</span>
+                    <button id="newerBtn" ${page <= 1 ? "disabled" : ""}>Newer ▶</button>
                     <button id="refreshBtn">🔄 Refresh</button>
                     <button id="saveBtn">💾 Save Snapshot</button>
                 </div>
@@ -79,7 +85,9 @@
             const wrap = hb.querySelector("#historyTableWrap");
             wrap.innerHTML = buildTable(rows);
 
-            document.getElementById("refreshBtn").onclick = renderTransitHistory;
+            document.getElementById("olderBtn").onclick = () => renderTransitHistory(page + 1);
+            document.getElementById("newerBtn").onclick = () => renderTransitHistory(page - 1);
+            document.getElementById("refreshBtn").onclick = () => renderTransitHistory(page);
             document.getElementById("saveBtn").onclick = async () => {
                 const ok = await saveSnapshot(chartId, "");
                 alert(ok ? "✅ Snapshot saved" : "❌ Save failed");
@@ -167,16 +175,11 @@
                 document.body.appendChild(panel);
                 panel.querySelector(".preview-close").onclick = () => panel.remove();
 
-                const res = await fetch("/generate_chart", {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify({
-                        ...buildPayload({ timestamp: new Date(tsEl.value).toISOString() }),
-                        chartType: "rasi"
-                    })
-                });
+                // positions are regenerated from the snapshot's moment and place
+                const res = await fetch(`/transit_snapshot/${r.id}`);
                 const data = await res.json();
-                panel.lastChild.innerHTML = data.status === "ok" ? buildGrid(data.rows) : "Error loading transit";
+                panel.lastChild.innerHTML = data.status !== "ok" ? "Error loading transit"
+                    : buildGrid(data.series ? seriesRows(data.series) : data.rows);
             };
         });
     }
@@ -184,9 +187,12 @@
     async function saveSnapshot(chartId, note) {
         try {
             if (!window.lastTransitData || window.lastTransitData.length === 0) return false;
+            const place = buildPayload();
             const payload = {
                 chart_id: chartId,
-                transit_data: window.lastTransitData,
+                timestamp: window.lastTransitMoment || new Date().toISOString(),
+                lat: place.lat, lon: place.lon, tz: place.tz,
+                ayanamsa: document.getElementById("ayanamsa")?.value || "lahiri",
                 location: document.getElementById("placeSearch")?.value || DEFAULT_LOCATION,
                 note
             };
@@ -217,9 +223,16 @@
         return { year: y, month: m, day: d, hour: h, minute: mi, second: s, lat, lon, tz };
     }
 
+    // First sample of a /transit_series response as name + rasi rows
+    function seriesRows(s) {
+        const rows = [];
+        if (s.lagna && s.lagna.sign.length) rows.push({ name: "லக்னம்", rasi: TAMIL_RASIS[s.lagna.sign[0]] });
+        s.grahas.forEach((g, k) => rows.push({ name: s.names[k], rasi: TAMIL_RASIS[s.sign[g][0]] }));
+        return rows;
+    }
+
     function buildGrid(rows) {
-        const tamilRasis = ["மேஷம்", "ரிஷபம்", "மிதுனம்", "கடகம்", "சிம்மம்", "கன்னி",
-            "துலாம்", "விருச்சிகம்", "தனுசு", "மகரம்", "கும்பம்", "மீனம்"];
+        const tamilRasis = TAMIL_RASIS;
         const grid = {}; tamilRasis.forEach(r => grid[r] = []);
         (rows || []).forEach(r => {
             const name = r.name || r.graha_ta || "";
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+storage.py — POOLED SQLITE CONNECTIONS FOR EVERY APP DATABASE
+-------------------------------------------------------------
+charts.db, dasha.db, events.db, the transit history, match_history.db and
+the small caches all open their connections here instead of calling
+sqlite3.connect() per request:
+
+- connections are pooled per database file; conn.close() hands the
+  connection back (uncommitted work is rolled back, as a real close
+  would), so a request no longer pays for opening the file, reading the
+  schema and setting the pragmas;
+- each connection keeps its compiled statements (STATEMENT_CACHE), so the
+  same query text is prepared once per connection, not once per request;
+- every database runs in WAL mode with the PRAGMAS below: readers never
+  wait for a writer, and a writer waits (busy_timeout) for another writer
+  instead of failing with "database is locked".
+
+A checked-out connection belongs to one thread until it is closed.
+Usage is the same as sqlite3:
+
+    conn = storage.connect(CHARTS_DB)
+    conn.row_factory = sqlite3.Row        # applies to this checkout only
+    rows = conn.execute("SELECT ...").fetchall()
+    conn.commit()
+    conn.close()
+
+CLI
+    python storage.py --bench             # throughput before/after, concurrent load
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+BUSY_TIMEOUT = 10.0          # seconds a writer waits for the write lock
+STATEMENT_CACHE = 256        # prepared statements kept per connection
+MAX_IDLE = 8                 # idle connections kept per database file
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",       # fsync at checkpoints only; safe with WAL
+    "PRAGMA cache_size=-16384",        # 16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",      # reads straight from a 128 MB file mapping
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}",
+)
+
+_pools = {}                  # (pid, path) -> [idle sqlite3.Connection]
+_lock = threading.Lock()
+_stats = {"opened": 0, "reused": 0}
+
+
+def _open(path):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    raw = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                          cached_statements=STATEMENT_CACHE)
+    for pragma in PRAGMAS:
+        try:
+            raw.execute(pragma)
+        except sqlite3.DatabaseError:
+            pass   # e.g. WAL on a read-only file system: keep the default journal
+    return raw
+
+
+def _release(path, raw):
+    try:
+        if raw.in_transaction:
+            raw.rollback()
+    except sqlite3.Error:
+        raw.close()
+        return
+    with _lock:
+        idle = _pools.setdefault((os.getpid(), path), [])
+        if len(idle) < MAX_IDLE:
+            idle.append(raw)
+            return
+    raw.close()
+
+
+class PooledConnection:
+    """
+    sqlite3.Connection stand-in for one checkout. row_factory is kept here
+    and applied to every cursor, so one caller's setting never leaks into
+    the next checkout of the same connection.
+    """
+
+    __slots__ = ("_raw", "_path", "row_factory")
+
+    def __init__(self, raw, path):
+        self._raw = raw
+        self._path = path
+        self.row_factory = None
+
+    def _conn(self):
+        if self._raw is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return self._raw
+
+    def cursor(self, factory=None):
+        raw = self._conn()
+        cur = raw.cursor(factory) if factory else raw.cursor()
+        cur.row_factory = self.row_factory
+        return cur
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def commit(self):
+        self._conn().commit()
+
+    def rollback(self):
+        self._conn().rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn().in_transaction
+
+    @property
+    def total_changes(self):
+        return self._conn().total_changes
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._conn(), name)
+
+    def __enter__(self):
+        self._conn().__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn().__exit__(*exc)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            _release(self._path, raw)
+
+    def __del__(self):
+        # a route that forgot close() (or raised before it) still gives it back
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def connect(path):
+    """A pooled connection to the database file at `path` (created if missing)."""
+    path = os.path.abspath(path)
+    key = (os.getpid(), path)
+    with _lock:
+        idle = _pools.get(key)
+        raw = idle.pop() if idle else None
+        _stats["reused" if raw is not None else "opened"] += 1
+    if raw is None:
+        raw = _open(path)
+    return PooledConnection(raw, path)
+
+
+def close_all():
+    """Close every idle connection (tests, shutdown, before replacing a db file)."""
+    with _lock:
+        pools = list(_pools.items())
+        _pools.clear()
+    for (pid, _), idle in pools:
+        if pid == os.getpid():
+            for raw in idle:
+                raw.close()
+
+
+def pool_info():
+    with _lock:
+        idle = {path: len(c) for (pid, path), c in _pools.items() if pid == os.getpid()}
+    return {**_stats, "idle": idle}
+
+
+# -------------------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------------------
+_BENCH_SCHEMA = """
+    CREATE TABLE charts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT, date TEXT, time TEXT, place_json TEXT, ayanamsa TEXT,
+        comment TEXT, data_json TEXT, gender TEXT, tag TEXT, updated_at TEXT
+    )
+"""
+
+
+def _bench_db(folder, rows):
+    path = os.path.join(folder, "bench.db")
+    conn = sqlite3.connect(path)
+    conn.execute(_BENCH_SCHEMA)
+    blob = json.dumps({"html": "x" * 4000})
+    conn.executemany(
+        "INSERT INTO charts (name, date, time, place_json, ayanamsa, comment, data_json, gender, tag) "
+        "VALUES (?, ?, ?, ?, 'lahiri', '', ?, 'Male', 'Client')",
+        [(f"Client {i}", f"19{50 + i % 50}-01-01", "06:00:00", '{"lat": 13.08, "lon": 80.27, "tz": 5.5}', blob)
+         for i in range(rows)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _run_load(opener, path, threads, seconds, write_ratio):
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    count_lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        reads = writes = locked = 0
+        while time.perf_counter() < stop:
+            try:
+                conn = opener(path)
+                try:
+                    if rnd.random() < write_ratio:
+                        conn.execute("UPDATE charts SET comment = ?, updated_at = datetime('now') WHERE id = ?",
+                                     (f"note {rnd.random()}", rnd.randint(1, 2000)))
+                        conn.commit()
+                        writes += 1
+                    else:
+                        conn.execute("SELECT id, name, date, time, tag FROM charts WHERE id = ?",
+                                     (rnd.randint(1, 2000),)).fetchone()
+                        conn.execute("SELECT id, name FROM charts ORDER BY id DESC LIMIT 50").fetchall()
+                        reads += 1
+                finally:
+                    conn.close()
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+        with count_lock:
+            counts["reads"] += reads
+            counts["writes"] += writes
+            counts["locked"] += locked
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    secs = time.perf_counter() - t0
+    return {"reads_per_sec": round(counts["reads"] / secs, 1),
+            "writes_per_sec": round(counts["writes"] / secs, 1),
+            "locked_errors": counts["locked"]}
+
+
+def benchmark(threads=8, seconds=3.0, write_ratio=0.2, rows=2000):
+    """Same mixed load through a fresh rollback-journal connection per op, then through the pool."""
+    folder = tempfile.mkdtemp(prefix="storage_bench_")
+    try:
+        path = _bench_db(folder, rows)
+        before = _run_load(lambda p: sqlite3.connect(p), path, threads, seconds, write_ratio)
+        after = _run_load(connect, path, threads, seconds, write_ratio)
+        close_all()
+        return {"threads": threads, "seconds": seconds, "write_ratio": write_ratio,
+                "before": before, "after": after}
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Pooled SQLite storage layer")
+    ap.add_argument("--bench", action="store_true", help="concurrent read/write throughput, before vs after")
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--write-ratio", type=float, default=0.2)
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(benchmark(args.threads, args.seconds, args.write_ratio), indent=1))
+    else:
+        ap.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+sun_times.py — ONE CACHED SUNRISE / SUNSET SERVICE
+--------------------------------------------------
+Maandhi, panchangam, the panchangam calendar and the chart comparison all
+need the same three numbers for a civil date and place: sunrise, the
+following sunset and the sunrise after that. They come from here.
+
+Lookups go through an in-memory LRU, then a small SQLite table
+(data/sun_times.db, pooled connections from storage.py), and only then
+swe.rise_trans. The key is
+(date, lat/lon rounded to GEO_DECIMALS, tz, flags); the rounding (~100 m)
+moves sunrise by well under a second and lets every chart from the same
+town share one entry.
+
+FLAGS
+    DISC_CENTER   centre of the disc, with refraction (maandhi)
+    HINDU_RISING  centre of the disc, no refraction (panchangam — matches
+                  the printed Tamil panchangam times)
+"""
+
+import os
+import sqlite3
+from collections import namedtuple
+from functools import lru_cache
+
+import swisseph as swe
+
+import storage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB = os.path.join(BASE_DIR, "data", "sun_times.db")
+
+DISC_CENTER = swe.BIT_DISC_CENTER
+HINDU_RISING = swe.BIT_DISC_CENTER | swe.BIT_NO_REFRACTION
+
+GEO_DECIMALS = 3
+
+# JD UT values; None when the event does not happen (polar day / night)
+SunTimes = namedtuple("SunTimes", ["rise", "set", "next_rise"])
+
+_stats = {"db_hits": 0, "computed": 0}
+
+
+def _db():
+    conn = storage.connect(CACHE_DB)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sun_times (
+            key TEXT PRIMARY KEY,
+            rise REAL, sset REAL, next_rise REAL
+        )
+    """)
+    return conn
+
+
+def _event(jd_from, rsmi, lat, lon):
+    try:
+        res, tret = swe.rise_trans(jd_from, swe.SUN, rsmi, [lon, lat, 0.0])
+    except Exception:
+        return None
+    return tret[0] if res == 0 and tret[0] > 0 else None
+
+
+def compute_sun_times(year, month, day, lat, lon, tz, flags=DISC_CENTER):
+    """Uncached: first sunrise after local midnight, then sunset, then next sunrise."""
+    jd_mid = swe.julday(year, month, day, 0.0) - tz / 24.0
+    rise = _event(jd_mid, swe.CALC_RISE | flags, lat, lon)
+    sset = _event(rise or jd_mid, swe.CALC_SET | flags, lat, lon)
+    next_rise = _event((sset or rise or jd_mid) + 1e-4, swe.CALC_RISE | flags, lat, lon)
+    return SunTimes(rise, sset, next_rise)
+
+
+@lru_cache(maxsize=8192)
+def _cached(year, month, day, lat, lon, tz, flags):
+    key = f"{year:04d}-{month:02d}-{day:02d}|{lat:.{GEO_DECIMALS}f}|{lon:.{GEO_DECIMALS}f}|{tz:g}|{flags}"
+    try:
+        conn = _db()
+        row = conn.execute("SELECT rise, sset, next_rise FROM sun_times WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        conn, row = None, None
+    if row:
+        conn.close()
+        _stats["db_hits"] += 1
+        return SunTimes(*row)
+
+    times = compute_sun_times(year, month, day, lat, lon, tz, flags)
+    _stats["computed"] += 1
+    if conn is not None:
+        try:
+            conn.execute("INSERT OR REPLACE INTO sun_times (key, rise, sset, next_rise) VALUES (?, ?, ?, ?)",
+                         (key, *times))
+            conn.commit()
+        except sqlite3.Error:
+            pass   # read-only disk etc. — the memory cache still works
+        finally:
+            conn.close()
+    return times
+
+
+def sun_times(year, month, day, lat, lon, tz, flags=DISC_CENTER):
+    """SunTimes(rise, set, next_rise) in JD UT for the local civil date."""
+    return _cached(int(year), int(month), int(day),
+                   round(float(lat), GEO_DECIMALS), round(float(lon), GEO_DECIMALS),
+                   float(tz), int(flags))
+
+
+def cache_info():
+    return {"memory": _cached.cache_info()._asdict(), **_stats}
+
+
+def clear_memory_cache():
+    _cached.cache_clear()
+
+
+if __name__ == "__main__":
+    from panchangam import jd_to_local_hms
+    for label, flags in (("disc centre", DISC_CENTER), ("hindu rising", HINDU_RISING)):
+        st = sun_times(2025, 10, 18, 13.0827, 80.2707, 5.5, flags)
+        print(f"Chennai 2025-10-18 {label:12s} rise {jd_to_local_hms(st.rise, 5.5)} "
+              f"set {jd_to_local_hms(st.set, 5.5)} next {jd_to_local_hms(st.next_rise, 5.5)}")
+    print(cache_info())
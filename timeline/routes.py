@@ -1,22 +1,15 @@
 from flask import Blueprint, request, jsonify
-import sqlite3
+import storage
 
 def register_timeline_routes(app, charts_db_path):
     timeline_bp = Blueprint("timeline", __name__)
 
     # ----- DB FUNCTIONS -----
     def add_timeline_entry(entry):
-        conn = sqlite3.connect(charts_db_path)
+        conn = storage.connect(charts_db_path)
         cur = conn.cursor()
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS timeline (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event TEXT,
-                timestamp TEXT
-            )
-        """)
-
+        # table comes from the charts.db migrations (migrations.py)
         cur.execute("INSERT INTO timeline (event, timestamp) VALUES (?, ?)",
                     (entry["event"], entry["timestamp"]))
 
@@ -27,7 +20,7 @@ def register_timeline_routes(app, charts_db_path):
     # ----- ROUTES -----
     @timeline_bp.route("/timeline", methods=["GET"])
     def get_timeline():
-        conn = sqlite3.connect(charts_db_path)
+        conn = storage.connect(charts_db_path)
         cur = conn.cursor()
 
         cur.execute("SELECT id, event, timestamp FROM timeline ORDER BY id DESC")
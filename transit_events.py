@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+transit_events.py — SIGN / NAKSHATRA / PADA INGRESSES AND STATIONS
+------------------------------------------------------------------
+"When does Saturn enter Meenam, when does Mercury turn retrograde?" —
+every such question is the time a sidereal longitude crosses a multiple
+of 3°20' (a pada; every nakshatra and sign boundary is also one) or the
+time the speed changes sign. Nothing is sampled at a fixed step:
+
+  1. Each graha is stepped adaptively. Its speed cannot change faster than
+     MAX_ACCEL, so no station can happen within |speed| / MAX_ACCEL days —
+     the step grows far from a station and shrinks (never below MIN_STEP,
+     shorter than any retrograde spell) as one approaches. A speed sign
+     change between two samples is the only way a station can hide.
+  2. A station is solved with the Illinois variant of regula falsi on the
+     speed and splits its step in two; the longitude is monotonic on both
+     halves, so the boundaries crossed are exactly those between the two
+     end longitudes.
+  3. Each crossing starts from a cubic (Hermite) interpolation of the two
+     samples around it — positions and speeds are both known — and is then
+     polished like panchangam_solver does it: Newton steps on the longitude
+     (calc_ut returns the speed for free), falling back to bisection
+     whenever a step leaves the bracket. Usually 1-2 evaluations.
+
+Rahu/Ketu are the mean node (as everywhere in the app): always retrograde,
+Ketu = Rahu + 180. Retrograde/direct follow the tropical speed, like the
+retro flags of the charts.
+
+Times are Julian Days UT; find_events() yields them lazily in time order,
+so a caller that only wants the first N never computes the rest.
+
+CLI
+    python transit_events.py 2025-01-01 2027-01-01 --planets saturn,jupiter
+    python transit_events.py 2025-01-01 2025-02-01 --kinds pada --planets moon
+    python transit_events.py --bench
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import swisseph as swe
+
+from chart_snapshot import DEFAULT_SID_MODE, ayanamsa_ut, sid_mode_for
+from panchangam import NAK, jd_to_local_str
+
+swe.set_ephe_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ephemeris"))
+
+TAMIL_SIGNS = [
+    "மேஷம்", "ரிஷபம்", "மிதுனம்", "கடகம்", "சிம்மம்", "கன்னி",
+    "துலாம்", "விருச்சிகம்", "தனுசு", "மகரம்", "கும்பம்", "மீனம்"
+]
+
+# key -> (Tamil name, swisseph body, offset added to its longitude)
+GRAHAS = {
+    "sun": ("சூரியன்", swe.SUN, 0.0),
+    "moon": ("சந்திரன்", swe.MOON, 0.0),
+    "mars": ("செவ்வாய்", swe.MARS, 0.0),
+    "mercury": ("புதன்", swe.MERCURY, 0.0),
+    "jupiter": ("குரு", swe.JUPITER, 0.0),
+    "venus": ("சுக்கிரன்", swe.VENUS, 0.0),
+    "saturn": ("சனி", swe.SATURN, 0.0),
+    "rahu": ("ராகு", swe.MEAN_NODE, 0.0),
+    "ketu": ("கேது", swe.MEAN_NODE, 180.0),
+}
+
+# Largest |d speed / dt| (deg/day²), 1.5x the worst seen over 1900-2100.
+# Grahas without an entry never station (Sun, Moon, mean node).
+MAX_ACCEL = {"mercury": 0.3, "venus": 0.065, "mars": 0.04, "jupiter": 0.006, "saturn": 0.003}
+
+# Largest |speed| (deg/day); a step never moves a graha more than MAX_MOVE
+MAX_SPEED = {"sun": 1.03, "moon": 15.5, "mars": 0.8, "mercury": 2.25, "jupiter": 0.25,
+             "venus": 1.27, "saturn": 0.14, "rahu": 0.06, "ketu": 0.06}
+MAX_MOVE = 120.0
+MAX_STEP = 60.0
+MIN_STEP = 1.0          # shortest time between two stations is ~20 d (Mercury)
+
+PADA_SPAN = 360.0 / 108.0
+KINDS = ("sign", "nakshatra", "pada", "station")
+DEFAULT_KINDS = ("sign", "nakshatra", "station")
+
+TOLERANCE_DAYS = 1.0 / 86400.0         # last Newton step; the result is far closer
+MAX_ITER = 40
+AYANAMSA_KNOT = 365.25                  # ayanamsa is interpolated between yearly values
+
+MAX_YEARS = 150
+DEFAULT_LIMIT = 5000
+MIN_LIMIT = 50          # more than can ever share one moment
+MAX_LIMIT = 50000
+SAME_MOMENT = 1e-5      # JD (~1 s): events closer than this are one moment
+
+
+def _wrap(deg):
+    """Signed difference in (-180, 180]."""
+    return (deg + 180.0) % 360.0 - 180.0
+
+
+def boundary_kinds(k, kinds):
+    """Kinds (of those asked for) whose boundary is pada boundary k (0..107)."""
+    out = []
+    if "sign" in kinds and k % 9 == 0:
+        out.append("sign")
+    if "nakshatra" in kinds and k % 4 == 0:
+        out.append("nakshatra")
+    if "pada" in kinds:
+        out.append("pada")
+    return out
+
+
+def index_label(kind, idx):
+    if kind == "sign":
+        return TAMIL_SIGNS[idx]
+    if kind == "nakshatra":
+        return NAK[idx]
+    return f"{NAK[idx // 4]} {idx % 4 + 1}"
+
+
+class _Hermite:
+    """
+    Cubic through (0, 0) and (h, move) with slopes v0, v1 (deg/day): the
+    first guess for a crossing between two samples.
+    """
+
+    def __init__(self, h, move, v0, v1):
+        self.h, self.move = h, move
+        m0, m1 = v0 * h, v1 * h
+        # p(s) = c1 s + c2 s^2 + c3 s^3 on s in [0, 1]
+        self.c1 = m0
+        self.c2 = 3 * move - 2 * m0 - m1
+        self.c3 = -2 * move + m0 + m1
+
+    def solve(self, d):
+        """Days after the first sample at which the cubic reaches d."""
+        c1, c2, c3 = self.c1, self.c2, self.c3
+        s = d / self.move if self.move else 0.5
+        for _ in range(4):
+            slope = c1 + 2 * c2 * s + 3 * c3 * s * s
+            if not slope:
+                break
+            s = min(1.0, max(0.0, s - (c1 * s + c2 * s * s + c3 * s ** 3 - d) / slope))
+        return s * self.h
+
+
+class TransitClock:
+    """
+    Sidereal longitude and speed of the grahas for one ayanamsa.
+    `calls` counts swe.calc_ut calls, for benchmarking.
+    """
+
+    def __init__(self, sid_mode=DEFAULT_SID_MODE):
+        self.sid_mode = sid_mode
+        self.calls = 0
+        self._knot = (None, 0.0, 0.0)
+
+    def ayanamsa(self, jd_ut):
+        """(ayanamsa, rate in deg/day), linear between yearly knots."""
+        n = math.floor(jd_ut / AYANAMSA_KNOT)
+        if n != self._knot[0]:
+            a0 = ayanamsa_ut(n * AYANAMSA_KNOT, self.sid_mode)
+            a1 = ayanamsa_ut((n + 1) * AYANAMSA_KNOT, self.sid_mode)
+            self._knot = (n, a0, (a1 - a0) / AYANAMSA_KNOT)
+        _, a0, rate = self._knot
+        return a0 + rate * (jd_ut - n * AYANAMSA_KNOT), rate
+
+    def state(self, jd_ut, graha):
+        """(sidereal lon, sidereal speed, tropical speed) of a GRAHAS key."""
+        _, pid, offset = GRAHAS[graha]
+        res = swe.calc_ut(jd_ut, pid)[0]
+        self.calls += 1
+        ay, rate = self.ayanamsa(jd_ut)
+        return (res[0] - ay + offset) % 360.0, res[3] - rate, res[3]
+
+    # ---- roots ----
+    def station(self, graha, lo, hi, v_lo, v_hi):
+        """JD in [lo, hi] where the tropical speed changes sign (Illinois)."""
+        side = 0
+        for _ in range(MAX_ITER):
+            jd = (lo * v_hi - hi * v_lo) / (v_hi - v_lo)
+            if not lo < jd < hi:
+                jd = (lo + hi) / 2.0
+            v = self.state(jd, graha)[2]
+            if (v < 0) == (v_lo < 0):
+                lo, v_lo = jd, v
+                if side == -1:
+                    v_hi /= 2.0
+                side = -1
+            else:
+                hi, v_hi = jd, v
+                if side == 1:
+                    v_lo /= 2.0
+                side = 1
+            if hi - lo < TOLERANCE_DAYS:
+                break
+        return (lo + hi) / 2.0
+
+    def crossing(self, graha, lo, hi, target, sign, jd):
+        """
+        JD in [lo, hi] where the longitude reaches `target`, moving in
+        direction `sign` (+1 direct, -1 retrograde) the whole time;
+        jd is the first guess.
+        """
+        def g(jd):
+            lon, speed, _ = self.state(jd, graha)
+            return _wrap(lon - target) * sign, speed * sign
+
+        for _ in range(MAX_ITER):
+            if not lo < jd < hi:
+                jd = (lo + hi) / 2.0
+            val, rate = g(jd)
+            if val < 0.0:
+                lo = jd
+            else:
+                hi = jd
+            if rate > 0 and abs(val / rate) < TOLERANCE_DAYS:
+                return jd - val / rate
+            if hi - lo < TOLERANCE_DAYS:
+                return (lo + hi) / 2.0
+            jd = jd - val / rate if rate > 0 else (lo + hi) / 2.0
+        return (lo + hi) / 2.0
+
+    # ---- scan ----
+    def _ingresses(self, graha, a, state_a, b, state_b, kinds):
+        """Boundary crossings on [a, b], over which the graha moves one way only."""
+        lon_a, lon_b = state_a[0], state_b[0]
+        move = _wrap(lon_b - lon_a)
+        guess = _Hermite(b - a, move, state_a[1], state_b[1])
+        sign = 1 if move > 0 else -1
+        k_a = math.floor(lon_a / PADA_SPAN)
+        k_b = math.floor((lon_a + move) / PADA_SPAN)
+        # direct: enters pada k at k*span; retrograde: leaves pada k there
+        ks = range(k_a + 1, k_b + 1) if sign > 0 else range(k_a, k_b, -1)
+        lo = a
+        for k in ks:
+            k %= 108
+            hit = boundary_kinds(k, kinds)
+            if not hit:
+                continue
+            jd = a + guess.solve(_wrap(k * PADA_SPAN - lon_a) if sign > 0 else -_wrap(lon_a - k * PADA_SPAN))
+            jd = self.crossing(graha, lo, b, k * PADA_SPAN, sign, jd)
+            lo = jd
+            new = k if sign > 0 else (k - 1) % 108
+            old = (k - 1) % 108 if sign > 0 else k
+            for kind in hit:
+                div = {"sign": 9, "nakshatra": 4, "pada": 1}[kind]
+                yield {"jd": jd, "planet": graha, "kind": kind, "from": old // div,
+                       "to": new // div, "lon": round(k * PADA_SPAN, 6), "retro": sign < 0}
+
+    def events(self, graha, jd_start, jd_end, kinds=DEFAULT_KINDS):
+        """Events of one graha in [jd_start, jd_end), in time order."""
+        accel = MAX_ACCEL.get(graha)
+        max_step = min(MAX_STEP, MAX_MOVE / MAX_SPEED[graha])
+        want_ingress = any(k in kinds for k in ("sign", "nakshatra", "pada"))
+        t = jd_start
+        st = self.state(t, graha)
+        while t < jd_end:
+            v = st[2]
+            step = max_step
+            if accel:
+                step = min(step, max(MIN_STEP, abs(v) / accel))
+            t2 = min(t + step, jd_end)
+            st2 = self.state(t2, graha)
+            v2 = st2[2]
+            pieces = [(t, st), (t2, st2)]
+            station = None
+            if accel and (v < 0) != (v2 < 0):
+                ts = self.station(graha, t, t2, v, v2)
+                pieces.insert(1, (ts, self.state(ts, graha)))
+                station = {"jd": ts, "planet": graha, "kind": "retrograde" if v2 < 0 else "direct",
+                           "lon": round(pieces[1][1][0], 6), "retro": v2 < 0}
+            for i in range(len(pieces) - 1):
+                if want_ingress:
+                    yield from self._ingresses(graha, *pieces[i], *pieces[i + 1], kinds)
+                if i == 0 and station and "station" in kinds:
+                    yield station
+            t, st = t2, st2
+
+
+def find_events(jd_start, jd_end, planets=None, kinds=DEFAULT_KINDS, sid_mode=DEFAULT_SID_MODE,
+                clock=None):
+    """
+    Lazily yield every event of the given kinds for the given grahas
+    (GRAHAS keys, default all) in [jd_start, jd_end), sorted by JD:
+    {"jd", "planet", "kind", "from", "to", "lon", "retro"} for ingresses
+    ("from"/"to" are sign 0-11, nakshatra 0-26 or pada 0-107 indexes),
+    {"jd", "planet", "kind": "retrograde"|"direct", "lon", "retro"} for stations.
+    """
+    clock = clock or TransitClock(sid_mode)
+    planets = list(GRAHAS) if not planets else planets
+    streams = [clock.events(p, jd_start, jd_end, kinds) for p in planets]
+    return heapq.merge(*streams, key=lambda e: e["jd"])
+
+
+# -------------------------------------------------------------
+# REQUESTS
+# -------------------------------------------------------------
+_PLANET_ALIASES = {**{k: k for k in GRAHAS}, **{v[0]: k for k, v in GRAHAS.items()}}
+
+
+def _as_list(val):
+    if val is None or val == "":
+        return []
+    if isinstance(val, str):
+        return [p.strip() for p in val.split(",") if p.strip()]
+    return [str(p).strip() for p in val]
+
+
+def parse_planets(val):
+    """'saturn,jupiter' / ['சனி', 'rahu'] -> GRAHAS keys (default all)."""
+    out = []
+    for p in _as_list(val):
+        key = _PLANET_ALIASES.get(p.lower() if p.isascii() else p)
+        if key is None:
+            raise ValueError(f"Unknown planet: {p}")
+        out.append(key)
+    return out or list(GRAHAS)
+
+
+def parse_kinds(val):
+    kinds = _as_list(val) or list(DEFAULT_KINDS)
+    for k in kinds:
+        if k not in KINDS:
+            raise ValueError(f"Unknown event kind: {k} (use {', '.join(KINDS)})")
+    return tuple(kinds)
+
+
+def search(start, end, planets=None, kinds=DEFAULT_KINDS, tz=5.5, ayanamsa="lahiri",
+           limit=DEFAULT_LIMIT, from_jd=None):
+    """
+    Events between local dates start..end (inclusive, datetime.date), at
+    most `limit` of them. When the list was cut short, "next_jd" is the
+    from_jd that continues it (events sharing one moment are never split).
+    """
+    if end < start:
+        raise ValueError("end is before start")
+    if (end - start).days > MAX_YEARS * 366:
+        raise ValueError(f"Range too long (max {MAX_YEARS} years)")
+    limit = max(MIN_LIMIT, min(int(limit), MAX_LIMIT))
+    jd_start = swe.julday(start.year, start.month, start.day, 0.0) - tz / 24.0
+    end += timedelta(days=1)
+    jd_end = swe.julday(end.year, end.month, end.day, 0.0) - tz / 24.0
+    if from_jd is not None:
+        jd_start = max(jd_start, float(from_jd) - SAME_MOMENT)
+
+    events, next_jd = [], None
+    for e in find_events(jd_start, jd_end, planets, kinds, sid_mode_for(ayanamsa)):
+        if from_jd is not None and e["jd"] < float(from_jd) - SAME_MOMENT / 2:
+            continue
+        if len(events) == limit:
+            next_jd = e["jd"]
+            while events[-1]["jd"] > next_jd - SAME_MOMENT / 2:
+                events.pop()
+            break
+        events.append(e)
+
+    for e in events:
+        e.update(name=GRAHAS[e["planet"]][0], local=jd_to_local_str(e["jd"], tz),
+                 jd=round(e["jd"], 7))
+        if "to" in e:
+            e["label"] = index_label(e["kind"], e["to"])
+    return {"count": len(events), "truncated": next_jd is not None,
+            "next_jd": round(next_jd, 7) if next_jd is not None else None, "events": events}
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _brute_force(jd_start, jd_end, graha, kinds, step=1.0 / 24.0):
+    """Reference hourly scan: (kind, to) sequence and approximate JDs."""
+    clock = TransitClock()
+    out = []
+    lon, _, v = clock.state(jd_start, graha)
+    t = jd_start
+    while t < jd_end:
+        t2 = min(t + step, jd_end)
+        lon2, _, v2 = clock.state(t2, graha)
+        if "station" in kinds and graha in MAX_ACCEL and (v < 0) != (v2 < 0):
+            out.append((t2, "retrograde" if v2 < 0 else "direct", None))
+        for kind, div in (("sign", 30.0), ("nakshatra", 360.0 / 27), ("pada", PADA_SPAN)):
+            if kind in kinds and int(lon // div) != int(lon2 // div):
+                out.append((t2, kind, int(lon2 // div)))
+        t, lon, v = t2, lon2, v2
+    return out
+
+
+def _bench():
+    jd0 = swe.julday(2000, 1, 1, 0.0)
+    report = {}
+    for label, kinds in (("default_kinds", DEFAULT_KINDS), ("with_padas", KINDS)):
+        clock = TransitClock()
+        t = time.perf_counter()
+        n = sum(1 for _ in find_events(jd0, jd0 + 100 * 365.25, kinds=kinds, clock=clock))
+        report[f"100y_all_grahas_{label}"] = {
+            "events": n, "seconds": round(time.perf_counter() - t, 2), "calc_ut_calls": clock.calls}
+
+    # agree with an hourly scan over two years (order, values and time within the hour)
+    a, b = swe.julday(2025, 1, 1, 0.0), swe.julday(2027, 1, 1, 0.0)
+    for graha in GRAHAS:
+        got = [(e["jd"], e["kind"], e.get("to")) for e in find_events(a, b, [graha], KINDS)]
+        want = _brute_force(a, b, graha, KINDS)
+        key = lambda x: (round(x[0] * 24), x[1])      # same hour, same kind
+        assert len(got) == len(want), (graha, len(got), len(want))
+        for g, w in zip(sorted(got, key=key), sorted(want, key=key)):
+            assert g[1:] == w[1:] and w[0] - 1.0 / 24 - 1e-9 <= g[0] <= w[0] + 1e-9, (graha, g, w)
+    report["hourly_scan_check"] = "ok (2025-2026, all grahas, all kinds)"
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sign / nakshatra / pada ingresses and stations")
+    ap.add_argument("start", nargs="?", help="YYYY-MM-DD (local)")
+    ap.add_argument("end", nargs="?", help="YYYY-MM-DD (local, inclusive)")
+    ap.add_argument("--planets", default="")
+    ap.add_argument("--kinds", default=",".join(DEFAULT_KINDS))
+    ap.add_argument("--tz", type=float, default=5.5)
+    ap.add_argument("--ayanamsa", default="lahiri")
+    ap.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    ap.add_argument("--bench", action="store_true", help="100 years, all grahas + hourly-scan check")
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(_bench(), indent=1))
+        return 0
+    if not args.start:
+        ap.error("start date is required")
+    start = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end = datetime.strptime(args.end or args.start, "%Y-%m-%d").date()
+    res = search(start, end, parse_planets(args.planets), parse_kinds(args.kinds),
+                 args.tz, args.ayanamsa, args.limit)
+    for e in res["events"]:
+        what = e.get("label") or f"{e['lon']:.4f}°"
+        print(f"{e['local']}  {e['planet']:8s} {e['kind']:10s} {what}{' (R)' if e['retro'] else ''}")
+    if res["truncated"]:
+        print(f"... truncated, next event at JD {res['next_jd']:.6f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
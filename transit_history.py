@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+transit_history.py — TRANSIT SNAPSHOTS AS MOMENTS
+-------------------------------------------------
+A transit snapshot is "the grahas at this moment, next to this chart".
+The positions follow from the moment, the place and the ayanamsa as
+deterministically as the chart itself does, so a transit_history row now
+keeps only those — jd (UT), lat, lon, tz, ayanamsa, next to chart_id,
+timestamp, location and note — instead of a packed copy of every
+position row (data_json stays NULL). Place and ayanamsa columns are NULL
+when they are the app defaults (Chennai, lahiri), which most rows are.
+
+    list_page()   metadata only, newest first, one page at a time
+    positions()   one snapshot's grahas + Lagna, regenerated on demand
+                  (a one-sample transit_series, the shape /transit_series
+                  returns); rows saved before this keep their stored blob
+
+`timestamp` is the moment the panel shows and edits; update_moment()
+keeps jd in step with it, and leaves both alone on a note-only edit.
+
+CLI
+    python transit_history.py --bench     # bytes per snapshot, old vs new
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import swisseph as swe
+
+import payload_codec
+from chart_snapshot import sid_mode_for
+from transit_series import series
+
+DEFAULT_PLACE = {"location": "Chennai", "lat": 13.0827, "lon": 80.2707, "tz": 5.5}
+PER_PAGE = 50
+MAX_PER_PAGE = 500
+META_COLS = ("id", "chart_id", "timestamp", "location", "note", "jd", "lat", "lon", "tz", "ayanamsa")
+
+
+# -------------------------------------------------------------
+# MOMENTS
+# -------------------------------------------------------------
+def parse_timestamp(ts, tz=5.5):
+    """ISO timestamp (browser 'Z' / offset, or naive = local at tz) -> (iso text, JD UT)."""
+    dt = datetime.fromisoformat(str(ts).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        hours = dt.hour + dt.minute / 60.0 + (dt.second + dt.microsecond / 1e6) / 3600.0 - tz
+        return dt.isoformat(), swe.julday(dt.year, dt.month, dt.day, hours)
+    u = dt.astimezone(timezone.utc)
+    hours = u.hour + u.minute / 60.0 + (u.second + u.microsecond / 1e6) / 3600.0
+    return dt.isoformat(), swe.julday(u.year, u.month, u.day, hours)
+
+
+def _unless_default(val, key):
+    val = float(val) if val not in (None, "") else DEFAULT_PLACE[key]
+    return None if val == DEFAULT_PLACE[key] else val
+
+
+def snapshot_row(data):
+    """A /save_transit_snapshot body -> transit_history column values (no position blob)."""
+    tz = float(data.get("tz") or DEFAULT_PLACE["tz"])
+    ts = data.get("timestamp") or datetime.now(timezone.utc).isoformat()
+    ts, jd = parse_timestamp(ts, tz)
+    ayanamsa = (data.get("ayanamsa") or "lahiri").strip().lower()
+    return {"chart_id": data.get("chart_id") or int(datetime.now().timestamp()),
+            "timestamp": ts, "location": data.get("location") or DEFAULT_PLACE["location"],
+            "note": data.get("note", ""), "jd": jd,
+            "lat": _unless_default(data.get("lat"), "lat"), "lon": _unless_default(data.get("lon"), "lon"),
+            "tz": _unless_default(tz, "tz"), "ayanamsa": None if ayanamsa == "lahiri" else ayanamsa}
+
+
+def insert(conn, row):
+    cols = ", ".join(row)
+    cur = conn.execute(f"INSERT INTO transit_history ({cols}) VALUES ({', '.join('?' * len(row))})",
+                       tuple(row.values()))
+    conn.commit()
+    return cur.lastrowid
+
+
+def update_moment(conn, entry_id, note, ts=None):
+    """
+    New note (and, if ts is given, timestamp) of a snapshot; jd follows the
+    timestamp, and stays put without one -> stored timestamp, None if missing.
+    Raises ValueError on an unparseable ts.
+    """
+    row = conn.execute("SELECT tz, timestamp FROM transit_history WHERE id = ?", (entry_id,)).fetchone()
+    if not row:
+        return None
+    if ts is None:
+        conn.execute("UPDATE transit_history SET note = ? WHERE id = ?", (note, entry_id))
+        conn.commit()
+        return row[1]
+    ts, jd = parse_timestamp(ts, DEFAULT_PLACE["tz"] if row[0] is None else row[0])
+    conn.execute("UPDATE transit_history SET note = ?, timestamp = ?, jd = ? WHERE id = ?",
+                 (note, ts, jd, entry_id))
+    conn.commit()
+    return ts
+
+
+# -------------------------------------------------------------
+# READS
+# -------------------------------------------------------------
+def _meta(row):
+    """META_COLS values -> dict with the defaults stored as NULL filled in."""
+    meta = dict(zip(META_COLS, row))
+    for key in ("lat", "lon", "tz"):
+        if meta[key] is None:
+            meta[key] = DEFAULT_PLACE[key]
+    meta["ayanamsa"] = meta["ayanamsa"] or "lahiri"
+    return meta
+
+
+def list_page(conn, chart_id=0, page=1, per_page=PER_PAGE):
+    """Snapshot metadata, newest first (chart_id 0 = every chart) -> page dict."""
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    page = max(1, int(page))
+    where, args = ("WHERE chart_id = ?", (chart_id,)) if chart_id else ("", ())
+    total = conn.execute(f"SELECT COUNT(*) FROM transit_history {where}", args).fetchone()[0]
+    rows = conn.execute(f"SELECT {', '.join(META_COLS)} FROM transit_history {where} "
+                        f"ORDER BY id DESC LIMIT ? OFFSET ?",
+                        (*args, per_page, (page - 1) * per_page)).fetchall()
+    return {"history": [_meta(r) for r in rows], "total": total, "page": page,
+            "per_page": per_page, "pages": max(1, -(-total // per_page))}
+
+
+def positions(conn, entry_id):
+    """
+    {"snapshot": metadata, "series": one transit_series sample} — or
+    {"snapshot", "rows"} for a row saved with its positions — None if missing.
+    """
+    row = conn.execute(f"SELECT {', '.join(META_COLS)}, data_json FROM transit_history WHERE id = ?",
+                       (entry_id,)).fetchone()
+    if not row:
+        return None
+    meta = _meta(row[:-1])
+    if meta["jd"] is None:
+        try:
+            return {"snapshot": meta, "rows": payload_codec.decode(row[-1], [])}
+        except ValueError:
+            return {"snapshot": meta, "rows": []}
+    return {"snapshot": meta, "series": series(meta["jd"], 1.0, 1, meta["lat"], meta["lon"],
+                                               sid_mode_for(meta["ayanamsa"]), meta["tz"])}
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _bench(n=2000):
+    """n snapshots stored the old way (packed /generate_chart rows) and the new way; file bytes per row."""
+    import migrations
+    from app_stable_backup import calc_full_table
+
+    rows = calc_full_table(2025, 1, 1, 9, 30, 0, 13.0827, 80.2707, 5.5, debug=False)
+    out = {}
+    away = {"lat": 9.9252, "lon": 78.1198, "tz": 5.5, "ayanamsa": "raman"}
+    for mode in ("blob", "moment", "moment_elsewhere"):
+        path = os.path.join(tempfile.gettempdir(), f"transit_history_{mode}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        migrations.migrate(path, migrations.CHARTS_STEPS)
+        conn = sqlite3.connect(path)
+        for i in range(n):
+            ts = f"2025-01-{1 + i % 28:02d}T09:{i % 60:02d}:00+05:30"
+            if mode == "blob":
+                conn.execute("INSERT INTO transit_history (chart_id, timestamp, location, note, data_json) "
+                             "VALUES (?, ?, ?, ?, ?)", (1 + i % 50, ts, "Chennai", "", payload_codec.encode(rows)))
+            else:
+                extra = away if mode == "moment_elsewhere" else {}
+                row = snapshot_row({"chart_id": 1 + i % 50, "timestamp": ts, **extra})
+                conn.execute(f"INSERT INTO transit_history ({', '.join(row)}) VALUES "
+                             f"({', '.join('?' * len(row))})", tuple(row.values()))
+        conn.commit()
+        payload = conn.execute("SELECT SUM(COALESCE(LENGTH(data_json), 0)) + SUM(LENGTH(timestamp)) "
+                               "+ SUM(LENGTH(location)) FROM transit_history").fetchone()[0]
+        pages = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = 'transit_history'").fetchone()[0] \
+            if _has_dbstat(conn) else None
+        conn.close()
+        out[mode] = {"payload_bytes_per_row": round(payload / n, 1),
+                     "table_bytes_per_row": round(pages / n, 1) if pages else None}
+        os.remove(path)
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE transit_history (id INTEGER PRIMARY KEY, chart_id, timestamp, location, note, "
+                 "data_json, jd, lat, lon, tz, ayanamsa)")
+    rid = insert(conn, snapshot_row({"chart_id": 1, "timestamp": "2025-01-01T09:30:00+05:30"}))
+    s = positions(conn, rid)["series"]
+    sat = next(r for r in rows if r["name"] == "சனி")
+    assert int(s["lon"]["saturn"][0] // 30) + 1 == sat["rasi_no"]
+    assert abs(s["lon"]["saturn"][0] % 30 - sat["deg_in_sign"]) < 1e-3
+    return out
+
+
+def _has_dbstat(conn):
+    try:
+        conn.execute("SELECT 1 FROM dbstat LIMIT 1")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Transit snapshots as moments")
+    ap.add_argument("--bench", action="store_true", help="bytes per snapshot, packed rows vs moment")
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(_bench(), indent=1))
+        return 0
+    ap.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+transit_hits.py — TRANSIT-OVER-NATAL HITS ACROSS ALL SAVED CHARTS
+-----------------------------------------------------------------
+"Which of my clients have Saturn crossing their natal Moon or Lagna in
+the next six months?" asked of every chart at once. The natal longitudes
+come from natal_store (one NumPy array per point over all charts), the
+transits from one track per graha sampled at a fixed step — a few
+thousand calc_ut calls however many charts there are.
+
+Every check is "the transit is inside an arc of the zodiac":
+
+    conjunction   natal ± orb
+    aspect        natal - (house - 1) * 30 ± orb, for the graha's drishti
+                  houses (all 7th; Mars 4/8, Jupiter 5/9, Saturn 3/10,
+                  Rahu/Ketu 5/9 like Jupiter)
+    sign          the natal point's rasi (entry to exit)
+
+The track is unwrapped and cut into runs between stations; on a run the
+longitude is monotonic, so for each target arc (and each lap of it the
+run covers) entry and exit are two np.interp lookups, vectorized over all
+charts. Windows of one target split only by a station are merged back.
+Times are linear between samples, so they are good to a fraction of the
+step (a day by default — hours for Saturn).
+
+CLI
+    python transit_hits.py 2025-01-01 2025-06-30 --transits saturn --natal moon,lagna
+    python transit_hits.py --bench           # 50k synthetic charts x 10 years
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import swisseph as swe
+
+from chart_snapshot import DEFAULT_SID_MODE, sid_mode_for
+from panchangam import jd_to_local_str
+from transit_events import GRAHAS, TAMIL_SIGNS, TransitClock, _as_list, parse_planets
+from transit_series import parse_step
+
+KINDS = ("conjunction", "aspect", "sign")
+DRISHTI = {"sun": (7,), "moon": (7,), "mercury": (7,), "venus": (7,), "mars": (4, 7, 8),
+           "jupiter": (5, 7, 9), "saturn": (3, 7, 10), "rahu": (5, 7, 9), "ketu": (5, 7, 9)}
+DEFAULT_TRANSITS = ("saturn", "jupiter", "rahu", "ketu")
+DEFAULT_NATAL = ("moon", "lagna")
+DEFAULT_ORB = 3.0
+MAX_ORB = 15.0
+DEFAULT_DAYS = 182
+MAX_SAMPLES = 40000     # 100 years daily
+DEFAULT_LIMIT = 200     # charts per response
+MAX_LIMIT = 5000
+TOUCH = 1e-9            # windows closer than this (in samples) are one
+
+POINT_NAMES = {**{k: v[0] for k, v in GRAHAS.items()}, "lagna": "லக்னம்"}
+_GRAHA_KEYS = tuple(GRAHAS)
+
+
+# -------------------------------------------------------------
+# TRACKS
+# -------------------------------------------------------------
+@lru_cache(maxsize=32)
+def track(jd0, step, count, graha, sid_mode=DEFAULT_SID_MODE):
+    """Unwrapped sidereal longitude of a graha at jd0 + i * step (read-only array)."""
+    clock = TransitClock(sid_mode)
+    lon = np.fromiter((clock.state(jd0 + i * step, graha)[0] for i in range(count)),
+                      dtype=np.float64, count=count)
+    out = np.unwrap(lon, period=360.0)
+    out.setflags(write=False)
+    return out
+
+
+def arc_windows(u, lo, hi):
+    """
+    Passes of the unwrapped track u through the arcs [lo, hi] (mod 360, one
+    per target) -> (target, start, end) arrays, start / end as fractional
+    sample indices.
+    """
+    n = len(u)
+    idx = np.arange(n, dtype=np.float64)
+    d = np.sign(np.diff(u))
+    turns = np.nonzero(d[1:] * d[:-1] < 0)[0] + 1
+    bounds = np.concatenate(([0], turns, [n - 1]))
+    parts = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        seg, t = u[a:b + 1], idx[a:b + 1]
+        if seg[-1] < seg[0]:
+            seg, t = seg[::-1], t[::-1]
+        # laps k of each arc that overlap [seg[0], seg[-1]]
+        k0 = np.ceil((seg[0] - hi) / 360.0)
+        k1 = np.floor((seg[-1] - lo) / 360.0)
+        laps = np.clip(k1 - k0 + 1, 0, None).astype(np.int64)
+        which = np.nonzero(laps)[0]
+        if not len(which):
+            continue
+        laps = laps[which]
+        tgt = np.repeat(which, laps)
+        k = np.repeat(k0[which], laps) + (np.arange(laps.sum()) - np.repeat(np.cumsum(laps) - laps, laps))
+        t_lo = np.interp(lo[tgt] + 360.0 * k, seg, t)
+        t_hi = np.interp(hi[tgt] + 360.0 * k, seg, t)
+        parts.append((tgt, np.minimum(t_lo, t_hi), np.maximum(t_lo, t_hi)))
+    if not parts:
+        empty = np.zeros(0)
+        return empty.astype(np.int64), empty, empty
+    tgt, s, e = (np.concatenate(c) for c in zip(*parts))
+
+    # merge windows of one target that touch (a station inside the arc)
+    order = np.lexsort((s, tgt))
+    tgt, s, e = tgt[order], s[order], e[order]
+    span = n + 1.0
+    reach = np.maximum.accumulate(e + tgt * span) - tgt * span
+    new = np.ones(len(tgt), dtype=bool)
+    new[1:] = (tgt[1:] != tgt[:-1]) | (s[1:] > reach[:-1] + TOUCH)
+    first = np.nonzero(new)[0]
+    return tgt[first], s[first], np.maximum.reduceat(e, first)
+
+
+def _targets(graha, natal, kinds, orb):
+    """(kind, house, lo, hi) arcs to test one transiting graha against."""
+    if "conjunction" in kinds:
+        yield "conjunction", 1, natal - orb, natal + orb
+    if "aspect" in kinds:
+        for house in DRISHTI[graha]:
+            centre = natal - (house - 1) * 30.0
+            yield "aspect", house, centre - orb, centre + orb
+    if "sign" in kinds:
+        start = np.floor(natal / 30.0) * 30.0
+        yield "sign", 1, start, start + 30.0
+
+
+# -------------------------------------------------------------
+# SCAN
+# -------------------------------------------------------------
+class Hits:
+    """
+    Hit windows as parallel arrays, one row per window: row (index into the
+    NatalSet), transit / point / kind (indexes into GRAHAS, natal_store.POINTS,
+    KINDS), house, start / end (fractional sample index).
+    """
+
+    COLUMNS = ("row", "transit", "point", "kind", "house", "start", "end")
+
+    def __init__(self, jd0, step, count, cols):
+        self.jd0, self.step, self.count = jd0, step, count
+        for c in self.COLUMNS:
+            setattr(self, c, cols[c])
+
+    def __len__(self):
+        return len(self.row)
+
+
+def scan(natal, jd0, step, count, transits=DEFAULT_TRANSITS, points=DEFAULT_NATAL,
+         kinds=KINDS, orb=DEFAULT_ORB):
+    """Every hit window of every chart of a NatalSet over count samples from jd0 -> Hits."""
+    from natal_store import POINTS
+    cols = {c: [] for c in Hits.COLUMNS}
+    for ayanamsa in sorted(set(natal.ayanamsa.tolist())):
+        rows = np.nonzero(natal.ayanamsa == ayanamsa)[0]
+        sid_mode = sid_mode_for(ayanamsa)
+        for graha in transits:
+            u = track(jd0, step, count, graha, sid_mode)
+            for point in points:
+                lons = natal.points[point][rows]
+                known = ~np.isnan(lons)
+                sub, lons = rows[known], lons[known]
+                for kind, house, lo, hi in _targets(graha, lons, kinds, orb):
+                    tgt, s, e = arc_windows(u, lo, hi)
+                    m = len(tgt)
+                    cols["row"].append(sub[tgt])
+                    cols["transit"].append(np.full(m, _GRAHA_KEYS.index(graha), dtype=np.int8))
+                    cols["point"].append(np.full(m, POINTS.index(point), dtype=np.int8))
+                    cols["kind"].append(np.full(m, KINDS.index(kind), dtype=np.int8))
+                    cols["house"].append(np.full(m, house, dtype=np.int8))
+                    cols["start"].append(s)
+                    cols["end"].append(e)
+    dtypes = {"row": np.int64, "start": np.float64, "end": np.float64}
+    return Hits(jd0, step, count, {c: np.concatenate(v) if v else np.zeros(0, dtypes.get(c, np.int8))
+                                   for c, v in cols.items()})
+
+
+def by_chart(hits, natal, tz=5.5, limit=DEFAULT_LIMIT, offset=0):
+    """
+    Charts with at least one hit, soonest first (offset / limit of them):
+    [{"chart_id", "hits": [...]}], and the number of such charts.
+    """
+    from natal_store import POINTS
+    if not len(hits):
+        return [], 0
+    order = np.lexsort((hits.end, hits.start, hits.row))
+    rows = hits.row[order]
+    first = np.nonzero(np.r_[True, rows[1:] != rows[:-1]])[0]
+    soonest = np.argsort(hits.start[order][first], kind="stable")
+    total = len(first)
+    bounds = np.r_[first, len(rows)]
+    out = []
+    for g in soonest[offset:offset + limit]:
+        items = []
+        for i in order[bounds[g]:bounds[g + 1]]:
+            graha, point, kind = _GRAHA_KEYS[hits.transit[i]], POINTS[hits.point[i]], KINDS[hits.kind[i]]
+            s, e = float(hits.start[i]), float(hits.end[i])
+            jd_s, jd_e = hits.jd0 + s * hits.step, hits.jd0 + e * hits.step
+            item = {"transit": graha, "transit_name": GRAHAS[graha][0],
+                    "natal": point, "natal_name": POINT_NAMES[point], "kind": kind,
+                    "start_jd": round(jd_s, 5), "end_jd": round(jd_e, 5),
+                    "start": jd_to_local_str(jd_s, tz), "end": jd_to_local_str(jd_e, tz),
+                    "ongoing": s <= TOUCH, "continues": e >= hits.count - 1 - TOUCH}
+            if kind == "aspect":
+                item["house"] = int(hits.house[i])
+            if kind == "sign":
+                item["sign"] = TAMIL_SIGNS[int(natal.points[point][hits.row[i]] // 30.0)]
+            items.append(item)
+        out.append({"chart_id": int(natal.chart_ids[hits.row[order[bounds[g]]]]), "hits": items})
+    return out, total
+
+
+# -------------------------------------------------------------
+# REQUESTS
+# -------------------------------------------------------------
+def _parse_points(val):
+    from natal_store import POINTS
+    names = {**{k: k for k in POINTS}, **{v: k for k, v in POINT_NAMES.items()}}
+    out = []
+    for p in _as_list(val):
+        key = names.get(p.lower() if p.isascii() else p)
+        if key is None:
+            raise ValueError(f"Unknown natal point: {p}")
+        out.append(key)
+    return tuple(out) or DEFAULT_NATAL
+
+
+def parse_request(src):
+    """start/end/step/transits/natal/kinds/orb/tz/chart_ids/limit/offset of a request."""
+    from panchangam_calendar import parse_range
+    tz = float(src.get("tz", 5.5))
+    if src.get("start"):
+        start, end = parse_range(src)
+    else:
+        start = date.today()
+        end = start + timedelta(days=DEFAULT_DAYS)
+    step = parse_step(src.get("step", "1d"))
+    jd0 = swe.julday(start.year, start.month, start.day, 0.0) - tz / 24.0
+    count = int(((end - start).days + 1) / step + 1e-9) + 1
+    if count > MAX_SAMPLES:
+        raise ValueError(f"Too many samples ({count}, max {MAX_SAMPLES}) — use a larger step")
+    kinds = tuple(_as_list(src.get("kinds"))) or KINDS
+    for k in kinds:
+        if k not in KINDS:
+            raise ValueError(f"Unknown hit kind: {k} (use {', '.join(KINDS)})")
+    orb = float(src.get("orb", DEFAULT_ORB))
+    if not 0 <= orb <= MAX_ORB:
+        raise ValueError(f"orb must be between 0 and {MAX_ORB}")
+    ids = [int(i) for i in _as_list(src.get("chart_ids"))]
+    return {"jd0": jd0, "step": step, "count": count, "tz": tz,
+            "transits": tuple(parse_planets(src.get("transits") or ",".join(DEFAULT_TRANSITS))),
+            "points": _parse_points(src.get("natal")), "kinds": kinds, "orb": orb,
+            "chart_ids": ids or None,
+            "limit": max(1, min(int(src.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)),
+            "offset": max(0, int(src.get("offset", 0))),
+            "range": {"start": start.isoformat(), "end": end.isoformat()}}
+
+
+def search(req, db_path=None):
+    """A parse_request() dict -> response with chart names (all saved charts)."""
+    import natal_store
+    import storage
+    from chart_list import CHARTS_DB
+
+    natal = natal_store.load(db_path)
+    if req["chart_ids"]:
+        natal = natal.subset(np.isin(natal.chart_ids, req["chart_ids"]))
+    hits = scan(natal, req["jd0"], req["step"], req["count"], req["transits"],
+                req["points"], req["kinds"], req["orb"])
+    charts, total = by_chart(hits, natal, req["tz"], req["limit"], req["offset"])
+    if charts:
+        conn = storage.connect(db_path or CHARTS_DB)
+        try:
+            ids = [c["chart_id"] for c in charts]
+            names = dict(conn.execute(f"SELECT id, name FROM charts WHERE id IN "
+                                      f"({', '.join('?' * len(ids))})", ids).fetchall())
+        finally:
+            conn.close()
+        for c in charts:
+            c["name"] = names.get(c["chart_id"])
+    return {"range": req["range"], "step_days": req["step"], "orb": req["orb"],
+            "transits": list(req["transits"]), "natal": list(req["points"]),
+            "kinds": list(req["kinds"]), "charts_scanned": len(natal), "hits": len(hits),
+            "total": total, "offset": req["offset"],
+            "truncated": req["offset"] + len(charts) < total, "charts": charts}
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _bench(n=50000, years=10, seed=5):
+    """n random natal Moons / Lagnas over `years` of daily samples; masks checked sample by sample."""
+    from natal_store import NatalSet, POINTS
+    rnd = np.random.default_rng(seed)
+    points = {p: np.full(n, np.nan) for p in POINTS}
+    points["moon"] = rnd.uniform(0, 360, n)
+    points["lagna"] = rnd.uniform(0, 360, n)
+    natal = NatalSet(np.arange(1, n + 1), np.full(n, "lahiri", dtype=object), points)
+    jd0 = swe.julday(2025, 1, 1, 0.0)
+    count = int(years * 365.25)
+
+    t = time.perf_counter()
+    for g in DEFAULT_TRANSITS:
+        track(jd0, 1.0, count, g)
+    tracks = time.perf_counter() - t
+    t = time.perf_counter()
+    hits = scan(natal, jd0, 1.0, count)
+    scanned = time.perf_counter() - t
+
+    # a sample is inside a window exactly when its longitude is inside the arc
+    samples = np.arange(count)
+    for graha in ("saturn", "rahu"):
+        lon = np.mod(track(jd0, 1.0, count, graha), 360.0)
+        for kind, house, lo, hi in _targets(graha, points["moon"][:300], KINDS, DEFAULT_ORB):
+            inside = (np.mod(lon[None, :] - lo[:, None], 360.0) <= (hi - lo)[:, None])
+            sel = ((hits.transit == _GRAHA_KEYS.index(graha)) & (hits.point == POINTS.index("moon"))
+                   & (hits.kind == KINDS.index(kind)) & (hits.house == house) & (hits.row < 300))
+            got = np.zeros_like(inside)
+            for r, s, e in zip(hits.row[sel], hits.start[sel], hits.end[sel]):
+                got[r] |= (samples >= s - 1e-9) & (samples <= e + 1e-9)
+            assert (got == inside).all(), (graha, kind, house)
+    return {"charts": n, "years": years, "samples": count, "hits": len(hits),
+            "tracks_s": round(tracks, 2), "scan_s": round(scanned, 2)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Transit-over-natal hits across all saved charts")
+    ap.add_argument("start", nargs="?", help="YYYY-MM-DD (default today)")
+    ap.add_argument("end", nargs="?")
+    ap.add_argument("--transits", default=",".join(DEFAULT_TRANSITS))
+    ap.add_argument("--natal", default=",".join(DEFAULT_NATAL))
+    ap.add_argument("--kinds", default=",".join(KINDS))
+    ap.add_argument("--orb", type=float, default=DEFAULT_ORB)
+    ap.add_argument("--step", default="1d")
+    ap.add_argument("--tz", type=float, default=5.5)
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--db")
+    ap.add_argument("--bench", action="store_true", help="50k synthetic charts x 10 years")
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(_bench(), indent=1))
+        return 0
+    req = parse_request({"start": args.start, "end": args.end, "transits": args.transits,
+                         "natal": args.natal, "kinds": args.kinds, "orb": args.orb,
+                         "step": args.step, "tz": args.tz, "limit": args.limit})
+    t = time.perf_counter()
+    res = search(req, args.db)
+    print(f"{res['total']} of {res['charts_scanned']} charts hit "
+          f"({res['hits']} windows) in {time.perf_counter() - t:.2f} s")
+    for c in res["charts"]:
+        print(f"  #{c['chart_id']} {c['name']}")
+        for h in c["hits"]:
+            what = h["kind"] + (f" {h['house']}" if "house" in h else "")
+            print(f"      {h['transit_name']} {what} → {h['natal_name']}: {h['start']} — {h['end']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+transit_series.py — TRANSIT POSITIONS AS TIME SERIES
+----------------------------------------------------
+Scrubbing or animating transits needs the grahas at many moments, not a
+full chart at each: no Maandhi, no HTML table, no dasha. series() samples
+start, start + step, ... and returns column arrays per graha:
+
+    lon    sidereal longitude (mean ayanamsa, like the charts), 4 decimals
+    speed  deg/day, negative = retrograde (the charts' retro flag)
+    sign   rasi index 0-11
+
+plus the sidereal Lagna for the place. Moment i is start_jd + i * step_days
+(JD UT), so no per-sample timestamps are sent. Long ranges are produced in
+chunks of CHUNK_POINTS samples; /transit_series streams them as NDJSON
+lines instead of building one huge document.
+
+CLI
+    python transit_series.py 2025-01-01 2025-12-31 --step 1d
+    python transit_series.py --bench
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+import swisseph as swe
+
+from chart_snapshot import DEFAULT_SID_MODE, sid_mode_for
+from transit_events import GRAHAS, TransitClock
+
+CHUNK_POINTS = 500
+MAX_POINTS = 100000
+LON_DECIMALS = 4
+SPEED_DECIMALS = 5
+
+STEP_UNITS = {"d": 1.0, "h": 1.0 / 24.0, "m": 1.0 / 1440.0, "w": 7.0}
+
+# Bodies actually computed; Ketu is Rahu + 180
+_BODIES = sorted({pid for _, pid, _ in GRAHAS.values()})
+
+
+def parse_step(val):
+    """'1d' / '6h' / '30m' / '2w' or a number of days -> days."""
+    if isinstance(val, (int, float)):
+        days = float(val)
+    else:
+        s = str(val or "1d").strip().lower()
+        unit = STEP_UNITS.get(s[-1:])
+        days = float(s[:-1]) * unit if unit else float(s)
+    if days <= 0:
+        raise ValueError("step must be positive")
+    return days
+
+
+def parse_moment(val, tz):
+    """'YYYY-MM-DD', 'YYYY-MM-DDTHH:MM[:SS]' or 'YYYY-MM-DD HH:MM[:SS]' (local) -> JD UT."""
+    s = str(val).strip().replace("T", " ")
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            dt = datetime.strptime(s, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Bad date/time: {val}")
+    return swe.julday(dt.year, dt.month, dt.day,
+                      dt.hour + dt.minute / 60.0 + dt.second / 3600.0) - tz / 24.0
+
+
+def point_count(jd_start, jd_end, step):
+    """Samples start, start + step, ... up to and including jd_end."""
+    if jd_end < jd_start:
+        raise ValueError("end is before start")
+    n = int((jd_end - jd_start) / step + 1e-9) + 1
+    if n > MAX_POINTS:
+        raise ValueError(f"Too many samples ({n}, max {MAX_POINTS}) — use a larger step")
+    return n
+
+
+def chunk(jd_start, step, offset, count, lat=None, lon=None, clock=None):
+    """
+    Samples offset .. offset+count-1 of the series as column arrays:
+    {"offset", "count", "lon": {graha: [...]}, "speed": {...}, "sign": {...},
+     "lagna": {"lon": [...], "sign": [...]}} (no lagna without a place).
+    """
+    clock = clock or TransitClock()
+    lons = {g: [] for g in GRAHAS}
+    speeds = {g: [] for g in GRAHAS}
+    signs = {g: [] for g in GRAHAS}
+    lagna = {"lon": [], "sign": []}
+    for i in range(offset, offset + count):
+        jd = jd_start + i * step
+        ay, _ = clock.ayanamsa(jd)
+        body = {pid: swe.calc_ut(jd, pid)[0] for pid in _BODIES}
+        for g, (_, pid, extra) in GRAHAS.items():
+            res = body[pid]
+            sid = (res[0] - ay + extra) % 360.0
+            lons[g].append(round(sid, LON_DECIMALS))
+            speeds[g].append(round(res[3], SPEED_DECIMALS))
+            signs[g].append(int(sid // 30.0))
+        if lat is not None and lon is not None:
+            asc = (swe.houses(jd, lat, lon, b'P')[1][0] - ay) % 360.0
+            lagna["lon"].append(round(asc, LON_DECIMALS))
+            lagna["sign"].append(int(asc // 30.0))
+    out = {"offset": offset, "count": count, "lon": lons, "speed": speeds, "sign": signs}
+    if lat is not None and lon is not None:
+        out["lagna"] = lagna
+    return out
+
+
+def header(jd_start, step, count, tz=5.5, sid_mode=DEFAULT_SID_MODE):
+    """What every sample shares: time axis, graha order and names."""
+    return {"start_jd": round(jd_start, 7), "step_days": step, "count": count, "tz": tz,
+            "sid_mode": sid_mode, "grahas": list(GRAHAS), "names": [v[0] for v in GRAHAS.values()],
+            "chunk_points": CHUNK_POINTS}
+
+
+def chunks(jd_start, step, count, lat=None, lon=None, sid_mode=DEFAULT_SID_MODE, size=CHUNK_POINTS):
+    """Lazily yield the whole series, `size` samples per chunk."""
+    clock = TransitClock(sid_mode)
+    for offset in range(0, count, size):
+        yield chunk(jd_start, step, offset, min(size, count - offset), lat, lon, clock)
+
+
+def series(jd_start, step, count, lat=None, lon=None, sid_mode=DEFAULT_SID_MODE, tz=5.5):
+    """Header and every sample in one dict (for ranges that fit one response)."""
+    out = header(jd_start, step, count, tz, sid_mode)
+    out.update(chunk(jd_start, step, 0, count, lat, lon, TransitClock(sid_mode)))
+    return out
+
+
+def parse_request(src):
+    """start/end/step/lat/lon/tz/ayanamsa of a request -> series() arguments."""
+    tz = float(src.get("tz", 5.5))
+    if not src.get("start"):
+        raise ValueError("start is required ('YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM')")
+    jd_start = parse_moment(src["start"], tz)
+    jd_end = parse_moment(src.get("end") or src["start"], tz)
+    step = parse_step(src.get("step", "1d"))
+    return {"jd_start": jd_start, "step": step, "count": point_count(jd_start, jd_end, step),
+            "lat": float(src.get("lat", 13.0827)), "lon": float(src.get("lon", 80.2707)),
+            "sid_mode": sid_mode_for(src.get("ayanamsa", "lahiri")), "tz": tz}
+
+
+# -------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------
+def _bench():
+    """One year of daily samples vs. one calc_full_table per day (what /generate_chart did)."""
+    from app_stable_backup import calc_full_table
+    from chart_snapshot import clear_caches
+
+    jd0 = parse_moment("2025-01-01 09:30", 5.5)
+    t = time.perf_counter()
+    s = series(jd0, 1.0, 365, 13.0827, 80.2707)
+    one = time.perf_counter() - t
+    size = len(json.dumps(s, separators=(",", ":")))
+
+    clear_caches()
+    t = time.perf_counter()
+    for i in range(365):
+        y, m, d, h = swe.revjul(jd0 + i + 5.5 / 24.0)
+        hh = int(h)
+        mm = int(round((h - hh) * 60))
+        calc_full_table(y, m, d, hh, mm, 0, 13.0827, 80.2707, 5.5, debug=False)
+    per_chart = time.perf_counter() - t
+
+    # same sidereal positions as the chart table
+    rows = calc_full_table(2025, 1, 1, 9, 30, 0, 13.0827, 80.2707, 5.5, debug=False)
+    sat = next(r for r in rows if r["name"] == "சனி")
+    assert int(s["lon"]["saturn"][0] // 30) + 1 == sat["rasi_no"]
+    assert abs(s["lon"]["saturn"][0] % 30 - sat["deg_in_sign"]) < 1e-3
+    return {"samples": 365, "series_ms": round(one * 1000, 1), "json_bytes": size,
+            "calc_full_table_x365_ms": round(per_chart * 1000, 1)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Transit positions as time series")
+    ap.add_argument("start", nargs="?", help="YYYY-MM-DD[THH:MM] local")
+    ap.add_argument("end", nargs="?")
+    ap.add_argument("--step", default="1d")
+    ap.add_argument("--tz", type=float, default=5.5)
+    ap.add_argument("--ayanamsa", default="lahiri")
+    ap.add_argument("--bench", action="store_true", help="a year of daily samples vs. per-day charts")
+    args = ap.parse_args(argv)
+    if args.bench:
+        print(json.dumps(_bench(), indent=1))
+        return 0
+    if not args.start:
+        ap.error("start is required")
+    req = parse_request({"start": args.start, "end": args.end, "step": args.step,
+                         "tz": args.tz, "ayanamsa": args.ayanamsa})
+    head = header(req["jd_start"], req["step"], req["count"], req["tz"], req["sid_mode"])
+    print(json.dumps(head, ensure_ascii=False))
+    for part in chunks(req["jd_start"], req["step"], req["count"], req["lat"], req["lon"], req["sid_mode"]):
+        print(json.dumps(part, separators=(",", ":")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,11 @@
 
 import swisseph as swe
 import datetime
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
 from typing import List
+from chart_snapshot import ayanamsa_ut
 
 # ---------------- Configuration ----------------
 EPHE_PATH = None  # e.g., r"D:\ephe"; keep None if default
@@ -16,7 +20,6 @@ if EPHE_PATH:
     swe.set_ephe_path(EPHE_PATH)
 
 DEFAULT_SID_MODE = swe.SIDM_LAHIRI
-swe.set_sid_mode(DEFAULT_SID_MODE)
 
 VIM_ORDER = ["Ketu", "Venus", "Sun", "Moon", "Mars", "Rahu", "Jupiter", "Saturn", "Mercury"]
 VIM_PERIOD = {
@@ -82,50 +85,161 @@ def normalize_angle(a: float) -> float:
     return a
 
 
-# ---------------- Recursive Builder ----------------
-def build_level(start_jd: float, dur_years: float, depth: int, tz: float, start_index: int = 0) -> List[dict]:
-    """Build nested Vimshottari levels."""
-    if depth <= 0:
-        return []
+# ---------------- Array-backed Tree ----------------
+LEVEL_NAMES = ["Mahadasha", "Bhukti", "Antara", "Pratyantara", "Sookshma", "Prana"]
+MAX_DEPTH = len(LEVEL_NAMES)
+CYCLE_YEARS = 120
 
-    nodes = []
-    jd = start_jd
-    for i in range(9):
-        idx = (start_index + i) % 9
-        lord = VIM_ORDER[idx]
-        sub_years = dur_years * (VIM_PERIOD[lord] / 120.0)
-        end_jd = jd + sub_years * DAYS_PER_YEAR
+# CUM_FRAC[p][i]: share of a period ruled by VIM_ORDER[p] that has passed when
+# its i-th sub-period starts (sub-periods run p, p+1, ... p+8 in VIM_ORDER).
+CUM_FRAC = []
+for _p in range(9):
+    _acc, _row = 0, [0.0]
+    for _i in range(9):
+        _acc += VIM_PERIOD[VIM_ORDER[(_p + _i) % 9]]
+        _row.append(_acc / CYCLE_YEARS)
+    CUM_FRAC.append(tuple(_row))
 
-        node = {
+
+class DashaTree:
+    """
+    A span of time split into Vimshottari levels, stored as flat arrays:
+    starts[k], ends[k] (JD UT) and lords[k] (index into VIM_ORDER) for level k.
+    Level k holds 9**(k+1) periods and the children of period n are
+    n*9 .. n*9+8 on the next level, so finding the running period is one
+    bisect per level. Levels deeper than `depth` are not stored; lookups
+    below them are worked out from CUM_FRAC on the fly.
+    Nothing is formatted until asked for (period / children / to_nested).
+    """
+
+    def __init__(self, start_jd: float, span_days: float, start_index: int, tz: float, depth: int = 3):
+        self.tz = tz
+        self.depth = max(1, min(int(depth), MAX_DEPTH))
+        self.start_jd = start_jd
+        self.end_jd = start_jd + span_days
+
+        cum = CUM_FRAC[start_index]
+        starts = array("d", (start_jd + span_days * cum[i] for i in range(9)))
+        ends = array("d", starts[1:])
+        ends.append(self.end_jd)
+        self.starts, self.ends = [starts], [ends]
+        self.lords = [array("b", ((start_index + i) % 9 for i in range(9)))]
+        for _ in range(1, self.depth):
+            self._split_last_level()
+
+    def _split_last_level(self):
+        starts, ends, lords = array("d"), array("d"), array("b")
+        for s, e, p in zip(self.starts[-1], self.ends[-1], self.lords[-1]):
+            span, cum = e - s, CUM_FRAC[p]
+            sub = [s + span * c for c in cum]
+            sub[9] = e
+            starts.extend(sub[:9])
+            ends.extend(sub[1:])
+            lords.extend((p + i) % 9 for i in range(9))
+        self.starts.append(starts)
+        self.ends.append(ends)
+        self.lords.append(lords)
+
+    # ---- lookup ----
+    def active_chain(self, jd_ut: float, depth: int = MAX_DEPTH) -> List[tuple]:
+        """
+        [(level, lord_index, start_jd, end_jd), ...] of the periods running at
+        jd_ut, outermost first. Empty when jd_ut is outside the tree.
+        """
+        if not self.start_jd <= jd_ut < self.end_jd:
+            return []
+        chain = []
+        lo, hi = 0, 9
+        for k in range(min(depth, MAX_DEPTH)):
+            if k < self.depth:
+                i = max(lo, bisect_right(self.starts[k], jd_ut, lo, hi) - 1)
+                s, e, p = self.starts[k][i], self.ends[k][i], self.lords[k][i]
+                lo, hi = i * 9, i * 9 + 9
+            else:
+                s0, e0, p0 = s, e, p
+                cum = CUM_FRAC[p0]
+                i = min(8, max(0, bisect_right(cum, (jd_ut - s0) / (e0 - s0)) - 1))
+                s = s0 + (e0 - s0) * cum[i]
+                e = e0 if i == 8 else s0 + (e0 - s0) * cum[i + 1]
+                p = (p0 + i) % 9
+            chain.append((k, p, s, e))
+        return chain
+
+    # ---- formatting ----
+    def period(self, level: int, i: int) -> dict:
+        """One stored period in the build_level node format (without "sub")."""
+        lord = VIM_ORDER[self.lords[level][i]]
+        s, e = self.starts[level][i], self.ends[level][i]
+        return {
             "lord": lord,
             "lord_ta": lord,
-            "start": jd_to_local_iso(jd, tz),
-            "end": jd_to_local_iso(end_jd, tz),
-            "start_jd": jd,
-            "end_jd": end_jd
+            "start": jd_to_local_iso(s, self.tz),
+            "end": jd_to_local_iso(e, self.tz),
+            "start_jd": s,
+            "end_jd": e
         }
 
-        if depth > 1:
-            node["sub"] = build_level(jd, sub_years, depth - 1, tz, idx)
-
-        nodes.append(node)
-        jd = end_jd
-    return nodes
+    def children(self, level: int = -1, parent: int = 0) -> List[dict]:
+        """The 9 periods of `level` under `parent` (level 0: the top 9)."""
+        if level <= 0:
+            return [self.period(0, i) for i in range(9)]
+        return [self.period(level, i) for i in range(parent * 9, parent * 9 + 9)]
+
+    def to_nested(self, depth: int = None) -> List[dict]:
+        """Nested dicts exactly as build_level returns them."""
+        depth = self.depth if depth is None else min(depth, self.depth)
+        memo = {}
+
+        def iso(jd):
+            # a period's end is the next one's start: format each boundary once
+            s = memo.get(jd)
+            if s is None:
+                s = memo[jd] = jd_to_local_iso(jd, self.tz)
+            return s
+
+        def level_nodes(k, lo):
+            nodes = []
+            starts, ends, lords = self.starts[k], self.ends[k], self.lords[k]
+            for i in range(lo, lo + 9):
+                lord = VIM_ORDER[lords[i]]
+                node = {
+                    "lord": lord,
+                    "lord_ta": lord,
+                    "start": iso(starts[i]),
+                    "end": iso(ends[i]),
+                    "start_jd": starts[i],
+                    "end_jd": ends[i]
+                }
+                if k + 1 < depth:
+                    node["sub"] = level_nodes(k + 1, i * 9)
+                nodes.append(node)
+            return nodes
+
+        return level_nodes(0, 0)
+
+    def chain_dicts(self, jd_ut: float, depth: int = MAX_DEPTH) -> List[dict]:
+        """active_chain formatted for /get_dasha_chain."""
+        return [{
+            "level": LEVEL_NAMES[k],
+            "planet": VIM_ORDER[p],
+            "start_date": jd_to_local_iso(s, self.tz),
+            "end_date": jd_to_local_iso(e, self.tz)
+        } for k, p, s, e in self.active_chain(jd_ut, depth)]
 
 
-# ---------------- Mahadasha Computation ----------------
-def compute_vimshottari(year: int, month: int, day: int,
-                        hour: int, minute: int, second: int,
-                        lat: float, lon: float, tz: float,
-                        sid_mode: int = DEFAULT_SID_MODE) -> dict:
-    """Compute Mahadashas based on Moon's longitude at birth (Parashara Vimshottari)."""
-    swe.set_sid_mode(sid_mode)
+def build_level(start_jd: float, dur_years: float, depth: int, tz: float, start_index: int = 0) -> List[dict]:
+    """Build nested Vimshottari levels."""
+    if depth <= 0:
+        return []
+    return DashaTree(start_jd, dur_years * DAYS_PER_YEAR, start_index, tz, depth).to_nested()
 
-    jd_ut = jd_from_local(year, month, day, hour, minute, second, tz)
 
-    # Get Moon longitude (sidereal)
+# ---------------- Mahadasha Computation ----------------
+def _birth_dasha_start(jd_ut: float, sid_mode: int):
+    """(moon_sid, nakshatra index, fraction elapsed, JD UT the birth Mahadasha began)."""
+    # Get Moon longitude (sidereal, ayanamsa passed explicitly)
     moon_pos = swe.calc_ut(jd_ut, swe.MOON)[0][0]
-    ayan = swe.get_ayanamsa_ut(jd_ut)
+    ayan = ayanamsa_ut(jd_ut, sid_mode)
     moon_sid = normalize_angle(moon_pos - ayan)
 
     nak_index = int(moon_sid // NAK_DEG)
@@ -133,7 +247,33 @@ def compute_vimshottari(year: int, month: int, day: int,
     start_lord = VIM_ORDER[nak_index % 9]
 
     elapsed_years = VIM_PERIOD[start_lord] * frac_in_nak
-    start_jd_current = jd_ut - (elapsed_years * DAYS_PER_YEAR)
+    return moon_sid, nak_index, frac_in_nak, jd_ut - (elapsed_years * DAYS_PER_YEAR)
+
+
+@lru_cache(maxsize=256)
+def dasha_tree(year: int, month: int, day: int,
+               hour: int, minute: int, second: int,
+               lat: float, lon: float, tz: float,
+               sid_mode: int = DEFAULT_SID_MODE, depth: int = 3) -> DashaTree:
+    """
+    The whole 120-year cycle from birth as a DashaTree (stored to `depth`
+    levels, Antara by default; deeper lookups are computed). Cached, so
+    repeated "what is running on date X" calls for a chart skip the Moon
+    calculation too. Treat the returned tree as read-only.
+    """
+    jd_ut = jd_from_local(year, month, day, hour, minute, second, tz)
+    _, nak_index, _, start_jd = _birth_dasha_start(jd_ut, sid_mode)
+    return DashaTree(start_jd, CYCLE_YEARS * DAYS_PER_YEAR, nak_index % 9, tz, depth)
+
+
+def compute_vimshottari(year: int, month: int, day: int,
+                        hour: int, minute: int, second: int,
+                        lat: float, lon: float, tz: float,
+                        sid_mode: int = DEFAULT_SID_MODE) -> dict:
+    """Compute Mahadashas based on Moon's longitude at birth (Parashara Vimshottari)."""
+    jd_ut = jd_from_local(year, month, day, hour, minute, second, tz)
+    moon_sid, nak_index, frac_in_nak, start_jd_current = _birth_dasha_start(jd_ut, sid_mode)
+    start_lord = VIM_ORDER[nak_index % 9]
 
     mahadashas = []
     jd_cursor = start_jd_current
@@ -185,4 +325,19 @@ if __name__ == "__main__":
     print("\n🪔 Test 2: 2012-11-10 19:07 Vellore (tz=5.5)")
     r2 = compute_vimshottari(2012, 11, 10, 19, 7, 0, 12.9, 79.1, 5.5)
     for m in r2["mahadashas"][:3]:
-        print(m["lord"], m["start"], "→", m["end"])
\ No newline at end of file
+        print(m["lord"], m["start"], "→", m["end"])
+
+    print("\n🪔 Test 3: running chain on 2025-10-23 12:00, full 6-level tree")
+    import time
+    tree = dasha_tree(2012, 11, 10, 19, 7, 0, 12.9, 79.1, 5.5)
+    target = jd_from_local(2025, 10, 23, 12, 0, 0, 5.5)
+    for p in tree.chain_dicts(target):
+        print(f"{p['level']:12s} {p['planet']:8s} {p['start_date']} → {p['end_date']}")
+    t0 = time.perf_counter()
+    for i in range(10000):
+        tree.active_chain(target + i * 0.37)
+    print(f"active_chain: {(time.perf_counter() - t0) / 10000 * 1e6:.1f} µs")
+    t0 = time.perf_counter()
+    full = DashaTree(tree.start_jd, tree.end_jd - tree.start_jd, tree.lords[0][0], 5.5, MAX_DEPTH)
+    print(f"6-level arrays ({len(full.starts[-1])} Prana periods): {time.perf_counter() - t0:.2f} s")
+    assert full.active_chain(target) == tree.active_chain(target)
\ No newline at end of file